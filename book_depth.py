@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Book Depth - Taille exécutable à partir du carnet L2 en cache
+
+Les exécuteurs ne regardaient que asks[0] / bids[0] et dimensionnaient tout
+l'ordre à ce prix: une grosse copie balayait le carnet ou était rejetée
+(FOK), puis retentée. Ici un côté du carnet devient une échelle de niveaux
+triés (meilleur prix d'abord) avec tailles et notionnels cumulés:
+
+    - VWAP d'une taille donnée, taille max exécutable sous un prix limite
+      ou un slippage en bps: bisect sur les tableaux cumulés, O(log n)
+    - tableaux cumulés construits à la demande, seulement jusqu'au niveau
+      atteint (la plupart des ordres ne touchent que les premiers niveaux)
+    - une échelle par snapshot de carnet: le cache du client renvoyant le
+      même objet pendant son TTL, les appels suivants ne refont rien
+
+L'ordre des niveaux renvoyé par l'API n'est pas supposé: ils sont triés.
+"""
+import math
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class DepthLadder:
+    """
+    Côté du carnet consommé par un ordre: les asks pour un BUY, les bids pour un SELL.
+
+    Args:
+        levels: [(prix, taille)] dans n'importe quel ordre
+        side: 'BUY' ou 'SELL' (sens de l'ordre, pas du côté du carnet)
+    """
+
+    def __init__(self, levels: List[Tuple[float, float]], side: str):
+        self.side = side.upper()
+        self._buy = self.side == 'BUY'
+        levels = [(p, s) for p, s in levels if p > 0 and s > 0]
+        # Meilleur prix d'abord: ask croissant, bid décroissant
+        levels.sort(key=lambda level: level[0], reverse=not self._buy)
+        self._prices = [p for p, _ in levels]
+        self._sizes = [s for _, s in levels]
+        # Clé de bisect croissante dans les deux sens (prix négatifs pour les bids)
+        self._keys = self._prices if self._buy else [-p for p in self._prices]
+        self._cum_size: List[float] = []
+        self._cum_notional: List[float] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_book(cls, book: Dict, side: str) -> 'DepthLadder':
+        raw = book.get('asks' if side.upper() == 'BUY' else 'bids', []) or []
+        levels = []
+        for level in raw:
+            try:
+                levels.append((float(level.get('price', 0)), float(level.get('size', 0))))
+            except (TypeError, ValueError, AttributeError):
+                continue
+        return cls(levels, side)
+
+    # =========================================================================
+    # CUMULS (incrémentaux)
+    # =========================================================================
+
+    def _extend_to(self, depth: int):
+        """Étend les cumuls jusqu'au niveau `depth` (exclu)"""
+        depth = min(depth, len(self._prices))
+        if len(self._cum_size) >= depth:
+            return
+        with self._lock:
+            size = self._cum_size[-1] if self._cum_size else 0.0
+            notional = self._cum_notional[-1] if self._cum_notional else 0.0
+            for i in range(len(self._cum_size), depth):
+                size += self._sizes[i]
+                notional += self._sizes[i] * self._prices[i]
+                self._cum_size.append(size)
+                self._cum_notional.append(notional)
+
+    def _levels_for_size(self, shares: float) -> int:
+        """Nombre de niveaux nécessaires pour `shares` (len+1 si profondeur insuffisante)"""
+        while (not self._cum_size or self._cum_size[-1] < shares - 1e-9) and len(self._cum_size) < len(self._prices):
+            self._extend_to(max(4, len(self._cum_size) * 2))
+        return bisect_left(self._cum_size, shares - 1e-9) + 1
+
+    # =========================================================================
+    # REQUÊTES
+    # =========================================================================
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    @property
+    def best_price(self) -> Optional[float]:
+        return self._prices[0] if self._prices else None
+
+    @property
+    def total_size(self) -> float:
+        self._extend_to(len(self._prices))
+        return self._cum_size[-1] if self._cum_size else 0.0
+
+    def limit_for_bps(self, max_slippage_bps: float) -> Optional[float]:
+        """Prix limite toléré autour du meilleur prix"""
+        best = self.best_price
+        if best is None:
+            return None
+        mult = max_slippage_bps / 10000
+        return best * (1 + mult) if self._buy else best * (1 - mult)
+
+    def max_size_within(self, limit_price: float) -> float:
+        """Shares exécutables sans dépasser `limit_price`"""
+        key = limit_price if self._buy else -limit_price
+        depth = bisect_right(self._keys, key + 1e-12)
+        if depth == 0:
+            return 0.0
+        self._extend_to(depth)
+        return self._cum_size[depth - 1]
+
+    def vwap(self, shares: float) -> Optional[float]:
+        """Prix moyen d'exécution de `shares` (None si profondeur insuffisante)"""
+        if shares <= 0 or not self._prices:
+            return None
+        depth = self._levels_for_size(shares)
+        if depth > len(self._prices):
+            return None
+        last = depth - 1
+        before_size = self._cum_size[last - 1] if last else 0.0
+        before_notional = self._cum_notional[last - 1] if last else 0.0
+        return (before_notional + (shares - before_size) * self._prices[last]) / shares
+
+    def marginal_price(self, shares: float) -> Optional[float]:
+        """Prix du dernier niveau touché par `shares` (limite suffisante pour tout exécuter)"""
+        if shares <= 0 or not self._prices:
+            return None
+        depth = self._levels_for_size(shares)
+        return self._prices[depth - 1] if depth <= len(self._prices) else None
+
+    def plan(self, shares: float, max_slippage_bps: float) -> Optional[Dict]:
+        """
+        Taille et prix limite d'un ordre de `shares` sous le slippage toléré.
+
+        Returns:
+            {'shares': taille plafonnée à la profondeur, 'requested', 'capped',
+             'best_price', 'limit_price', 'vwap', 'slippage_bps'} ou None (carnet vide)
+        """
+        best = self.best_price
+        if best is None:
+            return None
+        fillable = self.max_size_within(self.limit_for_bps(max_slippage_bps))
+        # Plafond arrondi au centième inférieur (précision des tailles CLOB)
+        executable = shares if fillable >= shares else math.floor(fillable * 100) / 100
+        if executable <= 0:
+            return {'shares': 0.0, 'requested': shares, 'capped': True, 'best_price': best,
+                    'limit_price': best, 'vwap': None, 'slippage_bps': 0.0}
+        vwap = self.vwap(executable)
+        return {
+            'shares': executable,
+            'requested': shares,
+            'capped': executable < shares,
+            'best_price': best,
+            'limit_price': self.marginal_price(executable),
+            'vwap': vwap,
+            'slippage_bps': abs(vwap - best) / best * 10000
+        }
+
+
+_ladders: 'OrderedDict[Tuple[int, str], Tuple[Dict, DepthLadder]]' = OrderedDict()
+_ladders_lock = threading.Lock()
+_MAX_LADDERS = 512
+
+
+def ladder_for(book: Optional[Dict], side: str) -> Optional[DepthLadder]:
+    """Échelle de profondeur d'un snapshot de carnet (réutilisée tant que le snapshot l'est)"""
+    if not book:
+        return None
+    side = side.upper()
+    key = (id(book), side)
+    with _ladders_lock:
+        entry = _ladders.get(key)
+        # Le snapshot est gardé dans l'entrée: son id ne peut pas être réattribué
+        if entry is not None and entry[0] is book:
+            _ladders.move_to_end(key)
+            return entry[1]
+    ladder = DepthLadder.from_book(book, side)
+    with _ladders_lock:
+        _ladders[key] = (book, ladder)
+        while len(_ladders) > _MAX_LADDERS:
+            _ladders.popitem(last=False)
+    return ladder
@@ -11,15 +11,20 @@ import json
 import threading
 import time
 import logging # ✨ Logging
+import socket
 import subprocess
 import signal
 import requests
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, render_template, render_template_string, jsonify, request
+from flask import Flask, render_template, render_template_string, jsonify, request, Response, stream_with_context
 from flask_socketio import SocketIO, emit
 
-# ⚡ Libérer le port 5000 au démarrage
+# ⏱️ Phases de démarrage (timings + état de disponibilité sur /health)
+from startup_manager import startup_manager
+_phase_start = time.time()
+
+# ⚡ Libérer le port au démarrage (appelé par main(), pas à l'import)
 def kill_port(port=5000):
     """Tue les processus utilisant le port spécifié"""
     try:
@@ -29,20 +34,18 @@ def kill_port(port=5000):
             capture_output=True,
             text=True
         )
-        pids = result.stdout.strip().split('\n')
+        pids = [pid for pid in result.stdout.strip().split('\n') if pid]
         for pid in pids:
-            if pid:
-                try:
-                    os.kill(int(pid), signal.SIGKILL)
-                    print(f"🔄 Process {pid} sur port {port} terminé")
-                except:
-                    pass
-        time.sleep(1)
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+                print(f"🔄 Process {pid} sur port {port} terminé")
+            except:
+                pass
+        if pids:
+            time.sleep(1)
     except Exception as e:
         pass  # Silencieux si erreur
 
-kill_port(5000)
-
 # ⚡ Charger variables d'environnement depuis .env
 def load_env_file():
     """Charge les variables d'environnement depuis .env"""
@@ -63,7 +66,8 @@ load_env_file()
 
 # Imports locaux
 from bot_logic import BotBackend
-from db_manager import db_manager
+from db_manager import db_manager, next_cursor
+from position_store import get_position_store
 from audit_logger import audit_logger
 from secret_manager import secret_manager
 from notification_aggregator import NotificationAggregator
@@ -71,7 +75,17 @@ from notification_aggregator import NotificationAggregator
 # 🔧 Optimisations
 from logging_config import setup_logging, get_logger
 from startup_reconciler import run_startup_reconciliation
-from cache_manager import start_cleanup_scheduler
+from cache_manager import start_cleanup_scheduler, cache as api_cache
+from request_coalescer import get_request_coalescer
+from goldsky_client import get_goldsky_client
+from timeseries_store import get_timeseries_store
+from state_publisher import init_state_publisher
+from process_broker import connect_from_env, RemoteComponent
+
+# 🧩 Mode multi-process (multiprocess_runner.py): ce processus ne sert que le web,
+# les scanners et le copy-trading tournent dans des workers joints via le broker
+PROCESS_MODE = os.getenv('BOT_PROCESS_MODE', 'single')
+broker_client = connect_from_env('web') if PROCESS_MODE == 'web' else None
 
 # Init Flask
 app = Flask(__name__)
@@ -85,10 +99,12 @@ def emit_notification(event_name, data):
 
 notification_aggregator = NotificationAggregator(
     emit_callback=emit_notification,
-    emit_interval_ms=500,  # 500ms entre chaque notification (fluidite)
-    high_value_threshold=1000  # $1000+ = haute priorite (immediat)
+    emit_interval_ms=500,  # 500ms entre chaque lot (fluidite)
+    high_value_threshold=1000,  # $1000+ = haute priorite (immediat)
+    max_queue_size=1000,  # Queue bornee: back-pressure au-dela
+    overflow_policy='coalesce'  # Fusionne les trades d'un meme trader/marche si saturee
 )
-print("📬 NotificationAggregator initialise (distribution fluide 500ms)")
+print("📬 NotificationAggregator initialise (lots toutes les 500ms, queue bornee 1000)")
 
 # 🔧 Configuration Logging Structuré
 log_level = os.getenv('LOG_LEVEL', 'INFO')
@@ -99,8 +115,12 @@ logger = get_logger("BotBackend")
 start_cleanup_scheduler(interval=300)  # Toutes les 5 minutes
 
 backend = BotBackend()
+if broker_client:
+    backend.on_save = lambda: broker_client.publish('config_changed')
+startup_manager.record('imports', _phase_start)
 
 # Imports Polymarket (avec fallback)
+_phase_start = time.time()
 try:
     from polymarket_tracking import PolymarketTracker
     from polymarket_executor import PolymarketExecutor
@@ -117,9 +137,6 @@ try:
     polymarket_tracker.add_callback(polymarket_executor.on_signal_detected)
     print("✅ Tracker connecté à l'Exécuteur")
     
-    # 🚀 Démarrer le tracker
-    monitoring_interval = backend.data.get('polymarket', {}).get('polling_interval', 5)
-    
     # Charger les wallets existants dans le tracker
     existing_wallets = backend.data.get('polymarket', {}).get('tracked_wallets', [])
     for w in existing_wallets:
@@ -131,14 +148,21 @@ try:
         )
     print(f"📋 Tracker chargé avec {len(existing_wallets)} wallets")
 
-    polymarket_tracker.start_monitoring(interval=monitoring_interval)
-    print("✅ Monitoring Polymarket démarré")
-    
+    if broker_client:
+        # Le monitoring tourne dans le worker copytrade
+        polymarket_tracker = RemoteComponent(
+            broker_client, 'copytrade', 'tracker', polymarket_tracker,
+            remote_methods=['check_all_wallets', 'set_polygonscan_key', 'add_wallet', 'remove_wallet'],
+            timeouts={'check_all_wallets': 60}
+        )
+    # Monitoring démarré en arrière-plan par start_subsystems()
+
 except ImportError as e:
     print(f"⚠️ Modules Polymarket non disponibles: {e}")
     polymarket_tracker = None
     polymarket_executor = None
     trailing_monitor = None
+startup_manager.record('copytrade_init', _phase_start)
 
 # Imports WebSocket Polygon (avec fallback)
 try:
@@ -158,43 +182,47 @@ except ImportError as e:
     polygon_ws = None
 
 # Imports CLOB Polymarket (avec fallback)
+# py-clob-client est initialisé en arrière-plan (warm_up) et le Risk Engine démarré
+# après la réconciliation, par start_subsystems()
+_phase_start = time.time()
 try:
     from polymarket_client import polymarket_client as polymarket_clob
     print(f"✅ Client Polymarket unifié chargé: {polymarket_clob.get_stats()}")
-
-    # 🛡️ Initialisation du Risk Engine (Remplace SLTPMonitor et TrailingStopMonitor)
-    # On l'initialise ici car il a besoin de polymarket_clob et polymarket_executor
-    if polymarket_executor and polymarket_clob:
-        risk_engine = init_risk_engine(polymarket_executor, polymarket_clob)
-        risk_engine.start()
-        print("✅ Risk Engine Polymarket démarré")
 except ImportError as e:
     print(f"⚠️ CLOB Polymarket non disponible: {e}")
     polymarket_clob = None
+startup_manager.record('clob_init', _phase_start)
 
 # 🔍 Imports Insider Tracker (avec fallback)
+_phase_start = time.time()
 try:
     from insider_scanner import insider_scanner
-    from insider_routes import insider_bp
+    from insider_routes import insider_bp, init_insider_routes
 
     # Injecter les dependances
     insider_scanner.socketio = socketio
     insider_scanner.db_manager = db_manager
 
+    if broker_client:
+        insider_scanner = RemoteComponent(
+            broker_client, 'insider', 'insider', insider_scanner,
+            remote_methods=['start_scanning', 'stop_scanning', 'set_config', 'get_config',
+                            'scan_all_markets', 'set_polygonscan_key', 'profile_wallet'],
+            timeouts={'scan_all_markets': 300, 'profile_wallet': 120}
+        )
+    init_insider_routes(insider_scanner)
+
     # Enregistrer le blueprint
     app.register_blueprint(insider_bp)
 
-    # Auto-démarrage si configuré
-    if insider_scanner.config.get('auto_start', False):
-         print("🔄 Redémarrage automatique du Insider Scanner...")
-         insider_scanner.start_scanning()
-
     print("✅ Insider Tracker chargé")
 except ImportError as e:
     print(f"⚠️ Insider Tracker non disponible: {e}")
     insider_scanner = None
+startup_manager.record('insider_init', _phase_start)
 
 # ⚡ Imports HFT Module (avec fallback)
+_phase_start = time.time()
 try:
     from hft_module.hft_scanner import HFTScanner
     from hft_routes import hft_bp, init_hft_routes
@@ -205,6 +233,14 @@ try:
         db_manager=db_manager,
         polymarket_client=polymarket_clob
     )
+    if broker_client:
+        hft_scanner = RemoteComponent(
+            broker_client, 'hft', 'hft', hft_scanner,
+            remote_methods=['start', 'stop', 'toggle', 'set_config', 'get_config', 'get_wallets',
+                            'add_wallet', 'remove_wallet', 'update_wallet', 'get_active_markets',
+                            'get_recent_signals', 'market_discovery'],
+            timeouts={'market_discovery.refresh': 60}
+        )
 
     # Initialiser les routes avec le scanner
     init_hft_routes(hft_scanner)
@@ -212,15 +248,11 @@ try:
     # Enregistrer le blueprint
     app.register_blueprint(hft_bp)
 
-    # Auto-démarrage si configuré
-    if hft_scanner.config.get('auto_start', False):
-        print("🔄 Redémarrage automatique du HFT Scanner...")
-        hft_scanner.start()
-
     print("✅ Module HFT chargé")
 except ImportError as e:
     print(f"⚠️ Module HFT non disponible: {e}")
     hft_scanner = None
+startup_manager.record('hft_init', _phase_start)
 
 # ============================================================================
 # INITIALISATION
@@ -239,6 +271,37 @@ print(f"🔍 Insider Tracker: {'Disponible' if insider_scanner else 'Non disponi
 print(f"⚡ HFT Module: {'Disponible' if hft_scanner else 'Non disponible'}")
 print("=" * 60)
 
+# 📡 State Publisher - Push delta-only de l'état du dashboard (frames 250ms)
+def _positions_state():
+    """Positions ouvertes indexées par id (pour les patchs par position)"""
+    return {str(p['id']): p for p in get_position_store().get_bot_positions()}
+
+def _pnl_state():
+    """Résumé PnL du portefeuille"""
+    positions = get_position_store().get_bot_positions()
+    unrealized = sum(p.get('unrealized_pnl') or 0 for p in positions)
+    realized = get_position_store().get_realized_pnl_total()
+    return {
+        'open_positions': len(positions),
+        'unrealized_pnl': round(unrealized, 4),
+        'realized_pnl': round(realized, 4),
+        'equity': round(realized + unrealized, 4)
+    }
+
+state_publisher = init_state_publisher(socketio, frame_interval_ms=250)
+state_publisher.register_channel('positions', _positions_state)
+state_publisher.register_channel('pnl', _pnl_state)
+if hft_scanner:
+    state_publisher.register_channel('hft_stats', hft_scanner.get_stats, max_staleness=10.0)
+state_publisher.register_handlers()
+state_publisher.start()
+
+if broker_client:
+    # Événements et canaux modifiés des workers -> navigateurs
+    broker_client.subscribe('socketio', lambda m: socketio.emit(m['event'], m['data'], namespace=m['namespace'], to=m['to']))
+    broker_client.subscribe('state_dirty', state_publisher.mark_dirty)
+    print("🧩 Mode multi-process: connecté au broker")
+
 
 # ============================================================================
 # ROUTES API
@@ -285,11 +348,13 @@ def health_check():
     except:
         pass
 
+    startup = startup_manager.get_status()
     return jsonify({
-        'status': 'ok',
+        'status': startup['status'],
         'timestamp': datetime.now().isoformat(),
         'db': db_manager.check_db(),
         'ws_clients': ws_count,
+        'startup': startup,
         'threads': [t.name for t in threading.enumerate()]
     })
 
@@ -301,21 +366,48 @@ def api_notification_stats():
         'stats': notification_aggregator.get_stats()
     })
 
+@app.route('/api/cache_stats')
+def api_cache_stats():
+    """Statistiques du cache API (par namespace: orderbook:, market:, trades:), du coalescing et du batching Goldsky."""
+    return jsonify({
+        'success': True,
+        'stats': api_cache.get_stats(),
+        'coalescer': get_request_coalescer().get_stats(),
+        'goldsky': get_goldsky_client().get_stats()
+    })
+
+@app.route('/api/state_stats')
+def api_state_stats():
+    """Statistiques du State Publisher (versions, abonnés et patchs par canal)."""
+    return jsonify({
+        'success': True,
+        'stats': state_publisher.get_stats()
+    })
+
 @app.route('/api/notification_config', methods=['POST'])
 def api_notification_config():
     """Mettre a jour la config de l'aggregateur."""
     data = request.get_json() or {}
     emit_interval = data.get('emit_interval_ms')
     threshold = data.get('high_value_threshold')
-    notification_aggregator.update_config(
-        emit_interval_ms=emit_interval,
-        high_value_threshold=threshold
-    )
+    try:
+        notification_aggregator.update_config(
+            emit_interval_ms=emit_interval,
+            high_value_threshold=threshold,
+            max_queue_size=data.get('max_queue_size'),
+            max_batch_size=data.get('max_batch_size'),
+            overflow_policy=data.get('overflow_policy')
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     return jsonify({
         'success': True,
         'config': {
             'emit_interval_ms': notification_aggregator.emit_interval_ms,
-            'high_value_threshold': notification_aggregator.high_value_threshold
+            'high_value_threshold': notification_aggregator.high_value_threshold,
+            'max_queue_size': notification_aggregator.max_queue_size,
+            'max_batch_size': notification_aggregator.max_batch_size,
+            'overflow_policy': notification_aggregator.overflow_policy
         }
     })
 
@@ -451,7 +543,8 @@ def api_polymarket_stats():
             'trades_copied': pm.get('trades_copied', 0),
             'total_profit': pm.get('total_profit', 0),
             'win_rate': pm.get('win_rate', 0)
-        }
+        },
+        'execution': polymarket_executor.get_stats() if polymarket_executor else None
     })
 
 # ============================================================================
@@ -495,6 +588,10 @@ def api_wallets_add():
         })
         backend.save_config_sync()
 
+        # 🔀 Ajouter au tracker (rebalancing des shards de polling)
+        if polymarket_tracker:
+            polymarket_tracker.add_wallet(address=address, name=name)
+
         # ✅ UNIFICATION: Sauvegarder aussi dans la DB Insider
         # Source = MANUAL
         try:
@@ -530,6 +627,9 @@ def api_wallets_remove():
         ]
         backend.save_config_sync()
 
+        if polymarket_tracker and address:
+            polymarket_tracker.remove_wallet(address)
+
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -708,17 +808,22 @@ def api_wallet_polymarket():
 
 @app.route('/api/history')
 def api_history():
-    """Historique des trades (depuis DB)"""
-    trades = db_manager.get_polymarket_trades(limit=100)
+    """Historique des trades (depuis DB), paginé par curseur keyset (?before=)"""
+    limit = request.args.get('limit', 100, type=int)
+    try:
+        trades = db_manager.get_polymarket_trades(limit=limit, before=request.args.get('before'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     return jsonify({
         'success': True,
-        'trades': trades
+        'trades': trades,
+        'next_cursor': next_cursor(trades, limit, id_key='order_id')
     })
 
 @app.route('/api/positions')
 def api_positions():
-    """Positions actives (depuis DB)"""
-    positions = db_manager.get_bot_positions()
+    """Positions actives (Position Store)"""
+    positions = get_position_store().get_bot_positions()
     return jsonify({
         'success': True,
         'positions': positions
@@ -738,11 +843,10 @@ def api_positions_sell():
         if percent < 1 or percent > 100:
             return jsonify({'success': False, 'error': 'Pourcentage invalide (1-100)'}), 400
 
-        # Trouver la position depuis la DB
-        positions = db_manager.get_bot_positions()
-        position = next((p for p in positions if p['id'] == position_id), None)
+        # Trouver la position (index par id du Position Store)
+        position = get_position_store().get_position_by_id(position_id)
 
-        if not position:
+        if not position or position.get('status') != 'OPEN':
             return jsonify({'success': False, 'error': 'Position non trouvée'}), 404
 
         # Calculer le montant à vendre (en USD)
@@ -789,14 +893,9 @@ def pnl_history():
 
         dates = [row['day'] for row in history]
         daily_pnls = [row['daily_pnl'] for row in history]
-        
-        # Calcul cumulatif (simple addition pas à pas)
-        cumulative = []
-        current_sum = 0
-        for val in daily_pnls:
-            current_sum += (val or 0)
-            cumulative.append(current_sum)
-            
+        # Cumul pré-calculé sur le rollup journalier
+        cumulative = [row['cumulative_pnl'] or 0 for row in history]
+
         return jsonify({
             'success': True,
             'dates': dates,
@@ -806,6 +905,34 @@ def pnl_history():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/stats/equity_history')
+def equity_history():
+    """Courbe d'equity (ou prix d'une position) + drawdown, lus depuis les rollups pré-agrégés"""
+    try:
+        resolution = request.args.get('resolution', '1h')
+        days = request.args.get('days', 7, type=int)
+        position_id = request.args.get('position_id', type=int)
+        series = f"pos:{position_id}:price" if position_id else 'equity'
+        since = int(time.time()) - days * 86400
+
+        store = get_timeseries_store()
+        buckets = store.get_series(series, resolution, since)
+
+        return jsonify({
+            'success': True,
+            'series': series,
+            'resolution': resolution,
+            'timestamps': [b['ts'] for b in buckets],
+            'values': [b['close'] for b in buckets],
+            'highs': [b['high'] for b in buckets],
+            'lows': [b['low'] for b in buckets],
+            'drawdown': store.get_drawdown(series, resolution, since)
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/benchmark')
 def api_benchmark():
     """Benchmark des wallets suivis - classement par performance"""
@@ -848,12 +975,30 @@ def api_benchmark():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _export_ndjson():
+    """Génère l'export ligne par ligne (une ligne JSON par trade / position)"""
+    yield json.dumps({'type': 'meta', 'exported_at': datetime.now().isoformat(), 'config': backend.data}) + '\n'
+    for trade in db_manager.stream_rows(
+        f'SELECT {db_manager.TRADE_LIST_COLUMNS} FROM polymarket_trades ORDER BY ts_ms DESC, order_id DESC'
+    ):
+        yield json.dumps({'type': 'trade', **trade}) + '\n'
+    for position in db_manager.stream_rows('SELECT * FROM bot_positions ORDER BY opened_at_ms DESC'):
+        yield json.dumps({'type': 'position', **position}) + '\n'
+
 @app.route('/api/export')
 def api_export():
-    """Export des données"""
+    """Export des données (?format=ndjson: export complet en streaming, mémoire constante)"""
+    if request.args.get('format') == 'ndjson':
+        filename = f"bot_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+        return Response(
+            stream_with_context(_export_ndjson()),
+            mimetype='application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
     try:
         trades = db_manager.get_polymarket_trades(limit=1000)
-        positions = db_manager.get_bot_positions()
+        positions = get_position_store().get_bot_positions()
         
         data = {
             'config': backend.data,
@@ -878,8 +1023,9 @@ def api_reset_stats():
 
         # Nettoyer les tables DB
         # Note: ceci est une opération destructive
-        db_manager._execute("DELETE FROM polymarket_trades")
-        db_manager._execute("DELETE FROM bot_positions")
+        db_manager.delete_trade_history()  # Trades et rollup PnL journalier
+        get_position_store().delete_all_positions()  # Base et mémoire
+        get_timeseries_store().clear()  # Historique d'equity / drawdown
 
         return jsonify({'success': True})
     except Exception as e:
@@ -1142,24 +1288,104 @@ def sync_tracked_wallets():
     except Exception as e:
         print(f"⚠️ Erreur synchronisation wallets: {e}")
 
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
+def reconcile_positions():
+    """Réconciliation des positions au démarrage"""
+    print("\n🔄 Réconciliation des positions...")
+    reconciliation_report = run_startup_reconciliation(polymarket_executor)
+    print(f"✅ Réconciliation terminée: {reconciliation_report['positions_checked']} positions vérifiées")
+    timings = reconciliation_report.get('timings_ms', {})
+    if timings:
+        print("   ⏱️ " + ", ".join(f"{phase}: {ms}ms" for phase, ms in timings.items()))
+    if reconciliation_report['positions_stale'] > 0:
+        print(f"⚠️ {reconciliation_report['positions_stale']} positions marquées STALE")
+    if reconciliation_report['errors']:
+        print(f"⚠️ {len(reconciliation_report['errors'])} erreurs lors de la réconciliation")
+
+def start_risk_engine():
+    """🛡️ Risk Engine (remplace SLTPMonitor et TrailingStopMonitor)"""
+    risk_engine = init_risk_engine(polymarket_executor, polymarket_clob)
+    risk_engine.start()
+    print("✅ Risk Engine Polymarket démarré")
+
+def start_monitoring():
+    monitoring_interval = backend.data.get('polymarket', {}).get('polling_interval', 5)
+    polymarket_tracker.start_monitoring(interval=monitoring_interval)
+    print("✅ Monitoring Polymarket démarré")
 
-    # 🔄 Synchronisation des wallets au démarrage
-    sync_tracked_wallets()
+def start_insider_scanner():
+    print("🔄 Redémarrage automatique du Insider Scanner...")
+    insider_scanner.start_scanning()
+
+def start_hft_scanner():
+    print("🔄 Redémarrage automatique du HFT Scanner...")
+    hft_scanner.start()
+
+def start_subsystems():
+    """
+    Phase 2 du démarrage: sous-systèmes lourds en arrière-plan, lancés une fois
+    le serveur web à l'écoute. Leur état est visible sur /health.
+    """
+    # En multi-process, monitoring/scanners/risk engine tournent dans les workers
+    local = not broker_client
+
+    if polymarket_clob:
+        startup_manager.background('clob_warmup', polymarket_clob.warm_up)
+    else:
+        startup_manager.skip('clob_warmup', 'CLOB non disponible')
+
+    startup_manager.background('wallet_sync', sync_tracked_wallets)
+    startup_manager.background('reconciliation', reconcile_positions)
+
+    if local and polymarket_tracker:
+        startup_manager.background('copytrade_monitoring', start_monitoring)
+    else:
+        startup_manager.skip('copytrade_monitoring', 'worker copytrade' if polymarket_tracker else 'non disponible')
+
+    if local and polymarket_executor and polymarket_clob:
+        startup_manager.background('risk_engine', start_risk_engine, after=['reconciliation', 'clob_warmup'])
+    else:
+        startup_manager.skip('risk_engine', 'worker copytrade' if polymarket_executor else 'non disponible')
+
+    if local and insider_scanner and insider_scanner.config.get('auto_start', False):
+        startup_manager.background('insider_scanner', start_insider_scanner)
+    else:
+        startup_manager.skip('insider_scanner', 'auto_start désactivé' if local else 'worker insider')
+
+    if local and hft_scanner and hft_scanner.config.get('auto_start', False):
+        startup_manager.background('hft_scanner', start_hft_scanner, after=['clob_warmup'])
+    else:
+        startup_manager.skip('hft_scanner', 'auto_start désactivé' if local else 'worker hft')
+
+def _when_serving(port, callback, timeout=10.0):
+    """Appelle `callback` dès que le serveur web accepte les connexions"""
+    started = time.time()
+
+    def wait():
+        error = TimeoutError(f"port {port} fermé après {timeout:.0f}s")
+        while time.time() - started < timeout:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+                error = None
+                break
+            except OSError:
+                time.sleep(0.05)
+        # Timeout: phase en échec sur /health, les sous-systèmes démarrent quand même
+        startup_manager.record('web_server', started, error)
+        callback()
 
-    # 🔄 Réconciliation des positions au démarrage
-    print("\n🔄 Réconciliation des positions...")
-    try:
-        reconciliation_report = run_startup_reconciliation(polymarket_executor)
-        print(f"✅ Réconciliation terminée: {reconciliation_report['positions_checked']} positions vérifiées")
-        if reconciliation_report['positions_stale'] > 0:
-            print(f"⚠️ {reconciliation_report['positions_stale']} positions marquées STALE")
-        if reconciliation_report['errors']:
-            print(f"⚠️ {len(reconciliation_report['errors'])} erreurs lors de la réconciliation")
-    except Exception as e:
-        print(f"⚠️ Réconciliation échouée: {e}")
+    threading.Thread(target=wait, daemon=True, name="StartupWaitServer").start()
+
+def main():
+    port = int(os.environ.get('PORT', 5000))
+    kill_port(port)
+
+    # Phase 1: le serveur web d'abord, phase 2: sous-systèmes en arrière-plan
+    _when_serving(port, start_subsystems)
 
     print(f"\n🚀 Bot démarré sur http://localhost:{port}")
     print("=" * 60)
     app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,9 @@ class BotBackend:
         self._save_lock = threading.Lock()
         self._pending_save = False
 
+        # Appelé après chaque écriture (mode multi-process: notifie les workers)
+        self.on_save = None
+
         self.load_config()
         self.is_running = self.data.get('is_running', False)
 
@@ -103,6 +106,12 @@ class BotBackend:
             self._pending_save = False
         except Exception as e:
             print(f"❌ Erreur sauvegarde config: {e}")
+            return
+        if self.on_save:
+            try:
+                self.on_save()
+            except Exception as e:
+                print(f"⚠️ Erreur notification sauvegarde config: {e}")
 
     def save_config(self):
         """Sauvegarde ASYNCHRONE avec debouncing (500ms)"""
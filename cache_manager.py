@@ -1,161 +1,323 @@
 # -*- coding: utf-8 -*-
 """
-Cache Manager - Système de cache simple en mémoire avec TTL
+Cache Manager - Cache mémoire shardé, borné (LRU + TTL)
 Réduit les appels API répétés et améliore les performances
+
+- Shards indépendants (un Lock par shard) pour limiter la contention
+- Taille maximale bornée avec éviction LRU
+- Expiration TTL vérifiée à la lecture (plus besoin d'attendre le cleanup)
+- Single-flight: plusieurs miss concurrents sur la même clé => un seul chargement
+- Statistiques par namespace (orderbook:, market:, trades:, ...)
 """
 import time
 import logging
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, Callable, Optional
-from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from threading import Lock, Event
 
 logger = logging.getLogger("CacheManager")
 
+DEFAULT_NAMESPACE = "default"
+_MISSING = object()
+
+
+def _namespace_of(key: Hashable) -> str:
+    """Extrait le namespace d'une clé (préfixe 'xxx:' ou premier élément du tuple)"""
+    if isinstance(key, tuple) and key:
+        return key[0] or DEFAULT_NAMESPACE
+    if isinstance(key, str):
+        idx = key.find(':')
+        if idx > 0:
+            return key[:idx + 1]
+    return DEFAULT_NAMESPACE
+
+
+class _InFlight:
+    """Chargement en cours pour une clé (single-flight)"""
+    __slots__ = ('event', 'value', 'error')
 
-class SimpleCache:
-    """Cache simple en mémoire avec expiration (TTL)"""
-    
     def __init__(self):
-        self._cache = {}
-        self._lock = Lock()
-        self._hits = 0
-        self._misses = 0
-        logger.info("✅ Cache Manager initialisé")
-    
-    def get(self, key: str) -> Optional[Any]:
+        self.event = Event()
+        self.value = None
+        self.error = None
+
+
+class _Shard:
+    """Un shard du cache: OrderedDict (ordre LRU) protégé par son propre Lock"""
+    __slots__ = ('lock', 'data', 'inflight', 'max_size', 'stats')
+
+    def __init__(self, max_size: int):
+        self.lock = Lock()
+        self.data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.inflight: Dict[Hashable, _InFlight] = {}
+        self.max_size = max_size
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def ns_stats(self, namespace: str) -> Dict[str, int]:
+        stats = self.stats.get(namespace)
+        if stats is None:
+            stats = {'hits': 0, 'misses': 0, 'loads': 0, 'coalesced': 0, 'evictions': 0, 'expired': 0}
+            self.stats[namespace] = stats
+        return stats
+
+
+class ShardedCache:
+    """Cache mémoire shardé avec taille bornée, éviction LRU et expiration (TTL)"""
+
+    DEFAULT_SHARDS = 16
+    DEFAULT_MAX_SIZE = 10000
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, shards: int = DEFAULT_SHARDS):
+        # Nombre de shards arrondi à une puissance de 2 (sélection par masque)
+        n = 1
+        while n < max(1, shards):
+            n <<= 1
+        self._mask = n - 1
+        self.max_size = max_size
+        per_shard = max(1, max_size // n)
+        self._shards = [_Shard(per_shard) for _ in range(n)]
+        logger.info(f"✅ Cache Manager initialisé ({n} shards, max {max_size} entrées)")
+
+    def _shard(self, key: Hashable) -> _Shard:
+        return self._shards[hash(key) & self._mask]
+
+    def _lookup(self, shard: _Shard, key: Hashable, stats: Dict[str, int], now: float) -> Any:
+        """Lecture sous le lock du shard. Retourne _MISSING si absent ou expiré."""
+        entry = shard.data.get(key)
+        if entry is not None:
+            value, expiry = entry
+            if now < expiry:
+                shard.data.move_to_end(key)
+                stats['hits'] += 1
+                return value
+            # Clé expirée, la supprimer
+            del shard.data[key]
+            stats['expired'] += 1
+        stats['misses'] += 1
+        return _MISSING
+
+    def _store(self, shard: _Shard, key: Hashable, value: Any, ttl: float, stats: Dict[str, int]):
+        """Écriture sous le lock du shard avec éviction LRU si le shard est plein"""
+        data = shard.data
+        data[key] = (value, time.time() + ttl)
+        data.move_to_end(key)
+        while len(data) > shard.max_size:
+            old_key, _ = data.popitem(last=False)
+            shard.ns_stats(_namespace_of(old_key))['evictions'] += 1
+
+    def get(self, key: Hashable) -> Optional[Any]:
         """Récupère une valeur du cache si elle existe et n'est pas expirée"""
-        with self._lock:
-            if key in self._cache:
-                value, expiry = self._cache[key]
-                if time.time() < expiry:
-                    self._hits += 1
-                    logger.debug(f"Cache HIT: {key}")
-                    return value
-                else:
-                    # Clé expirée, la supprimer
-                    del self._cache[key]
-                    logger.debug(f"Cache EXPIRED: {key}")
-            
-            self._misses += 1
-            logger.debug(f"Cache MISS: {key}")
-            return None
-    
-    def set(self, key: str, value: Any, ttl: int = 60):
+        shard = self._shard(key)
+        with shard.lock:
+            value = self._lookup(shard, key, shard.ns_stats(_namespace_of(key)), time.time())
+        return None if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any, ttl: float = 60):
         """Stocke une valeur dans le cache avec un TTL en secondes"""
-        with self._lock:
-            expiry = time.time() + ttl
-            self._cache[key] = (value, expiry)
-            logger.debug(f"Cache SET: {key} (TTL: {ttl}s)")
-    
-    def delete(self, key: str):
+        shard = self._shard(key)
+        with shard.lock:
+            self._store(shard, key, value, ttl, shard.ns_stats(_namespace_of(key)))
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float = 60,
+                    cache_none: bool = False) -> Any:
+        """
+        Retourne la valeur en cache ou la charge via `loader`.
+        Les appels concurrents sur la même clé attendent le chargement en cours
+        au lieu de relancer l'appel API (single-flight).
+
+        Args:
+            key: Clé de cache
+            loader: Fonction sans argument qui calcule la valeur
+            ttl: Durée de vie en secondes
+            cache_none: Si False, un résultat None n'est pas mis en cache
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            stats = shard.ns_stats(_namespace_of(key))
+            value = self._lookup(shard, key, stats, time.time())
+            if value is not _MISSING:
+                return value
+            pending = shard.inflight.get(key)
+            if pending is None:
+                pending = _InFlight()
+                shard.inflight[key] = pending
+                leader = True
+                stats['loads'] += 1
+            else:
+                leader = False
+                stats['coalesced'] += 1
+
+        if not leader:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            value = loader()
+            pending.value = value
+            if value is not None or cache_none:
+                with shard.lock:
+                    self._store(shard, key, value, ttl, stats)
+            return value
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with shard.lock:
+                shard.inflight.pop(key, None)
+            pending.event.set()
+
+    def delete(self, key: Hashable):
         """Supprime une clé du cache"""
-        with self._lock:
-            if key in self._cache:
-                del self._cache[key]
-                logger.debug(f"Cache DELETE: {key}")
-    
+        shard = self._shard(key)
+        with shard.lock:
+            shard.data.pop(key, None)
+
+    def delete_namespace(self, namespace: str) -> int:
+        """Supprime toutes les clés d'un namespace (ex: 'orderbook:')"""
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                keys = [k for k in shard.data if _namespace_of(k) == namespace]
+                for k in keys:
+                    del shard.data[k]
+                removed += len(keys)
+        return removed
+
     def clear(self):
         """Vide complètement le cache"""
-        with self._lock:
-            count = len(self._cache)
-            self._cache.clear()
-            self._hits = 0
-            self._misses = 0
-            logger.info(f"Cache CLEARED: {count} entrées supprimées")
-    
+        count = 0
+        for shard in self._shards:
+            with shard.lock:
+                count += len(shard.data)
+                shard.data.clear()
+                shard.stats.clear()
+        logger.info(f"Cache CLEARED: {count} entrées supprimées")
+
     def get_stats(self) -> dict:
-        """Retourne les statistiques du cache"""
-        with self._lock:
-            total = self._hits + self._misses
-            hit_rate = (self._hits / total * 100) if total > 0 else 0
-            
-            return {
-                'size': len(self._cache),
-                'hits': self._hits,
-                'misses': self._misses,
-                'hit_rate': round(hit_rate, 2),
-                'total_requests': total
-            }
-    
+        """Retourne les statistiques du cache (globales et par namespace)"""
+        namespaces: Dict[str, Dict[str, int]] = {}
+        size = 0
+        for shard in self._shards:
+            with shard.lock:
+                size += len(shard.data)
+                for key in shard.data:
+                    ns = namespaces.setdefault(_namespace_of(key), {'size': 0})
+                    ns['size'] += 1
+                for ns_name, counters in shard.stats.items():
+                    ns = namespaces.setdefault(ns_name, {'size': 0})
+                    for counter, value in counters.items():
+                        ns[counter] = ns.get(counter, 0) + value
+
+        hits = misses = 0
+        for ns in namespaces.values():
+            ns_hits = ns.setdefault('hits', 0)
+            ns_misses = ns.setdefault('misses', 0)
+            total = ns_hits + ns_misses
+            ns['hit_rate'] = round(ns_hits / total * 100, 2) if total > 0 else 0
+            hits += ns_hits
+            misses += ns_misses
+
+        total = hits + misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
+
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'shards': len(self._shards),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hit_rate, 2),
+            'total_requests': total,
+            'evictions': sum(ns.get('evictions', 0) for ns in namespaces.values()),
+            'coalesced': sum(ns.get('coalesced', 0) for ns in namespaces.values()),
+            'namespaces': namespaces
+        }
+
     def cleanup_expired(self):
-        """Nettoie les entrées expirées du cache"""
-        with self._lock:
-            now = time.time()
-            expired_keys = [
-                key for key, (_, expiry) in self._cache.items()
-                if now >= expiry
-            ]
-            for key in expired_keys:
-                del self._cache[key]
-            
-            if expired_keys:
-                logger.info(f"Cache cleanup: {len(expired_keys)} entrées expirées supprimées")
+        """Nettoie les entrées expirées du cache (shard par shard)"""
+        now = time.time()
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                expired_keys = [key for key, (_, expiry) in shard.data.items() if now >= expiry]
+                for key in expired_keys:
+                    del shard.data[key]
+                removed += len(expired_keys)
+
+        if removed:
+            logger.info(f"Cache cleanup: {removed} entrées expirées supprimées")
+
+
+# Rétrocompatibilité
+SimpleCache = ShardedCache
+
+
+def _make_key(namespace: str, name: str, args: tuple, kwargs: dict) -> Hashable:
+    """Construit une clé tuple (hash natif, pas de str() sur chaque argument)"""
+    key = (namespace, name, args, tuple(sorted(kwargs.items())) if kwargs else ())
+    try:
+        hash(key)
+        return key
+    except TypeError:
+        # Arguments non hashables (list, dict...): repli sur une clé texte
+        return (namespace, name, repr(args), repr(sorted(kwargs.items())))
 
 
 def cached(ttl: int = 60, key_prefix: str = ""):
     """
     Decorator pour cacher automatiquement les résultats d'une fonction
-    
+
     Args:
         ttl: Durée de vie du cache en secondes (défaut: 60s)
-        key_prefix: Préfixe optionnel pour la clé de cache
-    
+        key_prefix: Préfixe optionnel pour la clé de cache (sert aussi de namespace)
+
     Usage:
         @cached(ttl=30)
         def get_price(token_id):
             return expensive_api_call(token_id)
     """
     def decorator(func: Callable) -> Callable:
+        # Précalculé une seule fois (et non à chaque appel)
+        namespace = key_prefix or DEFAULT_NAMESPACE
+        name = func.__qualname__
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Construire la clé de cache
-            # Format: prefix:function_name:args:kwargs
-            args_str = ':'.join(str(arg) for arg in args)
-            kwargs_str = ':'.join(f"{k}={v}" for k, v in sorted(kwargs.items()))
-            cache_key = f"{key_prefix}{func.__name__}:{args_str}:{kwargs_str}"
-            
-            # Essayer de récupérer depuis le cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # Exécuter la fonction et cacher le résultat
-            result = func(*args, **kwargs)
-            
-            # Ne cacher que si le résultat n'est pas None
-            if result is not None:
-                cache.set(cache_key, result, ttl)
-            
-            return result
-        
+            cache_key = _make_key(namespace, name, args, kwargs)
+            # Ne cache que si le résultat n'est pas None (single-flight sur les miss)
+            return cache.get_or_load(cache_key, lambda: func(*args, **kwargs), ttl)
+
         # Ajouter une méthode pour invalider le cache de cette fonction
         wrapper.invalidate_cache = lambda *args, **kwargs: cache.delete(
-            f"{key_prefix}{func.__name__}:{':'.join(str(arg) for arg in args)}:{':'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))}"
+            _make_key(namespace, name, args, kwargs)
         )
-        
+
         return wrapper
     return decorator
 
 
 # Instance globale du cache
-cache = SimpleCache()
+cache = ShardedCache()
 
 
 # Fonction utilitaire pour nettoyer périodiquement
 def start_cleanup_scheduler(interval: int = 300):
     """
     Démarre un thread qui nettoie le cache périodiquement
-    
+
     Args:
         interval: Intervalle de nettoyage en secondes (défaut: 5 minutes)
     """
     import threading
-    
+
     def cleanup_loop():
         while True:
             time.sleep(interval)
             cache.cleanup_expired()
-    
+
     thread = threading.Thread(target=cleanup_loop, daemon=True)
     thread.start()
     logger.info(f"🧹 Cache cleanup scheduler démarré (intervalle: {interval}s)")
@@ -164,30 +326,38 @@ def start_cleanup_scheduler(interval: int = 300):
 if __name__ == '__main__':
     # Tests basiques
     print("=== Tests Cache Manager ===")
-    
+
     # Test 1: Set et Get
     cache.set('test_key', 'test_value', ttl=5)
     assert cache.get('test_key') == 'test_value', "Test 1 failed"
     print("✅ Test 1: Set/Get OK")
-    
+
     # Test 2: Expiration
     cache.set('expire_key', 'expire_value', ttl=1)
     time.sleep(2)
     assert cache.get('expire_key') is None, "Test 2 failed"
     print("✅ Test 2: Expiration OK")
-    
+
     # Test 3: Decorator
     @cached(ttl=5)
     def expensive_function(x):
         return x * 2
-    
+
     result1 = expensive_function(5)
     result2 = expensive_function(5)  # Devrait venir du cache
     assert result1 == result2 == 10, "Test 3 failed"
     print("✅ Test 3: Decorator OK")
-    
-    # Test 4: Stats
+
+    # Test 4: Taille bornée (LRU)
+    small = ShardedCache(max_size=4, shards=1)
+    for i in range(10):
+        small.set(f"lru:{i}", i)
+    assert small.get_stats()['size'] == 4, "Test 4 failed"
+    assert small.get("lru:0") is None and small.get("lru:9") == 9, "Test 4 failed"
+    print("✅ Test 4: LRU OK")
+
+    # Test 5: Stats
     stats = cache.get_stats()
-    print(f"✅ Test 4: Stats OK - {stats}")
-    
+    print(f"✅ Test 5: Stats OK - {stats}")
+
     print("\n🎉 Tous les tests passés!")
@@ -5,9 +5,39 @@ Gère le stockage des données de trading, portfolios, historiques
 """
 import sqlite3
 import json
+import base64
 import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from migrate_db import apply_epoch_migration, iso_to_epoch_ms
+
+
+# ============ KEYSET PAGINATION ============
+
+def encode_cursor(ts_ms: int, row_id) -> str:
+    """Encode un curseur opaque (timestamp epoch-ms, id) pour la pagination keyset"""
+    raw = f"{int(ts_ms or 0)}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Décode un curseur de pagination. Lève ValueError si invalide."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        ts_ms, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|', 1)
+        return int(ts_ms), row_id
+    except Exception:
+        raise ValueError(f"Curseur invalide: {cursor}")
+
+
+def next_cursor(rows: List[Dict], limit: int, ts_key: str = 'ts_ms', id_key: str = 'id') -> Optional[str]:
+    """Curseur de la page suivante (None si c'est la dernière page)"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.get(ts_key), last.get(id_key))
+
 
 class DBManager:
     """Gère la persistance SQLite"""
@@ -16,7 +46,7 @@ class DBManager:
         self.db_path = db_path
         # ✅ Phase A2: Connection persistante au lieu de nouvelles connexions à chaque fois
         self.conn = None
-        self.lock = threading.Lock() # 🔒 Sécurité thread-safety
+        self.lock = threading.RLock() # 🔒 Sécurité thread-safety (réentrant: PositionStore encadre ses écritures)
         self.pending_commits = []  # Pour batch commits
         self.max_batch_size = 10  # Commit tous les 10 ops
         self._connect()
@@ -29,11 +59,45 @@ class DBManager:
             # Optimisations SQLite
             self.conn.execute("PRAGMA journal_mode=WAL")  # Write-Ahead Logging (plus rapide)
             self.conn.execute("PRAGMA synchronous=NORMAL")  # Sync moins strict mais sûr
+            self._init_local_position_version()
             print("✅ Connection SQLite persistante établie")
         except Exception as e:
             print(f"❌ Erreur connexion SQLite: {e}")
             self.conn = None
 
+    def _init_local_position_version(self, c=None):
+        """
+        Compteur des modifications de bot_positions faites par CETTE connexion
+        (table et trigger TEMP, recréés à chaque connexion). Avec le compteur
+        global, le PositionStore distingue ses écritures de celles des autres.
+        """
+        c = c or self.conn.cursor()
+        try:
+            c.execute('CREATE TEMP TABLE IF NOT EXISTS bot_positions_local_version '
+                      '(id INTEGER PRIMARY KEY, version INTEGER NOT NULL)')
+            c.execute('INSERT OR IGNORE INTO bot_positions_local_version (id, version) VALUES (1, 0)')
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                c.execute(f'''
+                    CREATE TEMP TRIGGER IF NOT EXISTS bot_positions_local_version_{event.lower()}
+                    AFTER {event} ON main.bot_positions
+                    BEGIN UPDATE bot_positions_local_version SET version = version + 1 WHERE id = 1; END
+                ''')
+        except sqlite3.OperationalError:
+            pass  # Nouvelle base: bot_positions pas encore créée (init_db rappelle cette méthode)
+
+    def get_position_versions(self) -> Optional[Tuple[int, int]]:
+        """(modifications de bot_positions toutes connexions, modifications par cette connexion)"""
+        try:
+            cursor = self._execute(
+                'SELECT (SELECT version FROM bot_positions_version WHERE id = 1), '
+                '(SELECT version FROM bot_positions_local_version WHERE id = 1)', commit=False)
+            row = cursor.fetchone() if cursor else None
+        except sqlite3.Error:
+            return None
+        if not row or row[0] is None or row[1] is None:
+            return None
+        return int(row[0]), int(row[1])
+
     def _reconnect(self):
         """✅ Phase A2: Reconnexion automatique en cas de déconnexion"""
         if self.conn:
@@ -113,12 +177,25 @@ class DBManager:
                 status TEXT,
                 pnl REAL DEFAULT 0,
                 signal_type TEXT,
-                tx_hash TEXT
+                tx_hash TEXT,
+                ts_ms INTEGER
             )
         ''')
 
         c.execute('CREATE INDEX IF NOT EXISTS idx_poly_trades_ts ON polymarket_trades(timestamp DESC)')
 
+        # ✅ Rollup PnL journalier (maintenu à chaque trade / clôture, lu par le dashboard)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS daily_pnl_rollup (
+                day TEXT PRIMARY KEY,
+                daily_pnl REAL DEFAULT 0,
+                trades_count INTEGER DEFAULT 0,
+                winning_trades INTEGER DEFAULT 0,
+                positions_closed INTEGER DEFAULT 0,
+                positions_realized_pnl REAL DEFAULT 0
+            )
+        ''')
+
         # ✅ NEW: Table pour les positions actives du bot (Version 2.0 - Positions séparées par trader)
         c.execute('''
             CREATE TABLE IF NOT EXISTS bot_positions (
@@ -146,6 +223,10 @@ class DBManager:
                 use_trailing INTEGER DEFAULT 0,
                 exit_tiers TEXT, -- JSON pour paliers de sortie
                 capital_recovered INTEGER DEFAULT 0, -- 1 si capital initial retiré
+                opened_at_ms INTEGER,
+                closed_at_ms INTEGER,
+                order_id TEXT, -- Ordre d'achat suivi par le FillTracker (position PENDING)
+                order_size REAL, -- Taille de l'ordre (parent si netting)
                 UNIQUE(token_id, source_wallet)
             )
         ''')
@@ -159,6 +240,11 @@ class DBManager:
             c.execute('ALTER TABLE bot_positions ADD COLUMN use_trailing INTEGER DEFAULT 0')
         except:
             pass  # Colonne existe déjà
+        for col, col_type in (('order_id', 'TEXT'), ('order_size', 'REAL')):
+            try:
+                c.execute(f'ALTER TABLE bot_positions ADD COLUMN {col} {col_type}')
+            except:
+                pass  # Colonne existe déjà
 
         # Index pour performances
         c.execute('CREATE INDEX IF NOT EXISTS idx_source_wallet ON bot_positions(source_wallet)')
@@ -167,6 +253,22 @@ class DBManager:
         c.execute('CREATE INDEX IF NOT EXISTS idx_opened_at ON bot_positions(opened_at)')
         c.execute('CREATE INDEX IF NOT EXISTS idx_status_opened ON bot_positions(status, opened_at)')
 
+        # Compteur de modifications de bot_positions (toutes connexions), tenu par triggers:
+        # le PositionStore ne recharge que si cette table a changé
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS bot_positions_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        c.execute('INSERT OR IGNORE INTO bot_positions_version (id, version) VALUES (1, 0)')
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS bot_positions_version_{event.lower()} AFTER {event} ON bot_positions
+                BEGIN UPDATE bot_positions_version SET version = version + 1 WHERE id = 1; END
+            ''')
+        self._init_local_position_version(c)
+
         # ============ INSIDER TRACKER TABLES ============
 
         # Table: insider_alerts - Stocke les alertes de wallets suspects
@@ -191,7 +293,8 @@ class DBManager:
                 timestamp TEXT NOT NULL,
                 dedup_key TEXT,
                 nickname TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                ts_ms INTEGER
             )
         ''')
         
@@ -247,15 +350,99 @@ class DBManager:
         # ============ HFT MODULE TABLES ============
         self._init_hft_tables(c)
 
+        # ✅ Colonnes epoch-ms + index keyset (voir migrate_db.py)
+        apply_epoch_migration(c)
+
         self.conn.commit()
+
+        # Backfill automatique du rollup PnL pour les bases existantes
+        c.execute('SELECT 1 FROM daily_pnl_rollup LIMIT 1')
+        if not c.fetchone():
+            c.execute('SELECT 1 FROM polymarket_trades LIMIT 1')
+            if c.fetchone():
+                self.rebuild_daily_pnl_rollup()
+
+    def _transaction(self, fn):
+        """
+        Exécute plusieurs requêtes dans une seule transaction (verrou + commit/rollback).
+
+        Args:
+            fn: Fonction recevant le curseur
+        """
+        with self.lock:
+            if not self.conn:
+                self._reconnect()
+            cursor = self.conn.cursor()
+            try:
+                result = fn(cursor)
+                self.conn.commit()
+                return result
+            except Exception as e:
+                self.conn.rollback()
+                print(f"❌ Erreur SQLite (transaction): {e}")
+                raise
+
+    # Statuts de trades comptés dans le PnL journalier
+    PNL_TRADE_STATUSES = ('EXECUTED', 'CLOSED')
+
+    @staticmethod
+    def _pnl_day(timestamp) -> str:
+        """Jour (YYYY-MM-DD) d'un timestamp ISO, comme date(timestamp) en SQL"""
+        return str(timestamp or datetime.now().isoformat())[:10]
+
+    def _apply_trade_to_rollup(self, c, timestamp, pnl: float, status: str, sign: int = 1):
+        """Ajoute (sign=1) ou retire (sign=-1) la contribution d'un trade au rollup"""
+        if status not in self.PNL_TRADE_STATUSES:
+            return
+        pnl = float(pnl or 0)
+        c.execute('''
+            INSERT INTO daily_pnl_rollup (day, daily_pnl, trades_count, winning_trades)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                daily_pnl = daily_pnl + excluded.daily_pnl,
+                trades_count = trades_count + excluded.trades_count,
+                winning_trades = winning_trades + excluded.winning_trades
+        ''', (self._pnl_day(timestamp), sign * pnl, sign, sign * (1 if pnl > 0 else 0)))
+
+    def rebuild_daily_pnl_rollup(self) -> int:
+        """
+        Reconstruit le rollup PnL journalier depuis polymarket_trades et bot_positions (backfill).
+
+        Returns:
+            Nombre de jours reconstruits
+        """
+        def rebuild(c):
+            c.execute('DELETE FROM daily_pnl_rollup')
+            c.execute('''
+                INSERT INTO daily_pnl_rollup (day, daily_pnl, trades_count, winning_trades)
+                SELECT substr(timestamp, 1, 10) as day,
+                       SUM(pnl),
+                       COUNT(*),
+                       SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END)
+                FROM polymarket_trades
+                WHERE status IN ('EXECUTED', 'CLOSED')
+                GROUP BY day
+            ''')
+            c.execute('''
+                INSERT INTO daily_pnl_rollup (day, positions_closed, positions_realized_pnl)
+                SELECT substr(closed_at, 1, 10) as day, COUNT(*), SUM(realized_pnl)
+                FROM bot_positions
+                WHERE status != 'OPEN' AND closed_at IS NOT NULL
+                GROUP BY day
+                ON CONFLICT(day) DO UPDATE SET
+                    positions_closed = excluded.positions_closed,
+                    positions_realized_pnl = excluded.positions_realized_pnl
+            ''')
+            c.execute('SELECT COUNT(*) FROM daily_pnl_rollup')
+            return c.fetchone()[0]
+
+        days = self._transaction(rebuild)
+        print(f"✅ Rollup PnL journalier reconstruit ({days} jours)")
+        return days
         
     def save_polymarket_trade(self, trade_data: Dict):
-        """Sauvegarde un trade Polymarket"""
-        self._execute('''
-            INSERT OR REPLACE INTO polymarket_trades
-            (order_id, timestamp, market_slug, token_id, side, price, size, value_usd, status, pnl, signal_type, tx_hash)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        """Sauvegarde un trade Polymarket (et met à jour le rollup PnL dans la même transaction)"""
+        row = (
             trade_data.get('order_id', ''),
             trade_data.get('timestamp', datetime.now().isoformat()),
             trade_data.get('market_slug', ''),
@@ -268,33 +455,88 @@ class DBManager:
             float(trade_data.get('pnl', 0)),
             trade_data.get('signal_type', ''),
             trade_data.get('tx_hash', '')
-        ), commit=True)
+        )
+        ts_ms = iso_to_epoch_ms(row[1]) or 0  # Clé keyset: jamais NULL
+
+        def save(c):
+            # INSERT OR REPLACE: retirer l'ancienne contribution si le trade existe déjà
+            c.execute('SELECT timestamp, pnl, status FROM polymarket_trades WHERE order_id = ?', (row[0],))
+            previous = c.fetchone()
+            if previous:
+                self._apply_trade_to_rollup(c, previous[0], previous[1], previous[2], sign=-1)
+
+            c.execute('''
+                INSERT OR REPLACE INTO polymarket_trades
+                (order_id, timestamp, market_slug, token_id, side, price, size, value_usd, status, pnl, signal_type, tx_hash, ts_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row + (ts_ms,))
+            self._apply_trade_to_rollup(c, row[1], row[9], row[8])
+
+        self._transaction(save)
+
+    TRADE_LIST_COLUMNS = (
+        'order_id, timestamp, ts_ms, market_slug, token_id, side, price, size, '
+        'value_usd, status, pnl, signal_type, tx_hash'
+    )
+
+    def get_polymarket_trades(self, limit: int = 50, before: Optional[str] = None) -> List[Dict]:
+        """Récupère l'historique des trades Polymarket
+
+        Args:
+            limit: Taille de page
+            before: Curseur keyset (ts_ms, order_id) de la page précédente
+        """
+        where, params = '', []
+        if before:
+            ts_ms, order_id = decode_cursor(before)
+            where, params = 'WHERE (ts_ms, order_id) < (?, ?)', [ts_ms, order_id]
 
-    def get_polymarket_trades(self, limit: int = 50) -> List[Dict]:
-        """Récupère l'historique des trades Polymarket"""
         self.conn.row_factory = sqlite3.Row
         c = self.conn.cursor()
-        c.execute('''
-            SELECT * FROM polymarket_trades
-            ORDER BY timestamp DESC
+        c.execute(f'''
+            SELECT {self.TRADE_LIST_COLUMNS}
+            FROM polymarket_trades
+            {where}
+            ORDER BY ts_ms DESC, order_id DESC
             LIMIT ?
-        ''', (limit,))
+        ''', (*params, limit))
         
         rows = c.fetchall()
         return [dict(row) for row in rows]
 
+    def stream_rows(self, query: str, params: tuple = (), batch_size: int = 500) -> Iterator[Dict]:
+        """
+        Itère les lignes d'une requête via une connexion lecture dédiée (mémoire constante).
+
+        N'utilise ni la connexion partagée ni self.lock: un export long ne bloque
+        pas les écritures (WAL autorise les lecteurs concurrents).
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            c = conn.execute(query, params)
+            while True:
+                rows = c.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
     def get_daily_pnl(self, days: int = 30) -> List[Dict]:
-        """Aggrège le PnL journalier réalisé des 30 derniers jours"""
+        """PnL journalier réalisé des N derniers jours (lu depuis daily_pnl_rollup, ordre DESC)"""
         self.conn.row_factory = sqlite3.Row
         c = self.conn.cursor()
+        # Le cumul est calculé sur le rollup (une ligne par jour), pas sur les trades
         c.execute('''
-            SELECT date(timestamp) as day, 
-                   SUM(pnl) as daily_pnl,
-                   COUNT(*) as trades_count,
-                   SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as winning_trades
-            FROM polymarket_trades
-            WHERE status IN ('EXECUTED', 'CLOSED') 
-            GROUP BY day
+            SELECT day, daily_pnl, trades_count, winning_trades, cumulative_pnl
+            FROM (
+                SELECT day, daily_pnl, trades_count, winning_trades,
+                       SUM(daily_pnl) OVER (ORDER BY day) as cumulative_pnl
+                FROM daily_pnl_rollup
+                WHERE trades_count > 0
+            )
             ORDER BY day DESC
             LIMIT ?
         ''', (days,))
@@ -374,8 +616,8 @@ class DBManager:
             (token_id, source_wallet, market_slug, outcome, side, shares, size, 
              avg_price, entry_price, current_price, value_usd, sl_percent, tp_percent,
              unrealized_pnl, status, opened_at, last_updated, highest_price, use_trailing,
-             exit_tiers, capital_recovered)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             exit_tiers, capital_recovered, opened_at_ms, order_id, order_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             position_data.get('token_id'),
             position_data.get('source_wallet'),
@@ -397,7 +639,10 @@ class DBManager:
             float(position_data.get('entry_price', 0)), # Initial highest_price = entry_price
             int(position_data.get('use_trailing', 0)),
             position_data.get('exit_tiers'), # Nouveau: JSON string
-            int(position_data.get('capital_recovered', 0)) # Nouveau: 0 ou 1
+            int(position_data.get('capital_recovered', 0)), # Nouveau: 0 ou 1
+            iso_to_epoch_ms(position_data.get('opened_at') or datetime.now().isoformat()),
+            position_data.get('order_id'),
+            position_data.get('order_size')
         ), commit=True)
         
         return cursor.lastrowid
@@ -424,8 +669,8 @@ class DBManager:
                 INSERT INTO bot_positions
                 (token_id, source_wallet, market_slug, outcome, side, shares, size,
                  avg_price, entry_price, current_price, value_usd, unrealized_pnl,
-                 status, opened_at, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 status, opened_at, last_updated, opened_at_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(token_id, source_wallet) DO UPDATE SET
                     shares = excluded.shares,
                     size = excluded.size,
@@ -449,7 +694,8 @@ class DBManager:
                 float(position_data.get('pnl', 0)),
                 'OPEN',
                 datetime.now().isoformat(),
-                datetime.now().isoformat()
+                datetime.now().isoformat(),
+                iso_to_epoch_ms(datetime.now().isoformat())
             ))
 
     def get_bot_positions(self, status: str = 'OPEN') -> List[Dict]:
@@ -462,9 +708,9 @@ class DBManager:
         c = self.conn.cursor()
         
         if status:
-            c.execute('SELECT * FROM bot_positions WHERE status = ? ORDER BY opened_at DESC', (status,))
+            c.execute('SELECT * FROM bot_positions WHERE status = ? ORDER BY opened_at_ms DESC', (status,))
         else:
-            c.execute('SELECT * FROM bot_positions ORDER BY opened_at DESC')
+            c.execute('SELECT * FROM bot_positions ORDER BY opened_at_ms DESC')
         
         rows = c.fetchall()
         
@@ -524,12 +770,12 @@ class DBManager:
         
         if status:
             c.execute(
-                'SELECT * FROM bot_positions WHERE source_wallet = ? AND status = ? ORDER BY opened_at DESC',
+                'SELECT * FROM bot_positions WHERE source_wallet = ? AND status = ? ORDER BY opened_at_ms DESC',
                 (source_wallet, status)
             )
         else:
             c.execute(
-                'SELECT * FROM bot_positions WHERE source_wallet = ? ORDER BY opened_at DESC',
+                'SELECT * FROM bot_positions WHERE source_wallet = ? ORDER BY opened_at_ms DESC',
                 (source_wallet,)
             )
         
@@ -560,6 +806,24 @@ class DBManager:
             WHERE id = ?
         ''', (new_shares, new_shares, datetime.now().isoformat(), position_id), commit=True)
     
+    def apply_position_fill(self, position_id: int, filled_shares: float, avg_price: float):
+        """Applique le fill cumulé de l'ordre d'achat d'une position (PENDING -> OPEN)"""
+        self._execute('''
+            UPDATE bot_positions
+            SET shares = ?, size = ?, avg_price = ?, entry_price = ?, value_usd = ?,
+                status = CASE WHEN status = 'PENDING' THEN 'OPEN' ELSE status END,
+                last_updated = ?
+            WHERE id = ?
+        ''', (filled_shares, filled_shares, avg_price, avg_price, filled_shares * avg_price,
+              datetime.now().isoformat(), position_id), commit=True)
+
+    def cancel_pending_position(self, position_id: int):
+        """Supprime une position dont l'ordre d'achat a été annulé sans aucun fill"""
+        self._execute(
+            "DELETE FROM bot_positions WHERE id = ? AND status = 'PENDING'",
+            (position_id,), commit=True
+        )
+
     def close_position(self, position_id: int, realized_pnl: float, status: str = 'CLOSED_MANUAL'):
         """Ferme une position
         
@@ -568,16 +832,113 @@ class DBManager:
             realized_pnl: PnL réalisé
             status: 'CLOSED_MANUAL', 'CLOSED_SL', 'CLOSED_TP'
         """
-        self._execute('''
-            UPDATE bot_positions
-            SET status = ?, realized_pnl = ?, closed_at = ?, last_updated = ?
-            WHERE id = ?
-        ''', (status, realized_pnl, datetime.now().isoformat(), datetime.now().isoformat(), position_id), commit=True)
+        now = datetime.now().isoformat()
+
+        def close(c):
+            # Idempotent: retirer la contribution d'une clôture précédente
+            c.execute('SELECT status, realized_pnl, closed_at FROM bot_positions WHERE id = ?', (position_id,))
+            previous = c.fetchone()
+            if not previous:
+                return
+            if previous[0] != 'OPEN' and previous[2]:
+                c.execute('''
+                    UPDATE daily_pnl_rollup
+                    SET positions_closed = positions_closed - 1,
+                        positions_realized_pnl = positions_realized_pnl - ?
+                    WHERE day = ?
+                ''', (float(previous[1] or 0), self._pnl_day(previous[2])))
+
+            c.execute('''
+                UPDATE bot_positions
+                SET status = ?, realized_pnl = ?, closed_at = ?, closed_at_ms = ?, last_updated = ?
+                WHERE id = ?
+            ''', (status, realized_pnl, now, iso_to_epoch_ms(now), now, position_id))
+            c.execute('''
+                INSERT INTO daily_pnl_rollup (day, positions_closed, positions_realized_pnl)
+                VALUES (?, 1, ?)
+                ON CONFLICT(day) DO UPDATE SET
+                    positions_closed = positions_closed + 1,
+                    positions_realized_pnl = positions_realized_pnl + excluded.positions_realized_pnl
+            ''', (self._pnl_day(now), float(realized_pnl or 0)))
+
+        self._transaction(close)
     
+    def get_realized_pnl_total(self) -> float:
+        """Somme du PnL réalisé de toutes les positions (pour l'equity)"""
+        cursor = self._execute(
+            'SELECT COALESCE(SUM(realized_pnl), 0) FROM bot_positions',
+            commit=False
+        )
+        row = cursor.fetchone() if cursor else None
+        return float(row[0]) if row else 0.0
+
     def get_open_positions(self) -> List[Dict]:
         """Récupère uniquement les positions ouvertes"""
         return self.get_bot_positions(status='OPEN')
 
+    def update_position_status(self, position_id: int, status: str):
+        """Change le statut d'une position (ex: STALE à la réconciliation)"""
+        self._execute(
+            "UPDATE bot_positions SET status = ?, last_updated = ? WHERE id = ?",
+            (status, datetime.now().isoformat(), position_id),
+            commit=True
+        )
+
+    def apply_position_reconciliation(self, stale_ids: List[int], price_updates: List[Tuple[int, float, float]]):
+        """Marquages STALE et mises à jour de prix de la réconciliation, en une transaction
+
+        Args:
+            stale_ids: IDs des positions à passer en STALE
+            price_updates: [(position_id, current_price, unrealized_pnl)]
+        """
+        now = datetime.now().isoformat()
+
+        def apply(c):
+            c.executemany(
+                "UPDATE bot_positions SET status = 'STALE', last_updated = ? WHERE id = ?",
+                [(now, position_id) for position_id in stale_ids]
+            )
+            c.executemany(
+                "UPDATE bot_positions SET current_price = ?, unrealized_pnl = ?, last_updated = ? WHERE id = ?",
+                [(price, pnl, now, position_id) for position_id, price, pnl in price_updates]
+            )
+
+        self._transaction(apply)
+
+    def delete_stale_positions(self, opened_before: str) -> int:
+        """Supprime les positions STALE ouvertes avant `opened_before` (ISO)"""
+        def delete(c):
+            c.execute("DELETE FROM bot_positions WHERE status = 'STALE' AND opened_at < ?", (opened_before,))
+            return c.rowcount
+
+        return self._transaction(delete)
+
+    def delete_trade_history(self) -> int:
+        """Supprime les trades et leur rollup PnL journalier (reset des statistiques)"""
+        def delete(c):
+            c.execute('DELETE FROM polymarket_trades')
+            deleted = c.rowcount
+            c.execute('DELETE FROM daily_pnl_rollup')
+            return deleted
+
+        return self._transaction(delete)
+
+    def clear_timeseries(self):
+        """Vide les séries temporelles (points bruts et rollups) - reset des statistiques"""
+        def clear(c):
+            c.execute('DELETE FROM ts_points')
+            c.execute('DELETE FROM ts_rollups')
+
+        self._transaction(clear)
+
+    def delete_all_positions(self) -> int:
+        """Supprime toutes les positions (reset des statistiques)"""
+        def delete(c):
+            c.execute("DELETE FROM bot_positions")
+            return c.rowcount
+
+        return self._transaction(delete)
+
     def update_position_capital_recovered(self, position_id: int, status: int = 1):
         """Marque le capital comme récupéré pour une position"""
         self._execute(
@@ -605,12 +966,13 @@ class DBManager:
         Returns:
             ID de l'alerte créée
         """
+        timestamp = alert_data.get('timestamp', datetime.now().isoformat())
         self._execute('''
             INSERT OR REPLACE INTO insider_alerts
             (id, wallet_address, alert_type, suspicion_score, market_question, market_slug, market_url,
              token_id, bet_amount, bet_outcome, outcome_odds, criteria_matched, trigger_details, bet_details,
-             wallet_stats, scoring_mode, timestamp, dedup_key, nickname)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             wallet_stats, scoring_mode, timestamp, dedup_key, nickname, ts_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             alert_data.get('id'),
             alert_data.get('wallet_address', '').lower(),
@@ -628,9 +990,10 @@ class DBManager:
             alert_data.get('bet_details', ''),
             json.dumps(alert_data.get('wallet_stats', {})),
             alert_data.get('scoring_mode', 'balanced'),
-            alert_data.get('timestamp', datetime.now().isoformat()),
+            timestamp,
             alert_data.get('dedup_key'),
-            alert_data.get('nickname', '')
+            alert_data.get('nickname', ''),
+            iso_to_epoch_ms(timestamp) or 0  # Clé keyset: jamais NULL
         ), commit=True)
 
         # Mettre à jour les stats du wallet sauvegardé s'il existe
@@ -638,40 +1001,74 @@ class DBManager:
 
         return alert_data.get('id')
 
-    def get_insider_alerts(self, limit: int = 100, min_score: int = 0) -> List[Dict]:
+    def update_insider_alert_enrichment(self, alert_id: str, wallet_stats: Dict, nickname: str = '') -> bool:
+        """Complète une alerte déjà enregistrée avec les stats et le pseudo du wallet
+
+        Args:
+            alert_id: ID de l'alerte
+            wallet_stats: Stats de performance du wallet
+            nickname: Pseudo Polymarket (conservé s'il est vide)
+
+        Returns:
+            True si l'alerte existait
+        """
+        cursor = self._execute('''
+            UPDATE insider_alerts
+            SET wallet_stats = ?, nickname = COALESCE(NULLIF(?, ''), nickname)
+            WHERE id = ?
+        ''', (json.dumps(wallet_stats or {}), nickname or '', alert_id), commit=True)
+        return bool(cursor and cursor.rowcount)
+
+    # Colonnes des vues liste (sans criteria_matched / dedup_key / created_at)
+    ALERT_LIST_COLUMNS = (
+        'id, wallet_address, alert_type, suspicion_score, market_question, market_slug, market_url, '
+        'token_id, bet_amount, bet_outcome, outcome_odds, trigger_details, bet_details, wallet_stats, '
+        'scoring_mode, timestamp, ts_ms, nickname'
+    )
+
+    @staticmethod
+    def _parse_alert_row(row) -> Dict:
+        """Convertit une ligne d'alerte en dict (parse les champs JSON présents)"""
+        alert = dict(row)
+        if 'criteria_matched' in alert:
+            try:
+                alert['criteria_matched'] = json.loads(alert.get('criteria_matched') or '[]')
+            except:
+                alert['criteria_matched'] = []
+        try:
+            alert['wallet_stats'] = json.loads(alert.get('wallet_stats') or '{}')
+        except:
+            alert['wallet_stats'] = {}
+        return alert
+
+    def get_insider_alerts(self, limit: int = 100, min_score: int = 0,
+                           before: Optional[str] = None) -> List[Dict]:
         """Récupère les alertes insider, triées par date décroissante
 
         Args:
             limit: Nombre max d'alertes à récupérer
             min_score: Score minimum pour filtrer
+            before: Curseur keyset (ts_ms, id) de la page précédente
 
         Returns:
             Liste des alertes
         """
+        keyset, params = '', [min_score]
+        if before:
+            ts_ms, alert_id = decode_cursor(before)
+            keyset = 'AND (ts_ms, id) < (?, ?)'
+            params += [ts_ms, alert_id]
+
         self.conn.row_factory = sqlite3.Row
         c = self.conn.cursor()
-        c.execute('''
-            SELECT * FROM insider_alerts
-            WHERE suspicion_score >= ?
-            ORDER BY timestamp DESC
+        c.execute(f'''
+            SELECT {self.ALERT_LIST_COLUMNS} FROM insider_alerts
+            WHERE suspicion_score >= ? {keyset}
+            ORDER BY ts_ms DESC, id DESC
             LIMIT ?
-        ''', (min_score, limit))
+        ''', (*params, limit))
 
-        rows = c.fetchall()
-        alerts = []
-        for row in rows:
-            alert = dict(row)
-            # Parser les champs JSON
-            try:
-                alert['criteria_matched'] = json.loads(alert.get('criteria_matched', '[]'))
-            except:
-                alert['criteria_matched'] = []
-            try:
-                alert['wallet_stats'] = json.loads(alert.get('wallet_stats', '{}'))
-            except:
-                alert['wallet_stats'] = {}
-            alerts.append(alert)
-        return alerts
+        return [self._parse_alert_row(row) for row in c.fetchall()]
 
     def save_insider_wallet(self, wallet_data: Dict, source: str = 'SCANNER'):
         """Sauvegarde ou met à jour un wallet suspect"""
@@ -722,27 +1119,14 @@ class DBManager:
         """
         self.conn.row_factory = sqlite3.Row
         c = self.conn.cursor()
-        c.execute('''
-            SELECT * FROM insider_alerts
+        c.execute(f'''
+            SELECT {self.ALERT_LIST_COLUMNS} FROM insider_alerts
             WHERE wallet_address = ?
-            ORDER BY timestamp DESC
+            ORDER BY ts_ms DESC
             LIMIT ?
         ''', (address.lower(), limit))
 
-        rows = c.fetchall()
-        alerts = []
-        for row in rows:
-            alert = dict(row)
-            try:
-                alert['criteria_matched'] = json.loads(alert.get('criteria_matched', '[]'))
-            except:
-                alert['criteria_matched'] = []
-            try:
-                alert['wallet_stats'] = json.loads(alert.get('wallet_stats', '{}'))
-            except:
-                alert['wallet_stats'] = {}
-            alerts.append(alert)
-        return alerts
+        return [self._parse_alert_row(row) for row in c.fetchall()]
 
     def _update_saved_wallet_stats(self, address: str):
         """Met à jour les statistiques d'un wallet sauvegardé (appelé après nouvelle alerte)"""
@@ -778,10 +1162,10 @@ class DBManager:
             days: Nombre de jours à conserver
         """
         from datetime import timedelta
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        cutoff = iso_to_epoch_ms((datetime.now() - timedelta(days=days)).isoformat())
 
         self._execute(
-            'DELETE FROM insider_alerts WHERE timestamp < ?',
+            'DELETE FROM insider_alerts WHERE ts_ms < ?',
             (cutoff,),
             commit=True
         )
@@ -844,7 +1228,8 @@ class DBManager:
                 status TEXT DEFAULT 'PENDING',
                 order_id TEXT,
                 error_message TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                signal_ts_ms INTEGER
             )
         ''')
 
@@ -878,14 +1263,15 @@ class DBManager:
 
     def save_hft_trade(self, trade_data: Dict):
         """Sauvegarde un trade HFT"""
+        signal_timestamp = trade_data.get('signal_timestamp', datetime.now().isoformat())
         self._execute('''
             INSERT INTO hft_trades
             (signal_timestamp, execution_timestamp, source_wallet, trader_name, market_question,
              token_id, condition_id, side, signal_price, execution_price, size_usd, shares,
-             latency_ms, status, order_id, error_message)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             latency_ms, status, order_id, error_message, signal_ts_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
-            trade_data.get('signal_timestamp', datetime.now().isoformat()),
+            signal_timestamp,
             trade_data.get('execution_timestamp'),
             trade_data.get('source_wallet', ''),
             trade_data.get('trader_name', ''),
@@ -900,18 +1286,31 @@ class DBManager:
             int(trade_data.get('latency_ms', 0) or 0),
             trade_data.get('status', 'PENDING'),
             trade_data.get('order_id', ''),
-            trade_data.get('error_message', '')
+            trade_data.get('error_message', ''),
+            iso_to_epoch_ms(signal_timestamp) or 0  # Clé keyset: jamais NULL
         ), commit=True)
 
-    def get_hft_trades(self, limit: int = 100) -> List[Dict]:
-        """Récupère l'historique des trades HFT"""
+    HFT_TRADE_LIST_COLUMNS = (
+        'id, signal_timestamp, signal_ts_ms, execution_timestamp, source_wallet, trader_name, '
+        'market_question, token_id, condition_id, side, signal_price, execution_price, size_usd, '
+        'shares, latency_ms, status, order_id, error_message'
+    )
+
+    def get_hft_trades(self, limit: int = 100, before: Optional[str] = None) -> List[Dict]:
+        """Récupère l'historique des trades HFT (before: curseur keyset (signal_ts_ms, id))"""
+        where, params = '', []
+        if before:
+            ts_ms, trade_id = decode_cursor(before)
+            where, params = 'WHERE (signal_ts_ms, id) < (?, ?)', [ts_ms, int(trade_id)]
+
         self.conn.row_factory = sqlite3.Row
         c = self.conn.cursor()
-        c.execute('''
-            SELECT * FROM hft_trades
-            ORDER BY signal_timestamp DESC
+        c.execute(f'''
+            SELECT {self.HFT_TRADE_LIST_COLUMNS} FROM hft_trades
+            {where}
+            ORDER BY signal_ts_ms DESC, id DESC
             LIMIT ?
-        ''', (limit,))
+        ''', (*params, limit))
 
         rows = c.fetchall()
         return [dict(row) for row in rows]
@@ -920,10 +1319,10 @@ class DBManager:
         """Récupère les trades HFT pour un wallet spécifique"""
         self.conn.row_factory = sqlite3.Row
         c = self.conn.cursor()
-        c.execute('''
-            SELECT * FROM hft_trades
+        c.execute(f'''
+            SELECT {self.HFT_TRADE_LIST_COLUMNS} FROM hft_trades
             WHERE source_wallet = ?
-            ORDER BY signal_timestamp DESC
+            ORDER BY signal_ts_ms DESC
             LIMIT ?
         ''', (wallet_address.lower(), limit))
 
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Execution Queue - Découple la détection de signaux de l'exécution des ordres
+
+Le tracker appelait l'exécuteur en ligne: validation, deux lectures de prix,
+place_order (retries tenacity jusqu'à 10 s) et écritures DB tournaient sur le
+thread de détection. Un ordre lent retardait tous les autres wallets.
+
+Ici:
+    - file de priorité bornée: signaux de plus forte valeur d'abord, l'âge
+      augmentant la priorité (`age_weight` $ par seconde d'attente)
+    - pool de workers d'exécution
+    - sérialisation par token: jamais deux ordres en vol sur le même token, et
+      ordre de soumission (FIFO) entre les jobs d'un même token; la priorité ne
+      départage que les tokens entre eux
+    - abandon des signaux périmés (au-delà de `max_age_sec`)
+    - file pleine: le signal abandonnable le moins prioritaire est évincé;
+      un job non abandonnable (sortie de position) n'est jamais évincé,
+      le nouveau signal est refusé à la place
+
+`submit()` ne bloque jamais: la détection n'attend pas l'exécution.
+"""
+import heapq
+import itertools
+from collections import deque
+import threading
+import time
+import logging
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("ExecutionQueue")
+
+
+class _Job:
+    __slots__ = ('key', 'seq', 'item', 'token', 'value', 'enqueued_at', 'droppable')
+
+    def __init__(self, key: float, seq: int, item: Any, token: str, value: float, enqueued_at: float,
+                 droppable: bool = True):
+        self.key = key
+        self.seq = seq
+        self.item = item
+        self.token = token
+        self.value = value
+        self.enqueued_at = enqueued_at
+        self.droppable = droppable
+
+    def __lt__(self, other: '_Job') -> bool:
+        return (self.key, self.seq) < (other.key, other.seq)
+
+
+class ExecutionQueue:
+    """
+    File d'exécution prioritaire avec pool de workers. Thread-safe.
+
+    Args:
+        handler: Fonction d'exécution appelée avec l'item (dans un worker)
+        value_fn: Valeur de l'item (priorité, $)
+        token_fn: Clé de sérialisation (token_id): un seul item en vol par clé
+        droppable_fn: L'item peut-il être abandonné (périmé ou file pleine, défaut: oui)
+        on_drop: Appelé avec (item, raison) pour un item abandonné
+    """
+
+    def __init__(self, handler: Callable[[Any], Any], workers: int = 4, max_size: int = 500,
+                 max_age_sec: float = 30.0, age_weight: float = 10.0,
+                 value_fn: Callable[[Any], float] = lambda item: 0.0,
+                 token_fn: Callable[[Any], str] = lambda item: '',
+                 droppable_fn: Callable[[Any], bool] = lambda item: True,
+                 on_drop: Optional[Callable[[Any, str], None]] = None,
+                 name: str = "Execution"):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.max_age_sec = max_age_sec
+        self.age_weight = age_weight
+        self.value_fn = value_fn
+        self.token_fn = token_fn
+        self.droppable_fn = droppable_fn
+        self.on_drop = on_drop
+        self.name = name
+
+        # Le tas ne contient que le job de tête de chaque token; les suivants
+        # attendent leur tour dans _backlog (FIFO par token)
+        self._heap: List[_Job] = []
+        self._backlog: Dict[str, Deque[_Job]] = {}
+        self._queued = 0
+        self._busy_tokens = set()
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._origin = time.monotonic()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+        # Stats
+        self.submitted = 0
+        self.executed = 0
+        self.failed = 0
+        self.dropped_stale = 0
+        self.dropped_full = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    # =========================================================================
+    # FILE
+    # =========================================================================
+
+    def _key(self, value: float, enqueued_at: float) -> float:
+        # Score au temps t: value + age_weight * (t - enqueued_at). L'ordre entre
+        # deux jobs ne dépend pas de t: on trie sur age_weight * enqueued_at - value.
+        return self.age_weight * (enqueued_at - self._origin) - value
+
+    def _push(self, job: _Job):
+        """Met le job en file: dans le tas s'il est en tête de son token (appelé sous le lock)"""
+        self._queued += 1
+        if job.token and job.token in self._backlog:
+            self._backlog[job.token].append(job)
+        else:
+            heapq.heappush(self._heap, job)
+            if job.token:
+                self._backlog[job.token] = deque()
+
+    def _taken(self, job: _Job):
+        """Le job de tête a quitté le tas: le suivant du même token prend sa place (sous le lock)"""
+        self._queued -= 1
+        if not job.token:
+            return
+        waiting = self._backlog.get(job.token)
+        if waiting:
+            heapq.heappush(self._heap, waiting.popleft())
+        else:
+            self._backlog.pop(job.token, None)
+
+    def _queued_jobs(self):
+        yield from self._heap
+        for waiting in self._backlog.values():
+            yield from waiting
+
+    def _remove(self, job: _Job):
+        """Retire un job de la file, en tête ou en attente derrière son token (sous le lock)"""
+        waiting = self._backlog.get(job.token)
+        if waiting and job in waiting:
+            waiting.remove(job)
+            self._queued -= 1
+            return
+        self._heap.remove(job)
+        heapq.heapify(self._heap)
+        self._taken(job)
+
+    def submit(self, item: Any) -> bool:
+        """
+        Ajoute un item à la file (non bloquant). Démarre les workers au premier appel.
+
+        Returns:
+            False si l'item a été refusé (file pleine de jobs plus prioritaires
+            ou non abandonnables)
+        """
+        if not self._running:
+            self.start()
+
+        now = time.monotonic()
+        try:
+            value = float(self.value_fn(item) or 0.0)
+        except (TypeError, ValueError):
+            value = 0.0
+        job = _Job(self._key(value, now), next(self._seq), item, str(self.token_fn(item) or ''), value, now,
+                   bool(self.droppable_fn(item)))
+
+        evicted = None
+        with self._cond:
+            self.submitted += 1
+            if self._queued >= self.max_size:
+                # Victime: le job abandonnable le moins prioritaire, et seulement s'il
+                # passe après le nouveau (un job non abandonnable peut évincer tout
+                # job abandonnable). Sinon c'est le nouveau job qui est refusé.
+                candidates = [j for j in self._queued_jobs() if j.droppable and (not job.droppable or job < j)]
+                self.dropped_full += 1
+                if candidates:
+                    evicted = max(candidates)
+                    self._remove(evicted)
+                else:
+                    evicted = job
+            if evicted is not job:
+                self._push(job)
+                self._cond.notify()
+
+        if evicted is not None:
+            self._dropped(evicted, 'queue_full')
+        return evicted is not job
+
+    def _dropped(self, job: _Job, reason: str):
+        logger.warning(f"⚠️ {self.name}: job abandonné ({reason}, ${job.value:.2f}, token {job.token[:12]})")
+        if self.on_drop:
+            try:
+                self.on_drop(job.item, reason)
+            except Exception as e:
+                logger.error(f"❌ {self.name}: erreur on_drop: {e}")
+
+    def _pop_ready(self, stale: List[_Job]) -> Optional[_Job]:
+        """Job de tête le plus prioritaire dont le token est libre (appelé sous le lock)"""
+        now = time.monotonic()
+        held = []
+        found = None
+        while self._heap:
+            job = heapq.heappop(self._heap)
+            if now - job.enqueued_at > self.max_age_sec and job.droppable:
+                self.dropped_stale += 1
+                stale.append(job)
+                self._taken(job)
+                continue
+            if job.token and job.token in self._busy_tokens:
+                held.append(job)
+                continue
+            found = job
+            self._taken(job)
+            break
+        for job in held:
+            heapq.heappush(self._heap, job)
+        return found
+
+    # =========================================================================
+    # WORKERS
+    # =========================================================================
+
+    def _worker(self):
+        while True:
+            stale: List[_Job] = []
+            with self._cond:
+                job = None
+                while self._running:
+                    job = self._pop_ready(stale)
+                    if job or stale:
+                        break
+                    self._cond.wait(timeout=1.0)
+                if job:
+                    if job.token:
+                        self._busy_tokens.add(job.token)
+                    wait_ms = (time.monotonic() - job.enqueued_at) * 1000
+                    self.total_wait_ms += wait_ms
+                    self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                running = self._running
+
+            for old in stale:
+                self._dropped(old, 'stale')
+            if not job:
+                if not running:
+                    return
+                continue
+
+            try:
+                self.handler(job.item)
+                with self._cond:
+                    self.executed += 1
+            except Exception as e:
+                logger.error(f"❌ {self.name}: erreur exécution: {e}")
+                with self._cond:
+                    self.failed += 1
+            finally:
+                with self._cond:
+                    self._busy_tokens.discard(job.token)
+                    self._cond.notify_all()
+
+    def start(self):
+        """Démarre le pool de workers"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [
+                threading.Thread(target=self._worker, daemon=True, name=f"{self.name}-{i}")
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"🚀 {self.name}: {self.workers} workers (file max {self.max_size}, péremption {self.max_age_sec}s)")
+
+    def stop(self, timeout: float = 5.0):
+        """Arrête les workers (les jobs en vol se terminent)"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            started = self.executed + self.failed
+            return {
+                'running': self._running,
+                'workers': self.workers,
+                'queued': self._queued,
+                'in_flight_tokens': len(self._busy_tokens),
+                'submitted': self.submitted,
+                'executed': self.executed,
+                'failed': self.failed,
+                'dropped_stale': self.dropped_stale,
+                'dropped_full': self.dropped_full,
+                'avg_wait_ms': round(self.total_wait_ms / started, 1) if started else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 1)
+            }
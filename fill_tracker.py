@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+Fill Tracker - Suivi temps réel des fills et annulations d'ordres
+
+Après `place_order`, l'exécuteur enregistrait une position OPEN au prix
+limite comme si l'ordre était exécuté, sans jamais corriger les fills
+partiels. Désormais la position d'achat est créée PENDING puis:
+
+    - canal utilisateur authentifié du websocket CLOB (événements `order`
+      et `trade`): fills, fills partiels et annulations appliqués dès réception
+    - repli (websocket indisponible ou déconnecté): polling groupé des ordres
+      ouverts, une requête pour tous les ordres suivis
+    - fill -> position OPEN (shares / prix moyen réels), annulation sans
+      fill -> position PENDING supprimée
+
+Les événements d'un ordre pas encore enregistré (fill immédiat avant
+`track()`) sont gardés quelques secondes et rejoués à l'enregistrement.
+
+Un ordre parent (netting) porte plusieurs positions: chacune est enregistrée
+par `track()` sur le même order ID et reçoit sa part des fills au pro rata.
+"""
+import json
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from timing_wheel import TimingWheel
+
+try:
+    import websocket
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+logger = logging.getLogger("FillTracker")
+
+# Statuts terminaux (API CLOB)
+_TERMINAL = ('MATCHED', 'CANCELED', 'CANCELLED', 'CANCELED_MARKET_RESOLVED', 'INVALID')
+
+
+class _TrackedOrder:
+    __slots__ = ('order_id', 'allocations', 'token_id', 'side', 'requested', 'price',
+                 'filled', 'trade_ids', 'trade_shares', 'trade_notional', 'tracked_at')
+
+    def __init__(self, order_id: str, token_id: str, side: str, requested: float, price: float):
+        self.order_id = order_id
+        self.allocations: Dict[int, float] = {}  # {position_id: shares demandées}
+        self.token_id = token_id
+        self.side = side
+        self.requested = requested
+        self.price = price
+        self.filled = 0.0
+        self.trade_ids = set()
+        self.trade_shares = 0.0
+        self.trade_notional = 0.0
+        self.tracked_at = time.time()
+
+    @property
+    def avg_price(self) -> float:
+        if self.trade_shares > 0:
+            return self.trade_notional / self.trade_shares
+        return self.price
+
+    def share_of(self, position_id: int, filled: float) -> float:
+        """Part d'un fill cumulé revenant à une position (pro rata de sa demande)"""
+        return filled * self.allocations[position_id] / self.requested if self.requested > 0 else 0.0
+
+
+class FillTracker:
+    """
+    Suivi des ordres d'achat jusqu'à leur état terminal. Thread-safe.
+
+    Args:
+        client: PolymarketClient (get_open_orders, get_order, credentials API)
+        db: PositionStore ou DatabaseManager (apply_position_fill, cancel_pending_position)
+        on_change: Appelé avec (position_id, événement) après chaque mise à jour
+    """
+
+    WS_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/user"
+    PING_INTERVAL_SEC = 10
+    POLL_INTERVAL_SEC = 2.0        # Sans websocket
+    WS_POLL_INTERVAL_SEC = 30.0    # Filet de sécurité avec websocket
+    ORPHAN_EVENT_TTL_SEC = 30
+
+    def __init__(self, client: Any, db: Any, on_change: Optional[Callable[[int, str], None]] = None):
+        self.client = client
+        self.db = db
+        self.on_change = on_change
+
+        self._orders: Dict[str, _TrackedOrder] = {}
+        self._orphans: Dict[str, List[Dict]] = {}
+        self._orphan_expiry = TimingWheel(tick_sec=1.0, name="FillTrackerOrphans")
+        self._lock = threading.RLock()
+        self._running = False
+        self._wake = threading.Event()
+        self._ws = None
+        self.ws_connected = False
+        self.reconnect_delay = 5
+        self.max_reconnect_delay = 60
+
+        # Stats
+        self.orders_tracked = 0
+        self.fills_applied = 0
+        self.partial_fills = 0
+        self.cancels_applied = 0
+        self.ws_events = 0
+        self.polls = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Suivi possible: client authentifié"""
+        return bool(getattr(self.client, 'authenticated', False))
+
+    # =========================================================================
+    # ENREGISTREMENT
+    # =========================================================================
+
+    def track(self, order_id: str, position_id: int, token_id: str, side: str, requested: float, price: float,
+              parent_size: Optional[float] = None):
+        """
+        Suit un ordre placé (démarre le tracker au premier appel).
+
+        `parent_size`: taille totale de l'ordre parent quand plusieurs positions
+        le partagent (netting); la position reçoit requested/parent_size des fills.
+        """
+        if not order_id:
+            return
+        if not self._running:
+            self.start()
+
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None:
+                order = _TrackedOrder(order_id, token_id, side.upper(), float(parent_size or requested), float(price))
+                self._orders[order_id] = order
+                self.orders_tracked += 1
+            order.allocations[position_id] = float(requested)
+            # Position enregistrée après des fills du parent: rattrapage de sa part
+            if order.filled > 0:
+                self.db.apply_position_fill(position_id, order.share_of(position_id, order.filled), order.avg_price)
+            replay = self._orphans.pop(order_id, [])
+            self._orphan_expiry.cancel(order_id)
+        for event in replay:
+            self._handle_event(event)
+        self._wake.set()
+
+    def resume_pending(self) -> int:
+        """
+        Reprend le suivi des positions PENDING persistées (redémarrage).
+
+        Les positions d'un même ordre parent partagent son order ID et sa taille.
+
+        Returns:
+            Nombre de positions de nouveau suivies (celles sans order ID restent PENDING)
+        """
+        resumed = 0
+        for position in self.db.get_bot_positions(status='PENDING'):
+            order_id = position.get('order_id')
+            if not order_id:
+                continue
+            self.track(order_id, position['id'], position.get('token_id', ''), position.get('side') or 'BUY',
+                       position.get('shares') or 0.0, position.get('avg_price') or position.get('entry_price') or 0.0,
+                       parent_size=position.get('order_size'))
+            resumed += 1
+        if resumed:
+            logger.info(f"🔁 Suivi repris pour {resumed} position(s) PENDING")
+        return resumed
+
+    def _keep_orphan(self, order_id: str, event: Dict):
+        with self._lock:
+            self._orphans.setdefault(order_id, []).append(event)
+        self._orphan_expiry.schedule(order_id, time.time() + self.ORPHAN_EVENT_TTL_SEC, self._drop_orphan)
+
+    def _drop_orphan(self, order_id: str):
+        with self._lock:
+            self._orphans.pop(order_id, None)
+
+    # =========================================================================
+    # APPLICATION DES FILLS
+    # =========================================================================
+
+    def _update(self, order_id: str, size_matched: Optional[float] = None, terminal: bool = False,
+                trade: Optional[Dict] = None):
+        """Applique un état d'ordre (cumulatif) à la position"""
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None:
+                return
+            previous = order.filled
+
+            if trade and trade['id'] not in order.trade_ids:
+                order.trade_ids.add(trade['id'])
+                order.trade_shares += trade['size']
+                order.trade_notional += trade['size'] * trade['price']
+                order.filled = max(order.filled, order.trade_shares)
+            if size_matched is not None:
+                order.filled = max(order.filled, size_matched)
+            order.filled = min(order.filled, order.requested)
+
+            complete = order.filled >= order.requested - 1e-9
+            if terminal or complete:
+                del self._orders[order_id]
+            filled, avg_price = order.filled, order.avg_price
+
+            positions = list(order.allocations)
+
+            # Écritures sous le verrou: websocket et polling ne s'entrelacent pas
+            if filled > previous:
+                for position_id in positions:
+                    self.db.apply_position_fill(position_id, order.share_of(position_id, filled), avg_price)
+                self.fills_applied += 1
+                if not complete:
+                    self.partial_fills += 1
+            if terminal and filled <= 0:
+                for position_id in positions:
+                    self.db.cancel_pending_position(position_id)
+                self.cancels_applied += 1
+
+        if filled > previous:
+            logger.info(f"✅ Fill ordre {order_id[:12]}...: {filled:.2f}/{order.requested:.2f} @ {avg_price:.4f}")
+            for position_id in positions:
+                self._notify(position_id, 'FILL' if complete else 'PARTIAL_FILL')
+        if terminal and filled <= 0:
+            logger.info(f"🚫 Ordre {order_id[:12]}... annulé sans fill, position(s) {positions} retirée(s)")
+            for position_id in positions:
+                self._notify(position_id, 'CANCELLED')
+        elif terminal and not complete:
+            logger.info(f"✂️ Ordre {order_id[:12]}... clos à {filled:.2f}/{order.requested:.2f}")
+
+    def _notify(self, position_id: int, event: str):
+        if self.on_change:
+            try:
+                self.on_change(position_id, event)
+            except Exception as e:
+                logger.error(f"❌ Erreur on_change: {e}")
+
+    def _handle_event(self, event: Dict):
+        """Événement du canal utilisateur (`order` ou `trade`)"""
+        self._orphan_expiry.advance()
+        event_type = str(event.get('event_type', '')).lower()
+
+        if event_type == 'order':
+            order_id = event.get('id', '')
+            if order_id not in self._orders:
+                self._keep_orphan(order_id, event)
+                return
+            kind = str(event.get('type', '')).upper()
+            self._update(order_id, _float(event.get('size_matched')),
+                         terminal=kind == 'CANCELLATION' or str(event.get('status', '')).upper() in _TERMINAL)
+
+        elif event_type == 'trade':
+            if str(event.get('status', '')).upper() == 'FAILED':
+                return
+            trade_id = event.get('id', '')
+            # Notre ordre peut être le taker ou l'un des makers
+            matches = [(event.get('taker_order_id', ''), _float(event.get('size')), _float(event.get('price')))]
+            for maker in event.get('maker_orders', []) or []:
+                matches.append((maker.get('order_id', ''), _float(maker.get('matched_amount')),
+                                _float(maker.get('price'))))
+            for order_id, size, price in matches:
+                if not order_id or not size:
+                    continue
+                tracked = self._orders.get(order_id)
+                if tracked is None:
+                    self._keep_orphan(order_id, event)
+                    continue
+                self._update(order_id, trade={'id': f"{trade_id}:{order_id}", 'size': size,
+                                              'price': price or tracked.price})
+
+    # =========================================================================
+    # WEBSOCKET (canal utilisateur)
+    # =========================================================================
+
+    def _on_ws_open(self, ws):
+        self.ws_connected = True
+        self.reconnect_delay = 5
+        ws.send(json.dumps({
+            'type': 'user',
+            'markets': [],
+            'auth': {
+                'apiKey': self.client.api_key,
+                'secret': self.client.api_secret,
+                'passphrase': self.client.api_passphrase
+            }
+        }))
+        logger.info("🔌 Canal utilisateur CLOB connecté (fills temps réel)")
+
+    def _on_ws_message(self, ws, message: str):
+        if message in ('PONG', 'pong'):
+            return
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            return
+        for event in payload if isinstance(payload, list) else [payload]:
+            if isinstance(event, dict):
+                self.ws_events += 1
+                try:
+                    self._handle_event(event)
+                except Exception as e:
+                    logger.error(f"❌ Erreur événement CLOB: {e}")
+
+    def _on_ws_close(self, ws, *args):
+        self.ws_connected = False
+        self._wake.set()  # Le polling reprend immédiatement
+
+    def _ws_loop(self):
+        while self._running:
+            self._ws = websocket.WebSocketApp(
+                self.WS_URL,
+                on_open=self._on_ws_open,
+                on_message=self._on_ws_message,
+                on_error=lambda ws, error: logger.warning(f"⚠️ Canal utilisateur CLOB: {error}"),
+                on_close=self._on_ws_close
+            )
+            pinger = threading.Thread(target=self._ping_loop, args=(self._ws,), daemon=True)
+            pinger.start()
+            self._ws.run_forever()
+            self.ws_connected = False
+            if self._running:
+                time.sleep(self.reconnect_delay)
+                self.reconnect_delay = min(self.reconnect_delay * 2, self.max_reconnect_delay)
+
+    def _ping_loop(self, ws):
+        while self._running and ws is self._ws:
+            time.sleep(self.PING_INTERVAL_SEC)
+            if self.ws_connected:
+                try:
+                    ws.send('PING')
+                except Exception:
+                    return
+
+    # =========================================================================
+    # POLLING GROUPÉ (repli)
+    # =========================================================================
+
+    def poll_once(self):
+        """Une requête pour tous les ordres ouverts; lecture finale des ordres sortis du carnet"""
+        self._orphan_expiry.advance()
+        with self._lock:
+            tracked = list(self._orders.values())
+        if not tracked:
+            return
+        self.polls += 1
+
+        open_orders = self.client.get_open_orders()
+        if open_orders is None:
+            return
+        by_id = {o.get('id'): o for o in open_orders}
+
+        for order in tracked:
+            state = by_id.get(order.order_id)
+            if state is not None:
+                self._update(order.order_id, _float(state.get('size_matched')))
+                continue
+            # Plus dans les ordres ouverts: exécuté ou annulé (ou pas encore visible)
+            final = self.client.get_order(order.order_id)
+            if not final:
+                continue
+            status = str(final.get('status', '')).upper()
+            self._update(order.order_id, _float(final.get('size_matched')), terminal=status in _TERMINAL)
+
+    def _poll_loop(self):
+        while self._running:
+            interval = self.WS_POLL_INTERVAL_SEC if self.ws_connected else self.POLL_INTERVAL_SEC
+            self._wake.wait(interval)
+            self._wake.clear()
+            if not self._running:
+                return
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"❌ Erreur polling ordres: {e}")
+
+    # =========================================================================
+    # CYCLE DE VIE
+    # =========================================================================
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._poll_loop, daemon=True, name="FillTrackerPoll").start()
+        if WEBSOCKET_AVAILABLE and self.enabled:
+            threading.Thread(target=self._ws_loop, daemon=True, name="FillTrackerWS").start()
+            logger.info("🚀 FillTracker démarré (websocket + polling de secours)")
+        else:
+            logger.info("🚀 FillTracker démarré (polling groupé des ordres ouverts)")
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._ws:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._orders)
+        return {
+            'running': self._running,
+            'mode': 'websocket' if self.ws_connected else 'polling',
+            'pending_orders': pending,
+            'orders_tracked': self.orders_tracked,
+            'fills_applied': self.fills_applied,
+            'partial_fills': self.partial_fills,
+            'cancels_applied': self.cancels_applied,
+            'ws_events': self.ws_events,
+            'polls': self.polls
+        }
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+_fill_tracker: Optional[FillTracker] = None
+_fill_tracker_lock = threading.Lock()
+
+
+def get_fill_tracker() -> FillTracker:
+    """Instance globale (client CLOB et base du process courant)"""
+    global _fill_tracker
+    if _fill_tracker is None:
+        with _fill_tracker_lock:
+            if _fill_tracker is None:
+                from polymarket_client import polymarket_client
+                from position_store import get_position_store
+                from state_publisher import mark_dirty
+
+                def on_change(position_id: int, event: str):
+                    mark_dirty('positions')
+                    mark_dirty('pnl')
+
+                _fill_tracker = FillTracker(polymarket_client, get_position_store(), on_change=on_change)
+    return _fill_tracker
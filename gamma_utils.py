@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+Gamma Utils - Helpers partagés pour les réponses de l'API Gamma
+"""
+import json
+from typing import List
+
+
+def json_list(value) -> List:
+    """Gamma renvoie parfois les listes (clobTokenIds, outcomes, outcomePrices) sous forme de chaîne JSON"""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            parsed = json.loads(value)
+            return parsed if isinstance(parsed, list) else []
+        except ValueError:
+            return []
+    return []
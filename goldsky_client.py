@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Goldsky Client - Batching des requêtes GraphQL vers les subgraphs
+
+Chaque composant (Tracker, HFT Monitor, Insider Scanner) construisait sa
+requête `userBalances` avec du formatage `%` et l'envoyait seule: N wallets
+suivis = N requêtes HTTP par cycle, chacune passant par le rate limiter.
+
+Ce module:
+    - construit les requêtes à partir de specs (entity, where, fields...)
+      avec sérialisation GraphQL des valeurs (plus de `%` dans le code métier)
+    - fusionne plusieurs requêtes logiques dans UN document aliasé
+      (`q0: userBalances(...) {...} q1: userBalances(...) {...}`) dans la
+      limite d'un budget de complexité (somme des `first`)
+    - redistribue la réponse alias par alias aux appelants
+    - pagine par curseur `id_gt` (toutes les requêtes non terminées avancent
+      ensemble, un document par tour)
+    - déduplique les requêtes logiques identiques déjà en vol (un autre
+      thread attend le même résultat au lieu de la renvoyer)
+"""
+import json
+import hashlib
+import threading
+import logging
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from goldsky_rate_limiter import get_goldsky_rate_limiter, Priority
+
+logger = logging.getLogger("GoldskyClient")
+
+GOLDSKY_POSITIONS = "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/positions-subgraph/0.0.7/gn"
+
+DEFAULT_MAX_COMPLEXITY = 5000   # Somme des `first` par document
+DEFAULT_MAX_ALIASES = 50        # Requêtes logiques max par document
+
+
+def render_value(value: Any) -> str:
+    """Sérialise une valeur Python en littéral GraphQL"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return 'null'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{k}: {render_value(v)}" for k, v in value.items()) + '}'
+    if isinstance(value, (list, tuple, set)):
+        return '[' + ', '.join(render_value(v) for v in value) + ']'
+    raise TypeError(f"Type non supporté en GraphQL: {type(value).__name__}")
+
+
+@dataclass
+class GraphQLQuery:
+    """Requête logique sur une entité d'un subgraph"""
+    entity: str
+    fields: str
+    where: Dict = field(default_factory=dict)
+    first: int = 100
+    order_by: Optional[str] = None
+    order_direction: Optional[str] = None
+
+    @property
+    def cost(self) -> int:
+        return max(1, int(self.first))
+
+    def render(self, alias: Optional[str] = None) -> str:
+        args = [f"first: {int(self.first)}"]
+        if self.order_by:
+            args.append(f"orderBy: {self.order_by}")
+        if self.order_direction:
+            args.append(f"orderDirection: {self.order_direction}")
+        if self.where:
+            args.append(f"where: {render_value(self.where)}")
+        prefix = f"{alias}: " if alias else ""
+        return f"{prefix}{self.entity}({', '.join(args)}) {{ {' '.join(self.fields.split())} }}"
+
+
+class GoldskyClient:
+    """
+    Client GraphQL partagé avec batching, pagination `id_gt` et dédup en vol.
+    Thread-safe.
+    """
+
+    def __init__(self, max_complexity: int = DEFAULT_MAX_COMPLEXITY,
+                 max_aliases: int = DEFAULT_MAX_ALIASES, post: Optional[Callable] = None):
+        self.max_complexity = max_complexity
+        self.max_aliases = max_aliases
+        self._post = post
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        # Stats
+        self.logical_queries = 0
+        self.http_requests = 0
+        self.deduped = 0
+        self.errors = 0
+
+        logger.info(f"GoldskyClient initialisé (budget {max_complexity}, {max_aliases} alias/doc)")
+
+    # =========================================================================
+    # HTTP
+    # =========================================================================
+
+    def _send(self, url: str, document: str, priority: Priority, timeout: float) -> Optional[Dict]:
+        """
+        Envoie un document via le rate limiter.
+
+        Returns:
+            {'data': {...}, 'errors': [...]} ou None si échec HTTP
+        """
+        post = self._post
+        if post is None:
+            import requests
+            post = requests.post
+
+        rate_limiter = get_goldsky_rate_limiter()
+        rate_limiter.wait_for_slot(priority)
+        with self._lock:
+            self.http_requests += 1
+        try:
+            resp = post(url, json={'query': document}, timeout=timeout,
+                        headers={'Content-Type': 'application/json'})
+            if resp.status_code == 429:
+                rate_limiter.report_rate_limit()
+                logger.warning("Goldsky API rate limited (429)")
+                return None
+            if resp.status_code != 200:
+                logger.warning(f"Goldsky API returned status {resp.status_code}")
+                return None
+            rate_limiter.report_success()
+            return resp.json()
+        except Exception as e:
+            logger.debug(f"Erreur requête Goldsky: {e}")
+            return None
+
+    @staticmethod
+    def _key(url: str, query: GraphQLQuery) -> str:
+        return hashlib.sha1(f"{url}|{query.render()}".encode()).hexdigest()
+
+    def _execute_batch(self, url: str, queries: List[GraphQLQuery], priority: Priority,
+                       timeout: float) -> List[Optional[List[Dict]]]:
+        """Un document aliasé pour toutes les requêtes; résultat None par alias en erreur"""
+        document = '{ ' + ' '.join(q.render(f"q{i}") for i, q in enumerate(queries)) + ' }'
+        response = self._send(url, document, priority, timeout)
+        if response is None:
+            with self._lock:
+                self.errors += 1
+            return [None] * len(queries)
+
+        data = response.get('data') or {}
+        failed = set()
+        for err in response.get('errors') or []:
+            path = err.get('path') or []
+            if path:
+                failed.add(path[0])
+            else:
+                # Erreur globale (syntaxe, complexité): tout le document est invalide
+                logger.warning(f"Goldsky GraphQL errors: {err.get('message', err)}")
+                with self._lock:
+                    self.errors += 1
+                return [None] * len(queries)
+        if failed:
+            with self._lock:
+                self.errors += len(failed)
+
+        return [
+            None if f"q{i}" in failed else (data.get(f"q{i}") or [])
+            for i in range(len(queries))
+        ]
+
+    def _chunks(self, queries: List[GraphQLQuery]) -> List[List[int]]:
+        """Découpe en documents respectant le budget de complexité et d'alias"""
+        chunks, current, cost = [], [], 0
+        for i, q in enumerate(queries):
+            if current and (cost + q.cost > self.max_complexity or len(current) >= self.max_aliases):
+                chunks.append(current)
+                current, cost = [], 0
+            current.append(i)
+            cost += q.cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    # =========================================================================
+    # API
+    # =========================================================================
+
+    def query_many(self, url: str, queries: List[GraphQLQuery], priority: Priority = Priority.INSIDER,
+                   timeout: float = 15) -> List[Optional[List[Dict]]]:
+        """
+        Exécute plusieurs requêtes logiques en un minimum de requêtes HTTP.
+
+        Returns:
+            Une liste de résultats alignée sur `queries` (None = échec de cette requête)
+        """
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        waiting = {}   # index -> Future d'un autre appelant
+        owned = {}     # index -> (key, Future) dont on est responsable
+        to_send = []
+
+        with self._lock:
+            self.logical_queries += len(queries)
+            for i, q in enumerate(queries):
+                key = self._key(url, q)
+                future = self._inflight.get(key)
+                if future is not None:
+                    waiting[i] = future
+                    self.deduped += 1
+                    continue
+                # Doublon au sein du même appel: attendre notre propre future
+                future = Future()
+                self._inflight[key] = future
+                owned[i] = (key, future)
+                to_send.append(i)
+
+        try:
+            for chunk in self._chunks([queries[i] for i in to_send]):
+                indexes = [to_send[j] for j in chunk]
+                batch_results = self._execute_batch(url, [queries[i] for i in indexes], priority, timeout)
+                for i, res in zip(indexes, batch_results):
+                    results[i] = res
+                    key, future = owned[i]
+                    future.set_result(res)
+        finally:
+            with self._lock:
+                for i, (key, future) in owned.items():
+                    if not future.done():
+                        future.set_result(None)
+                    self._inflight.pop(key, None)
+
+        for i, future in waiting.items():
+            try:
+                results[i] = future.result(timeout=timeout * 2)
+            except Exception:
+                results[i] = None
+        return results
+
+    def query(self, url: str, query: GraphQLQuery, priority: Priority = Priority.INSIDER,
+              timeout: float = 15) -> Optional[List[Dict]]:
+        """Exécute une requête logique (dédupliquée avec les requêtes identiques en vol)"""
+        return self.query_many(url, [query], priority, timeout)[0]
+
+    def paginate_many(self, url: str, queries: List[GraphQLQuery], priority: Priority = Priority.INSIDER,
+                      timeout: float = 15, max_pages: int = 10) -> List[Optional[List[Dict]]]:
+        """
+        Pagine plusieurs requêtes par curseur `id_gt` (tri par id).
+        Chaque tour envoie ensemble toutes les requêtes dont la dernière page était pleine.
+
+        Returns:
+            Toutes les lignes par requête (None si une page a échoué: pas de résultat partiel)
+        """
+        results: List[Optional[List[Dict]]] = [[] for _ in queries]
+        cursors: Dict[int, Optional[str]] = {i: None for i in range(len(queries))}
+
+        for _ in range(max_pages):
+            if not cursors:
+                break
+            active = list(cursors)
+            page_queries = []
+            for i in active:
+                base = queries[i]
+                where = dict(base.where)
+                if cursors[i] is not None:
+                    where['id_gt'] = cursors[i]
+                page_queries.append(GraphQLQuery(
+                    entity=base.entity, fields=base.fields, where=where, first=base.first,
+                    order_by='id', order_direction='asc'
+                ))
+
+            for i, rows in zip(active, self.query_many(url, page_queries, priority, timeout)):
+                if rows is None:
+                    results[i] = None
+                    del cursors[i]
+                    continue
+                results[i].extend(rows)
+                if len(rows) < queries[i].first or not rows[-1].get('id'):
+                    del cursors[i]
+                else:
+                    cursors[i] = rows[-1]['id']
+        else:
+            if cursors:
+                logger.warning(f"⚠️ Pagination Goldsky tronquée après {max_pages} pages ({len(cursors)} requêtes)")
+
+        return results
+
+    def paginate(self, url: str, query: GraphQLQuery, priority: Priority = Priority.INSIDER,
+                 timeout: float = 15, max_pages: int = 10) -> Optional[List[Dict]]:
+        """Pagine une requête par curseur `id_gt`"""
+        return self.paginate_many(url, [query], priority, timeout, max_pages)[0]
+
+    # =========================================================================
+    # HELPERS
+    # =========================================================================
+
+    def get_user_balances(self, addresses: List[str], priority: Priority = Priority.INSIDER,
+                          timeout: float = 15, fields: Optional[str] = None) -> Dict[str, Optional[List[Dict]]]:
+        """
+        Positions (balance > 0) de plusieurs wallets, paginées et batchées.
+
+        Returns:
+            {address_lower: [userBalance, ...] ou None si échec}
+        """
+        addrs = list(dict.fromkeys(a.lower() for a in addresses if a))
+        queries = [
+            GraphQLQuery(
+                entity='userBalances',
+                fields=fields or 'id user balance asset { id condition { id } }',
+                where={'user': addr, 'balance_gt': "0"},
+                first=100
+            )
+            for addr in addrs
+        ]
+        return dict(zip(addrs, self.paginate_many(GOLDSKY_POSITIONS, queries, priority, timeout)))
+
+    def get_stats(self) -> Dict:
+        """Statistiques (requêtes logiques vs HTTP réellement envoyées)"""
+        with self._lock:
+            logical = self.logical_queries
+            http = self.http_requests
+            return {
+                'logical_queries': logical,
+                'http_requests': http,
+                'deduped': self.deduped,
+                'errors': self.errors,
+                'in_flight': len(self._inflight),
+                'requests_saved': max(0, logical - http)
+            }
+
+
+# Instance globale pour import facile
+_goldsky_client = None
+_init_lock = threading.Lock()
+
+
+def get_goldsky_client() -> GoldskyClient:
+    """Retourne l'instance partagée du client"""
+    global _goldsky_client
+    if _goldsky_client is None:
+        with _init_lock:
+            if _goldsky_client is None:
+                _goldsky_client = GoldskyClient()
+    return _goldsky_client
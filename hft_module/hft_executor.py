@@ -6,12 +6,25 @@ Exécute les ordres sans validation lourde pour minimiser la latence.
 Optimisations v3.1:
 - DB write asynchrone (fire-and-forget)
 - Ne bloque pas le retour de l'exécution
+
+Types d'ordre: FOK / FAK (jamais de reste au carnet) ou GTC avec échéance:
+le reste non exécuté après `timeout_sec` est annulé. Latence de fill et
+fraction exécutée sont mesurées par ordre.
+
+La taille est plafonnée à la profondeur du carnet disponible sous
+`max_slippage_bps` (book_depth), et le prix limite resserré au dernier
+niveau réellement touché.
 """
+import time
 import logging
 import threading
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 
+from state_publisher import mark_dirty
+from order_gateway import make_client_order_id
+from book_depth import DepthLadder, ladder_for
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("HFTExecutor")
 
@@ -28,6 +41,9 @@ class HFTExecutor:
 
     DEFAULT_MAX_SLIPPAGE_BPS = 50  # 0.5%
     DEFAULT_TIMEOUT_SEC = 2
+    DEFAULT_ORDER_TYPE = 'GTC'
+    ORDER_TYPES = ('GTC', 'FOK', 'FAK')
+    FILL_POLL_SEC = 0.2  # Polling de l'état d'un GTC avant échéance
 
     def __init__(self, polymarket_client=None, db_manager=None, socketio=None):
         self.polymarket_client = polymarket_client
@@ -37,12 +53,21 @@ class HFTExecutor:
         # Configuration
         self.max_slippage_bps = self.DEFAULT_MAX_SLIPPAGE_BPS
         self.timeout_sec = self.DEFAULT_TIMEOUT_SEC
+        self.order_type = self.DEFAULT_ORDER_TYPE
         self.enabled = True
 
         # Stats
         self.trades_executed = 0
         self.trades_failed = 0
+        self.trades_unfilled = 0      # Aucun fill (FOK tué, GTC annulé à l'échéance)
+        self.remainders_cancelled = 0  # GTC partiellement exécutés puis annulés
+        self.orders_capped = 0         # Taille réduite à la profondeur disponible
+        self.depth_rejects = 0         # Aucune profondeur sous le slippage toléré
         self.total_volume_usd = 0.0
+        self._fill_ratio_sum = 0.0
+        self._fill_latency_sum_ms = 0.0
+        self._fills_measured = 0
+        self._fills_timed = 0
 
         logger.info("HFTExecutor initialisé")
 
@@ -51,11 +76,14 @@ class HFTExecutor:
         if 'max_slippage_bps' in config:
             self.max_slippage_bps = int(config['max_slippage_bps'])
         if 'timeout_sec' in config:
-            self.timeout_sec = int(config['timeout_sec'])
+            self.timeout_sec = float(config['timeout_sec'])
+        if 'order_type' in config and str(config['order_type']).upper() in self.ORDER_TYPES:
+            self.order_type = str(config['order_type']).upper()
         if 'enabled' in config:
             self.enabled = bool(config['enabled'])
 
-        logger.info(f"HFTExecutor config: slippage={self.max_slippage_bps}bps, timeout={self.timeout_sec}s")
+        logger.info(f"HFTExecutor config: slippage={self.max_slippage_bps}bps, timeout={self.timeout_sec}s, "
+                    f"type={self.order_type}")
 
     def calculate_position_size(self, signal: Dict, wallet_config: Dict) -> float:
         """
@@ -72,31 +100,22 @@ class HFTExecutor:
 
         return round(position_usd, 2)
 
-    def get_best_price(self, token_id: str, side: str) -> Optional[float]:
-        """Récupère le meilleur prix disponible"""
+    def get_depth(self, token_id: str, side: str) -> Optional[DepthLadder]:
+        """Profondeur du carnet consommée par un ordre `side` (asks pour un BUY)"""
         if not self.polymarket_client:
             return None
 
         try:
-            order_book = self.polymarket_client.get_order_book(token_id)
-            if not order_book:
-                return None
-
-            if side == 'BUY':
-                asks = order_book.get('asks', [])
-                if asks:
-                    return float(asks[0].get('price', 0))
-            else:
-                bids = order_book.get('bids', [])
-                if bids:
-                    return float(bids[0].get('price', 0))
-
-            return None
-
+            return ladder_for(self.polymarket_client.get_order_book(token_id), side)
         except Exception as e:
-            logger.error(f"Erreur get_best_price: {e}")
+            logger.error(f"Erreur get_depth: {e}")
             return None
 
+    def get_best_price(self, token_id: str, side: str) -> Optional[float]:
+        """Récupère le meilleur prix disponible"""
+        ladder = self.get_depth(token_id, side)
+        return ladder.best_price if ladder else None
+
     def execute_copy_trade(self, signal: Dict, wallet_config: Dict) -> Dict:
         """
         Exécute un trade de copie HFT.
@@ -133,8 +152,9 @@ class HFTExecutor:
                     'message': 'Token ID manquant'
                 }
 
-            # 1. Récupérer le meilleur prix actuel
-            best_price = self.get_best_price(token_id, side)
+            # 1. Récupérer le meilleur prix actuel (et la profondeur derrière)
+            ladder = self.get_depth(token_id, side)
+            best_price = ladder.best_price if ladder else None
 
             if not best_price or best_price <= 0:
                 # Fallback sur le prix du signal
@@ -168,32 +188,96 @@ class HFTExecutor:
 
             shares = round(shares, 2)
 
+            # 3b. Plafonner à la profondeur exécutable sous le slippage toléré
+            depth_capped = False
+            plan = ladder.plan(shares, self.max_slippage_bps) if ladder else None
+            if plan:
+                if plan['shares'] <= 0:
+                    self.depth_rejects += 1
+                    return {
+                        'status': 'error',
+                        'message': f"Profondeur insuffisante sous {self.max_slippage_bps}bps"
+                    }
+                if plan['capped']:
+                    self.orders_capped += 1
+                    depth_capped = True
+                    logger.info(f"HFT taille plafonnée à la profondeur: {shares} -> {plan['shares']} shares "
+                                f"(VWAP ${plan['vwap']:.4f})")
+                    shares = plan['shares']
+                    position_usd = round(shares * plan['vwap'], 2)
+                # Inutile de proposer plus que le dernier niveau touché
+                if side == 'BUY':
+                    limit_price = round(min(limit_price, plan['limit_price']), 4)
+                else:
+                    limit_price = round(max(limit_price, plan['limit_price']), 4)
+
             # 4. Placer l'ordre (sans validation lourde)
-            logger.info(f"HFT Order: {side} {shares} shares @ ${limit_price} (${position_usd})")
+            order_type = self.order_type
+            logger.info(f"HFT Order ({order_type}): {side} {shares} shares @ ${limit_price} (${position_usd})")
 
+            submitted_at = time.time()
             order_result = self.polymarket_client.place_order(
                 token_id=token_id,
                 side=side,
                 price=limit_price,
                 size=shares,
-                order_type='LIMIT'
+                order_type='LIMIT',
+                time_in_force=order_type,
+                # ID dérivé du signal: un signal ré-exécuté ne re-poste pas
+                client_order_id=make_client_order_id(token_id, side, limit_price, shares,
+                                                     intent=f"hft:{signal.get('id', '')}") if signal.get('id') else None,
+                hedge=True
             )
 
-            execution_time = datetime.now()
-            latency_ms = int((execution_time - start_time).total_seconds() * 1000)
+            if order_result and order_result.get('deduplicated'):
+                return {
+                    'status': 'duplicate',
+                    'message': 'Signal déjà exécuté',
+                    'order_id': order_result.get('orderID', '')
+                }
+
+            if order_result and order_result.get('status') == 'success':
+                order_id = order_result.get('orderID', order_result.get('order_id', ''))
+
+                # 5. Suivi du fill (échéance + annulation du reste pour un GTC)
+                fill = self._await_fill(order_id, shares, order_type, submitted_at,
+                                        side=side, response=order_result.get('result'))
 
-            if order_result and order_result.get('success'):
+                execution_time = datetime.now()
+                latency_ms = int((execution_time - start_time).total_seconds() * 1000)
+                self._record_fill(fill)
+
+                if fill['filled_shares'] <= 0:
+                    self.trades_unfilled += 1
+                    logger.info(f"HFT Order non exécuté ({order_type}, {fill['final_status']}) en {latency_ms}ms")
+                    return {
+                        'status': 'unfilled',
+                        'message': f"Aucun fill avant échéance ({order_type})",
+                        'order_id': order_id,
+                        'order_type': order_type,
+                        'final_status': fill['final_status'],
+                        'fill_ratio': 0.0,
+                        'latency_ms': latency_ms
+                    }
+
+                filled_usd = round(fill['filled_shares'] * limit_price, 2)
                 self.trades_executed += 1
-                self.total_volume_usd += position_usd
+                self.total_volume_usd += filled_usd
 
                 result = {
                     'status': 'executed',
-                    'order_id': order_result.get('orderID', order_result.get('order_id', '')),
+                    'order_id': order_id,
                     'token_id': token_id,
                     'side': side,
                     'price': limit_price,
-                    'shares': shares,
-                    'value_usd': position_usd,
+                    'shares': fill['filled_shares'],
+                    'requested_shares': shares,
+                    'depth_capped': depth_capped,
+                    'value_usd': filled_usd,
+                    'order_type': order_type,
+                    'fill_ratio': fill['fill_ratio'],
+                    'fill_latency_ms': fill['fill_latency_ms'],
+                    'remainder_cancelled': fill['cancelled'],
                     'latency_ms': latency_ms,
                     'timestamp': execution_time.isoformat()
                 }
@@ -203,16 +287,19 @@ class HFTExecutor:
                     self._save_trade_to_db(signal, result, wallet_config)
 
                 # Notification WebSocket
+                mark_dirty('hft_stats')
                 if self.socketio:
                     self.socketio.emit('hft_trade_executed', result, namespace='/')
 
-                logger.info(f"HFT Trade exécuté: {side} ${position_usd} en {latency_ms}ms")
+                logger.info(f"HFT Trade exécuté: {side} ${filled_usd} en {latency_ms}ms "
+                            f"(fill {fill['fill_ratio']}, {fill['fill_latency_ms']}ms)")
 
                 return result
 
             else:
                 self.trades_failed += 1
                 error_msg = order_result.get('error', 'Erreur inconnue') if order_result else 'Pas de réponse'
+                latency_ms = int((datetime.now() - start_time).total_seconds() * 1000)
 
                 return {
                     'status': 'failed',
@@ -228,6 +315,118 @@ class HFTExecutor:
                 'message': str(e)
             }
 
+    # =========================================================================
+    # SUIVI DES FILLS
+    # =========================================================================
+
+    def _matched_size(self, order_id: str) -> Tuple[Optional[float], str]:
+        """(quantité exécutée, statut) d'un ordre; (None, '') si illisible"""
+        order = self.polymarket_client.get_order(order_id) if order_id else None
+        if not order:
+            return None, ''
+        try:
+            return float(order.get('size_matched', 0) or 0), str(order.get('status', '')).upper()
+        except (TypeError, ValueError):
+            return None, ''
+
+    @staticmethod
+    def _response_fill(response: Optional[Dict], side: str) -> Optional[float]:
+        """Quantité exécutée immédiatement d'après la réponse du POST (None si absente)"""
+        if not isinstance(response, dict):
+            return None
+        # BUY: on donne des USDC (making) contre des shares (taking); SELL: l'inverse
+        amount = response.get('takingAmount' if side == 'BUY' else 'makingAmount')
+        if amount in (None, ''):
+            return None
+        try:
+            return float(amount)
+        except (TypeError, ValueError):
+            return None
+
+    def _await_fill(self, order_id: str, shares: float, order_type: str, submitted_at: float,
+                    side: str = 'BUY', response: Optional[Dict] = None) -> Dict:
+        """
+        Mesure le fill d'un ordre. FOK/FAK sont terminaux dès la réponse; un GTC
+        est suivi jusqu'à exécution complète ou `timeout_sec`, puis le reste est annulé.
+        Si l'état de l'ordre reste illisible, le fill immédiat de la réponse du POST
+        (`response`) fait foi.
+        """
+        matched, status = self._matched_size(order_id)
+        last_fill_at = time.time() if matched else submitted_at
+        cancelled = False
+
+        if order_type == 'GTC':
+            deadline = submitted_at + self.timeout_sec
+            while (matched is None or matched < shares) and time.time() < deadline:
+                time.sleep(min(self.FILL_POLL_SEC, max(0.0, deadline - time.time())))
+                current, current_status = self._matched_size(order_id)
+                if current is not None:
+                    if matched is None or current > matched:
+                        last_fill_at = time.time()
+                    matched, status = current, current_status
+
+            if matched is None or matched < shares:
+                # Échéance: annuler le reste, puis relire (un fill a pu arriver entre-temps)
+                cancel = self.polymarket_client.cancel_order(order_id)
+                cancelled = cancel.get('status') == 'success'
+                final, final_status = self._matched_size(order_id)
+                if final is not None:
+                    if matched is None or final > matched:
+                        last_fill_at = time.time()
+                    matched, status = final, final_status
+                if cancelled and matched:
+                    self.remainders_cancelled += 1
+
+        if matched is None:
+            # État jamais lisible. Un FOK/FAK tué ou un GTC annulé ne se remplira
+            # plus: seul le fill immédiat de la réponse compte
+            immediate = self._response_fill(response, side)
+            terminal = order_type != 'GTC' or cancelled
+            if immediate is not None and (terminal or immediate >= shares):
+                matched = immediate
+                status = str(response.get('status', '') or '').upper()
+                last_fill_at = None  # Instant du fill inconnu
+            elif terminal:
+                logger.warning(f"⚠️ État de l'ordre {order_id} illisible ({order_type}"
+                               f"{', annulé' if cancelled else ''}), aucun fill retenu")
+                return {
+                    'filled_shares': 0.0,
+                    'fill_ratio': None,
+                    'fill_latency_ms': None,
+                    'cancelled': cancelled,
+                    'final_status': 'UNKNOWN'
+                }
+            else:
+                # GTC dont l'annulation a échoué (le plus souvent: déjà exécuté en
+                # entier): on suppose le fill complet plutôt que d'ignorer une
+                # position peut-être réelle
+                logger.warning(f"⚠️ État de l'ordre {order_id} illisible, fill supposé complet")
+                return {
+                    'filled_shares': shares,
+                    'fill_ratio': None,
+                    'fill_latency_ms': None,
+                    'cancelled': cancelled,
+                    'final_status': 'UNKNOWN'
+                }
+
+        filled = round(min(matched, shares), 2)
+        return {
+            'filled_shares': filled,
+            'fill_ratio': round(filled / shares, 4) if shares else 0.0,
+            'fill_latency_ms': int((last_fill_at - submitted_at) * 1000) if filled and last_fill_at else None,
+            'cancelled': cancelled,
+            'final_status': status or 'UNKNOWN'
+        }
+
+    def _record_fill(self, fill: Dict):
+        if fill['fill_ratio'] is None:
+            return
+        self._fills_measured += 1
+        self._fill_ratio_sum += fill['fill_ratio']
+        if fill['fill_latency_ms'] is not None:
+            self._fill_latency_sum_ms += fill['fill_latency_ms']
+            self._fills_timed += 1
+
     def _save_trade_to_db(self, signal: Dict, result: Dict, wallet_config: Dict):
         """
         Sauvegarde le trade en base de données de manière ASYNCHRONE.
@@ -279,5 +478,12 @@ class HFTExecutor:
                 self.trades_executed / max(1, self.trades_executed + self.trades_failed) * 100, 1
             ),
             'max_slippage_bps': self.max_slippage_bps,
-            'timeout_sec': self.timeout_sec
+            'timeout_sec': self.timeout_sec,
+            'order_type': self.order_type,
+            'trades_unfilled': self.trades_unfilled,
+            'remainders_cancelled': self.remainders_cancelled,
+            'orders_capped': self.orders_capped,
+            'depth_rejects': self.depth_rejects,
+            'avg_fill_ratio': round(self._fill_ratio_sum / self._fills_measured, 4) if self._fills_measured else None,
+            'avg_fill_latency_ms': round(self._fill_latency_sum_ms / self._fills_timed, 1) if self._fills_timed else None
         }
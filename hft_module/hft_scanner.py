@@ -9,6 +9,7 @@ Optimisations v3.1:
 """
 import os
 import json
+import time
 import threading
 import logging
 from concurrent.futures import ThreadPoolExecutor
@@ -18,6 +19,7 @@ from datetime import datetime
 from .market_discovery import HFTMarketDiscovery
 from .trade_monitor import HFTTradeMonitor, HFTSignal
 from .hft_executor import HFTExecutor
+from state_publisher import mark_dirty
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("HFTScanner")
@@ -37,6 +39,7 @@ class HFTScanner:
         'market_refresh_interval': 60,
         'max_slippage_bps': 50,
         'execution_timeout_sec': 2,
+        'order_type': 'GTC',  # GTC (reste annulé après execution_timeout_sec), FOK ou FAK
         'poll_interval': 5,
         'tracked_wallets': []
     }
@@ -65,14 +68,14 @@ class HFTScanner:
             db_manager=db_manager,
             socketio=socketio
         )
-        self.executor.set_config({
-            'max_slippage_bps': self.config.get('max_slippage_bps', 50),
-            'timeout_sec': self.config.get('execution_timeout_sec', 2)
-        })
+        self.executor.set_config(self._executor_config())
 
         # Connecter le callback de signal
         self.trade_monitor.add_callback(self._on_signal_detected)
 
+        # Pré-chauffage des marchés planifiés (avant le premier fill whale)
+        self.market_discovery.add_prewarm_callback(self._prewarm_market)
+
         # État
         self._running = False
         self._lock = threading.Lock()
@@ -139,11 +142,19 @@ class HFTScanner:
             if 'poll_interval' in new_config:
                 self.trade_monitor._poll_interval = new_config['poll_interval']
 
-            if 'max_slippage_bps' in new_config or 'execution_timeout_sec' in new_config:
-                self.executor.set_config(new_config)
+            if {'max_slippage_bps', 'execution_timeout_sec', 'order_type'} & new_config.keys():
+                self.executor.set_config(self._executor_config())
 
             self.save_config()
 
+    def _executor_config(self) -> Dict:
+        """Config HFT -> config de l'exécuteur"""
+        return {
+            'max_slippage_bps': self.config.get('max_slippage_bps', 50),
+            'timeout_sec': self.config.get('execution_timeout_sec', 2),
+            'order_type': self.config.get('order_type', 'GTC')
+        }
+
     def get_config(self) -> Dict:
         """Retourne la configuration"""
         return {
@@ -151,12 +162,44 @@ class HFTScanner:
             'running': self._running
         }
 
+    def _prewarm_market(self, market):
+        """
+        Marché planifié résolu avant ouverture: cache marché du monitor
+        immédiatement, carnets d'ordres à l'ouverture (un carnet lu avant
+        l'ouverture serait vide et resterait en cache).
+        """
+        opens_at = market.start_date.timestamp() if market.start_date else time.time()
+        info = {
+            'question': market.question,
+            'condition_id': market.condition_id,
+            'yes_price': market.yes_price,
+        }
+        tokens = [t for t in (market.yes_token_id, market.no_token_id) if t]
+        for token_id in tokens:
+            self.trade_monitor.prime_market_info(token_id, info, valid_from=opens_at)
+
+        if self.polymarket_client and tokens:
+            timer = threading.Timer(max(0.0, opens_at - time.time()) + 1, self._warm_order_books, [tokens])
+            timer.daemon = True
+            timer.start()
+
+    def _warm_order_books(self, token_ids: List[str]):
+        """Charge les carnets (cache orderbook + connexions CLOB ouvertes)"""
+        if not self._running:
+            return
+        for token_id in token_ids:
+            try:
+                self.polymarket_client.get_order_book(token_id)
+            except Exception as e:
+                logger.debug(f"Pré-chauffage carnet {token_id[:12]}: {e}")
+
     def _on_signal_detected(self, signal: HFTSignal):
         """
         Callback NON-BLOQUANT appelé quand un signal HFT est détecté.
         L'exécution est déléguée au ThreadPool pour ne pas bloquer le polling.
         """
         self.signals_received += 1
+        mark_dirty('hft_stats')
 
         logger.info(f"⚡ HFT Signal reçu: {signal.wallet_name} | {signal.side} | ${signal.value_usd:.2f}")
 
@@ -380,8 +423,8 @@ class HFTScanner:
         """Retourne les signaux récents"""
         return self.trade_monitor.get_recent_signals(limit)
 
-    def get_trades_history(self, limit: int = 100) -> List[Dict]:
-        """Retourne l'historique des trades HFT"""
+    def get_trades_history(self, limit: int = 100, before: Optional[str] = None) -> List[Dict]:
+        """Retourne l'historique des trades HFT (before: curseur keyset)"""
         if self.db_manager:
-            return self.db_manager.get_hft_trades(limit)
+            return self.db_manager.get_hft_trades(limit, before=before)
         return []
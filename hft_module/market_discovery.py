@@ -2,15 +2,25 @@
 """
 HFT Market Discovery - Détection des marchés crypto 15-min sur Polymarket
 Scanne l'API Gamma pour identifier les marchés à durée courte (15 minutes) sur BTC/ETH.
+
+Les marchés "Up or Down" 15-min ouvrent à cadence fixe (fenêtres alignées
+sur 900 s, slug `{asset}-updown-15m-{début}`): un planificateur prédit les
+prochains slugs, résout leurs token IDs juste avant l'ouverture et pré-chauffe
+les caches (callbacks de pré-chauffage), sans attendre le refresh Gamma.
 """
+import re
 import requests
 import threading
 import time
 import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 
+from gamma_utils import json_list
+from request_coalescer import coalesced_get_json
+from timing_wheel import TimingWheel
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("HFTMarketDiscovery")
 
@@ -31,11 +41,13 @@ class CryptoMarket:
     liquidity: float
     crypto_asset: str  # BTC, ETH, etc.
     direction: str     # UP, DOWN, ABOVE, BELOW
+    start_date: Optional[datetime] = None  # Ouverture de la fenêtre (marchés planifiés)
 
     def to_dict(self) -> Dict:
         return {
             **asdict(self),
-            'end_date': self.end_date.isoformat() if self.end_date else None
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'start_date': self.start_date.isoformat() if self.start_date else None
         }
 
     @property
@@ -52,22 +64,43 @@ class CryptoMarket:
         return self.time_remaining_seconds > 0
 
 
+def _parse_date(value: str) -> datetime:
+    """Date ISO Gamma (UTC) -> datetime naive locale, comparable à datetime.now()"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
 class HFTMarketDiscovery:
     """
     Découvre et cache les marchés crypto 15-min actifs.
-    Refresh automatique toutes les 60 secondes.
+    Refresh automatique toutes les 60 secondes, plus un planificateur qui
+    résout les marchés à cadence fixe avant leur ouverture.
     """
 
     GAMMA_API = "https://gamma-api.polymarket.com"
 
-    # Keywords pour identifier les marchés crypto
-    CRYPTO_KEYWORDS = ['btc', 'eth', 'bitcoin', 'ethereum', 'crypto']
-    DIRECTION_KEYWORDS = ['up', 'down', 'above', 'below', 'higher', 'lower', 'rise', 'fall']
+    # Classification en une passe: mots entiers uniquement ('eth' ne matche plus "whether")
+    CLASSIFIER = re.compile(
+        r'\b(?:(?P<btc>btc|bitcoin)|(?P<eth>eth|ethereum)|(?P<crypto>crypto)'
+        r'|(?P<up>up|above|higher|rise)|(?P<down>down|below|lower|fall))\b',
+        re.IGNORECASE
+    )
+    # Marchés "Up or Down" planifiés: btc-updown-15m-1735689600 (début de fenêtre, epoch)
+    SCHEDULED_SLUG = re.compile(r'^(?P<asset>[a-z]+)-updown-15m-(?P<start>\d+)$')
 
     # Durée acceptable pour un marché 15-min (en minutes)
     MIN_DURATION_MINUTES = 10
     MAX_DURATION_MINUTES = 20
 
+    # Planificateur
+    WINDOW_SEC = 15 * 60
+    SCHEDULED_ASSETS = ('btc', 'eth')
+    PREWARM_LEAD_SEC = 30   # Résolution des token IDs avant l'ouverture
+    SCHEDULE_TICK_SEC = 2
+    SCHEDULE_RETRY_MAX_SEC = 60  # Backoff max d'un slug prédit introuvable sur Gamma
+
     def __init__(self, refresh_interval: int = 60):
         self.refresh_interval = refresh_interval
         self.active_markets: Dict[str, CryptoMarket] = {}  # {condition_id: CryptoMarket}
@@ -75,70 +108,79 @@ class HFTMarketDiscovery:
 
         self._running = False
         self._refresh_thread = None
+        self._schedule_thread = None
         self._last_refresh: Optional[datetime] = None
         self._lock = threading.Lock()
 
+        # Planificateur: {slug: CryptoMarket} résolus, callbacks de pré-chauffage
+        self._scheduled: Dict[str, CryptoMarket] = {}
+        self._unresolved: Dict[str, Tuple[int, float]] = {}  # {slug: (échecs, prochain essai)}
+        self._prewarm_callbacks: List[Callable[[CryptoMarket], None]] = []
+
+        # Expiration des marchés (et de leurs tokens) à leur end_date exacte
+        self._expiry = TimingWheel(tick_sec=1.0, name="HFTMarketExpiry")
+        self.markets_expired = 0
+
         # Stats
         self.total_markets_checked = 0
         self.markets_found = 0
+        self.scheduled_resolved = 0
+        self.schedule_lookups = 0
+        self.schedule_lead_sec: Optional[float] = None  # Avance de la dernière résolution
 
         logger.info(f"HFTMarketDiscovery initialisé (refresh: {refresh_interval}s)")
 
+    @classmethod
+    def classify(cls, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """(crypto_asset, direction) du premier match de chaque type, en une passe"""
+        asset = direction = None
+        for match in cls.CLASSIFIER.finditer(text or ''):
+            kind = match.lastgroup
+            if asset is None and kind in ('btc', 'eth', 'crypto'):
+                asset = 'CRYPTO' if kind == 'crypto' else kind.upper()
+            elif direction is None and kind in ('up', 'down'):
+                direction = kind.upper()
+            if asset and direction:
+                break
+        return asset, direction
+
     def is_15min_crypto_market(self, market: Dict) -> Optional[CryptoMarket]:
         """
         Vérifie si un marché est un marché crypto 15-min.
         Retourne un CryptoMarket si oui, None sinon.
         """
-        question = (market.get('question') or '').lower()
-
-        # 1. Vérifier les keywords crypto
-        crypto_asset = None
-        for kw in self.CRYPTO_KEYWORDS:
-            if kw in question:
-                if 'btc' in kw or 'bitcoin' in kw:
-                    crypto_asset = 'BTC'
-                elif 'eth' in kw or 'ethereum' in kw:
-                    crypto_asset = 'ETH'
-                else:
-                    crypto_asset = 'CRYPTO'
-                break
-
-        if not crypto_asset:
-            return None
-
-        # 2. Vérifier les keywords de direction
-        direction = None
-        for kw in self.DIRECTION_KEYWORDS:
-            if kw in question:
-                if kw in ['up', 'above', 'higher', 'rise']:
-                    direction = 'UP'
-                else:
-                    direction = 'DOWN'
-                break
-
-        if not direction:
+        crypto_asset, direction = self.classify(market.get('question'))
+        scheduled = self.SCHEDULED_SLUG.match(market.get('slug') or '')
+
+        # 1-2. Actif crypto + direction (les marchés "Up or Down" planifiés: YES = UP)
+        if scheduled:
+            crypto_asset = scheduled.group('asset').upper()
+            direction = 'UP'
+        if not crypto_asset or not direction:
             return None
 
         # 3. Vérifier la durée (15 minutes)
         end_date_str = market.get('endDate')
         start_date_str = market.get('startDate') or market.get('createdAt')
-
-        if not end_date_str:
-            return None
+        start_date = None
 
         try:
-            # Parser les dates
-            end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-            # Convertir en datetime naive pour comparaison
-            end_date = end_date.replace(tzinfo=None)
-
-            if start_date_str:
-                start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                start_date = start_date.replace(tzinfo=None)
-                duration_minutes = (end_date - start_date).total_seconds() / 60
+            if scheduled:
+                # Le slug donne la fenêtre exacte (startDate Gamma = date de création)
+                start_date = datetime.fromtimestamp(int(scheduled.group('start')))
+                end_date = start_date + timedelta(seconds=self.WINDOW_SEC)
+                duration_minutes = self.WINDOW_SEC / 60
             else:
-                # Si pas de start_date, on estime basé sur le temps restant
-                duration_minutes = 15  # Assume 15 min
+                if not end_date_str:
+                    return None
+                end_date = _parse_date(end_date_str)
+
+                if start_date_str:
+                    start_date = _parse_date(start_date_str)
+                    duration_minutes = (end_date - start_date).total_seconds() / 60
+                else:
+                    # Si pas de start_date, on estime basé sur le temps restant
+                    duration_minutes = 15  # Assume 15 min
 
             # Vérifier si dans la plage acceptée
             if not (self.MIN_DURATION_MINUTES <= duration_minutes <= self.MAX_DURATION_MINUTES):
@@ -154,8 +196,8 @@ class HFTMarketDiscovery:
 
         # 5. Extraire les infos du marché
         condition_id = market.get('conditionId', '')
-        clob_token_ids = market.get('clobTokenIds', [])
-        outcome_prices = market.get('outcomePrices', [])
+        clob_token_ids = json_list(market.get('clobTokenIds'))
+        outcome_prices = json_list(market.get('outcomePrices'))
 
         yes_token = clob_token_ids[0] if len(clob_token_ids) > 0 else ''
         no_token = clob_token_ids[1] if len(clob_token_ids) > 1 else ''
@@ -176,7 +218,8 @@ class HFTMarketDiscovery:
             volume=float(market.get('volume', 0) or 0),
             liquidity=float(market.get('liquidity', 0) or 0),
             crypto_asset=crypto_asset,
-            direction=direction
+            direction=direction,
+            start_date=start_date if scheduled else None
         )
 
     def fetch_markets(self) -> List[Dict]:
@@ -244,6 +287,17 @@ class HFTMarketDiscovery:
                     new_token_map[crypto_market.no_token_id] = crypto_market.condition_id
 
         with self._lock:
+            # Conserver les marchés planifiés pas encore listés par Gamma
+            for market in self._scheduled.values():
+                if market.condition_id not in new_markets:
+                    new_markets[market.condition_id] = market
+                    for token in (market.yes_token_id, market.no_token_id):
+                        if token:
+                            new_token_map[token] = market.condition_id
+            for condition_id in self.active_markets.keys() - new_markets.keys():
+                self._expiry.cancel(condition_id)
+            for market in new_markets.values():
+                self._track_expiry(market)
             self.active_markets = new_markets
             self.token_to_condition = new_token_map
             self._last_refresh = datetime.now()
@@ -259,8 +313,123 @@ class HFTMarketDiscovery:
 
         return len(new_markets)
 
+    # =========================================================================
+    # PLANIFICATEUR (marchés à cadence fixe)
+    # =========================================================================
+
+    def add_prewarm_callback(self, callback: Callable[[CryptoMarket], None]):
+        """Callback appelé dès qu'un marché planifié est résolu (avant son ouverture)"""
+        self._prewarm_callbacks.append(callback)
+
+    @classmethod
+    def predict_windows(cls, now: float, count: int = 2) -> List[Tuple[str, int]]:
+        """
+        Slugs prédits de la fenêtre courante et des suivantes.
+
+        Returns:
+            [(slug, début epoch), ...]
+        """
+        base = int(now // cls.WINDOW_SEC) * cls.WINDOW_SEC
+        return [
+            (f"{asset}-updown-15m-{base + i * cls.WINDOW_SEC}", base + i * cls.WINDOW_SEC)
+            for i in range(count)
+            for asset in cls.SCHEDULED_ASSETS
+        ]
+
+    def resolve_slug(self, slug: str) -> Optional[CryptoMarket]:
+        """Résout un slug prédit en marché (token IDs) via Gamma"""
+        self.schedule_lookups += 1
+        try:
+            markets = coalesced_get_json('gamma', f"{self.GAMMA_API}/markets",
+                                         params={'slug': slug}, timeout=5)
+        except Exception as e:
+            logger.debug(f"Erreur résolution {slug}: {e}")
+            return None
+        for market in markets or []:
+            crypto_market = self.is_15min_crypto_market(market)
+            if crypto_market and crypto_market.yes_token_id:
+                return crypto_market
+        return None
+
+    def register_market(self, market: CryptoMarket):
+        """Ajoute un marché aux marchés actifs et déclenche le pré-chauffage"""
+        with self._lock:
+            self._track_expiry(market)
+            self.active_markets[market.condition_id] = market
+            for token in (market.yes_token_id, market.no_token_id):
+                if token:
+                    self.token_to_condition[token] = market.condition_id
+        for callback in self._prewarm_callbacks:
+            try:
+                callback(market)
+            except Exception as e:
+                logger.error(f"Erreur pré-chauffage {market.slug}: {e}")
+
+    def schedule_tick(self, now: Optional[float] = None) -> int:
+        """
+        Résout les fenêtres qui ouvrent dans moins de PREWARM_LEAD_SEC (ou déjà ouvertes).
+
+        Returns:
+            Nombre de marchés nouvellement résolus
+        """
+        now = now if now is not None else time.time()
+        resolved = 0
+        windows = self.predict_windows(now)
+        with self._lock:
+            # Oublie le backoff des fenêtres qui ne sont plus prédites
+            predicted = {slug for slug, _ in windows}
+            for slug in [s for s in self._unresolved if s not in predicted]:
+                del self._unresolved[slug]
+
+        for slug, start in windows:
+            with self._lock:
+                failures, retry_at = self._unresolved.get(slug, (0, 0.0))
+                if slug in self._scheduled or start - now > self.PREWARM_LEAD_SEC or now < retry_at:
+                    continue
+            market = self.resolve_slug(slug)
+            with self._lock:
+                if not market:
+                    # Pas encore publié: nouvel essai après 2, 4, 8... s (plafonné)
+                    delay = min(self.SCHEDULE_TICK_SEC * 2 ** failures, self.SCHEDULE_RETRY_MAX_SEC)
+                    self._unresolved[slug] = (failures + 1, now + delay)
+                    continue
+                self._unresolved.pop(slug, None)
+                if slug in self._scheduled:
+                    continue
+                self._scheduled[slug] = market
+                self.scheduled_resolved += 1
+                self.schedule_lead_sec = round(start - now, 1)
+            resolved += 1
+            logger.info(f"⏰ Marché planifié résolu: {slug} ({self.schedule_lead_sec:+.0f}s avant ouverture)")
+            self.register_market(market)
+        return resolved
+
+    # =========================================================================
+    # EXPIRATION
+    # =========================================================================
+
+    def _track_expiry(self, market: CryptoMarket):
+        """Programme le retrait du marché à son end_date (O(1))"""
+        if market.end_date:
+            self._expiry.schedule(market.condition_id, market.end_date.timestamp(), self._expire_market)
+
+    def _expire_market(self, condition_id: str):
+        """Callback de la roue: retire le marché, ses tokens et sa fenêtre planifiée"""
+        with self._lock:
+            market = self.active_markets.pop(condition_id, None)
+            if market is None:
+                return
+            for token in (market.yes_token_id, market.no_token_id):
+                if token and self.token_to_condition.get(token) == condition_id:
+                    del self.token_to_condition[token]
+            if self._scheduled.get(market.slug) is market:
+                del self._scheduled[market.slug]
+            self.markets_expired += 1
+        logger.debug(f"Marché expiré: {market.slug or condition_id[:12]}")
+
     def get_market_by_token(self, token_id: str) -> Optional[CryptoMarket]:
         """Récupère un marché par son token ID"""
+        self._expiry.advance()
         with self._lock:
             condition_id = self.token_to_condition.get(token_id)
             if condition_id:
@@ -269,16 +438,19 @@ class HFTMarketDiscovery:
 
     def get_market_by_condition(self, condition_id: str) -> Optional[CryptoMarket]:
         """Récupère un marché par son condition ID"""
+        self._expiry.advance()
         with self._lock:
             return self.active_markets.get(condition_id)
 
     def get_all_active_markets(self) -> List[CryptoMarket]:
-        """Retourne tous les marchés actifs"""
+        """Retourne tous les marchés actifs (les expirés sont retirés par la roue)"""
+        self._expiry.advance()
         with self._lock:
-            return [m for m in self.active_markets.values() if m.is_active]
+            return list(self.active_markets.values())
 
     def get_all_token_ids(self) -> List[str]:
         """Retourne tous les token IDs des marchés actifs"""
+        self._expiry.advance()
         with self._lock:
             tokens = []
             for market in self.active_markets.values():
@@ -309,6 +481,18 @@ class HFTMarketDiscovery:
 
         self._refresh_thread = threading.Thread(target=refresh_loop, daemon=True)
         self._refresh_thread.start()
+
+        def schedule_loop():
+            while self._running:
+                try:
+                    self._expiry.advance()
+                    self.schedule_tick()
+                except Exception as e:
+                    logger.error(f"Erreur planificateur: {e}")
+                time.sleep(self.SCHEDULE_TICK_SEC)
+
+        self._schedule_thread = threading.Thread(target=schedule_loop, daemon=True, name="HFTMarketSchedule")
+        self._schedule_thread.start()
         logger.info("HFTMarketDiscovery démarré")
 
     def stop(self):
@@ -318,6 +502,7 @@ class HFTMarketDiscovery:
 
     def get_stats(self) -> Dict:
         """Retourne les statistiques"""
+        self._expiry.advance()
         with self._lock:
             return {
                 'running': self._running,
@@ -326,5 +511,14 @@ class HFTMarketDiscovery:
                 'last_refresh': self._last_refresh.isoformat() if self._last_refresh else None,
                 'refresh_interval': self.refresh_interval,
                 'total_checked': self.total_markets_checked,
+                'expired': self.markets_expired,
+                'expiry_wheel': self._expiry.get_stats(),
+                'schedule': {
+                    'resolved': self.scheduled_resolved,
+                    'lookups': self.schedule_lookups,
+                    'backoff': len(self._unresolved),
+                    'last_lead_sec': self.schedule_lead_sec,
+                    'upcoming': [slug for slug, start in self.predict_windows(time.time()) if start > time.time()]
+                },
                 'markets': [m.to_dict() for m in self.active_markets.values()]
             }
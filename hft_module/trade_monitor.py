@@ -10,13 +10,13 @@ Optimisations v3.2:
 - Cache Gamma API avec TTL 30s
 - Pré-chargement positions au démarrage
 - Rate limiter partagé avec InsiderScanner (évite conflits 429)
+- Positions de tous les wallets en une requête GraphQL aliasée (GoldskyClient)
 """
 import os
 import sys
 import threading
 import time
 import logging
-import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Set, Optional, Callable, Tuple
 from datetime import datetime
@@ -25,7 +25,10 @@ from collections import deque
 
 # Ajouter le parent au path pour importer goldsky_rate_limiter
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from goldsky_rate_limiter import get_goldsky_rate_limiter, Priority
+from goldsky_rate_limiter import Priority
+from goldsky_client import get_goldsky_client
+from request_coalescer import coalesced_get_json
+from timing_wheel import TimingWheel
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("HFTTradeMonitor")
@@ -80,9 +83,11 @@ class HFTTradeMonitor:
         # Cache positions précédentes pour détecter les changements
         self._last_positions: Dict[str, Dict] = {}  # {wallet: {asset_id: balance}}
 
-        # Cache pour éviter les doublons de signaux
+        # Cache pour éviter les doublons de signaux: chaque clé expire
+        # _dedup_ttl secondes après son ajout (roue temporelle, pas d'éviction arbitraire)
         self._processed_signals: Set[str] = set()
-        self._max_cache_size = 500
+        self._dedup_ttl = 900  # Une fenêtre de marché 15-min
+        self._dedup_expiry = TimingWheel(tick_sec=1.0, name="HFTSignalDedup")
 
         # Cache Gamma API avec TTL (optimisation latence)
         self._market_cache: Dict[str, Tuple[Dict, float]] = {}  # {token_id: (data, timestamp)}
@@ -141,57 +146,54 @@ class HFTTradeMonitor:
     # GOLDSKY SUBGRAPH - Positions actuelles
     # =========================================================================
 
-    def _get_user_positions(self, address: str) -> Dict[str, float]:
-        """Récupère les positions actuelles d'un wallet via Goldsky"""
-        query = """
-        {
-          userBalances(first: 100, where: {user: "%s", balance_gt: "0"}) {
-            id
-            balance
-            asset {
-              id
-              condition {
-                id
-              }
-            }
-          }
-        }
-        """ % address.lower()
-
+    @staticmethod
+    def _balances_to_positions(balances: List[Dict]) -> Dict[str, float]:
+        """Convertit les userBalances Goldsky en {asset_id: balance}"""
+        positions = {}
+        for bal in balances:
+            asset_id = bal['asset']['id']
+            # Balance en micro-unités, convertir en unités normales
+            positions[asset_id] = float(bal['balance']) / 1e6
+        return positions
+
+    def _get_all_user_positions(self, addresses: List[str]) -> Dict[str, Optional[Dict[str, float]]]:
+        """
+        Récupère les positions de plusieurs wallets en un minimum de requêtes
+        (un document GraphQL aliasé, priorité HFT).
+
+        Returns:
+            {address: {asset_id: balance}} - None pour un wallet en échec
+        """
         try:
-            # Rate limiter avec priorité HFT (plus haute que Insider)
-            rate_limiter = get_goldsky_rate_limiter()
-            rate_limiter.wait_for_slot(Priority.HFT)
-
-            resp = requests.post(
-                self.GOLDSKY_POSITIONS,
-                json={'query': query},
-                timeout=3,  # Réduit de 10s à 3s pour HFT
-                headers={'Content-Type': 'application/json'}
+            balances = get_goldsky_client().get_user_balances(
+                addresses, priority=Priority.HFT, timeout=3,  # Réduit de 10s à 3s pour HFT
+                fields='id balance asset { id condition { id } }'
             )
-
-            if resp.status_code == 200:
-                rate_limiter.report_success()
-                data = resp.json()
-                if 'data' in data and data['data'].get('userBalances'):
-                    positions = {}
-                    for bal in data['data']['userBalances']:
-                        asset_id = bal['asset']['id']
-                        # Balance en micro-unités, convertir en unités normales
-                        balance = float(bal['balance']) / 1e6
-                        positions[asset_id] = balance
-                    return positions
-            elif resp.status_code == 429:
-                rate_limiter.report_rate_limit()
-            return {}
         except Exception as e:
-            logger.debug(f"Erreur get_user_positions: {e}")
-            return {}
+            logger.debug(f"Erreur get_all_user_positions: {e}")
+            return {addr: None for addr in addresses}
+
+        return {
+            addr: (self._balances_to_positions(balances[addr.lower()])
+                   if balances.get(addr.lower()) is not None else None)
+            for addr in addresses
+        }
+
+    def _get_user_positions(self, address: str) -> Dict[str, float]:
+        """Récupère les positions actuelles d'un wallet via Goldsky"""
+        return self._get_all_user_positions([address]).get(address) or {}
 
     # =========================================================================
     # GAMMA API - Infos marché
     # =========================================================================
 
+    def prime_market_info(self, token_id: str, info: Dict, valid_from: Optional[float] = None):
+        """
+        Pré-remplit le cache marché (marchés planifiés résolus avant ouverture).
+        `valid_from`: l'entrée compte son TTL à partir de cet instant (ouverture).
+        """
+        self._market_cache[token_id] = (info, max(time.time(), valid_from or 0))
+
     def _get_market_info(self, token_id: str) -> Dict:
         """Récupère les infos d'un marché via Gamma API (avec cache TTL 30s)"""
         now = time.time()
@@ -206,23 +208,22 @@ class HFTTradeMonitor:
         self.cache_misses += 1
 
         try:
-            resp = requests.get(
-                f"{self.GAMMA_API}/markets",
+            # Coalescé: plusieurs signaux sur le même token partagent la requête
+            markets = coalesced_get_json(
+                'gamma', f"{self.GAMMA_API}/markets",
                 params={'clob_token_ids': token_id},
                 timeout=3  # Réduit de 5s à 3s
             )
-            if resp.status_code == 200:
-                markets = resp.json()
-                if markets and len(markets) > 0:
-                    market = markets[0]
-                    result = {
-                        'question': market.get('question', ''),
-                        'condition_id': market.get('condition_id', ''),
-                        'yes_price': float(market.get('outcomePrices', '["0.5","0.5"]').strip('[]').split(',')[0].strip('"') or 0.5),
-                    }
-                    # Stocker en cache
-                    self._market_cache[token_id] = (result, now)
-                    return result
+            if markets and len(markets) > 0:
+                market = markets[0]
+                result = {
+                    'question': market.get('question', ''),
+                    'condition_id': market.get('condition_id', ''),
+                    'yes_price': float(market.get('outcomePrices', '["0.5","0.5"]').strip('[]').split(',')[0].strip('"') or 0.5),
+                }
+                # Stocker en cache
+                self._market_cache[token_id] = (result, now)
+                return result
         except Exception as e:
             logger.debug(f"Erreur get_market_info: {e}")
 
@@ -232,13 +233,15 @@ class HFTTradeMonitor:
     # DÉTECTION DE TRADES
     # =========================================================================
 
-    def _detect_position_changes(self, wallet_addr: str, wallet_info: Dict) -> List[HFTSignal]:
-        """Détecte les changements de position pour un wallet"""
+    def _detect_position_changes(self, wallet_addr: str, wallet_info: Dict,
+                                 current_positions: Optional[Dict[str, float]] = None) -> List[HFTSignal]:
+        """Détecte les changements de position pour un wallet (positions pré-chargées ou non)"""
         signals = []
         detection_time = datetime.now()
 
         # Récupérer positions actuelles
-        current_positions = self._get_user_positions(wallet_addr)
+        if current_positions is None:
+            current_positions = self._get_user_positions(wallet_addr)
         previous_positions = self._last_positions.get(wallet_addr, {})
 
         # Détecter les changements
@@ -302,10 +305,8 @@ class HFTTradeMonitor:
 
             signals.append(signal)
             self._processed_signals.add(signal_id)
-
-            # Nettoyer le cache si trop grand
-            if len(self._processed_signals) > self._max_cache_size:
-                self._processed_signals = set(list(self._processed_signals)[-250:])
+            self._dedup_expiry.schedule(signal_id, time.time() + self._dedup_ttl,
+                                        self._processed_signals.discard)
 
         # Mettre à jour le cache
         self._last_positions[wallet_addr] = current_positions
@@ -320,14 +321,21 @@ class HFTTradeMonitor:
         """Poll tous les wallets en parallèle pour réduire la latence"""
         all_signals = []
 
+        self._dedup_expiry.advance()
         if not self.tracked_wallets:
             return all_signals
 
-        # Utiliser ThreadPoolExecutor pour polling parallèle
-        with ThreadPoolExecutor(max_workers=min(10, len(self.tracked_wallets) + 1)) as executor:
+        # Positions de tous les wallets: une requête aliasée au lieu d'une par wallet
+        wallets = dict(self.tracked_wallets)
+        positions = self._get_all_user_positions(list(wallets))
+
+        # Détection en parallèle (les infos marché restent des appels Gamma)
+        # Un wallet en échec est ignoré ce cycle (sinon toutes ses positions paraîtraient vendues)
+        with ThreadPoolExecutor(max_workers=min(10, len(wallets) + 1)) as executor:
             futures = {
-                executor.submit(self._detect_position_changes, addr, info): addr
-                for addr, info in self.tracked_wallets.items()
+                executor.submit(self._detect_position_changes, addr, info, positions[addr]): addr
+                for addr, info in wallets.items()
+                if positions.get(addr) is not None
             }
 
             for future in as_completed(futures, timeout=self._poll_interval + 3):
@@ -342,6 +350,8 @@ class HFTTradeMonitor:
 
     def _poll_loop(self):
         """Boucle de polling principale (optimisée avec parallélisation)"""
+        # Pré-charger les positions avant le premier poll (évite faux signaux au démarrage)
+        self._preload_positions_parallel()
         logger.info(f"HFT Poll loop démarrée (interval: {self._poll_interval}s, parallèle)")
 
         while self._running:
@@ -384,27 +394,19 @@ class HFTTradeMonitor:
     # =========================================================================
 
     def _preload_positions_parallel(self):
-        """Pré-charge les positions de tous les wallets en parallèle"""
+        """Pré-charge les positions de tous les wallets (requêtes batchées)"""
         if not self.tracked_wallets:
             return
 
         logger.info(f"Pré-chargement positions HFT ({len(self.tracked_wallets)} wallets)...")
 
-        with ThreadPoolExecutor(max_workers=min(10, len(self.tracked_wallets) + 1)) as executor:
-            futures = {
-                executor.submit(self._get_user_positions, addr): addr
-                for addr in self.tracked_wallets.keys()
-            }
-
-            for future in as_completed(futures, timeout=15):
-                wallet_addr = futures[future]
-                try:
-                    positions = future.result()
-                    self._last_positions[wallet_addr] = positions
-                    logger.info(f"  ✓ {wallet_addr[:10]}...: {len(positions)} positions")
-                except Exception as e:
-                    logger.warning(f"  ✗ {wallet_addr[:10]}...: {e}")
-                    self._last_positions[wallet_addr] = {}
+        for wallet_addr, positions in self._get_all_user_positions(list(self.tracked_wallets)).items():
+            if positions is None:
+                logger.warning(f"  ✗ {wallet_addr[:10]}...: positions indisponibles")
+                self._last_positions[wallet_addr] = {}
+            else:
+                self._last_positions[wallet_addr] = positions
+                logger.info(f"  ✓ {wallet_addr[:10]}...: {len(positions)} positions")
 
     def start(self):
         """Démarre le monitoring"""
@@ -414,10 +416,8 @@ class HFTTradeMonitor:
 
         self._running = True
 
-        # Pré-charger les positions en parallèle (évite faux signaux au démarrage)
-        self._preload_positions_parallel()
-
-        # Démarrer le polling
+        # Démarrer le polling (le pré-chargement des positions se fait dans le thread:
+        # start() ne bloque plus le démarrage du bot)
         self._poll_thread = threading.Thread(target=self._poll_loop, daemon=True)
         self._poll_thread.start()
 
@@ -449,5 +449,6 @@ class HFTTradeMonitor:
             'cache_hits': self.cache_hits,
             'cache_misses': self.cache_misses,
             'cache_hit_rate': cache_hit_rate,
-            'cache_size': len(self._market_cache)
+            'cache_size': len(self._market_cache),
+            'dedup_keys': len(self._processed_signals)
         }
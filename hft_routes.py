@@ -6,6 +6,8 @@ Routes dédiées au copy-trading HFT, séparées du reste de l'application.
 from flask import Blueprint, jsonify, request
 import logging
 
+from db_manager import next_cursor
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("HFTRoutes")
 
@@ -269,8 +271,15 @@ def hft_get_trades():
         return jsonify({'error': 'Module HFT non initialisé'}), 503
 
     limit = request.args.get('limit', 100, type=int)
+    before = request.args.get('before')
+
+    try:
+        trades = hft_scanner.get_trades_history(limit, before=before)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
     return jsonify({
         'success': True,
-        'trades': hft_scanner.get_trades_history(limit)
+        'trades': trades,
+        'next_cursor': next_cursor(trades, limit, ts_key='signal_ts_ms')
     })
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Insider Activity Source - Flux exact des trades via les subgraphs Goldsky
+
+L'ancienne source (snapshot) devinait les achats en diffant le top-50 des
+`userBalances` de chaque marché: les petits holders étaient invisibles et
+chaque scan coûtait une requête par marché.
+
+Cette source pagine les événements depuis le dernier timestamp vu, pour
+TOUS les marchés surveillés à la fois:
+    - fills du carnet CLOB  (orderbook subgraph, `orderFilledEvents`)
+    - splits de collatéral   (activity subgraph, `splits`)
+
+Les merges sont des sorties de position: ils ne sont pas candidats aux
+triggers insider et ne sont donc pas récupérés.
+
+Le coût d'un scan suit le nombre de nouveaux trades, pas marchés × holders.
+"""
+import json
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from gamma_utils import json_list
+from goldsky_rate_limiter import get_goldsky_rate_limiter, Priority
+
+logger = logging.getLogger("InsiderActivitySource")
+
+GOLDSKY_ACTIVITY = "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/activity-subgraph/0.0.4/gn"
+GOLDSKY_ORDERBOOK = "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/orderbook-subgraph/0.0.1/gn"
+
+# Asset id du collatéral (USDC) dans les OrderFilledEvent
+COLLATERAL_ASSET_ID = "0"
+
+# Contrats d'échange: `taker` des OrderFilledEvent côté ordre taker, jamais un acheteur
+EXCHANGE_ADDRESSES = {
+    '0x4bfb41d5b3570defd03c39a9a4d8de6bd8b8982e',  # CTF Exchange
+    '0xc5d563a36ae78145c45a50134d48a1215220f80a',  # NegRisk CTF Exchange
+}
+
+PAGE_SIZE = 1000
+MAX_PAGES_PER_SCAN = 5   # Au-delà, le reste est repris au scan suivant (curseur persistant)
+FILTER_CHUNK = 200       # Ids max par filtre `_in`
+
+
+class _Cursor:
+    """Curseur timestamp + ids déjà vus à ce timestamp (ex-aequo)"""
+
+    def __init__(self, ts: int):
+        self.ts = ts
+        self.seen_at_ts = set()
+
+    def is_new(self, ev: Dict) -> bool:
+        ts = int(ev.get('timestamp', 0))
+        return ts > self.ts or (ts == self.ts and ev.get('id') not in self.seen_at_ts)
+
+    def advance(self, events: List[Dict]):
+        for ev in events:
+            ts = int(ev.get('timestamp', 0))
+            if ts > self.ts:
+                self.ts = ts
+                self.seen_at_ts = {ev['id']}
+            elif ts == self.ts:
+                self.seen_at_ts.add(ev['id'])
+
+    def catch_up(self, ts: int):
+        """Tous les événements avant `ts` ont été lus (aucun à `ts` pour ce curseur)"""
+        if ts > self.ts:
+            self.ts = ts
+            self.seen_at_ts = set()
+
+
+class ActivitySubgraphSource:
+    """
+    Source d'activités pour l'InsiderScanner.
+
+    `poll(markets)` retourne les nouvelles activités [(activity, market), ...]
+    au format attendu par InsiderScanner.process_batch:
+        {'user', 'amount' (USDC 1e6), 'odds', 'outcome', 'asset': {'id'}, 'type', 'timestamp', ...}
+    """
+
+    def __init__(self, post: Optional[Callable] = None, lookback_sec: int = 60):
+        self._post = post
+        self.lookback_sec = lookback_sec
+        self._cursors: Dict[str, _Cursor] = {}
+
+        # Stats
+        self.queries = 0
+        self.events_seen = 0
+        self.activities_emitted = 0
+        self.errors = 0
+        self.last_poll_ms = 0.0
+
+    # =========================================================================
+    # HTTP
+    # =========================================================================
+
+    def _query(self, url: str, query: str) -> Optional[Dict]:
+        """POST GraphQL via le rate limiter partagé (priorité INSIDER)"""
+        post = self._post
+        if post is None:
+            import requests
+            post = requests.post
+
+        rate_limiter = get_goldsky_rate_limiter()
+        rate_limiter.wait_for_slot(Priority.INSIDER)
+        self.queries += 1
+        try:
+            resp = post(url, json={'query': query}, timeout=15)
+            if resp.status_code == 429:
+                rate_limiter.report_rate_limit()
+                logger.warning("Goldsky API rate limited (429)")
+                return None
+            if resp.status_code != 200:
+                logger.warning(f"Goldsky API returned status {resp.status_code}")
+                return None
+            rate_limiter.report_success()
+            data = resp.json()
+            if 'errors' in data:
+                logger.warning(f"Goldsky GraphQL errors: {data['errors']}")
+                self.errors += 1
+                return None
+            return data.get('data') or {}
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"Erreur requête activity subgraph: {e}")
+            return None
+
+    def _cursor(self, name: str) -> _Cursor:
+        cursor = self._cursors.get(name)
+        if cursor is None:
+            # Premier passage: on ne remonte que `lookback_sec` (pas d'alertes sur l'historique)
+            cursor = _Cursor(int(time.time()) - self.lookback_sec)
+            self._cursors[name] = cursor
+        return cursor
+
+    def _page_events(self, names: List[str], url: str, entity: str, fields: str,
+                     where_builder: Callable[[str], str],
+                     names_of: Callable[[Dict], List[str]]) -> List[Dict]:
+        """
+        Pagine une entité par timestamp croissant pour un lot de curseurs
+        (un par token ou condition: l'ajout d'un marché ne décale pas ceux des autres).
+        La pagination part du curseur le plus ancien du lot; un événement n'est
+        retenu que s'il est nouveau pour le curseur de son token / sa condition.
+        `where_builder(ts_filter)` construit la clause where (filtres marchés inclus).
+        """
+        cursors = {name: self._cursor(name) for name in names}
+        if not cursors:
+            return []
+        # Position de pagination de ce scan (ex-aequo déjà lus à la page précédente)
+        cursor = _Cursor(min(c.ts for c in cursors.values()))
+        events = []
+        for _ in range(MAX_PAGES_PER_SCAN):
+            start_ts = cursor.ts
+            ts_filter = f'timestamp_gte: "{start_ts}"'
+            query = """
+            {
+              %s(first: %d, orderBy: timestamp, orderDirection: asc, where: %s) {
+                %s
+              }
+            }
+            """ % (entity, PAGE_SIZE, where_builder(ts_filter), fields)
+
+            data = self._query(url, query)
+            if data is None:
+                break
+            page = data.get(entity) or []
+            for ev in page:
+                if not cursor.is_new(ev):
+                    continue
+                keys = [cursors[n] for n in names_of(ev) if n in cursors]
+                if any(c.is_new(ev) for c in keys):
+                    events.append(ev)
+                for c in keys:
+                    c.advance([ev])
+            cursor.advance(page)
+
+            if len(page) < PAGE_SIZE:
+                break
+            if cursor.ts == start_ts:
+                # Page entière d'ex-aequo: on saute ce timestamp pour ne pas boucler
+                logger.warning(f"⚠️ {entity}: plus de {PAGE_SIZE} événements à ts={start_ts}, reste ignoré")
+                cursor.ts += 1
+                cursor.seen_at_ts = set()
+
+        # Tout ce qui précède la position atteinte a été lu pour chaque curseur du lot
+        for c in cursors.values():
+            c.catch_up(cursor.ts)
+
+        self.events_seen += len(events)
+        return events
+
+    # =========================================================================
+    # POLL
+    # =========================================================================
+
+    @staticmethod
+    def _index_markets(markets: List[Dict]) -> Tuple[Dict[str, Dict], Dict[str, Tuple[Dict, int]]]:
+        """{condition_id: market}, {token_id: (market, outcome_index)}"""
+        by_condition = {}
+        by_token = {}
+        for market in markets:
+            condition_id = (market.get('conditionId') or '').lower()
+            if condition_id:
+                by_condition[condition_id] = market
+            for idx, token_id in enumerate(json_list(market.get('clobTokenIds'))):
+                by_token[str(token_id)] = (market, idx)
+        return by_condition, by_token
+
+    @staticmethod
+    def _outcome_name(market: Dict, idx: int) -> str:
+        outcomes = json_list(market.get('outcomes'))
+        if idx < len(outcomes):
+            return str(outcomes[idx]).upper()
+        return "YES" if idx == 0 else "NO"
+
+    @staticmethod
+    def _fill_token_ids(ev: Dict) -> List[str]:
+        """Token(s) échangé(s) par un OrderFilledEvent (hors collatéral)"""
+        return [a for a in (str(ev.get('makerAssetId')), str(ev.get('takerAssetId'))) if a != COLLATERAL_ASSET_ID]
+
+    def _fill_to_activity(self, ev: Dict, by_token: Dict) -> Optional[Tuple[Dict, Dict]]:
+        """
+        Convertit un OrderFilledEvent en achat d'outcome, côté maker uniquement.
+
+        Chaque ordre exécuté a son propre événement, dont il est le `maker`: un
+        achat est celui du maker qui paie l'USDC. Côté ordre taker, `taker` est
+        le contrat d'échange; côté ordre maker, le `taker` acheteur a déjà son
+        propre événement. Le `taker` n'est donc jamais l'acheteur retenu.
+        """
+        if str(ev.get('makerAssetId')) != COLLATERAL_ASSET_ID:
+            return None
+        buyer, token_id = ev.get('maker'), str(ev.get('takerAssetId'))
+        usdc, tokens = int(ev.get('makerAmountFilled', 0)), int(ev.get('takerAmountFilled', 0))
+
+        entry = by_token.get(token_id)
+        if not entry or not buyer or str(buyer).lower() in EXCHANGE_ADDRESSES or tokens <= 0:
+            return None
+        market, idx = entry
+        return {
+            'id': ev.get('id'),
+            'user': buyer,
+            'amount': usdc,
+            'odds': usdc / tokens,
+            'outcome': self._outcome_name(market, idx),
+            'asset': {'id': token_id},
+            'type': 'FILL',
+            'timestamp': int(ev.get('timestamp', 0)),
+            'condition_id': market.get('conditionId', ''),
+            'tx_hash': ev.get('transactionHash', '')
+        }, market
+
+    @staticmethod
+    def _split_to_activity(ev: Dict, by_condition: Dict) -> Optional[Tuple[Dict, Dict]]:
+        """Un split de collatéral: entrée non directionnelle (odds du marché)"""
+        market = by_condition.get((ev.get('condition') or '').lower())
+        if not market or not ev.get('stakeholder'):
+            return None
+        return {
+            'id': ev.get('id'),
+            'user': ev.get('stakeholder'),
+            'amount': int(ev.get('amount', 0)),
+            'type': 'SPLIT',
+            'timestamp': int(ev.get('timestamp', 0)),
+            'condition_id': market.get('conditionId', '')
+        }, market
+
+    def poll(self, markets: List[Dict]) -> List[Tuple[Dict, Dict]]:
+        """
+        Récupère les nouveaux fills et splits de tous les marchés surveillés.
+
+        Args:
+            markets: Marchés Gamma surveillés (conditionId, clobTokenIds, outcomes...)
+
+        Returns:
+            [(activity, market), ...] en ordre chronologique
+        """
+        started = time.time()
+        by_condition, by_token = self._index_markets(markets)
+        items = []
+
+        # Curseurs des marchés qui ne sont plus surveillés: oubliés (un retour
+        # repart de `lookback_sec`, sans rejouer l'historique manqué)
+        watched = {f"fill:{t}" for t in by_token} | {f"split:{c}" for c in by_condition}
+        for name in [n for n in self._cursors if n not in watched]:
+            del self._cursors[name]
+
+        token_ids = sorted(by_token)
+        for i in range(0, len(token_ids), FILTER_CHUNK):
+            tokens = token_ids[i:i + FILTER_CHUNK]
+            chunk = json.dumps(tokens)
+            fills = self._page_events(
+                [f"fill:{t}" for t in tokens], GOLDSKY_ORDERBOOK, 'orderFilledEvents',
+                'id timestamp transactionHash maker taker makerAssetId takerAssetId makerAmountFilled takerAmountFilled',
+                lambda ts, c=chunk: '{or: [{%s, makerAssetId_in: %s}, {%s, takerAssetId_in: %s}]}' % (ts, c, ts, c),
+                lambda ev: [f"fill:{t}" for t in self._fill_token_ids(ev)]
+            )
+            for ev in fills:
+                item = self._fill_to_activity(ev, by_token)
+                if item:
+                    items.append(item)
+
+        condition_ids = sorted(by_condition)
+        for i in range(0, len(condition_ids), FILTER_CHUNK):
+            conditions = condition_ids[i:i + FILTER_CHUNK]
+            chunk = json.dumps(conditions)
+            splits = self._page_events(
+                [f"split:{c}" for c in conditions], GOLDSKY_ACTIVITY, 'splits',
+                'id timestamp stakeholder condition amount',
+                lambda ts, c=chunk: '{%s, condition_in: %s}' % (ts, c),
+                lambda ev: [f"split:{(ev.get('condition') or '').lower()}"]
+            )
+            for ev in splits:
+                item = self._split_to_activity(ev, by_condition)
+                if item:
+                    items.append(item)
+
+        items.sort(key=lambda item: item[0]['timestamp'])
+        self.activities_emitted += len(items)
+        self.last_poll_ms = (time.time() - started) * 1000
+        return items
+
+    def get_stats(self) -> Dict:
+        """Statistiques de la source"""
+        return {
+            'queries': self.queries,
+            'events_seen': self.events_seen,
+            'activities_emitted': self.activities_emitted,
+            'errors': self.errors,
+            'last_poll_ms': round(self.last_poll_ms, 2),
+            'cursors': {name: c.ts for name, c in self._cursors.items()}
+        }
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Insider Detection Engine - Scoring vectorisé des activités par lot
+
+Au lieu d'évaluer chaque activité avec des if/else et des appels Polygonscan
+dans la boucle, le scanner accumule toutes les activités d'un scan puis:
+    1. extrait les features en colonnes (amount, odds, wallet_age_days,
+       dormant_days, tx_count, liquidity)
+    2. pré-charge en parallèle les profils des wallets qui peuvent encore
+       déclencher une règle dépendant du profil
+    3. évalue toutes les règles sur les colonnes entières (masques booléens)
+
+Les règles sont déclaratives et construites depuis `insider_config.json`:
+les triggers historiques (risky_bet, whale_wakeup, fresh_wallet) y gardent
+leur format, et `custom_rules` permet d'en ajouter sans toucher au code:
+
+    "custom_rules": [
+        {"type": "THIN_MARKET", "label": "Marché Illiquide", "score": 15,
+         "all": [["amount", ">=", 500], ["liquidity", "<=", 5000]]}
+    ]
+
+Une règle se déclenche si toutes les conditions `all` sont vraies ET (si
+présente) au moins une condition `any`. Une feature inconnue vaut NaN: toute
+comparaison est alors fausse (pas de trigger sans donnée).
+
+NumPy est utilisé s'il est installé, sinon repli sur des listes Python.
+"""
+import time
+import logging
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger("InsiderDetection")
+
+NAN = float('nan')
+
+FEATURES = ('amount', 'odds', 'wallet_age_days', 'dormant_days', 'tx_count', 'liquidity')
+
+# Features qui nécessitent un appel Polygonscan par wallet
+PROFILE_FEATURES = frozenset({'wallet_age_days', 'dormant_days', 'tx_count'})
+
+OPERATORS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Score de suspicion: base + score de chaque règle active + bonus montant, plafonné à 100
+BASE_SCORE = 50
+AMOUNT_BONUSES = ((1000.0, 10), (5000.0, 10))
+MAX_SCORE = 100
+
+
+@dataclass
+class Rule:
+    """Règle de détection: conjonction `all` + disjonction optionnelle `any`"""
+    type: str
+    label: str
+    score: int = 0
+    all: List[Sequence] = field(default_factory=list)
+    any: List[Sequence] = field(default_factory=list)
+    # Texte affiché: format str sur les features de la ligne, ou callable(row) -> str
+    details: Any = ''
+
+    def __post_init__(self):
+        for feature, op, _ in list(self.all) + list(self.any):
+            if feature not in FEATURES:
+                raise ValueError(f"Feature inconnue dans la règle {self.type}: {feature}")
+            if op not in OPERATORS:
+                raise ValueError(f"Opérateur inconnu dans la règle {self.type}: {op}")
+
+    @property
+    def features(self) -> set:
+        return {c[0] for c in list(self.all) + list(self.any)}
+
+    @property
+    def needs_profile(self) -> bool:
+        return bool(self.features & PROFILE_FEATURES)
+
+    def describe(self, row: Dict[str, float]) -> str:
+        if callable(self.details):
+            return self.details(row)
+        try:
+            return str(self.details).format(**row)
+        except (KeyError, ValueError):
+            return str(self.details)
+
+
+# =========================================================================
+# OPÉRATIONS COLONNES (NumPy ou repli Python)
+# =========================================================================
+
+def _column(values: List[float]):
+    return np.asarray(values, dtype=np.float64) if NUMPY_AVAILABLE else list(values)
+
+
+def _compare(column, op: str, value: float):
+    fn = OPERATORS[op]
+    if NUMPY_AVAILABLE:
+        with np.errstate(invalid='ignore'):
+            return fn(column, value)
+    return [fn(v, value) for v in column]
+
+
+def _and(a, b):
+    if NUMPY_AVAILABLE:
+        return a & b
+    return [x and y for x, y in zip(a, b)]
+
+
+def _or(a, b):
+    if NUMPY_AVAILABLE:
+        return a | b
+    return [x or y for x, y in zip(a, b)]
+
+
+def _full(n: int, value: bool):
+    if NUMPY_AVAILABLE:
+        return np.full(n, value, dtype=bool)
+    return [value] * n
+
+
+def _nonzero(mask) -> List[int]:
+    if NUMPY_AVAILABLE:
+        return np.flatnonzero(mask).tolist()
+    return [i for i, m in enumerate(mask) if m]
+
+
+def _to_float(value, default: float = NAN) -> float:
+    try:
+        if value is None or value == '':
+            return default
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# =========================================================================
+# RÈGLES DEPUIS LA CONFIG
+# =========================================================================
+
+def build_rules(config: Dict) -> List[Rule]:
+    """
+    Construit les règles à partir de la config du scanner.
+    L'ordre compte: la première règle active d'une ligne est le trigger principal.
+    """
+    rules = []
+
+    risky = config.get('risky_bet', {})
+    if risky.get('enabled', False):
+        max_odds = float(risky.get('max_odds', 0.35))
+        rules.append(Rule(
+            type='RISKY_BET', label='Pari Risqué', score=int(risky.get('score', 20)),
+            all=[('amount', '>=', float(risky.get('min_amount', 50)))],
+            any=[('odds', '<=', max_odds), ('amount', '>=', float(risky.get('high_amount', 1000)))],
+            details=lambda row, m=max_odds: (
+                f"{'Low Odds' if row['odds'] <= m else 'High Stake'} (Odds: {row['odds']:.2f})"
+            )
+        ))
+
+    whale = config.get('whale_wakeup', {})
+    if whale.get('enabled', False):
+        rules.append(Rule(
+            type='WHALE_WAKEUP', label='Réveil Dormant', score=int(whale.get('score', 25)),
+            all=[('amount', '>=', float(whale.get('min_amount', 100))),
+                 ('dormant_days', '>=', float(whale.get('dormant_days', 30)))],
+            details=lambda row: f"Inactif {int(row['dormant_days'])}j"
+        ))
+
+    fresh = config.get('fresh_wallet', {})
+    if fresh.get('enabled', False):
+        rules.append(Rule(
+            type='FRESH_WALLET', label='Nouveau Wallet', score=int(fresh.get('score', 30)),
+            all=[('amount', '>=', float(fresh.get('min_amount', 500))),
+                 ('tx_count', '<=', float(fresh.get('max_tx', 5)))],
+            details=lambda row: f"Seulement {int(row['tx_count'])} txs"
+        ))
+
+    for spec in config.get('custom_rules', []) or []:
+        if not spec.get('enabled', True):
+            continue
+        try:
+            rules.append(Rule(
+                type=spec['type'],
+                label=spec.get('label', spec['type']),
+                score=int(spec.get('score', 0)),
+                all=[tuple(c) for c in spec.get('all', [])],
+                any=[tuple(c) for c in spec.get('any', [])],
+                details=spec.get('details', '')
+            ))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Règle personnalisée ignorée ({spec.get('type', '?')}): {e}")
+
+    return rules
+
+
+# =========================================================================
+# ENGINE
+# =========================================================================
+
+class InsiderDetectionEngine:
+    """
+    Évalue un lot d'activités contre un jeu de règles.
+
+    `profile_fetcher(wallet)` doit retourner un dict
+    {'tx_count': int|None, 'last_activity': datetime|None, 'first_seen': datetime|None};
+    il est appelé en parallèle, une seule fois par wallet du lot.
+    """
+
+    def __init__(self, rules: List[Rule], profile_fetcher: Optional[Callable[[str], Dict]] = None,
+                 max_workers: int = 4):
+        self.rules = rules
+        self.profile_fetcher = profile_fetcher
+        self.max_workers = max(1, int(max_workers))
+
+        # Stats du dernier lot
+        self.last_batch_size = 0
+        self.last_profiles_fetched = 0
+        self.last_prefetch_ms = 0.0
+        self.last_scoring_ms = 0.0
+
+    def _eval_conditions(self, columns: Dict, conditions: List[Sequence], n: int, mode: str,
+                         skip_profile: bool = False):
+        """Combine un groupe de conditions (mode 'all' ou 'any') en un masque"""
+        mask = None
+        for feature, op, value in conditions:
+            if skip_profile and feature in PROFILE_FEATURES:
+                continue
+            m = _compare(columns[feature], op, float(value))
+            if mask is None:
+                mask = m
+            else:
+                mask = _and(mask, m) if mode == 'all' else _or(mask, m)
+        return mask
+
+    def _rule_mask(self, rule: Rule, columns: Dict, n: int, skip_profile: bool = False):
+        mask = self._eval_conditions(columns, rule.all, n, 'all', skip_profile)
+        if mask is None:
+            mask = _full(n, True)
+        if rule.any:
+            any_mask = self._eval_conditions(columns, rule.any, n, 'any', skip_profile)
+            if any_mask is not None:
+                mask = _and(mask, any_mask)
+        return mask
+
+    def _prefetch_profiles(self, wallets: List[str]) -> Dict[str, Dict]:
+        """Charge les profils des wallets uniques en parallèle"""
+        unique = list(dict.fromkeys(w.lower() for w in wallets if w))
+        if not unique or not self.profile_fetcher:
+            return {}
+
+        def fetch(wallet):
+            try:
+                return wallet, self.profile_fetcher(wallet) or {}
+            except Exception as e:
+                logger.debug(f"Profil {wallet[:10]}... indisponible: {e}")
+                return wallet, {}
+
+        workers = min(self.max_workers, len(unique))
+        if workers == 1:
+            return dict(fetch(w) for w in unique)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="InsiderProfile") as pool:
+            return dict(pool.map(fetch, unique))
+
+    @staticmethod
+    def _profile_features(profile: Dict, now: datetime) -> Dict[str, float]:
+        last_activity = profile.get('last_activity')
+        first_seen = profile.get('first_seen')
+        tx_count = profile.get('tx_count')
+        return {
+            'tx_count': _to_float(tx_count),
+            'dormant_days': float((now - last_activity).days) if last_activity else NAN,
+            'wallet_age_days': float((now - first_seen).days) if first_seen else NAN,
+        }
+
+    def evaluate(self, rows: List[Dict]) -> List[Dict]:
+        """
+        Score un lot de lignes.
+
+        Args:
+            rows: [{'wallet', 'amount', 'odds', 'liquidity', ...}] - les features
+                  profil absentes sont complétées par le prefetch
+
+        Returns:
+            Pour chaque ligne déclenchant au moins une règle:
+            {'index', 'triggers': [{'type', 'label', 'details'}], 'score', 'features'}
+        """
+        n = len(rows)
+        self.last_batch_size = n
+        self.last_profiles_fetched = 0
+        if n == 0 or not self.rules:
+            return []
+
+        columns = {f: _column([_to_float(r.get(f)) for r in rows]) for f in FEATURES}
+
+        # 1. Prefetch des profils: seulement pour les lignes qui passent déjà
+        #    les conditions hors-profil d'au moins une règle qui en dépend
+        profile_rules = [r for r in self.rules if r.needs_profile]
+        if profile_rules and self.profile_fetcher:
+            started = time.time()
+            candidates = _full(n, False)
+            for rule in profile_rules:
+                candidates = _or(candidates, self._rule_mask(rule, columns, n, skip_profile=True))
+            idx = _nonzero(candidates)
+            profiles = self._prefetch_profiles([rows[i].get('wallet', '') for i in idx])
+            self.last_profiles_fetched = len(profiles)
+
+            if profiles:
+                now = datetime.now()
+                profile_cols = {f: [_to_float(r.get(f)) for r in rows] for f in PROFILE_FEATURES}
+                for i in idx:
+                    profile = profiles.get((rows[i].get('wallet') or '').lower())
+                    if profile:
+                        for f, v in self._profile_features(profile, now).items():
+                            profile_cols[f][i] = v
+                for f, values in profile_cols.items():
+                    columns[f] = _column(values)
+            self.last_prefetch_ms = (time.time() - started) * 1000
+
+        # 2. Évaluation vectorisée de toutes les règles
+        started = time.time()
+        masks = [(rule, self._rule_mask(rule, columns, n)) for rule in self.rules]
+
+        if NUMPY_AVAILABLE:
+            scores = np.full(n, BASE_SCORE, dtype=np.int64)
+            hit_any = np.zeros(n, dtype=bool)
+            for rule, mask in masks:
+                scores += mask * rule.score
+                hit_any |= mask
+            for threshold, bonus in AMOUNT_BONUSES:
+                scores += (columns['amount'] >= threshold) * bonus
+            scores = np.minimum(scores, MAX_SCORE).tolist()
+            hits = np.flatnonzero(hit_any).tolist()
+            masks = [(rule, mask.tolist()) for rule, mask in masks]
+            amounts = columns['amount'].tolist()
+        else:
+            hits = [i for i in range(n) if any(mask[i] for _, mask in masks)]
+            amounts = columns['amount']
+            scores = [0] * n
+            for i in hits:
+                score = BASE_SCORE + sum(rule.score for rule, mask in masks if mask[i])
+                score += sum(bonus for threshold, bonus in AMOUNT_BONUSES if amounts[i] >= threshold)
+                scores[i] = min(score, MAX_SCORE)
+
+        # 3. Matérialisation uniquement pour les lignes déclenchées
+        results = []
+        for i in hits:
+            features = {f: (columns[f][i].item() if NUMPY_AVAILABLE else columns[f][i]) for f in FEATURES}
+            triggers = [
+                {'type': rule.type, 'label': rule.label, 'details': rule.describe(features)}
+                for rule, mask in masks if mask[i]
+            ]
+            results.append({
+                'index': i,
+                'triggers': triggers,
+                'score': int(scores[i]),
+                'features': features
+            })
+        self.last_scoring_ms = (time.time() - started) * 1000
+        return results
+
+    def get_stats(self) -> Dict:
+        """Statistiques du dernier lot évalué"""
+        return {
+            'numpy': NUMPY_AVAILABLE,
+            'rules': [r.type for r in self.rules],
+            'last_batch_size': self.last_batch_size,
+            'last_profiles_fetched': self.last_profiles_fetched,
+            'last_prefetch_ms': round(self.last_prefetch_ms, 2),
+            'last_scoring_ms': round(self.last_scoring_ms, 2)
+        }
@@ -5,12 +5,18 @@ API endpoints pour la detection et le suivi de wallets suspects sur Polymarket
 """
 from flask import Blueprint, jsonify, request
 from insider_scanner import insider_scanner
-from db_manager import db_manager
+from db_manager import db_manager, next_cursor
 
 # Blueprint pour les routes insider
 insider_bp = Blueprint('insider', __name__, url_prefix='/api/insider')
 
 
+def init_insider_routes(scanner):
+    """Remplace le scanner utilise par les routes (proxy du worker en mode multi-process)"""
+    global insider_scanner
+    insider_scanner = scanner
+
+
 @insider_bp.route('/alerts', methods=['GET'])
 def get_alerts():
     """
@@ -20,18 +26,23 @@ def get_alerts():
     Query params:
       - limit: int (default 100)
       - min_score: int (default 0)
+      - before: curseur keyset (next_cursor de la page precedente)
     """
     try:
         limit = request.args.get('limit', 100, type=int)
         min_score = request.args.get('min_score', 0, type=int)
+        before = request.args.get('before')
 
-        alerts = db_manager.get_insider_alerts(limit=limit, min_score=min_score)
+        alerts = db_manager.get_insider_alerts(limit=limit, min_score=min_score, before=before)
 
         return jsonify({
             'success': True,
             'alerts': alerts,
-            'count': len(alerts)
+            'count': len(alerts),
+            'next_cursor': next_cursor(alerts, limit)
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -10,13 +10,19 @@ import requests
 import threading
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Callable
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 
 # Rate limiter partagé
-from goldsky_rate_limiter import get_goldsky_rate_limiter, Priority
+from goldsky_rate_limiter import Priority
+from request_coalescer import coalesced_get_json
+from insider_detection import InsiderDetectionEngine, build_rules
+from insider_activity_source import ActivitySubgraphSource
+from gamma_utils import json_list
+from goldsky_client import get_goldsky_client, GraphQLQuery
 
 # Configuration logging
 logging.basicConfig(level=logging.INFO)
@@ -46,6 +52,7 @@ class InsiderAlert:
     dedup_key: str
     suspicion_score: int = 70  # Score de suspicion (requis par DB)
     nickname: str = ""
+    enriched: bool = False  # wallet_stats / nickname remplis par le worker d'enrichissement
 
     def to_dict(self) -> Dict:
         return asdict(self)
@@ -108,7 +115,21 @@ class InsiderScanner:
                 'min_amount': 500.0      # STRICT: Que les gros montants
             },
 
-            'categories': self.DEFAULT_CATEGORIES.copy()
+            'categories': self.DEFAULT_CATEGORIES.copy(),
+
+            # Regles supplementaires evaluees par le moteur de detection
+            # ex: {"type": "THIN_MARKET", "score": 15, "all": [["liquidity", "<=", 5000]]}
+            'custom_rules': [],
+
+            # Nombre de requetes Polygonscan paralleles pour le prefetch des profils
+            'profile_workers': 4,
+
+            # Workers d'enrichissement des alertes (stats + nickname, hors boucle de scan)
+            'enrichment_workers': 4,
+
+            # Source d'activites: 'activity' (fills/splits exacts via subgraphs, curseur timestamp)
+            # ou 'snapshot' (ancien diff du top-N des userBalances par marche)
+            'detection_source': 'activity'
         }
 
         # Deduplication cache: {dedup_key: timestamp}
@@ -121,14 +142,25 @@ class InsiderScanner:
         # Cache pour eviter requetes repetees
         self._wallet_tx_cache = {}  # {address: {count, timestamp}}
         self._wallet_activity_cache = {}  # {address: {last_activity, timestamp}}
+        self._wallet_profile_cache = {}  # {address: {profile, timestamp}}
+        self._public_profile_cache = {}  # {address: {data, timestamp}} (Gamma public-profile)
         self._market_cache = {}  # {token_id: {data, timestamp}}
         self._market_snapshots = {} # {condition_id: {user: balance, _updated: datetime}}
+        self.activity_source = ActivitySubgraphSource(lookback_sec=self.scan_interval)
         self._max_snapshot_age = 3600 * 6  # 6 heures max pour les snapshots
 
         # Stats
         self.alerts_generated = 0
         self.markets_scanned = 0
         self.last_scan = None
+        self._last_detection_stats = {}
+
+        # Enrichissement differe des alertes
+        self._enrichment_pool = None
+        self._enrichment_lock = threading.Lock()
+        self.enrichment_pending = 0
+        self.enrichment_done = 0
+        self.enrichment_failed = 0
 
         logger.info("🔍 InsiderScanner initialise")
         if self.polygonscan_api_key:
@@ -238,71 +270,55 @@ class InsiderScanner:
             logger.error(f"❌ Erreur get_all_active_markets: {e}")
             return []
 
-    def get_recent_market_activity(self, condition_id: str, limit: int = 300) -> List[Dict]:
+    def fetch_market_holders(self, condition_ids: List[str], limit: int = 300) -> Dict[str, Optional[Dict[str, float]]]:
+        """
+        Recupere le top N des holders de plusieurs marches en requetes GraphQL batchees.
+        On ne filtre pas par high balance pour voir les petits insiders.
+
+        Returns:
+            {condition_id: {user: balance}} - None pour un marche en echec
+        """
+        queries = [
+            GraphQLQuery(
+                entity='userBalances',
+                fields='id user balance asset { id }',
+                where={'asset_': {'condition': cid}, 'balance_gt': "0"},
+                first=limit,
+                order_by='balance',
+                order_direction='desc'
+            )
+            for cid in condition_ids
+        ]
+        results = get_goldsky_client().query_many(self.GOLDSKY_POSITIONS, queries, Priority.INSIDER)
+
+        holders = {}
+        for cid, rows in zip(condition_ids, results):
+            if rows is None:
+                holders[cid] = None
+                continue
+            holders[cid] = {p.get('user'): float(p.get('balance', 0)) for p in rows}
+        return holders
+
+    def get_recent_market_activity(self, condition_id: str, limit: int = 300,
+                                   current_holders: Optional[Dict[str, float]] = None) -> List[Dict]:
         """
         Recupere les NOUVELLES positions ou AUGMENTATIONS de positions via snapshot diff.
         Ceci permet de detecter les "achats recents" meme sans API d'historique de trades.
+        `current_holders` peut etre pre-charge par fetch_market_holders (scan batche).
         """
         if not condition_id:
             return []
 
-        # 1. Recuperer l'etat ACTUEL des balances (Top N holders pour avoir une bonne couverture)
-        # On ne filtre pas par high balance pour voir les petits insiders.
-        query = """
-        {
-          userBalances(
-            first: %d,
-            orderBy: balance,
-            orderDirection: desc,
-            where: { asset_: { condition: "%s" }, balance_gt: "0" } 
-          ) {
-            id
-            user
-            balance
-            asset {
-              id
-            }
-          }
-        }
-        """ % (limit, condition_id)
-
         try:
-            # Rate limiter - attendre un slot disponible (priorité INSIDER)
-            rate_limiter = get_goldsky_rate_limiter()
-            rate_limiter.wait_for_slot(Priority.INSIDER)
-
-            resp = requests.post(self.GOLDSKY_POSITIONS, json={'query': query}, timeout=15)
-
-            current_holders = {} # {user: balance}
+            # 1. Recuperer l'etat ACTUEL des balances (Top N holders pour avoir une bonne couverture)
+            if current_holders is None:
+                current_holders = self.fetch_market_holders([condition_id], limit).get(condition_id)
+            if current_holders is None:
+                # Echec de lecture: on garde le snapshot precedent intact
+                return []
+            current_holders = dict(current_holders)
             activities = []
 
-            if resp.status_code == 200:
-                rate_limiter.report_success()
-                try:
-                    data = resp.json()
-                except Exception as json_err:
-                    logger.warning(f"Invalid JSON response from Goldsky: {json_err}")
-                    return []
-
-                # 🔧 FIX: Vérifier les erreurs GraphQL
-                if 'errors' in data:
-                    logger.warning(f"Goldsky GraphQL errors: {data['errors']}")
-                    return []
-
-                if 'data' in data and data['data'] and data['data'].get('userBalances'):
-                    raw_positions = data['data']['userBalances']
-
-                    # Construire la map actuelle
-                    for p in raw_positions:
-                        user = p.get('user')
-                        balance = float(p.get('balance', 0))
-                        current_holders[user] = balance
-            elif resp.status_code == 429:
-                rate_limiter.report_rate_limit()
-                logger.warning(f"Goldsky API rate limited (429)")
-            else:
-                logger.warning(f"Goldsky API returned status {resp.status_code}")
-
             # 2. Comparer avec le snapshot PRECEDENT (thread-safe)
             # Si c'est le premier scan, on ne genere PAS d'alerte (sinon on alerte sur tout le monde)
             # On initialise juste le snapshot.
@@ -335,7 +351,7 @@ class InsiderScanner:
                 # 3. Mettre a jour le snapshot avec timestamp
                 current_holders['_updated'] = datetime.now()
                 self._market_snapshots[condition_id] = current_holders
-            
+
             return activities
 
         except Exception as e:
@@ -428,8 +444,114 @@ class InsiderScanner:
             logger.warning(f"Polygonscan last activity error: {e}")
             return None
 
-    def get_wallet_performance(self, address: str) -> Dict:
-        """Calcule les stats de performance d'un wallet via Gamma API public-profile"""
+    def _fetch_first_seen(self, address: str) -> Optional[datetime]:
+        """Premiere tx du wallet (sort asc, 1 resultat), None si inconnue"""
+        try:
+            params = {
+                'module': 'account',
+                'action': 'txlist',
+                'address': address,
+                'page': 1,
+                'offset': 1,
+                'sort': 'asc',
+                'apikey': self.polygonscan_api_key
+            }
+            resp = requests.get(self.POLYGONSCAN_API, params=params, timeout=10)
+            if resp.status_code == 200:
+                data = resp.json()
+                if data.get('status') == '1' and data.get('result'):
+                    ts = int(data['result'][0].get('timeStamp', 0))
+                    return datetime.fromtimestamp(ts) if ts > 0 else None
+        except Exception as e:
+            logger.warning(f"Polygonscan first tx error: {e}")
+        return None
+
+    def get_wallet_profile(self, address: str) -> Dict:
+        """
+        Recupere en un appel Polygonscan: nombre de txs (max 100), derniere
+        activite et premiere tx (age du wallet). Au-dela de 100 txs, un second
+        appel (sort asc) donne la vraie premiere tx. Cache 1h, et alimente
+        aussi les caches de get_wallet_tx_count / get_wallet_last_activity.
+        Les valeurs inconnues sont None (aucun trigger ne s'active dessus).
+        """
+        profile = {'tx_count': None, 'last_activity': None, 'first_seen': None}
+        if not self.polygonscan_api_key:
+            return profile
+
+        addr_lower = address.lower()
+        with self._cache_lock:
+            cached = self._wallet_profile_cache.get(addr_lower)
+        if cached and datetime.now() - cached['timestamp'] < timedelta(hours=1):
+            return cached['profile']
+
+        try:
+            params = {
+                'module': 'account',
+                'action': 'txlist',
+                'address': address,
+                'page': 1,
+                'offset': 100,
+                'sort': 'desc',
+                'apikey': self.polygonscan_api_key
+            }
+            resp = requests.get(self.POLYGONSCAN_API, params=params, timeout=10)
+            if resp.status_code != 200:
+                return profile
+            data = resp.json()
+            if data.get('status') == '1':
+                txs = data.get('result', [])
+                timestamps = [int(tx.get('timeStamp', 0)) for tx in txs if int(tx.get('timeStamp', 0)) > 0]
+                profile['tx_count'] = len(txs)
+                if timestamps:
+                    profile['last_activity'] = datetime.fromtimestamp(max(timestamps))
+                    # Page pleine: la plus ancienne tx de la page n'est pas la premiere du wallet
+                    if len(txs) >= params['offset']:
+                        profile['first_seen'] = self._fetch_first_seen(address)
+                    else:
+                        profile['first_seen'] = datetime.fromtimestamp(min(timestamps))
+            elif 'No transactions found' in str(data.get('message', '')):
+                profile['tx_count'] = 0
+            else:
+                logger.warning(f"Polygonscan API error: {data.get('message', 'Unknown')}")
+                return profile
+        except Exception as e:
+            logger.warning(f"Polygonscan profile error: {e}")
+            return profile
+
+        now = datetime.now()
+        with self._cache_lock:
+            self._wallet_profile_cache[addr_lower] = {'profile': profile, 'timestamp': now}
+            self._wallet_tx_cache[addr_lower] = {'count': profile['tx_count'], 'timestamp': now}
+            if profile['last_activity']:
+                self._wallet_activity_cache[addr_lower] = {
+                    'last_activity': profile['last_activity'],
+                    'timestamp': now
+                }
+        return profile
+
+    def get_wallet_public_profile(self, address: str) -> Optional[Dict]:
+        """
+        Recupere le profil public Gamma d'un wallet (stats + pseudo) en un seul appel.
+        Cache 10 min, et les appels concurrents sur le meme wallet sont coalesces.
+        """
+        addr_lower = address.lower()
+        with self._cache_lock:
+            cached = self._public_profile_cache.get(addr_lower)
+        if cached and (datetime.now() - cached['timestamp']).total_seconds() < 600:
+            return cached['data']
+
+        data = coalesced_get_json(
+            'gamma', f"{self.GAMMA_API}/public-profile", params={'address': addr_lower}, timeout=10
+        )
+        if isinstance(data, dict):
+            with self._cache_lock:
+                self._public_profile_cache[addr_lower] = {'data': data, 'timestamp': datetime.now()}
+            return data
+        return None
+
+    @staticmethod
+    def _performance_from_profile(data: Dict) -> Dict:
+        """Extrait les stats de performance d'un profil public Gamma"""
         stats = {
             'pnl': 0.0,
             'win_rate': 0.0,
@@ -437,159 +559,134 @@ class InsiderScanner:
             'total_trades': 0
         }
 
+        # Extraire les stats disponibles
+        pnl = data.get('pnl') or data.get('profit') or 0
+        win_rate = data.get('winRate') or data.get('win_rate') or 0
+        trades = data.get('tradesCount') or data.get('trades_count') or data.get('betsCount') or 0
+
+        if isinstance(pnl, str):
+            pnl = float(pnl.replace('$', '').replace(',', '')) if pnl else 0
+        if isinstance(win_rate, str):
+            win_rate = float(win_rate.replace('%', '')) if win_rate else 0
+
+        stats['pnl'] = round(float(pnl), 2)
+        stats['win_rate'] = round(float(win_rate), 1)
+        stats['total_trades'] = int(trades) if trades else 0
+
+        # Calcul ROI si on a le volume
+        volume = data.get('volume') or data.get('totalVolume') or 0
+        if volume and float(volume) > 0:
+            stats['roi'] = round((float(pnl) / float(volume)) * 100, 1)
+        return stats
+
+    def _performance_from_goldsky(self, address: str) -> Dict:
+        """Fallback: estime les stats de performance via le subgraph Goldsky"""
+        stats = {
+            'pnl': 0.0,
+            'win_rate': 0.0,
+            'roi': 0.0,
+            'total_trades': 0
+        }
         try:
-            # Utiliser l'API Gamma pour les stats du profil (plus fiable que le subgraph)
-            url = f"{self.GAMMA_API}/public-profile?address={address.lower()}"
-            resp = requests.get(url, timeout=10)
-            
-            if resp.status_code == 200:
-                data = resp.json()
-                
-                # Extraire les stats disponibles
-                pnl = data.get('pnl') or data.get('profit') or 0
-                win_rate = data.get('winRate') or data.get('win_rate') or 0
-                trades = data.get('tradesCount') or data.get('trades_count') or data.get('betsCount') or 0
-                
-                if isinstance(pnl, str):
-                    pnl = float(pnl.replace('$', '').replace(',', '')) if pnl else 0
-                if isinstance(win_rate, str):
-                    win_rate = float(win_rate.replace('%', '')) if win_rate else 0
-                    
-                stats['pnl'] = round(float(pnl), 2)
-                stats['win_rate'] = round(float(win_rate), 1)
-                stats['total_trades'] = int(trades) if trades else 0
-                
-                # Calcul ROI si on a le volume
-                volume = data.get('volume') or data.get('totalVolume') or 0
-                if volume and float(volume) > 0:
-                    stats['roi'] = round((float(pnl) / float(volume)) * 100, 1)
-                    
+            balances = get_goldsky_client().query(self.GOLDSKY_POSITIONS, GraphQLQuery(
+                entity='userBalances',
+                fields='id balance cost asset { id }',
+                where={'user': address.lower()},
+                first=200
+            ))
+            if balances is not None:
+                total_cost = 0
+                total_value = 0
+                wins = 0
+                trades = 0
+
+                for b in balances:
+                    balance = float(b.get('balance', 0)) / 1e6  # USDC 6 decimals
+                    cost = float(b.get('cost', 0)) / 1e6
+
+                    if balance > 0.01:  # Filtrer positions negligeables
+                        trades += 1
+                        total_cost += cost
+                        total_value += balance
+                        if balance > cost and cost > 0:
+                            wins += 1
+
+                if trades > 0:
+                    stats['total_trades'] = trades
+                    if total_cost > 0:
+                        stats['win_rate'] = round((wins / trades) * 100, 1)
+                        stats['pnl'] = round(total_value - total_cost, 2)
+                        stats['roi'] = round(((total_value - total_cost) / total_cost) * 100, 1)
+                    else:
+                        # Si on n'a pas le cost, au moins montrer la valeur totale
+                        stats['pnl'] = round(total_value, 2)
+
         except Exception as e:
-            logger.debug(f"Error getting wallet performance from Gamma: {e}")
-            
-            # Fallback: utiliser Goldsky subgraph
-            try:
-                query = """
-                {
-                  userBalances(first: 200, where: {user: "%s"}) {
-                    id
-                    balance
-                    cost
-                    asset {
-                      id
-                    }
-                  }
-                }
-                """ % address.lower()
-
-                # Rate limiter
-                rate_limiter = get_goldsky_rate_limiter()
-                rate_limiter.wait_for_slot(Priority.INSIDER)
-
-                resp = requests.post(self.GOLDSKY_POSITIONS, json={'query': query}, timeout=15)
-                if resp.status_code == 200:
-                    rate_limiter.report_success()
-                    data = resp.json()
-                    balances = data.get('data', {}).get('userBalances', [])
-
-                    total_cost = 0
-                    total_value = 0
-                    wins = 0
-                    trades = 0
-
-                    for b in balances:
-                        balance = float(b.get('balance', 0)) / 1e6  # USDC 6 decimals
-                        cost = float(b.get('cost', 0)) / 1e6
-
-                        if balance > 0.01:  # Filtrer positions negligeables
-                            trades += 1
-                            total_cost += cost
-                            total_value += balance
-                            if balance > cost and cost > 0:
-                                wins += 1
-
-                    if trades > 0:
-                        stats['total_trades'] = trades
-                        if total_cost > 0:
-                            stats['win_rate'] = round((wins / trades) * 100, 1)
-                            stats['pnl'] = round(total_value - total_cost, 2)
-                            stats['roi'] = round(((total_value - total_cost) / total_cost) * 100, 1)
-                        else:
-                            # Si on n'a pas le cost, au moins montrer la valeur totale
-                            stats['pnl'] = round(total_value, 2)
-                            
-            except Exception as e2:
-                logger.debug(f"Fallback Goldsky also failed: {e2}")
+            logger.debug(f"Fallback Goldsky also failed: {e}")
 
         return stats
 
+    def get_wallet_performance(self, address: str) -> Dict:
+        """Calcule les stats de performance d'un wallet via Gamma API public-profile (fallback Goldsky)"""
+        try:
+            data = self.get_wallet_public_profile(address)
+            if data is not None:
+                return self._performance_from_profile(data)
+        except Exception as e:
+            logger.debug(f"Error getting wallet performance from Gamma: {e}")
+        return self._performance_from_goldsky(address)
+
+    def enrich_wallet(self, address: str) -> tuple:
+        """
+        Stats de performance + pseudo d'un wallet a partir d'UN seul appel profil.
+
+        Returns:
+            (wallet_stats, nickname)
+        """
+        data = None
+        try:
+            data = self.get_wallet_public_profile(address)
+        except Exception as e:
+            logger.debug(f"Error getting public profile from Gamma: {e}")
+
+        if data is None:
+            return self._performance_from_goldsky(address), ""
+
+        try:
+            stats = self._performance_from_profile(data)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Profil Gamma illisible pour {address[:10]}...: {e}")
+            stats = self._performance_from_goldsky(address)
+        # On priorise 'name' (nickname choisi par l'user) puis 'pseudonym'
+        return stats, data.get('name') or data.get('pseudonym') or ""
+
 
     # =========================================================================
     # TRIGGER DETECTION ALGORITHM
     # =========================================================================
 
-    def detect_triggers(self, wallet: str, bet_amount: float, outcome_odds: float) -> List[Dict]:
+    def _build_engine(self) -> InsiderDetectionEngine:
+        """Construit le moteur de detection depuis la config courante"""
+        return InsiderDetectionEngine(
+            build_rules(self.config),
+            profile_fetcher=self.get_wallet_profile,
+            max_workers=self.config.get('profile_workers', 4)
+        )
+
+    def detect_triggers(self, wallet: str, bet_amount: float, outcome_odds: float,
+                        liquidity: Optional[float] = None) -> List[Dict]:
         """
-        Verifie si l'activite declenche un ou plusieurs triggers.
-        Retourne une liste de triggers actifs: [{'type': 'RISKY_BET', 'details': '...'}]
+        Verifie si une activite isolee declenche un ou plusieurs triggers.
+        Retourne une liste de triggers actifs: [{'type': 'RISKY_BET', 'label': ..., 'details': '...'}]
+        (Le scan utilise directement le moteur sur tout le lot, voir process_batch)
         """
-        triggers = []
-        
-        # 1. TRIGGER A: RISKY BET (Le Sniper)
-        cfg_risky = self.config['risky_bet']
-        if cfg_risky['enabled']:
-            # Condition: Mise > 50$ ET (Cote < 35% OU Mise > 1000$)
-            if bet_amount >= cfg_risky['min_amount']:
-                is_low_odds = outcome_odds <= cfg_risky['max_odds']
-                is_high_amount = bet_amount >= cfg_risky['high_amount']
-                
-                if is_low_odds or is_high_amount:
-                    reason = "Low Odds" if is_low_odds else "High Stake"
-                    triggers.append({
-                        'type': 'RISKY_BET',
-                        'label': 'Pari Risqué',
-                        'details': f"{reason} (Odds: {outcome_odds:.2f})"
-                    })
-                    logger.debug(f"  [TRIGGER] RISKY_BET: ${bet_amount} @ {outcome_odds:.2f}")
-
-        # Les triggers suivants necessitent des appels API couteux (Polygonscan)
-        # On ne les verifie que si le montant depasse le seuil minimum du trigger LE PLUS BAS (ici 100$)
-        # pour eviter de spammer l'API pour des paris de 10$ qui ne triggeront rien de toute facon.
-        
-        min_profile_check = min(self.config['whale_wakeup']['min_amount'], self.config['fresh_wallet']['min_amount'])
-        if bet_amount < min_profile_check:
-            return triggers
-
-        # Recuperation des infos wallet (avec cache)
-        last_activity = self.get_wallet_last_activity(wallet)
-        tx_count = self.get_wallet_tx_count(wallet)
-
-        # 2. TRIGGER B: WHALE WAKEUP (Le Revenant)
-        cfg_whale = self.config['whale_wakeup']
-        if cfg_whale['enabled'] and bet_amount >= cfg_whale['min_amount']:
-            if last_activity:
-                days_since = (datetime.now() - last_activity).days
-                if days_since >= cfg_whale['dormant_days']:
-                    triggers.append({
-                        'type': 'WHALE_WAKEUP',
-                        'label': 'Réveil Dormant',
-                        'details': f"Inactif {days_since}j"
-                    })
-                    logger.debug(f"  [TRIGGER] WHALE_WAKEUP: Inactif {days_since}j")
-
-        # 3. TRIGGER C: FRESH WALLET (Le Nouveau)
-        cfg_fresh = self.config['fresh_wallet']
-        if cfg_fresh['enabled'] and bet_amount >= cfg_fresh['min_amount']:
-            # Note: tx_count peut etre 999 si API key manquante -> Le trigger ne s'active pas (safe)
-            if tx_count <= cfg_fresh['max_tx']:
-                triggers.append({
-                    'type': 'FRESH_WALLET',
-                    'label': 'Nouveau Wallet',
-                    'details': f"Seulement {tx_count} txs"
-                })
-                logger.debug(f"  [TRIGGER] FRESH_WALLET: {tx_count} txs, ${bet_amount}")
-
-        return triggers
+        results = self._build_engine().evaluate([{
+            'wallet': wallet,
+            'amount': bet_amount,
+            'odds': outcome_odds,
+            'liquidity': liquidity
+        }])
+        return results[0]['triggers'] if results else []
 
     # =========================================================================
     # ALERT GENERATION
@@ -630,97 +727,134 @@ class InsiderScanner:
         if expired:
             logger.debug(f"🧹 Nettoyé {len(expired)} snapshots expirés")
 
-    def process_activity(self, activity: Dict, market: Dict) -> Optional[InsiderAlert]:
-        """Traite une activite et genere une alerte si un trigger est active"""
-        wallet = activity.get('user', '')
-        if not wallet:
-            return None
-
-        # Calculer le montant en USD
-        amount_raw = int(activity.get('amount', 0))
-        bet_amount = amount_raw / 1e6  # USDC 6 decimals
+    @staticmethod
+    def _resolve_outcome(activity: Dict, market: Dict):
+        """
+        Determine l'outcome parie et ses odds: (bet_outcome, outcome_odds).
+        Un SPLIT (collateral -> YES + NO) n'est pas directionnel: ('SPLIT', None),
+        les regles sur les odds ne s'y appliquent pas.
+        """
+        if activity.get('type') == 'SPLIT':
+            return 'SPLIT', None
 
-        # [MODIFIED] Filtre global abaisse de 100$ a 10$ pour laisser passer les "Risky Bets"
-        if bet_amount < 10.0:
-            return None
+        # Fill exact (source activity): outcome et prix d'execution connus
+        if activity.get('odds') is not None and 0 < activity['odds'] < 1:
+            return activity.get('outcome', 'YES'), float(activity['odds'])
 
-        # Infos marche
-        market_slug = market.get('slug', 'unknown')
-        market_question = market.get('question', 'Unknown Market')
-        token_id = activity.get('asset', {}).get('id', '') if isinstance(activity.get('asset'), dict) else ''
-
-        # Determiner l'outcome et les odds
-        outcome_prices = market.get('outcomePrices', [])
-        activity_type = activity.get('type', 'BUY')
+        # Gamma renvoie outcomePrices sous forme de chaine JSON
+        outcome_prices = json_list(market.get('outcomePrices'))
 
         # Parser le prix de l'activite ou utiliser les odds du marche
         price = float(activity.get('price', 0)) / 1e6 if activity.get('price') else 0.5
-        
-        # Logique de determination du pari (YES/NO et Odds)
+
+        # On scanne les positions (achats / augmentations): implicitement un "Hold/Buy".
+        # Simplification: marches binaires, l'outcome est YES.
         if outcome_prices and len(outcome_prices) >= 2:
             yes_price = float(outcome_prices[0]) if outcome_prices[0] else 0.5
-            # no_price = float(outcome_prices[1]) if outcome_prices[1] else 0.5 # Unused
-            
-            # Si le prix de l'activité est cohérent (entre 0 et 1)
-            if 0 < price < 1:
-                outcome_odds = price
-                # Si on achete a ce prix, on parie sur l'outcome correspondant.
-                # Simplification: On assume souvent que c'est du Binary.
-                # Si price correspond au YES, c'est YES.
-                # Mais ici on garde la logique existante: on déduit le side.
-                # Pour faire simple et robuste:
-                bet_outcome = "YES" # Par defaut
-                # Si c'est un "Sell", c'est l'inverse, mais ici on scanne les "Buys" (activités positives)
-                # Amélioration: le scanner regarde les positions, donc c'est implicitement un "Hold/Buy"
-            else:
-                # Fallback sur les prix actuels
-                outcome_odds = yes_price
-                bet_outcome = "YES"
+            # Si le prix de l'activité est cohérent (entre 0 et 1) on l'utilise,
+            # sinon fallback sur les prix actuels du marche
+            outcome_odds = price if 0 < price < 1 else yes_price
         else:
             outcome_odds = price if price > 0 else 0.5
-            bet_outcome = "YES"
+        return "YES", outcome_odds
+
+    @staticmethod
+    def _market_liquidity(market: Dict) -> Optional[float]:
+        """Liquidite du marche (Gamma: liquidityNum ou liquidity), None si inconnue"""
+        value = market.get('liquidityNum', market.get('liquidity'))
+        try:
+            return float(value) if value not in (None, '') else None
+        except (TypeError, ValueError):
+            return None
+
+    def _build_row(self, activity: Dict, market: Dict) -> Optional[Dict]:
+        """Features d'une activite, None si filtree (montant, dedup)"""
+        wallet = activity.get('user', '')
+        if not wallet:
+            return None
 
-        # Verifier la deduplication
+        # Calculer le montant en USD (USDC 6 decimals)
+        bet_amount = int(activity.get('amount', 0)) / 1e6
+
+        # Filtre global a 10$ pour laisser passer les "Risky Bets"
+        if bet_amount < 10.0:
+            return None
+
+        market_slug = market.get('slug', 'unknown')
         dedup_key = self._generate_dedup_key(wallet, market_slug)
         if self._is_duplicate(dedup_key):
             return None
 
-        # [MODIFIED] Detection par Triggers
-        active_triggers = self.detect_triggers(wallet, bet_amount, outcome_odds)
+        bet_outcome, outcome_odds = self._resolve_outcome(activity, market)
+        return {
+            'wallet': wallet,
+            'amount': bet_amount,
+            'odds': outcome_odds,
+            'liquidity': self._market_liquidity(market),
+            'bet_outcome': bet_outcome,
+            'dedup_key': dedup_key,
+            'activity': activity,
+            'market': market
+        }
+
+    def process_batch(self, items: List[tuple]) -> List[InsiderAlert]:
+        """
+        Score un lot d'activites [(activity, market), ...] en une passe:
+        features en colonnes, profils wallets pre-charges en parallele,
+        puis evaluation vectorisee de toutes les regles.
+        """
+        rows = []
+        for activity, market in items:
+            try:
+                row = self._build_row(activity, market)
+            except (TypeError, ValueError, AttributeError) as e:
+                # Une activite mal formee ne fait pas echouer tout le lot
+                logger.debug(f"Activite ignoree: {e}")
+                continue
+            if row:
+                rows.append(row)
+
+        engine = self._build_engine()
+        results = engine.evaluate(rows)
+        self._last_detection_stats = engine.get_stats()
+
+        # Dedup apres scoring: une alerte par (wallet, marche) dans le lot, la mieux notee.
+        # Un petit pari non declenche ne masque pas un gros pari ulterieur du meme wallet.
+        best = {}
+        for result in results:
+            key = rows[result['index']]['dedup_key']
+            if key not in best or result['score'] > best[key]['score']:
+                best[key] = result
+
+        alerts = []
+        for result in sorted(best.values(), key=lambda r: r['index']):
+            row = rows[result['index']]
+            alerts.append(self._build_alert(row, result['triggers'], result['score']))
+        return alerts
+
+    def _build_alert(self, row: Dict, active_triggers: List[Dict], suspicion_score: int) -> InsiderAlert:
+        """Construit l'alerte d'une ligne declenchee et la marque comme vue"""
+        wallet = row['wallet']
+        market = row['market']
+        activity = row['activity']
+        bet_amount = row['amount']
+        outcome_odds = row['odds']
 
-        if not active_triggers:
-            return None
+        market_slug = market.get('slug', 'unknown')
+        market_question = market.get('question', 'Unknown Market')
+        token_id = activity.get('asset', {}).get('id', '') if isinstance(activity.get('asset'), dict) else ''
 
         # On prend le trigger le plus prioritaire/important comme type principal
         primary_trigger = active_triggers[0]
-        
-        # Recuperer les stats du wallet pour enrichir
-        wallet_stats = self.get_wallet_performance(wallet)
-        
+
         # Formater les details pour l'affichage humain
         trigger_desc = ", ".join([f"{t['label']} ({t['details']})" for t in active_triggers])
-        bet_desc = f"${bet_amount:.0f} sur {bet_outcome} @ {outcome_odds:.2f}"
-
-        # Calculer le score de suspicion basé sur les triggers
-        suspicion_score = 50  # Base score
-        for trigger in active_triggers:
-            if trigger['type'] == 'FRESH_WALLET':
-                suspicion_score += 30  # Nouveau wallet = très suspect
-            elif trigger['type'] == 'WHALE_WAKEUP':
-                suspicion_score += 25  # Reveil dormant = suspect
-            elif trigger['type'] == 'RISKY_BET':
-                suspicion_score += 20  # Pari risqué = modérément suspect
-        
-        # Bonus pour gros montants
-        if bet_amount >= 1000:
-            suspicion_score += 10
-        if bet_amount >= 5000:
-            suspicion_score += 10
-            
-        # Cap à 100
-        suspicion_score = min(suspicion_score, 100)
+        if outcome_odds is None:
+            bet_desc = f"${bet_amount:.0f} en split (YES + NO)"
+            outcome_odds = 0.0
+        else:
+            bet_desc = f"${bet_amount:.0f} sur {row['bet_outcome']} @ {outcome_odds:.2f}"
 
-        # Generer l'alerte
         alert = InsiderAlert(
             id=f"alert_{int(datetime.now().timestamp() * 1000)}_{wallet[:8]}",
             wallet_address=wallet,
@@ -730,34 +864,127 @@ class InsiderScanner:
             market_url=f"https://polymarket.com/event/{market_slug}",
             token_id=token_id,
             bet_amount=bet_amount,
-            bet_outcome=bet_outcome,
+            bet_outcome=row['bet_outcome'],
             outcome_odds=outcome_odds,
             trigger_details=trigger_desc,
             bet_details=bet_desc,
-            wallet_stats=wallet_stats,
+            wallet_stats={},  # Rempli par l'enrichissement differe
             timestamp=datetime.now().isoformat(),
-            dedup_key=dedup_key,
-            suspicion_score=suspicion_score,
-            nickname=self.get_polymarket_username(wallet) or ""
+            dedup_key=row['dedup_key'],
+            suspicion_score=suspicion_score
         )
 
         # Marquer comme vu
-        self.recent_alerts[dedup_key] = datetime.now()
+        self.recent_alerts[row['dedup_key']] = datetime.now()
 
         return alert
 
+    def process_activity(self, activity: Dict, market: Dict) -> Optional[InsiderAlert]:
+        """Traite une activite isolee et genere une alerte si un trigger est active"""
+        alerts = self.process_batch([(activity, market)])
+        return alerts[0] if alerts else None
+
+    def _publish_alert(self, alert: InsiderAlert):
+        """Diffuse une alerte: WebSocket, DB et callbacks"""
+        # Emettre via WebSocket (broadcast à tous les clients connectés)
+        if self.socketio:
+            try:
+                # 🔧 FIX: Utiliser emit avec namespace pour broadcast depuis thread
+                self.socketio.emit('insider_alert', alert.to_dict(), namespace='/')
+            except Exception as ws_err:
+                logger.warning(f"WebSocket emit error: {ws_err}")
+
+        # Sauvegarder en DB
+        if self.db_manager:
+            try:
+                print(f"💾 Saving alert for {alert.wallet_address} to DB...")
+                self.db_manager.save_insider_alert(alert.to_dict())
+                print("✅ Alert saved successfully")
+            except Exception as e:
+                print(f"❌ Error saving alert to DB: {e}")
+                logger.error(f"Erreur sauvegarde alerte: {e}")
+        else:
+            print("❌ DB Manager is None in scanner!")
+
+        # Notifier les callbacks
+        for callback in self.callbacks:
+            try:
+                callback(alert)
+            except Exception as e:
+                logger.error(f"Callback error: {e}")
+
+        logger.info(f"🚨 ALERT [{alert.alert_type}] {alert.wallet_address[:8]}... | {alert.bet_details} | {alert.trigger_details}")
+
+        self._schedule_enrichment(alert)
+
+    # =========================================================================
+    # ENRICHISSEMENT DIFFERE
+    # =========================================================================
+
+    def _get_enrichment_pool(self) -> ThreadPoolExecutor:
+        with self._enrichment_lock:
+            if self._enrichment_pool is None:
+                self._enrichment_pool = ThreadPoolExecutor(
+                    max_workers=max(1, int(self.config.get('enrichment_workers', 4))),
+                    thread_name_prefix="InsiderEnrich"
+                )
+            return self._enrichment_pool
+
+    def _schedule_enrichment(self, alert: InsiderAlert):
+        """Planifie l'enrichissement d'une alerte deja emise et sauvegardee"""
+        with self._enrichment_lock:
+            self.enrichment_pending += 1
+        try:
+            self._get_enrichment_pool().submit(self._enrich_alert, alert)
+        except RuntimeError as e:
+            # Pool arrete (shutdown): l'alerte reste avec ses champs de base
+            with self._enrichment_lock:
+                self.enrichment_pending -= 1
+                self.enrichment_failed += 1
+            logger.warning(f"⚠️ Enrichissement impossible pour {alert.id}: {e}")
+
+    def _enrich_alert(self, alert: InsiderAlert):
+        """Worker: stats + pseudo du wallet, mise a jour DB puis push 'insider_alert_enriched'"""
+        try:
+            wallet_stats, nickname = self.enrich_wallet(alert.wallet_address)
+            alert.wallet_stats = wallet_stats
+            alert.nickname = nickname or alert.nickname
+            alert.enriched = True
+
+            if self.db_manager:
+                self.db_manager.update_insider_alert_enrichment(alert.id, wallet_stats, nickname)
+
+            if self.socketio:
+                self.socketio.emit('insider_alert_enriched', {
+                    'id': alert.id,
+                    'wallet_address': alert.wallet_address,
+                    'wallet_stats': alert.wallet_stats,
+                    'nickname': alert.nickname
+                }, namespace='/')
+
+            with self._enrichment_lock:
+                self.enrichment_done += 1
+        except Exception as e:
+            with self._enrichment_lock:
+                self.enrichment_failed += 1
+            logger.error(f"❌ Erreur enrichissement alerte {alert.id}: {e}")
+        finally:
+            with self._enrichment_lock:
+                self.enrichment_pending -= 1
+
     # =========================================================================
     # MAIN SCAN LOOP
     # =========================================================================
 
     def scan_all_markets(self) -> List[InsiderAlert]:
-        """Scanne tous les marches configures pour activite suspecte"""
-        all_alerts = []
+        """Scanne tous les marches configures puis score toutes les activites en un seul lot"""
         self._cleanup_dedup_cache()
         self._cleanup_old_snapshots()  # Nettoyage mémoire
 
         categories = self.config.get('categories', self.DEFAULT_CATEGORIES)
-        total_activities = 0
+        use_activity = self.config.get('detection_source', 'activity') == 'activity'
+        batch = []  # [(activity, market)]
+        watched = {}  # {condition_id: market}
         total_markets_with_activity = 0
 
         for category in categories:
@@ -770,59 +997,50 @@ class InsiderScanner:
                     if not condition_id:
                         continue
 
-                    # Recuperer l'activite recente sur ce marche
-                    activities = self.get_recent_market_activity(condition_id, limit=50)
-                    
-                    if activities:
-                        total_markets_with_activity += 1
-                        total_activities += len(activities)
-
-                    for activity in activities:
-                        # Si on utilise 'positions' au lieu de 'activities', le type est implicite ou dans un autre champ
-                        # Pour le scanner insider, on s'interesse aux entrees
-                        alert = self.process_activity(activity, market)
-                        if alert:
-                            all_alerts.append(alert)
-                            self.alerts_generated += 1
-
-                            # Emettre via WebSocket (broadcast à tous les clients connectés)
-                            if self.socketio:
-                                try:
-                                    # 🔧 FIX: Utiliser emit avec namespace pour broadcast depuis thread
-                                    self.socketio.emit('insider_alert', alert.to_dict(), namespace='/')
-                                except Exception as ws_err:
-                                    logger.warning(f"WebSocket emit error: {ws_err}")
-
-                            # Sauvegarder en DB
-                            if self.db_manager:
-                                try:
-                                    print(f"💾 Saving alert for {alert.wallet_address} to DB...")
-                                    self.db_manager.save_insider_alert(alert.to_dict())
-                                    print("✅ Alert saved successfully")
-                                except Exception as e:
-                                    print(f"❌ Error saving alert to DB: {e}")
-                                    logger.error(f"Erreur sauvegarde alerte: {e}")
-                            else:
-                                print("❌ DB Manager is None in scanner!")
-
-                            # Notifier les callbacks
-                            for callback in self.callbacks:
-                                try:
-                                    callback(alert)
-                                except Exception as e:
-                                    logger.error(f"Callback error: {e}")
-
-                            logger.info(f"🚨 ALERT [{alert.alert_type}] {alert.wallet_address[:8]}... | {alert.bet_details} | {alert.trigger_details}")
-
-                    # Petit delai pour eviter rate limiting
-                    time.sleep(0.1)
+                    # Requetes groupees pour tous les marches apres la boucle
+                    watched[condition_id] = market
 
             except Exception as e:
                 logger.error(f"❌ Erreur scan categorie {category}: {e}")
 
+        if not use_activity and watched:
+            # Source snapshot: top holders de tous les marches en documents GraphQL aliases
+            holders = self.fetch_market_holders(list(watched), limit=50)
+            for condition_id, market in watched.items():
+                activities = self.get_recent_market_activity(
+                    condition_id, limit=50, current_holders=holders.get(condition_id)
+                )
+                if activities:
+                    total_markets_with_activity += 1
+                    batch.extend((activity, market) for activity in activities)
+
+        if use_activity and watched:
+            try:
+                batch = self.activity_source.poll(list(watched.values()))
+                total_markets_with_activity = len({m.get('conditionId') for _, m in batch})
+            except Exception as e:
+                logger.error(f"❌ Erreur source activity: {e}")
+
+        all_alerts = []
+        if batch:
+            try:
+                all_alerts = self.process_batch(batch)
+            except Exception as e:
+                logger.error(f"❌ Erreur scoring du lot: {e}")
+
+        for alert in all_alerts:
+            self.alerts_generated += 1
+            self._publish_alert(alert)
+
         # Log résumé du scan
-        if total_activities > 0:
-            logger.info(f"📊 Scan terminé: {total_activities} activités sur {total_markets_with_activity} marchés, {len(all_alerts)} alertes générées")
+        if batch:
+            stats = self._last_detection_stats
+            logger.info(
+                f"📊 Scan terminé: {len(batch)} activités sur {total_markets_with_activity} marchés, "
+                f"{len(all_alerts)} alertes générées "
+                f"(profils: {stats.get('last_profiles_fetched', 0)} en {stats.get('last_prefetch_ms', 0)}ms, "
+                f"scoring: {stats.get('last_scoring_ms', 0)}ms)"
+            )
         else:
             logger.debug(f"📊 Scan terminé: Aucune nouvelle activité détectée (snapshots en cours d'initialisation)")
 
@@ -879,10 +1097,8 @@ class InsiderScanner:
     def get_polymarket_username(self, address: str) -> Optional[str]:
         """Récupère le pseudonyme/name Polymarket pour une adresse donnée"""
         try:
-            url = f"https://gamma-api.polymarket.com/public-profile?address={address.lower()}"
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
+            data = self.get_wallet_public_profile(address)
+            if data:
                 # On priorise 'name' (nickname choisi par l'user) puis 'pseudonym'
                 return data.get('name') or data.get('pseudonym')
         except Exception as e:
@@ -900,9 +1116,8 @@ class InsiderScanner:
         try:
             # On cherche par token_id (assetId sur Gamma)
             # Normalement l'API Gamma permet de chercher un marché par un de ses tokens
-            resp = requests.get(f"{self.GAMMA_API}/markets/{token_id}", timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
+            data = coalesced_get_json('gamma', f"{self.GAMMA_API}/markets/{token_id}", timeout=5)
+            if data:
                 market_info = {
                     'question': data.get('question', 'Marche inconnu'),
                     'slug': data.get('slug', ''),
@@ -917,34 +1132,8 @@ class InsiderScanner:
 
     def get_wallet_positions(self, address: str) -> List[Dict]:
         """Recupere les positions d'un wallet via Goldsky (Schema 0.0.7)"""
-        # Note: balance_gt attend souvent une chaine pour les BigInt dans Goldsky
-        query = """
-        {
-          userBalances(first: 100, where: {user: "%s", balance_gt: "0"}) {
-            id
-            balance
-            asset {
-              id
-              condition {
-                id
-              }
-            }
-          }
-        }
-        """ % address.lower()
-
         try:
-            # Rate limiter
-            rate_limiter = get_goldsky_rate_limiter()
-            rate_limiter.wait_for_slot(Priority.INSIDER)
-
-            resp = requests.post(self.GOLDSKY_POSITIONS, json={'query': query}, timeout=10)
-            if resp.status_code == 200:
-                rate_limiter.report_success()
-                data = resp.json()
-                return data.get('data', {}).get('userBalances', [])
-            elif resp.status_code == 429:
-                rate_limiter.report_rate_limit()
+            return get_goldsky_client().get_user_balances([address], timeout=10).get(address.lower()) or []
         except Exception as e:
             logger.debug(f"Error getting wallet positions: {e}")
         return []
@@ -1094,7 +1283,15 @@ class InsiderScanner:
             'enabled_categories': self.config.get('categories', []),
             'alert_threshold': self.config.get('alert_threshold', 60),
             'scan_interval': self.scan_interval,
-            'scoring_preset': self.config.get('scoring_preset', 'balanced')
+            'scoring_preset': self.config.get('scoring_preset', 'balanced'),
+            'detection': self._last_detection_stats,
+            'detection_source': self.config.get('detection_source', 'activity'),
+            'activity_source': self.activity_source.get_stats(),
+            'enrichment': {
+                'pending': self.enrichment_pending,
+                'done': self.enrichment_done,
+                'failed': self.enrichment_failed
+            }
         }
 
 
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 """
-Script de migration de la table bot_positions
-Migre de l'ancien schéma vers le nouveau schéma avec source_wallet, sl_percent, tp_percent
+Script de migration de la base
+- bot_positions: ancien schéma -> source_wallet, sl_percent, tp_percent
+- Timestamps ISO TEXT -> colonnes epoch-ms + index keyset (--epoch-ms)
+- Backfill du rollup PnL journalier (--backfill-pnl)
 """
 import sqlite3
 from datetime import datetime
+from typing import Optional
 
 def migrate_bot_positions(db_path='bot_data.db'):
     """Migre la table bot_positions vers le nouveau schéma"""
@@ -135,5 +138,138 @@ def migrate_bot_positions(db_path='bot_data.db'):
     finally:
         conn.close()
 
+# ============ TIMESTAMPS EPOCH-MS ============
+
+# Colonnes de tri keyset: jamais NULL (une ligne à NULL sortirait de la pagination),
+# 0 quand le timestamp ISO est absent ou illisible
+KEYSET_EPOCH_COLUMNS = {('polymarket_trades', 'ts_ms'), ('insider_alerts', 'ts_ms'), ('hft_trades', 'signal_ts_ms')}
+
+# (table, colonne epoch-ms, colonne ISO source)
+EPOCH_COLUMNS = [
+    ('polymarket_trades', 'ts_ms', 'timestamp'),
+    ('insider_alerts', 'ts_ms', 'timestamp'),
+    ('hft_trades', 'signal_ts_ms', 'signal_timestamp'),
+    ('bot_positions', 'opened_at_ms', 'opened_at'),
+    ('bot_positions', 'closed_at_ms', 'closed_at'),
+]
+
+# Index keyset pour les vues liste: tri (epoch-ms, id) et filtres usuels servis par l'index,
+# sans tri temporaire. Non couvrants: les colonnes projetées sont lues dans la table
+# pour les seules lignes de la page (LIMIT).
+EPOCH_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_poly_trades_keyset ON polymarket_trades(ts_ms DESC, order_id DESC, status, pnl)',
+    'CREATE INDEX IF NOT EXISTS idx_insider_alerts_keyset ON insider_alerts(ts_ms DESC, id DESC, suspicion_score)',
+    'CREATE INDEX IF NOT EXISTS idx_insider_alerts_wallet_ts ON insider_alerts(wallet_address, ts_ms DESC, suspicion_score)',
+    'CREATE INDEX IF NOT EXISTS idx_hft_trades_keyset ON hft_trades(signal_ts_ms DESC, id DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_hft_trades_wallet_ts ON hft_trades(source_wallet, signal_ts_ms DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_positions_status_opened_ms ON bot_positions(status, opened_at_ms DESC)',
+]
+
+# Index remplacés par les index keyset ci-dessus
+SUPERSEDED_INDEXES = ['idx_poly_trades_ts_ms', 'idx_insider_alerts_ts_ms', 'idx_hft_trades_ts_ms']
+
+# Conversion ISO -> epoch ms côté SQL. Les ISO sans fuseau sont écrits en heure locale
+# (datetime.now().isoformat()): 'utc' les convertit, et est sans effet sur un ISO avec fuseau
+EPOCH_MS_SQL = "CAST(ROUND((julianday({col}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def iso_to_epoch_ms(value) -> Optional[int]:
+    """
+    Convertit un timestamp ISO en epoch ms (None si invalide). Même convention que EPOCH_MS_SQL:
+    un ISO sans fuseau est en heure locale, comme les epochs time.time() du timeseries_store.
+    """
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.astimezone()
+    return int(round(dt.timestamp() * 1000))
+
+
+def apply_epoch_migration(cursor) -> int:
+    """
+    Ajoute les colonnes epoch-ms manquantes, les remplit depuis les colonnes ISO
+    et crée les index keyset. Idempotent (appelé à chaque démarrage par DBManager).
+
+    Returns:
+        Nombre de colonnes ajoutées
+    """
+    added = 0
+    for table, col, source in EPOCH_COLUMNS:
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [c[1] for c in cursor.fetchall()]
+        if not columns:
+            continue
+
+        if col not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} INTEGER")
+            added += 1
+
+        # Backfill des lignes encore à NULL (colonne ajoutée, ou écrite par une
+        # ancienne version); l'index keyset sert le filtre IS NULL
+        if (table, col) in KEYSET_EPOCH_COLUMNS:
+            cursor.execute(
+                f"UPDATE {table} SET {col} = COALESCE({EPOCH_MS_SQL.format(col=source)}, 0) WHERE {col} IS NULL"
+            )
+        else:
+            cursor.execute(
+                f"UPDATE {table} SET {col} = {EPOCH_MS_SQL.format(col=source)} "
+                f"WHERE {col} IS NULL AND {source} IS NOT NULL"
+            )
+        if cursor.rowcount > 0:
+            print(f"✅ {table}.{col}: {cursor.rowcount} lignes migrées")
+
+    for name in SUPERSEDED_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    for ddl in EPOCH_INDEXES:
+        table = ddl.split(' ON ')[1].split('(')[0]
+        if table in tables:
+            cursor.execute(ddl)
+
+    return added
+
+
+def migrate_epoch_timestamps(db_path='bot_data.db'):
+    """Migre les timestamps ISO TEXT vers des colonnes epoch-ms indexées"""
+    print("🔄 Migration des timestamps vers epoch-ms...")
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        added = apply_epoch_migration(cursor)
+        conn.commit()
+        cursor.execute("ANALYZE")
+        print(f"✅ Migration epoch-ms terminée ({added} colonnes ajoutées)")
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def backfill_daily_pnl_rollup(db_path='bot_data.db'):
+    """Reconstruit la table daily_pnl_rollup depuis l'historique des trades et positions"""
+    from db_manager import DBManager
+
+    print("🔄 Backfill du rollup PnL journalier...")
+    db = DBManager(db_path)
+    try:
+        db.rebuild_daily_pnl_rollup()
+    finally:
+        db.conn.close()
+
 if __name__ == '__main__':
-    migrate_bot_positions()
+    import sys
+
+    if '--backfill-pnl' in sys.argv:
+        backfill_daily_pnl_rollup()
+    elif '--epoch-ms' in sys.argv:
+        migrate_epoch_timestamps()
+    else:
+        migrate_bot_positions()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Multiprocess Runner - Déploiement multi-process du bot
+
+En mode classique (`python bot.py`), le web, le module HFT, l'Insider Scanner
+et le copy-trading partagent un seul interpréteur: le GIL sérialise leurs
+boucles de polling et de scoring, et un scan Insider lourd retarde la
+détection HFT.
+
+Ce superviseur lance chaque composant dans son propre processus, épinglé sur
+un cœur CPU quand le système le permet:
+
+    web        Flask + Socket.IO (bot.py en mode BOT_PROCESS_MODE=web)
+    hft        HFTScanner (découverte marchés, monitoring, exécution)
+    insider    InsiderScanner (scan, scoring, enrichissement)
+    copytrade  PolymarketTracker + PolymarketExecutor + Risk Engine
+
+Les processus communiquent via le broker local (process_broker.py): événements
+Socket.IO relayés au web, stats et commandes de contrôle. La base SQLite (WAL)
+est partagée directement. Un worker mort est relancé avec backoff.
+
+Usage:
+    python multiprocess_runner.py      (ou BOT_MULTIPROCESS=1 ./start_bot.sh)
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import multiprocessing as mp
+from pathlib import Path
+from typing import Dict, Optional
+
+from process_broker import ProcessBroker, BrokerEmitter, connect_from_env
+
+logger = logging.getLogger("MultiprocessRunner")
+
+ROLES = ['web', 'hft', 'insider', 'copytrade']
+
+MAX_RESTART_DELAY = 60
+
+
+def load_env_file():
+    """Charge .env (même format que bot.py) avant de lancer les workers"""
+    env_file = Path('.env')
+    if env_file.exists():
+        try:
+            with open(env_file) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#') and '=' in line:
+                        key, value = line.split('=', 1)
+                        os.environ[key.strip()] = value.strip().strip('"\'')
+        except Exception as e:
+            print(f"⚠️ Erreur lecture .env: {e}")
+
+
+# =========================================================================
+# WORKERS
+# =========================================================================
+
+def _forward_dirty(client):
+    """mark_dirty() d'un worker -> stats à jour puis signal au web"""
+    from state_publisher import set_dirty_forwarder
+
+    def forward(name: str):
+        client.publish_stats()
+        client.publish('state_dirty', name)
+
+    set_dirty_forwarder(forward)
+
+
+def _run_hft(client):
+    from db_manager import db_manager
+    from hft_module.hft_scanner import HFTScanner
+    try:
+        from polymarket_client import polymarket_client
+    except ImportError:
+        polymarket_client = None
+
+    scanner = HFTScanner(socketio=BrokerEmitter(client), db_manager=db_manager,
+                         polymarket_client=polymarket_client)
+    client.serve({'hft': scanner})
+    if scanner.config.get('auto_start', False):
+        print("🔄 Redémarrage automatique du HFT Scanner...")
+        scanner.start()
+
+
+def _run_insider(client):
+    from db_manager import db_manager
+    from insider_scanner import insider_scanner
+
+    insider_scanner.socketio = BrokerEmitter(client)
+    insider_scanner.db_manager = db_manager
+    client.serve({'insider': insider_scanner})
+    if insider_scanner.config.get('auto_start', False):
+        print("🔄 Redémarrage automatique du Insider Scanner...")
+        insider_scanner.start_scanning()
+
+
+def _run_copytrade(client):
+    from bot_logic import BotBackend
+    from polymarket_tracking import PolymarketTracker
+    from polymarket_executor import PolymarketExecutor
+    from risk_engine import init_risk_engine
+
+    backend = BotBackend()
+    emitter = BrokerEmitter(client)
+    tracker = PolymarketTracker(socketio=emitter)
+    executor = PolymarketExecutor(backend=backend, socketio=emitter)
+    tracker.add_callback(executor.on_signal_detected)
+
+    for w in backend.data.get('polymarket', {}).get('tracked_wallets', []):
+        tracker.add_wallet(
+            address=w.get('address'),
+            name=w.get('name', 'Wallet'),
+            capital=w.get('capital_allocated', 0),
+            percent=w.get('percent_per_trade', 0)
+        )
+
+    # config.json est écrit par le web: recharger à chaque sauvegarde
+    def on_config_changed(_):
+        backend.load_config()
+        backend.is_running = backend.data.get('is_running', False)
+
+    client.subscribe('config_changed', on_config_changed)
+    client.serve({'tracker': tracker})
+
+    tracker.start_monitoring(interval=backend.data.get('polymarket', {}).get('polling_interval', 5))
+    try:
+        from polymarket_client import polymarket_client
+        init_risk_engine(executor, polymarket_client).start()
+    except ImportError as e:
+        print(f"⚠️ CLOB Polymarket non disponible, Risk Engine désactivé: {e}")
+
+
+ROLE_RUNNERS = {
+    'hft': _run_hft,
+    'insider': _run_insider,
+    'copytrade': _run_copytrade,
+}
+
+
+def worker_main(role: str, core: Optional[int]):
+    """Point d'entrée d'un processus worker"""
+    if core is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError as e:
+            print(f"⚠️ Affinité CPU impossible pour {role}: {e}")
+
+    if role == 'web':
+        os.environ['BOT_PROCESS_MODE'] = 'web'
+        import bot
+        bot.main()
+        return
+
+    from logging_config import setup_logging
+    # Un seul processus (web) écrit les fichiers de log tournants
+    setup_logging(level=os.getenv('LOG_LEVEL', 'INFO'), log_to_file=False)
+
+    client = connect_from_env(role)
+    if client is None:
+        print(f"❌ Worker {role}: broker introuvable (lancer via multiprocess_runner.py)")
+        sys.exit(1)
+    _forward_dirty(client)
+    ROLE_RUNNERS[role](client)
+    print(f"✅ Worker {role} démarré (pid {os.getpid()})")
+
+    # Le broker vit dans le superviseur: s'il tombe, on sort pour être relancé
+    while client.connected:
+        time.sleep(1)
+    sys.exit(1)
+
+
+# =========================================================================
+# SUPERVISEUR
+# =========================================================================
+
+class Supervisor:
+    """Lance le broker et les workers, relance ceux qui meurent"""
+
+    def __init__(self, roles=None):
+        self.roles = roles or ROLES
+        self.ctx = mp.get_context('spawn')
+        self.broker = ProcessBroker()
+        self.processes: Dict[str, mp.Process] = {}
+        self.restarts: Dict[str, int] = {role: 0 for role in self.roles}
+        self.next_start: Dict[str, float] = {}
+        self._stopping = False
+
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        # Un cœur par rôle (round-robin si moins de cœurs que de rôles)
+        self.cores = {
+            role: cores[i % len(cores)] if len(cores) > 1 else None
+            for i, role in enumerate(self.roles)
+        }
+
+    def _spawn(self, role: str):
+        proc = self.ctx.Process(target=worker_main, args=(role, self.cores[role]), name=f"bot-{role}")
+        proc.start()
+        self.processes[role] = proc
+        core = self.cores[role]
+        print(f"🚀 Worker {role} lancé (pid {proc.pid}{f', cœur {core}' if core is not None else ''})")
+
+    def start(self):
+        self.broker.start()
+        os.environ.update(self.broker.env())  # Hérité par les workers au spawn
+        for role in self.roles:
+            self._spawn(role)
+
+    def watch(self):
+        """Boucle de supervision (bloquante)"""
+        while not self._stopping:
+            now = time.time()
+            for role, proc in list(self.processes.items()):
+                if proc.is_alive():
+                    continue
+                if role not in self.next_start:
+                    self.restarts[role] += 1
+                    delay = min(MAX_RESTART_DELAY, 2 ** min(self.restarts[role], 6))
+                    self.next_start[role] = now + delay
+                    print(f"⚠️ Worker {role} arrêté (code {proc.exitcode}), relance dans {delay}s")
+                elif now >= self.next_start[role]:
+                    del self.next_start[role]
+                    self._spawn(role)
+            time.sleep(1)
+
+    def stop(self, *args):
+        if self._stopping:
+            return
+        self._stopping = True
+        print("\n🛑 Arrêt des workers...")
+        for proc in self.processes.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self.processes.values():
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.kill()
+        self.broker.stop()
+
+    def get_stats(self) -> Dict:
+        return {
+            'workers': {
+                role: {
+                    'pid': proc.pid,
+                    'alive': proc.is_alive(),
+                    'core': self.cores[role],
+                    'restarts': self.restarts[role]
+                }
+                for role, proc in self.processes.items()
+            },
+            'broker': self.broker.get_stats()
+        }
+
+
+def main():
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'),
+                        format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+    load_env_file()
+
+    supervisor = Supervisor()
+    signal.signal(signal.SIGINT, supervisor.stop)
+    signal.signal(signal.SIGTERM, supervisor.stop)
+
+    print("=" * 60)
+    print("🎯 BOT DU MILLIONNAIRE - MODE MULTI-PROCESS")
+    print("=" * 60)
+    supervisor.start()
+    try:
+        supervisor.watch()
+    finally:
+        supervisor.stop()
+
+
+if __name__ == '__main__':
+    main()
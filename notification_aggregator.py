@@ -2,19 +2,20 @@
 NotificationAggregator - Gestion fluide des notifications de trades
 
 Fonctionnalites:
-- Deduplication par tx_hash (evite doublons WebSocket/polling)
-- Distribution fluide (notifications espacees dans le temps)
-- Cooldown configurable entre notifications
-- Priority queue pour trades urgents (gros montants)
+- Deduplication par tx_hash (evite doublons WebSocket/polling), expiration O(1) amortie
+- Distribution fluide par frames: un emit `trade_signal_batch` par intervalle
+- Queue bornee avec back-pressure (coalesce / drop_oldest / drop_newest)
+- Priority pour trades urgents (gros montants)
+- Metriques de retard (lag) de la queue par rapport au temps reel
 """
 
 import threading
 import time
 import logging
-from queue import Queue, Empty
-from typing import Dict, List, Optional, Callable, Set
+from collections import deque
+from typing import Deque, Dict, List, Optional, Callable, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +33,13 @@ class TradeNotification:
     timestamp: datetime
     source: str  # 'websocket' ou 'polling'
     priority: int = 0  # 0=normal, 1=high (gros montant)
+    count: int = 1  # > 1 si plusieurs trades ont ete coalesces
+    enqueued_at: float = field(default_factory=time.time)
+
+    @property
+    def coalesce_key(self) -> Tuple[str, str, str, str]:
+        """Cle de regroupement: meme trader, meme marche, meme sens, meme issue"""
+        return (self.wallet_address, self.market_question, self.action, self.outcome)
 
     def to_dict(self) -> Dict:
         """Convertit en dictionnaire pour emission WebSocket."""
@@ -45,7 +53,8 @@ class TradeNotification:
             'outcome': self.outcome,
             'timestamp': self.timestamp.isoformat() if isinstance(self.timestamp, datetime) else self.timestamp,
             'source': self.source,
-            'priority': 'high' if self.priority == 1 else 'normal'
+            'priority': 'high' if self.priority == 1 else 'normal',
+            'count': self.count
         }
 
 
@@ -55,15 +64,20 @@ class NotificationAggregator:
 
     Logique FLUIDE:
     - Trades haute priorite (>= seuil) -> IMMEDIATS
-    - Autres trades -> mis en queue et distribues avec delai entre chaque
+    - Autres trades -> mis en queue bornee, emis par lots toutes les X ms
     - Deduplication par tx_hash (evite doublons WebSocket + polling)
-    - Distribution fluide: 1 notification toutes les X ms
+    - Queue pleine -> politique de debordement (coalesce par defaut)
     """
 
+    OVERFLOW_POLICIES = ('coalesce', 'drop_oldest', 'drop_newest')
+
     def __init__(self,
                  emit_callback: Callable,
                  emit_interval_ms: int = 500,
-                 high_value_threshold: float = 1000):
+                 high_value_threshold: float = 1000,
+                 max_queue_size: int = 1000,
+                 max_batch_size: int = 50,
+                 overflow_policy: str = 'coalesce'):
         """
         Initialise l'aggregateur.
 
@@ -71,14 +85,29 @@ class NotificationAggregator:
             emit_callback: Fonction pour emettre les notifications (socketio.emit style)
             emit_interval_ms: Intervalle entre emissions en ms (defaut: 500ms)
             high_value_threshold: Seuil pour trades prioritaires (defaut: $1000)
+            max_queue_size: Taille max de la queue (back-pressure au-dela)
+            max_batch_size: Nombre max de trades par emit `trade_signal_batch`
+            overflow_policy: 'coalesce' (fusionne trader/marche/sens, sinon drop_oldest),
+                             'drop_oldest' ou 'drop_newest'
         """
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy invalide: {overflow_policy}")
+
         self.emit_callback = emit_callback
         self.emit_interval_ms = emit_interval_ms
         self.high_value_threshold = high_value_threshold
-
-        # Queue de notifications a distribuer
-        self._notification_queue: Queue = Queue()
-        self._seen_hashes: Dict[str, float] = {}  # tx_hash -> timestamp
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.overflow_policy = overflow_policy
+
+        # Queue bornee de notifications a distribuer (+ index pour coalescing O(1))
+        self._queue: Deque[TradeNotification] = deque()
+        self._pending_by_key: Dict[Tuple[str, str, str], TradeNotification] = {}
+        self._cond = threading.Condition()
+
+        # Deduplication: dict pour le lookup, deque ordonnee par expiration pour le nettoyage
+        self._seen_hashes: Dict[str, float] = {}  # tx_hash -> expiration
+        self._seen_expiry: Deque[Tuple[float, str]] = deque()
         self._lock = threading.Lock()
         self._dedup_ttl = 3600  # 1 heure de retention pour deduplication
 
@@ -92,33 +121,37 @@ class NotificationAggregator:
             'duplicates_filtered': 0,
             'immediate_sent': 0,
             'queued_sent': 0,
-            'high_priority_sent': 0
+            'high_priority_sent': 0,
+            'batches_sent': 0,
+            'coalesced': 0,
+            'dropped': 0
         }
+        # Metriques de retard (ms)
+        self._lag = {'queue_lag_ms': 0.0, 'event_lag_ms': 0.0, 'max_queue_lag_ms': 0.0, 'avg_queue_lag_ms': 0.0}
 
         # Demarrer le worker de distribution
         self._start_worker()
 
-        logger.info(f"NotificationAggregator initialise: emit_interval={emit_interval_ms}ms, high_value_threshold=${high_value_threshold}")
+        logger.info(f"NotificationAggregator initialise: emit_interval={emit_interval_ms}ms, high_value_threshold=${high_value_threshold}, "
+                    f"max_queue={max_queue_size}, overflow={overflow_policy}")
 
     def _start_worker(self):
-        """Demarre le worker thread pour distribution fluide."""
+        """Demarre le worker thread pour distribution fluide (un lot par intervalle)."""
         def worker_loop():
             logger.info("Worker de distribution fluide demarre")
             while self._running:
                 try:
-                    # Attendre une notification (timeout pour permettre l'arret)
-                    trade = self._notification_queue.get(timeout=1.0)
-
-                    # Emettre la notification
-                    self._emit_single(trade)
-                    self.stats['queued_sent'] += 1
+                    with self._cond:
+                        # Attendre une notification (timeout pour permettre l'arret)
+                        if not self._queue:
+                            self._cond.wait(timeout=1.0)
+                        batch = self._take_batch()
 
-                    # Attendre avant la prochaine emission (fluidite)
-                    time.sleep(self.emit_interval_ms / 1000)
+                    if batch:
+                        self._emit_batch(batch)
+                        # Attendre avant la prochaine frame (fluidite)
+                        time.sleep(self.emit_interval_ms / 1000)
 
-                except Empty:
-                    # Pas de notification en attente, continuer
-                    continue
                 except Exception as e:
                     logger.error(f"Erreur worker distribution: {e}")
 
@@ -135,7 +168,7 @@ class NotificationAggregator:
             trade: Notification de trade a traiter
 
         Returns:
-            True si accepte et programme pour emission, False si doublon
+            True si accepte (emis, en queue ou coalesce), False si doublon ou rejete
         """
         with self._lock:
             self.stats['total_received'] += 1
@@ -148,23 +181,62 @@ class NotificationAggregator:
 
             self._mark_seen(trade.tx_hash)
 
-            # Determiner la priorite (gros montant = haute priorite)
-            if trade.amount >= self.high_value_threshold:
-                trade.priority = 1
-
-            # Trade haute priorite = emission immediate (bypass la queue)
-            if trade.priority == 1:
-                logger.info(f"Trade haute priorite (${trade.amount:.0f}): emission immediate")
-                self.stats['high_priority_sent'] += 1
-                self._emit_single(trade)
-                return True
-
-            # Ajouter a la queue pour distribution fluide
-            self._notification_queue.put(trade)
-            queue_size = self._notification_queue.qsize()
-            logger.debug(f"Trade ajoute a la queue (taille: {queue_size})")
+        # Determiner la priorite (gros montant = haute priorite)
+        if trade.amount >= self.high_value_threshold:
+            trade.priority = 1
+
+        # Trade haute priorite = emission immediate (bypass la queue)
+        if trade.priority == 1:
+            logger.info(f"Trade haute priorite (${trade.amount:.0f}): emission immediate")
+            self.stats['high_priority_sent'] += 1
+            self._emit_single(trade)
+            return True
+
+        # Ajouter a la queue bornee pour distribution fluide
+        return self._enqueue(trade)
+
+    def _enqueue(self, trade: TradeNotification) -> bool:
+        """Ajoute a la queue en appliquant la politique de debordement."""
+        trade.enqueued_at = time.time()
+        key = trade.coalesce_key
+
+        with self._cond:
+            if len(self._queue) >= self.max_queue_size:
+                if self.overflow_policy == 'coalesce' and key in self._pending_by_key:
+                    pending = self._pending_by_key[key]
+                    pending.amount += trade.amount
+                    pending.count += trade.count
+                    pending.timestamp = trade.timestamp
+                    self.stats['coalesced'] += 1
+                    return True
+                if self.overflow_policy == 'drop_newest':
+                    self.stats['dropped'] += 1
+                    return False
+                # drop_oldest (ou coalesce sans cle correspondante)
+                self._forget(self._queue.popleft())
+                self.stats['dropped'] += 1
+
+            self._queue.append(trade)
+            self._pending_by_key[key] = trade
+            self._cond.notify()
+            logger.debug(f"Trade ajoute a la queue (taille: {len(self._queue)})")
             return True
 
+    def _forget(self, trade: TradeNotification):
+        """Retire un trade sorti de la queue de l'index de coalescing."""
+        key = trade.coalesce_key
+        if self._pending_by_key.get(key) is trade:
+            del self._pending_by_key[key]
+
+    def _take_batch(self) -> List[TradeNotification]:
+        """Extrait jusqu'a max_batch_size trades (appele sous self._cond)."""
+        batch = []
+        while self._queue and len(batch) < self.max_batch_size:
+            trade = self._queue.popleft()
+            self._forget(trade)
+            batch.append(trade)
+        return batch
+
     def add_trade_from_signal(self, signal: Dict) -> bool:
         """
         Cree un TradeNotification depuis un signal dict et l'ajoute.
@@ -215,21 +287,57 @@ class NotificationAggregator:
             return False
 
     def _is_duplicate(self, tx_hash: str) -> bool:
-        """Verifie si ce tx_hash a deja ete traite."""
-        if tx_hash in self._seen_hashes:
-            return True
-
-        # Nettoyer periodiquement les vieux hashes
+        """Verifie si ce tx_hash a deja ete traite (expiration O(1) amortie)."""
+        # Les entrees sont ajoutees dans l'ordre d'expiration (TTL constant):
+        # il suffit de depiler le debut de la deque tant qu'il est expire
         now = time.time()
-        expired = [h for h, t in self._seen_hashes.items() if now - t > self._dedup_ttl]
-        for h in expired:
-            del self._seen_hashes[h]
+        while self._seen_expiry and self._seen_expiry[0][0] <= now:
+            _, h = self._seen_expiry.popleft()
+            if self._seen_hashes.get(h, 0) <= now:
+                self._seen_hashes.pop(h, None)
 
-        return False
+        return tx_hash in self._seen_hashes
 
     def _mark_seen(self, tx_hash: str):
         """Marque un tx_hash comme vu."""
-        self._seen_hashes[tx_hash] = time.time()
+        expires_at = time.time() + self._dedup_ttl
+        self._seen_hashes[tx_hash] = expires_at
+        self._seen_expiry.append((expires_at, tx_hash))
+
+    def _record_lag(self, trades: List[TradeNotification]):
+        """Met a jour les metriques de retard a l'emission."""
+        now = time.time()
+        oldest = min(t.enqueued_at for t in trades)
+        queue_lag = (now - oldest) * 1000
+
+        event_lag = 0.0
+        ts = trades[0].timestamp
+        if isinstance(ts, datetime):
+            ref = datetime.now(timezone.utc) if ts.tzinfo else datetime.now()
+            event_lag = max(0.0, (ref - ts).total_seconds() * 1000)
+
+        self._lag['queue_lag_ms'] = round(queue_lag, 1)
+        self._lag['event_lag_ms'] = round(event_lag, 1)
+        self._lag['max_queue_lag_ms'] = round(max(self._lag['max_queue_lag_ms'], queue_lag), 1)
+        # Moyenne mobile exponentielle
+        self._lag['avg_queue_lag_ms'] = round(0.9 * self._lag['avg_queue_lag_ms'] + 0.1 * queue_lag, 1)
+
+    def _emit_batch(self, trades: List[TradeNotification]):
+        """Emet un lot de notifications en un seul evenement."""
+        self._record_lag(trades)
+        self.stats['queued_sent'] += len(trades)
+        self.stats['batches_sent'] += 1
+
+        try:
+            self.emit_callback('trade_signal_batch', {
+                'count': len(trades),
+                'trades': [t.to_dict() for t in trades],
+                'queue_lag_ms': self._lag['queue_lag_ms'],
+                'pending': len(self._queue)
+            })
+            logger.info(f"📤 Lot de notifications: {len(trades)} trades (lag {self._lag['queue_lag_ms']:.0f}ms)")
+        except Exception as e:
+            logger.error(f"Erreur emission lot de notifications: {e}")
 
     def _emit_single(self, trade: TradeNotification):
         """Emet une seule notification."""
@@ -242,11 +350,18 @@ class NotificationAggregator:
             logger.error(f"Erreur emission notification: {e}")
 
     def get_stats(self) -> Dict:
-        """Retourne les statistiques de l'aggregateur."""
+        """Retourne les statistiques de l'aggregateur (dont le retard de la queue)."""
+        with self._cond:
+            queue_size = len(self._queue)
+            oldest_pending_ms = round((time.time() - self._queue[0].enqueued_at) * 1000, 1) if self._queue else 0
         with self._lock:
             return {
                 **self.stats,
-                'queue_size': self._notification_queue.qsize(),
+                **self._lag,
+                'queue_size': queue_size,
+                'max_queue_size': self.max_queue_size,
+                'oldest_pending_ms': oldest_pending_ms,
+                'overflow_policy': self.overflow_policy,
                 'seen_hashes_count': len(self._seen_hashes),
                 'emit_interval_ms': self.emit_interval_ms,
                 'high_value_threshold': self.high_value_threshold,
@@ -256,13 +371,13 @@ class NotificationAggregator:
     def flush(self):
         """Force l'emission de toutes les notifications en attente."""
         count = 0
-        while not self._notification_queue.empty():
-            try:
-                trade = self._notification_queue.get_nowait()
-                self._emit_single(trade)
-                count += 1
-            except Empty:
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
                 break
+            self._emit_batch(batch)
+            count += len(batch)
         if count > 0:
             logger.info(f"Flush force: {count} notifications emises")
 
@@ -271,15 +386,20 @@ class NotificationAggregator:
         with self._lock:
             count = len(self._seen_hashes)
             self._seen_hashes.clear()
+            self._seen_expiry.clear()
             logger.info(f"Cache de deduplication vide: {count} hashes supprimes")
 
-    def update_config(self, emit_interval_ms: int = None, high_value_threshold: float = None):
+    def update_config(self, emit_interval_ms: int = None, high_value_threshold: float = None,
+                      max_queue_size: int = None, max_batch_size: int = None, overflow_policy: str = None):
         """
         Met a jour la configuration a chaud.
 
         Args:
             emit_interval_ms: Nouvel intervalle entre emissions (optionnel)
             high_value_threshold: Nouveau seuil haute priorite (optionnel)
+            max_queue_size: Nouvelle taille max de queue (optionnel)
+            max_batch_size: Nouvelle taille max de lot (optionnel)
+            overflow_policy: Nouvelle politique de debordement (optionnel)
         """
         if emit_interval_ms is not None:
             self.emit_interval_ms = emit_interval_ms
@@ -289,9 +409,25 @@ class NotificationAggregator:
             self.high_value_threshold = high_value_threshold
             logger.info(f"Seuil haute priorite mis a jour: ${high_value_threshold}")
 
+        if max_queue_size is not None:
+            self.max_queue_size = max(1, int(max_queue_size))
+            logger.info(f"Taille max de queue mise a jour: {self.max_queue_size}")
+
+        if max_batch_size is not None:
+            self.max_batch_size = max(1, int(max_batch_size))
+            logger.info(f"Taille max de lot mise a jour: {self.max_batch_size}")
+
+        if overflow_policy is not None:
+            if overflow_policy not in self.OVERFLOW_POLICIES:
+                raise ValueError(f"overflow_policy invalide: {overflow_policy}")
+            self.overflow_policy = overflow_policy
+            logger.info(f"Politique de debordement mise a jour: {overflow_policy}")
+
     def stop(self):
         """Arrete le worker de distribution."""
         self._running = False
+        with self._cond:
+            self._cond.notify_all()
         if self._worker_thread:
             self._worker_thread.join(timeout=2.0)
         logger.info("NotificationAggregator arrete")
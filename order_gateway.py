@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Order Gateway - Soumission d'ordres idempotente à retry rapide
+
+place_order était enveloppé dans tenacity (wait_exponential 2-10 s): un
+timeout transitoire coûtait 2 à 10 s, et le retry pouvait doubler le fill si
+le premier POST avait en fait abouti. Ici:
+
+    - chaque ordre a un client order ID déterministe (dérivé du signal):
+      un même ID soumis deux fois renvoie le même résultat sans re-poster
+    - l'ordre est signé UNE fois: retries et hedge re-postent le même ordre
+      signé (même hash côté CLOB, un doublon est rejeté par l'exchange)
+    - retry à backoff jitteré sous la seconde, uniquement sur erreur ambiguë
+      (timeout, connexion, 5xx: le POST a peut-être abouti)
+    - avant chaque nouvelle soumission, vérification que l'ordre signé n'existe
+      pas déjà (ordres ouverts / trades récents, par hash de l'ordre signé: un
+      autre ordre de mêmes token/sens/prix/taille n'est pas confondu)
+    - hedge optionnel: second envoi du même ordre signé si le premier n'a pas
+      répondu après le p95 de latence observé
+    - ordre sans identité vérifiable (pas de hash: fallback REST non signé):
+      ni retry ni hedge, une erreur ambiguë est remontée telle quelle
+    - issue inconnue (erreur ambiguë persistante, doublon rejeté sans ordre
+      retrouvé): résultat 'error' marqué `ambiguous`, conservé pour l'intention
+      comme un succès (pas de re-soumission automatique du même client order ID)
+"""
+import hashlib
+import random
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from timing_wheel import TimingWheel
+
+try:
+    import requests
+    _TRANSPORT_ERRORS: Tuple[type, ...] = (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                                           TimeoutError, ConnectionError)
+except ImportError:
+    _TRANSPORT_ERRORS = (TimeoutError, ConnectionError)
+
+logger = logging.getLogger("OrderGateway")
+
+
+class OrderRejected(Exception):
+    """Réponse explicite du CLOB (status_code None: pas de réponse)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def make_client_order_id(token_id: str, side: str, price: float, size: float, intent: Optional[str] = None) -> str:
+    """
+    Client order ID déterministe.
+
+    Avec `intent` (ID du signal copié...), l'ID ne dépend que de l'intention,
+    du token et du sens: une ré-exécution du même signal à un prix recalculé
+    reste le même ordre. Sans `intent`, un nonce est ajouté au contenu: l'ID
+    n'est stable que pour les retries d'un même appel.
+    """
+    if intent is not None:
+        raw = f"{intent}|{token_id}|{side.upper()}"
+    else:
+        raw = f"nonce:{time.time_ns()}:{random.random()}|{token_id}|{side.upper()}|{price:.6f}|{size:.6f}"
+    return 'cid-' + hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def is_ambiguous(error: Exception) -> bool:
+    """L'ordre a-t-il pu être accepté malgré l'erreur? (timeout, connexion, 5xx)"""
+    if isinstance(error, _TRANSPORT_ERRORS):
+        return True
+    if not hasattr(error, 'status_code'):
+        return False
+    status = getattr(error, 'status_code')
+    return status is None or (isinstance(status, int) and status >= 500)
+
+
+def is_duplicate(error: Exception) -> bool:
+    """Rejet pour doublon: l'ordre signé a déjà été accepté"""
+    return 'duplicat' in str(error).lower() or 'already exists' in str(error).lower()
+
+
+class _Entry:
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+
+
+class OrderGateway:
+    """
+    Passerelle d'ordres idempotente. Thread-safe.
+
+    Args:
+        sign: (token_id, side, price, size) -> ordre signé
+        post: (ordre signé, time_in_force) -> réponse CLOB (dict avec 'orderID'),
+              lève une exception en cas d'échec (voir is_ambiguous / OrderRejected)
+        lookup: (ordre signé, since) -> ordre existant {'id': ...} de même hash, ou None
+        resubmittable: (ordre signé) -> un re-POST est-il sûr (hash stable: doublon
+              rejeté par l'exchange et retrouvable par lookup)? Sinon ni retry ni hedge
+    """
+
+    def __init__(self, sign: Callable[..., Any], post: Callable[[Any, str], Dict],
+                 lookup: Optional[Callable[..., Optional[Dict]]] = None,
+                 resubmittable: Callable[[Any], bool] = lambda signed: True,
+                 max_attempts: int = 4, base_backoff_sec: float = 0.05, max_backoff_sec: float = 0.5,
+                 default_hedge_ms: float = 800.0, min_hedge_ms: float = 50.0,
+                 result_ttl_sec: float = 600.0):
+        self.sign = sign
+        self.post = post
+        self.lookup = lookup
+        self.resubmittable = resubmittable
+        self.max_attempts = max(1, max_attempts)
+        self.base_backoff_sec = base_backoff_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.default_hedge_ms = default_hedge_ms
+        self.min_hedge_ms = min_hedge_ms
+        self.result_ttl_sec = result_ttl_sec
+
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._expiry = TimingWheel(tick_sec=1.0, name="OrderGatewayIds")
+        self._latencies_ms: deque = deque(maxlen=200)
+        self._stats_lock = threading.Lock()  # Compteurs et latences (workers + pool de hedge)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="OrderHedge")
+
+        # Stats
+        self.submitted = 0
+        self.deduplicated = 0
+        self.retries = 0
+        self.recovered = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.failed = 0
+        self.ambiguous = 0
+
+    # =========================================================================
+    # LATENCE
+    # =========================================================================
+
+    def hedge_delay_ms(self) -> float:
+        """p95 des latences de POST observées (défaut tant que < 20 mesures)"""
+        with self._stats_lock:
+            samples = sorted(self._latencies_ms)
+        if len(samples) < 20:
+            return self.default_hedge_ms
+        return max(self.min_hedge_ms, samples[int(0.95 * (len(samples) - 1))])
+
+    def _timed_post(self, signed: Any, time_in_force: str) -> Dict:
+        started = time.time()
+        resp = self.post(signed, time_in_force)
+        with self._stats_lock:
+            self._latencies_ms.append((time.time() - started) * 1000)
+        return resp
+
+    def _incr(self, stat: str):
+        with self._stats_lock:
+            setattr(self, stat, getattr(self, stat) + 1)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter, plafonné sous la seconde"""
+        return random.uniform(0, min(self.max_backoff_sec, self.base_backoff_sec * (2 ** attempt)))
+
+    # =========================================================================
+    # SOUMISSION
+    # =========================================================================
+
+    def submit(self, token_id: str, side: str, price: float, size: float, time_in_force: str = 'GTC',
+               client_order_id: Optional[str] = None, hedge: bool = False, wait_timeout: float = 30.0) -> Dict:
+        """
+        Soumet un ordre de façon idempotente.
+
+        Returns:
+            {'status': 'success', 'orderID', 'result', 'client_order_id', 'attempts', ...}
+            ou {'status': 'error', 'error', 'client_order_id', 'ambiguous'?}: avec
+            'ambiguous', l'ordre a peut-être été accepté (à réconcilier, pas à re-poster)
+        """
+        self._expiry.advance()
+        cid = client_order_id or make_client_order_id(token_id, side, price, size)
+
+        with self._lock:
+            entry = self._entries.get(cid)
+            owner = entry is None
+            if owner:
+                entry = self._entries[cid] = _Entry()
+
+        if not owner:
+            # Même intention déjà soumise (ou en vol): même résultat, pas de second POST
+            self._incr('deduplicated')
+            if not entry.done.wait(wait_timeout):
+                return {'status': 'error', 'error': 'Soumission identique toujours en cours', 'client_order_id': cid}
+            if entry.result['status'] != 'success':
+                return entry.result
+            return {**entry.result, 'deduplicated': True}
+
+        self._incr('submitted')
+        try:
+            result = self._submit(token_id, side, price, size, time_in_force, cid, hedge)
+        except Exception as e:
+            result = {'status': 'error', 'error': str(e), 'client_order_id': cid}
+
+        entry.result = result
+        entry.done.set()
+        if result['status'] == 'success' or result.get('ambiguous'):
+            # Issue connue ou incertaine: la même intention ne re-poste pas
+            if result.get('ambiguous'):
+                self._incr('ambiguous')
+            self._expiry.schedule(cid, time.time() + self.result_ttl_sec, self._forget)
+        else:
+            # Échec définitif: l'appelant peut retenter la même intention
+            self._incr('failed')
+            self._forget(cid)
+        return result
+
+    def _forget(self, cid: str):
+        with self._lock:
+            self._entries.pop(cid, None)
+
+    def _submit(self, token_id: str, side: str, price: float, size: float, time_in_force: str,
+                cid: str, hedge: bool) -> Dict:
+        signed = self.sign(token_id, side, price, size)
+        first_submit = time.time()
+        last_error: Optional[Exception] = None
+        resubmittable = self.resubmittable(signed)
+        hedge = hedge and resubmittable
+        max_attempts = self.max_attempts if resubmittable else 1
+
+        for attempt in range(max_attempts):
+            if attempt > 0:
+                self._incr('retries')
+                time.sleep(self._backoff(attempt))
+                existing = self._find_existing(signed, first_submit)
+                if existing:
+                    return self._recovered(existing, cid, attempt)
+
+            try:
+                resp, hedged = self._post(signed, time_in_force, hedge)
+            except Exception as e:
+                if is_duplicate(e):
+                    # Une soumission précédente (ou le hedge) a abouti
+                    existing = self._find_existing(signed, first_submit)
+                    if existing and (existing.get('id') or existing.get('orderID')):
+                        return self._recovered(existing, cid, attempt + 1)
+                    return self._ambiguous(f"Doublon rejeté mais ordre introuvable: {e}", cid, attempt + 1)
+                if not is_ambiguous(e):
+                    return {'status': 'error', 'error': str(e), 'client_order_id': cid, 'attempts': attempt + 1}
+                last_error = e
+                logger.warning(f"⚠️ Soumission {cid} ambiguë (essai {attempt + 1}/{max_attempts}): {e}")
+                continue
+
+            if resp and resp.get('orderID'):
+                return {'status': 'success', 'result': resp, 'orderID': resp['orderID'], 'client_order_id': cid,
+                        'attempts': attempt + 1, 'hedged': hedged}
+            error = (resp or {}).get('errorMsg') or 'Réponse invalide du CLOB'
+            return {'status': 'error', 'error': error, 'details': resp, 'client_order_id': cid, 'attempts': attempt + 1}
+
+        # Dernière vérification: le dernier POST ambigu a pu aboutir
+        existing = self._find_existing(signed, first_submit)
+        if existing:
+            return self._recovered(existing, cid, max_attempts)
+        return self._ambiguous(str(last_error), cid, max_attempts)
+
+    def _post(self, signed: Any, time_in_force: str, hedge: bool) -> Tuple[Dict, bool]:
+        """POST, avec second envoi du même ordre signé après le p95 si `hedge`"""
+        if not hedge:
+            return self._timed_post(signed, time_in_force), False
+
+        first = self._hedge_pool.submit(self._timed_post, signed, time_in_force)
+        try:
+            return first.result(timeout=self.hedge_delay_ms() / 1000), False
+        except FutureTimeout:
+            pass
+
+        self._incr('hedges_sent')
+        second = self._hedge_pool.submit(self._timed_post, signed, time_in_force)
+        errors = []
+        for future in as_completed([first, second]):
+            try:
+                resp = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            if future is second:
+                self._incr('hedges_won')
+            return resp, True
+        # Les deux ont échoué: un doublon signifie que l'un des deux a abouti
+        raise next((e for e in errors if is_duplicate(e)), errors[-1])
+
+    def _find_existing(self, signed: Any, since: float) -> Optional[Dict]:
+        if not self.lookup:
+            return None
+        try:
+            return self.lookup(signed, since)
+        except Exception as e:
+            logger.debug(f"Vérification d'ordre existant impossible: {e}")
+            return None
+
+    def _recovered(self, existing: Dict, cid: str, attempts: int) -> Dict:
+        self._incr('recovered')
+        order_id = existing.get('id') or existing.get('orderID')
+        logger.info(f"♻️ Ordre {cid} déjà accepté par le CLOB ({order_id or 'id inconnu'}), pas de re-soumission")
+        return {'status': 'success', 'result': existing, 'orderID': order_id, 'client_order_id': cid,
+                'attempts': attempts, 'recovered': True}
+
+    def _ambiguous(self, error: str, cid: str, attempts: int) -> Dict:
+        logger.error(f"❓ Ordre {cid}: issue inconnue ({error}), à réconcilier sans re-soumission")
+        return {'status': 'error', 'error': error, 'client_order_id': cid, 'attempts': attempts, 'ambiguous': True}
+
+    def get_stats(self) -> Dict:
+        return {
+            'submitted': self.submitted,
+            'deduplicated': self.deduplicated,
+            'retries': self.retries,
+            'recovered': self.recovered,
+            'hedges_sent': self.hedges_sent,
+            'hedges_won': self.hedges_won,
+            'failed': self.failed,
+            'ambiguous': self.ambiguous,
+            'hedge_delay_ms': round(self.hedge_delay_ms(), 1),
+            'tracked_ids': len(self._entries)
+        }
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Order Netting - Agrégation des ordres simultanés sur un même token
+
+Plusieurs wallets copiés qui achètent la même issue à quelques secondes
+d'intervalle, ou plusieurs positions d'un token qui sortent dans le même
+cycle du RiskEngine, donnaient chacun leur propre place_order. Ici les
+ordres (token, sens) arrivant dans une fenêtre courte (`window_ms`) sont
+regroupés en un ordre parent:
+
+    - le premier ordre ouvre la fenêtre et place le parent à sa fermeture
+    - taille parent = somme des enfants; prix = la limite la plus stricte
+      (min pour un BUY, max pour un SELL): aucun enfant ne paie plus que sa limite
+    - ordres urgents (sorties SL/trailing avec slippage) regroupés à part, au
+      prix le plus agressif: une sortie forcée n'hérite jamais de la limite
+      d'une sortie ordinaire et reste exécutable
+    - un seul parent en vol par token, tous sens confondus: la fenêtre suivante
+      attend (pas d'auto-concurrence sur un carnet fin). C'est ici, après le
+      netting, que les ordres d'un même token sont sérialisés: les appelants
+      (wallets copiés différents) peuvent soumettre en parallèle
+    - chaque enfant récupère le résultat du parent et sa part (pro rata)
+
+`submit()` bloque l'appelant jusqu'au résultat du parent. Un enfant qui
+abandonne (timeout) avant la fermeture du lot en est retiré; une fois le lot
+fermé il en fait partie et attend le résultat du parent.
+"""
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("OrderNetting")
+
+
+class _Child:
+    __slots__ = ('size', 'limit_price', 'intent')
+
+    def __init__(self, size: float, limit_price: float, intent: Optional[str]):
+        self.size = size
+        self.limit_price = limit_price
+        self.intent = intent
+
+
+class _Batch:
+    __slots__ = ('token_id', 'side', 'urgent', 'children', 'closed', 'done', 'result', 'price', 'size')
+
+    def __init__(self, token_id: str, side: str, urgent: bool):
+        self.token_id = token_id
+        self.side = side
+        self.urgent = urgent
+        self.children: List[_Child] = []
+        self.closed = False  # Enfants figés (sous le verrou du netter)
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+        self.price = 0.0
+        self.size = 0.0
+
+
+class OrderNetter:
+    """
+    Regroupement d'ordres par (token, sens). Thread-safe.
+
+    Args:
+        place: (token_id, side, size, price, intents) -> résultat place_order
+               ({'status': 'success', 'orderID', ...} ou {'status': 'error', ...})
+        window_ms: Durée de la fenêtre de regroupement (0 = pas de netting)
+    """
+
+    def __init__(self, place: Callable[[str, str, float, float, List[Optional[str]]], Dict],
+                 window_ms: float = 100.0, name: str = "Netting"):
+        self.place = place
+        self.window_ms = window_ms
+        self.name = name
+
+        self._open: Dict[Tuple[str, str, bool], _Batch] = {}
+        self._inflight: Dict[str, threading.Lock] = {}  # {token_id: parent en vol}
+        self._lock = threading.Lock()
+
+        # Stats
+        self.children = 0
+        self.parents = 0
+        self.netted_children = 0  # Enfants ayant partagé un parent
+        self.max_batch = 0
+
+    def submit(self, token_id: str, side: str, size: float, limit_price: float,
+               intent: Optional[str] = None, urgent: bool = False, timeout: float = 30.0) -> Dict:
+        """
+        Ajoute un ordre enfant et attend le résultat du parent.
+
+        `urgent`: sortie forcée (limite déjà décalée par un slippage), nettée
+        seulement avec d'autres ordres urgents, au prix le plus agressif.
+
+        Returns:
+            Résultat du parent enrichi de la part de l'enfant:
+            {'status', 'orderID', ..., 'allocated_shares', 'price', 'parent_size', 'batch_size'}
+        """
+        side = side.upper()
+        key = (token_id, side, bool(urgent))
+        child = _Child(float(size), float(limit_price), intent)
+
+        with self._lock:
+            self.children += 1
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch(token_id, side, bool(urgent))
+            batch.children.append(child)
+
+        if leader:
+            self._run_batch(key, batch)
+        elif not batch.done.wait(timeout):
+            with self._lock:
+                if not batch.closed:
+                    # Lot pas encore figé: l'enfant en sort, le parent ne le porte pas
+                    batch.children.remove(child)
+                    return {'status': 'error', 'error': 'Ordre parent sans réponse'}
+            # Déjà inclus dans le parent: son résultat le concerne
+            batch.done.wait()
+
+        result = batch.result or {'status': 'error', 'error': 'Ordre parent non placé'}
+        return {
+            **result,
+            'allocated_shares': child.size,
+            'price': batch.price,
+            'parent_size': batch.size,
+            'batch_size': len(batch.children)
+        }
+
+    def _run_batch(self, key: Tuple[str, str, bool], batch: _Batch):
+        """Leader: attend la fenêtre, ferme le lot, place le parent"""
+        with self._lock:
+            inflight = self._inflight.setdefault(batch.token_id, threading.Lock())
+
+        # Un parent à la fois par token (BUY et SELL compris): l'attente prolonge la fenêtre
+        with inflight:
+            if self.window_ms > 0:
+                time.sleep(self.window_ms / 1000)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+                batch.closed = True
+                children = list(batch.children)
+
+            batch.size = round(sum(c.size for c in children), 2)
+            prices = [c.limit_price for c in children]
+            # Limite la plus stricte, ou la plus agressive pour un lot urgent
+            strict = (batch.side == 'BUY') != batch.urgent
+            batch.price = min(prices) if strict else max(prices)
+
+            self.parents += 1
+            self.max_batch = max(self.max_batch, len(children))
+            if len(children) > 1:
+                self.netted_children += len(children)
+                logger.info(f"🧮 {self.name}: {len(children)} ordres {batch.side} nettés sur {batch.token_id[:12]}... "
+                            f"-> {batch.size} @ {batch.price:.4f}")
+            try:
+                batch.result = self.place(batch.token_id, batch.side, batch.size, batch.price,
+                                          [c.intent for c in children])
+            except Exception as e:
+                batch.result = {'status': 'error', 'error': str(e)}
+            finally:
+                batch.done.set()
+
+    def get_stats(self) -> Dict:
+        return {
+            'window_ms': self.window_ms,
+            'children': self.children,
+            'parent_orders': self.parents,
+            'netted_children': self.netted_children,
+            'orders_saved': self.children - self.parents,
+            'max_batch': self.max_batch
+        }
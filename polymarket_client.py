@@ -10,10 +10,10 @@ import hashlib
 import time
 import json
 import logging
+import threading
 import requests
 from typing import Dict, List, Optional, Tuple, Any
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 # Import du cache manager
 try:
@@ -28,6 +28,8 @@ except ImportError:
         return decorator
 
 from secret_manager import secret_manager
+from request_coalescer import get_request_coalescer, coalesced_get_json
+from order_gateway import OrderGateway, OrderRejected
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -46,22 +48,28 @@ class PolymarketClient:
     # Chain ID Polygon
     CHAIN_ID = 137
 
+    # Types d'ordre CLOB (durée de validité)
+    TIME_IN_FORCE = ('GTC', 'FOK', 'FAK')
+
     def __init__(self):
         load_dotenv()
         
         # Credentials
         self.api_key = os.getenv('POLYMARKET_API_KEY', '')
-        # Déchiffrer les secrets
-        self.api_secret = secret_manager.decrypt(os.getenv('POLYMARKET_SECRET', ''))
-        self.api_passphrase = secret_manager.decrypt(os.getenv('POLYMARKET_PASSPHRASE', ''))
-        
-        # Déchiffrer la clé privée si elle est chiffrée
-        encrypted_key = os.getenv('POLYGON_PRIVATE_KEY', '')
-        self.private_key = secret_manager.decrypt(encrypted_key)
+        # Secrets chiffrés: déchiffrés au premier usage authentifié (warm_up() ou signature),
+        # pas à l'import (dérivation PBKDF2 de la clé maître)
+        self._encrypted = {
+            'api_secret': os.getenv('POLYMARKET_SECRET', ''),
+            'api_passphrase': os.getenv('POLYMARKET_PASSPHRASE', ''),
+            'private_key': os.getenv('POLYGON_PRIVATE_KEY', ''),
+        }
+        self._secrets: Dict[str, str] = {}
+        self._secrets_lock = threading.Lock()
 
-        # Client officiel (py-clob-client)
-        self.client = None
-        self._init_clob_client()
+        # Client officiel (py-clob-client): init paresseuse (import lourd), voir warm_up()
+        self._client = None
+        self._client_ready = False
+        self._client_lock = threading.Lock()
 
         # Session HTTP pour les fallbacks REST
         self.session = requests.Session()
@@ -70,21 +78,81 @@ class PolymarketClient:
             'Accept': 'application/json',
         })
 
+        # Soumission idempotente (signature unique, retry rapide, hedge optionnel)
+        # Domaines EIP-712 des deux exchanges (standard, neg-risk), calculés une fois
+        self._order_domains = None
+        self.order_gateway = OrderGateway(sign=self._sign_order, post=self._post_signed, lookup=self._find_order,
+                                          resubmittable=lambda signed: bool(self._order_hashes(signed)))
+
         # Stats
         self.orders_placed = 0
         self.orders_filled = 0
         self.total_volume = 0.0
         
-        # Status
-        self.authenticated = bool(self.api_key and self.api_secret and self.private_key)
+        # Status (un secret chiffré non vide reste non vide une fois déchiffré)
+        self.authenticated = bool(self.api_key and self._encrypted['api_secret'] and self._encrypted['private_key'])
         
         logger.info("🚀 PolymarketClient initialisé")
-        if self.client:
+        if not self.authenticated:
+             logger.warning("   ❌ Mode: Lecture Seule (Pas de clés API configurées)")
+
+    def _secret(self, name: str) -> str:
+        if name not in self._secrets:
+            with self._secrets_lock:
+                if name not in self._secrets:
+                    self._secrets[name] = secret_manager.decrypt(self._encrypted.get(name, ''))
+        return self._secrets[name]
+
+    def _set_secret(self, name: str, value: str):
+        with self._secrets_lock:
+            self._secrets[name] = value
+
+    @property
+    def api_secret(self) -> str:
+        return self._secret('api_secret')
+
+    @api_secret.setter
+    def api_secret(self, value: str):
+        self._set_secret('api_secret', value)
+
+    @property
+    def api_passphrase(self) -> str:
+        return self._secret('api_passphrase')
+
+    @api_passphrase.setter
+    def api_passphrase(self, value: str):
+        self._set_secret('api_passphrase', value)
+
+    @property
+    def private_key(self) -> str:
+        return self._secret('private_key')
+
+    @private_key.setter
+    def private_key(self, value: str):
+        self._set_secret('private_key', value)
+
+    @property
+    def client(self):
+        """Client py-clob, initialisé au premier usage si warm_up() n'a pas encore tourné"""
+        if not self._client_ready:
+            self.warm_up()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def warm_up(self):
+        """Initialise le client py-clob (appelé en arrière-plan au démarrage)"""
+        with self._client_lock:
+            if self._client_ready:
+                return
+            self._init_clob_client()
+            self._client_ready = True
+        if self._client:
              logger.info("   ✅ Mode: py-clob-client (Optimisé)")
         elif self.authenticated:
              logger.info("   ⚠️ Mode: REST API Fallback (Fonctionnel mais plus lent)")
-        else:
-             logger.warning("   ❌ Mode: Lecture Seule (Pas de clés API configurées)")
 
     def _init_clob_client(self):
         """Initialise le client officiel py-clob si disponible et configuré."""
@@ -144,7 +212,8 @@ class PolymarketClient:
         self.authenticated = bool(self.api_key and self.api_secret and self.private_key)
         
         # Tenter de re-initialiser le client officiel
-        self._init_clob_client()
+        self._client_ready = False
+        self.warm_up()
         
         logger.info("🔐 Clé privée mise à jour en mémoire (Mode Authentifié actif)")
 
@@ -154,7 +223,8 @@ class PolymarketClient:
         self.api_secret = api_secret
         self.api_passphrase = api_passphrase
         self.authenticated = bool(self.api_key and self.api_secret and self.private_key)
-        self._init_clob_client()
+        self._client_ready = False
+        self.warm_up()
         logger.info("🔑 Identifiants API mis à jour en mémoire")
 
     def _sign_request(self, method: str, path: str, body: str = '') -> Dict[str, str]:
@@ -183,42 +253,48 @@ class PolymarketClient:
 
     @cached(ttl=30, key_prefix="orderbook:")
     def get_order_book(self, token_id: str) -> Optional[Dict]:
-        """Récupère le carnet d'ordres pour un token (avec cache 30s)."""
+        """Récupère le carnet d'ordres pour un token (avec cache 30s + coalescing)."""
         try:
-            if self.client:
-                ob = self.client.get_order_book(token_id)
-                # Convertir l'objet OrderBookSummary en dict pour compatibilité
-                if ob and hasattr(ob, 'bids'):
-                    # Convertir les OrderSummary en dicts
-                    def convert_orders(orders):
-                        if not orders:
-                            return []
-                        result = []
-                        for o in orders:
-                            if hasattr(o, 'price') and hasattr(o, 'size'):
-                                result.append({'price': o.price, 'size': o.size})
-                            elif isinstance(o, dict):
-                                result.append(o)
-                        return result
-                    
-                    return {
-                        'bids': convert_orders(ob.bids),
-                        'asks': convert_orders(ob.asks),
-                        'market': getattr(ob, 'market', ''),
-                        'hash': getattr(ob, 'hash', ''),
-                        'timestamp': getattr(ob, 'timestamp', '')
-                    }
-                return None
-
-            # REST Fallback
-            resp = self.session.get(f"{self.CLOB_HOST}/book", params={'token_id': token_id}, timeout=10)
-            if resp.status_code == 200:
-                return resp.json()
-            return None
+            return get_request_coalescer().do(
+                f"clob:book:{token_id}", lambda: self._fetch_order_book(token_id)
+            )
         except Exception as e:
             logger.error(f"Erreur get_order_book: {e}")
             return None
 
+    def _fetch_order_book(self, token_id: str) -> Optional[Dict]:
+        """Appel réseau brut du carnet d'ordres (py-clob-client ou REST)."""
+        if self.client:
+            ob = self.client.get_order_book(token_id)
+            # Convertir l'objet OrderBookSummary en dict pour compatibilité
+            if ob and hasattr(ob, 'bids'):
+                # Convertir les OrderSummary en dicts
+                def convert_orders(orders):
+                    if not orders:
+                        return []
+                    result = []
+                    for o in orders:
+                        if hasattr(o, 'price') and hasattr(o, 'size'):
+                            result.append({'price': o.price, 'size': o.size})
+                        elif isinstance(o, dict):
+                            result.append(o)
+                    return result
+
+                return {
+                    'bids': convert_orders(ob.bids),
+                    'asks': convert_orders(ob.asks),
+                    'market': getattr(ob, 'market', ''),
+                    'hash': getattr(ob, 'hash', ''),
+                    'timestamp': getattr(ob, 'timestamp', '')
+                }
+            return None
+
+        # REST Fallback
+        resp = self.session.get(f"{self.CLOB_HOST}/book", params={'token_id': token_id}, timeout=10)
+        if resp.status_code == 200:
+            return resp.json()
+        return None
+
     def get_markets(self, limit: int = 100, active: bool = True) -> List[Dict]:
         """Récupère la liste des marchés (via Gamma API)."""
         try:
@@ -235,10 +311,9 @@ class PolymarketClient:
     def get_market(self, condition_id: str) -> Optional[Dict]:
         """Récupère un marché spécifique (avec cache 60s)."""
         try:
-            resp = self.session.get(f"{self.GAMMA_HOST}/markets/{condition_id}", timeout=10)
-            if resp.status_code == 200:
-                return resp.json()
-            return None
+            # Coalescé avec les autres lookups Gamma (Tracker, Insider) sur la même URL
+            return coalesced_get_json('gamma', f"{self.GAMMA_HOST}/markets/{condition_id}",
+                                      timeout=10, session=self.session)
         except Exception as e:
             logger.error(f"Erreur get_market: {e}")
             return None
@@ -288,15 +363,10 @@ class PolymarketClient:
     # TRADING & ORDERS
     # =========================================================================
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.HTTPError)),
-        reraise=True
-    )
-    def place_order(self, token_id: str, side: str, price: float, size: float, order_type: str = 'LIMIT') -> Dict:
+    def place_order(self, token_id: str, side: str, price: float, size: float, order_type: str = 'LIMIT',
+                    time_in_force: str = 'GTC', client_order_id: Optional[str] = None, hedge: bool = False) -> Dict:
         """
-        Place un ordre sur le marché (avec retry automatique).
+        Place un ordre sur le marché (via la passerelle idempotente, retry rapide).
         
         Args:
             token_id: ID du token (Asset ID)
@@ -304,67 +374,179 @@ class PolymarketClient:
             price: Prix limite
             size: Quantité (Shares)
             order_type: 'LIMIT' ou 'MARKET' (Market simulé par IOC agressif)
+            time_in_force: 'GTC' (reste au carnet), 'FOK' (tout ou rien immédiat)
+                           ou 'FAK' (exécute l'immédiatement disponible, annule le reste)
+            client_order_id: ID déterministe de l'intention (voir make_client_order_id);
+                             une seconde soumission du même ID ne re-poste pas
+            hedge: Second envoi du même ordre signé si pas de réponse après le p95
         """
         if not self.authenticated:
             return {'status': 'error', 'error': 'Non authentifié - Vérifiez vos clés API'}
 
+        time_in_force = (time_in_force or 'GTC').upper()
+        if time_in_force not in self.TIME_IN_FORCE:
+            return {'status': 'error', 'error': f"Type d'ordre inconnu: {time_in_force}"}
+
+        # order_type 'MARKET': les appelants passent déjà un prix limite agressif
+        result = self.order_gateway.submit(
+            token_id, side.upper(), price, size, time_in_force,
+            client_order_id=client_order_id, hedge=hedge
+        )
+
+        if result['status'] == 'success' and not result.get('deduplicated'):
+            self.orders_placed += 1
+            self.total_volume += price * size
+            mode = 'Client' if self._client else 'REST'
+            logger.info(f"✅ Ordre placé ({mode}, {time_in_force}): {side} {size} @ {price} "
+                        f"[{result['client_order_id']}, essai {result.get('attempts', 1)}]")
+        elif result['status'] != 'success':
+            logger.error(f"❌ Erreur place_order: {result.get('error')}")
+        return result
+
+    def _sign_order(self, token_id: str, side: str, price: float, size: float) -> Any:
+        """Signe l'ordre une seule fois (les retries re-postent le même ordre signé)"""
+        if self.client:
+            from py_clob_client.clob_types import OrderArgs
+            return self.client.create_order(OrderArgs(
+                price=price,
+                size=size,
+                side=side,
+                token_id=token_id,
+            ))
+
+        # REST API Fallback
+        return {
+            'tokenID': token_id,
+            'side': side,
+            'price': str(price),
+            'size': str(size),
+            'type': 'LIMIT', # CLOB ne supporte que LIMIT
+        }
+
+    def _post_signed(self, signed_order: Any, time_in_force: str) -> Dict:
+        """POST d'un ordre signé. Lève une exception en cas d'échec (voir order_gateway.is_ambiguous)"""
+        if self.client:
+            from py_clob_client.clob_types import OrderType
+            clob_order_type = getattr(OrderType, time_in_force, None)
+            if clob_order_type is None:
+                raise OrderRejected(f"{time_in_force} non supporté par cette version de py-clob-client", 400)
+            return self.client.post_order(signed_order, clob_order_type)
+
+        path = '/order'
+        body = json.dumps({**signed_order, 'timeInForce': time_in_force})
+        headers = self._sign_request('POST', path, body)
+        resp = self.session.post(f"{self.CLOB_HOST}{path}", data=body, headers=headers, timeout=5)
+        if resp.status_code in [200, 201]:
+            return resp.json()
+        raise OrderRejected(resp.text, resp.status_code)
+
+    def _order_hashes(self, signed_order: Any) -> set:
+        """
+        Hash(es) EIP-712 possibles de l'ordre signé, c'est-à-dire son id côté CLOB.
+        Le domaine dépend de l'exchange (standard ou neg-risk), inconnu ici: les
+        deux hashes sont candidats. Vide si incalculable: ni recherche ni
+        re-soumission automatique (voir OrderGateway.resubmittable).
+        """
+        if isinstance(signed_order, dict):
+            order_hash = signed_order.get('hash') or signed_order.get('orderHash')
+            return {order_hash.lower()} if order_hash else set()
+        try:
+            from eth_utils import keccak
+
+            return {
+                '0x' + bytes(keccak(signed_order.order.signable_bytes(domain=domain))).hex()
+                for domain in self._get_order_domains()
+            }
+        except Exception as e:
+            logger.debug(f"Hash de l'ordre signé incalculable: {e}")
+            return set()
+
+    def _get_order_domains(self) -> List[Any]:
+        """Domaines EIP-712 'Polymarket CTF Exchange' des exchanges standard et neg-risk"""
+        if self._order_domains is None:
+            from poly_eip712_structs import make_domain
+            from py_clob_client.config import get_contract_config
+
+            self._order_domains = [
+                make_domain(name="Polymarket CTF Exchange", version="1", chainId=str(self.CHAIN_ID),
+                            verifyingContract=get_contract_config(self.CHAIN_ID, neg_risk).exchange)
+                for neg_risk in (False, True)
+            ]
+        return self._order_domains
+
+    def _find_order(self, signed_order: Any, since: float) -> Optional[Dict]:
+        """
+        Ordre déjà accepté ayant le hash de `signed_order` (ordres ouverts puis
+        trades depuis `since`). Utilisé par la passerelle avant toute nouvelle
+        soumission. Un autre ordre de mêmes token/sens/prix/taille n'est pas
+        confondu: sans hash calculable, rien n'est trouvé et la passerelle ne
+        re-poste pas (issue ambiguë remontée à l'appelant).
+        """
+        hashes = self._order_hashes(signed_order)
+        if not hashes:
+            return None
+        token_id = self._signed_token_id(signed_order)
+
+        for order in self.get_open_orders(token_id) or []:
+            if str(order.get('id', '')).lower() in hashes:
+                return order
+
+        if self.client:
+            from py_clob_client.clob_types import TradeParams
+            for trade in self.client.get_trades(TradeParams(asset_id=token_id, after=int(since) - 1)) or []:
+                if str(trade.get('taker_order_id', '')).lower() in hashes:
+                    return {'id': trade.get('taker_order_id'), 'trade': trade}
+                for maker in trade.get('maker_orders') or []:
+                    if str(maker.get('order_id', '')).lower() in hashes:
+                        return {'id': maker.get('order_id'), 'trade': trade}
+        return None
+
+    @staticmethod
+    def _signed_token_id(signed_order: Any) -> Optional[str]:
+        if isinstance(signed_order, dict):
+            return signed_order.get('tokenID')
+        token_id = getattr(getattr(signed_order, 'order', None), 'tokenId', None)
+        return str(token_id) if token_id is not None else None
+
+    def get_open_orders(self, token_id: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Ordres ouverts du compte (tous, ou ceux d'un token), None si illisible.
+        """
         try:
-            # 1. Utilisation de py-clob-client (Préco)
             if self.client:
-                from py_clob_client.clob_types import OrderArgs
-                
-                # Ajustement pour Market Order simulé
-                if order_type.upper() == 'MARKET':
-                    # Fallback interne pour market order si nécessaire, 
-                    # mais py-clob gère surtout des limites.
-                    # On place un Limit IOC agressif.
-                    # Note: C'est mieux géré par l'appelant, mais on sécurise ici.
-                    pass 
-
-                order_args = OrderArgs(
-                    price=price,
-                    size=size,
-                    side=side.upper(),
-                    token_id=token_id,
-                )
-                
-                # Signature et envoi automatique
-                resp = self.client.create_and_post_order(order_args)
-                
-                if resp and 'orderID' in resp:
-                    self.orders_placed += 1
-                    self.total_volume += price * size
-                    logger.info(f"✅ Ordre placé (Client): {side} {size} @ {price}")
-                    return {'status': 'success', 'result': resp, 'orderID': resp['orderID']}
-                else:
-                    return {'status': 'error', 'error': 'Réponse invalide du client', 'details': resp}
-
-            # 2. REST API Fallback
-            path = '/order'
-            body = json.dumps({
-                'tokenID': token_id,
-                'side': side.upper(),
-                'price': str(price),
-                'size': str(size),
-                'type': 'LIMIT', # CLOB ne supporte que LIMIT
-                'timeInForce': 'GTC' # Good Till Cancel
-            })
-            
-            headers = self._sign_request('POST', path, body)
-            resp = self.session.post(f"{self.CLOB_HOST}{path}", data=body, headers=headers, timeout=10)
-            
-            if resp.status_code in [200, 201]:
+                from py_clob_client.clob_types import OpenOrderParams
+                params = OpenOrderParams(asset_id=token_id) if token_id else None
+                return self.client.get_orders(params) or []
+
+            path = '/data/orders'
+            headers = self._sign_request('GET', path)
+            resp = self.session.get(f"{self.CLOB_HOST}{path}", params={'asset_id': token_id} if token_id else None,
+                                    headers=headers, timeout=5)
+            if resp.status_code == 200:
                 data = resp.json()
-                self.orders_placed += 1
-                self.total_volume += price * size
-                logger.info(f"✅ Ordre placé (REST): {side} {size} @ {price}")
-                return {'status': 'success', 'result': data, 'orderID': data.get('orderID')}
-            else:
-                return {'status': 'error', 'error': resp.text}
+                return (data.get('data', []) if isinstance(data, dict) else data) or []
+            return None
+        except Exception as e:
+            logger.debug(f"Erreur get_open_orders: {e}")
+            return None
 
+    def get_order(self, order_id: str) -> Optional[Dict]:
+        """
+        État d'un ordre (size_matched, original_size, status), None si illisible.
+        """
+        try:
+            if self.client:
+                return self.client.get_order(order_id)
+
+            path = f"/data/order/{order_id}"
+            headers = self._sign_request('GET', path)
+            resp = self.session.get(f"{self.CLOB_HOST}{path}", headers=headers, timeout=5)
+            if resp.status_code == 200:
+                return resp.json()
+            return None
         except Exception as e:
-            logger.error(f"❌ Erreur place_order: {e}")
-            return {'status': 'error', 'error': str(e)}
+            logger.debug(f"Erreur get_order {order_id}: {e}")
+            return None
 
     def cancel_order(self, order_id: str) -> Dict:
         """Annule un ordre."""
@@ -422,9 +604,10 @@ class PolymarketClient:
         """Statistiques du client."""
         return {
             'authenticated': self.authenticated,
-            'mode': 'py-clob-client' if self.client else 'REST',
+            'mode': ('py-clob-client' if self._client else 'REST') if self._client_ready else 'initializing',
             'orders_placed': self.orders_placed,
-            'total_volume': self.total_volume
+            'total_volume': self.total_volume,
+            'order_gateway': self.order_gateway.get_stats()
         }
 
 # Instance globale pour importation directe
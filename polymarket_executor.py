@@ -11,6 +11,13 @@ from polymarket_client import polymarket_client # UPDATED IMPORT
 from db_manager import db_manager
 from strategy_engine import strategy_engine # ✨ Import Strategy Engine
 from position_lock_manager import position_lock, PositionLockError # 🔒 Anti-double vente
+from state_publisher import mark_dirty
+from execution_queue import ExecutionQueue
+from order_gateway import make_client_order_id
+from order_netting import OrderNetter
+from book_depth import DepthLadder, ladder_for
+from fill_tracker import get_fill_tracker
+from position_store import get_position_store
 
 # Configuration logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +32,32 @@ class PolymarketExecutor:
         self.env_min_position = float(os.getenv("MIN_POSITION_USD", "5"))
         self.executed_trades = {}  # Historique des trades exécutés
         self.backend_ref = backend # Alias
+
+        # ⚡ File d'exécution: la détection n'attend jamais un ordre (workers démarrés au 1er signal)
+        pm_config = backend.data.get('polymarket', {}) if backend else {}
+        self.execution_queue = ExecutionQueue(
+            handler=self._execute_queued,
+            workers=int(pm_config.get('execution_workers', 4)),
+            max_size=int(pm_config.get('execution_queue_size', 500)),
+            max_age_sec=float(pm_config.get('signal_max_age_sec', 30)),
+            value_fn=lambda signal: signal.get('value_usd', 0),
+            # Clé (token, wallet copié): les signaux de wallets différents sur un même
+            # token arrivent ensemble au netting, qui sérialise ensuite les ordres
+            # parents du token (un seul en vol); FIFO conservé par wallet
+            token_fn=lambda signal: f"{signal.get('asset_id', '')}:{signal.get('wallet', '')}",
+            # Un BUY périmé copie un prix qui a bougé; un SELL doit toujours sortir
+            droppable_fn=lambda signal: signal.get('type') == 'BUY',
+            name="CopyExecution"
+        )
+
+        # 🧮 Netting: les ordres simultanés d'un même token (signaux copiés,
+        # sorties du RiskEngine) partent en un seul ordre parent; un seul
+        # parent en vol par token, tous sens confondus
+        self.netter = OrderNetter(
+            self._place_netted,
+            window_ms=float(pm_config.get('netting_window_ms', 100)),
+            name="CopyNetting"
+        )
         
         logger.info("🚀 Executeur Polymarket initialisé en mode RÉEL")
 
@@ -100,34 +133,30 @@ class PolymarketExecutor:
         
         return round(position_size, 2)
 
-    def get_market_price(self, token_id: str, side: str) -> Optional[float]:
+    def get_depth(self, token_id: str, side: str) -> Optional[DepthLadder]:
         """
-        Récupère le prix actuel du marché pour un token donné.
+        Profondeur du carnet consommée par un ordre `side` (asks pour un BUY, bids pour un SELL).
         """
-        if not polymarket_client.authenticated:
-             # Try anyway, maybe read-only mode works for book
-             pass
-            
         try:
-            order_book = polymarket_client.get_order_book(token_id)
-            if not order_book:
-                return None
-                
-            if side == 'BUY':
-                # Pour acheter, on prend le meilleur ask (offre de vente)
-                asks = order_book.get('asks', [])
-                if asks:
-                    return float(asks[0].get('price', 0))
-            else:
-                # Pour vendre, on prend le meilleur bid (offre d'achat)
-                bids = order_book.get('bids', [])
-                if bids:
-                    return float(bids[0].get('price', 0))
-            return None
+            return ladder_for(polymarket_client.get_order_book(token_id), side)
         except Exception as e:
-            logger.error(f"❌ Erreur récupération prix: {e}")
+            logger.error(f"❌ Erreur récupération carnet: {e}")
             return None
 
+    def get_market_price(self, token_id: str, side: str) -> Optional[float]:
+        """
+        Récupère le prix actuel du marché pour un token donné.
+        Pour acheter, le meilleur ask (offre de vente); pour vendre, le meilleur bid.
+        """
+        ladder = self.get_depth(token_id, side)
+        return ladder.best_price if ladder else None
+
+    @property
+    def max_slippage_bps(self) -> float:
+        """Slippage toléré au-delà du meilleur prix pour une copie"""
+        pm_config = self.backend.data.get('polymarket', {}) if self.backend else {}
+        return float(pm_config.get('max_slippage_bps', 100))
+
     def execute_copy_trade(self, signal: Dict, bot_capital: float = 1000.0) -> Dict:
         """
         Exécute un trade de copie basé sur un signal détecté.
@@ -149,7 +178,9 @@ class PolymarketExecutor:
             from db_manager import db_manager
             
             validator = TradeValidator(self.backend.data.get('polymarket', {}))
-            current_positions = db_manager.get_bot_positions()
+            # Les positions PENDING (ordre d'achat en vol) comptent dans les limites
+            store = get_position_store()
+            current_positions = store.get_bot_positions('OPEN') + store.get_bot_positions('PENDING')
             
             # Récupérer le prix actuel
             side = 'BUY' if signal_type == 'BUY' else 'SELL'
@@ -190,6 +221,22 @@ class PolymarketExecutor:
             # Calculer la quantité de shares
             shares = position_size / price if price > 0 else 0
 
+            # 📚 Plafonner à la profondeur exécutable sous le slippage toléré:
+            # un ordre que le carnet ne peut pas absorber n'est pas envoyé tel quel
+            ladder = self.get_depth(asset_id, side)
+            plan = ladder.plan(round(shares, 2), self.max_slippage_bps) if ladder else None
+            if plan:
+                if plan['shares'] <= 0:
+                    logger.warning(f"❌ Profondeur insuffisante pour {asset_id[:12]}... sous {self.max_slippage_bps}bps")
+                    return {'status': 'error', 'message': 'Profondeur insuffisante'}
+                if plan['capped']:
+                    logger.info(f"📚 Taille plafonnée à la profondeur: {shares:.2f} -> {plan['shares']:.2f} shares "
+                                f"(VWAP ${plan['vwap']:.4f})")
+                    shares = plan['shares']
+                    position_size = round(shares * plan['vwap'], 2)
+                # Limite au dernier niveau touché: tout le lot s'exécute
+                price = plan['limit_price']
+
             # Créer le résumé du trade
             trade_summary = {
                 'timestamp': datetime.now().isoformat(),
@@ -202,35 +249,25 @@ class PolymarketExecutor:
                 'status': 'pending'
             }
 
-            # Mode réel - Placer l'ordre via le CLIENT UNIFIÉ
-            result = polymarket_client.place_order(
-                token_id=asset_id,
-                side=side,
-                price=price,
-                size=shares,
-                order_type='LIMIT' # Standard
-            )
+            # Mode réel - Placer l'ordre via le netting (ordre parent partagé
+            # avec les signaux simultanés du même token)
+            # ID dérivé du signal (wallet, token, type, détection): un signal
+            # re-soumis ne re-poste pas l'ordre
+            intent = f"copy:{source_wallet}:{asset_id}:{signal_type}:{signal.get('timestamp', '')}"
+            result = self.netter.submit(asset_id, side, round(shares, 2), price, intent=intent)
+
+            if result.get('deduplicated'):
+                logger.info(f"♻️ Signal déjà exécuté ({result.get('client_order_id')}), ignoré")
+                return {'status': 'duplicate', 'order_id': result.get('orderID', 'unknown')}
             
             if result.get('status') == 'success':
+                # Prix du parent (limite la plus stricte du lot)
+                price = result.get('price', price)
+                trade_summary['price'] = price
                 trade_summary['status'] = 'executed'
                 trade_summary['order_id'] = result.get('orderID', 'unknown')
                 logger.info(f"✅ Ordre exécuté: {signal_type} {shares:.2f} shares @ ${price:.4f}")
                 
-                # ✅ Sauvegarder dans la DB
-                db_manager.save_polymarket_trade({
-                    'order_id': trade_summary['order_id'],
-                    'timestamp': trade_summary['timestamp'],
-                    'market_slug': market_slug,
-                    'token_id': asset_id,
-                    'side': side,
-                    'price': price,
-                    'size': shares,
-                    'value_usd': position_size,
-                    'status': 'EXECUTED',
-                    'signal_type': signal_type,
-                    'tx_hash': result.get('result', {}).get('transactionHash', '')
-                })
-                
                 # ✅ Récupérer la config du trader
                 sl_percent = None
                 tp_percent = None
@@ -249,7 +286,10 @@ class PolymarketExecutor:
                         tp_tiers = wallet_config.get('tp_tiers', [])
                 
                 # ✅ Enregistrer la position avec toutes les stratégies de sortie (v2.2)
-                position_id = db_manager.add_position({
+                # PENDING jusqu'au premier fill (appliqué par le FillTracker)
+                fill_tracker = get_fill_tracker()
+                track_fills = fill_tracker.enabled and side == 'BUY' and bool(result.get('orderID'))
+                position_id = get_position_store().add_position({
                     'token_id': asset_id,
                     'source_wallet': source_wallet,
                     'market_slug': market_slug,
@@ -266,11 +306,34 @@ class PolymarketExecutor:
                     'use_trailing': int(use_trailing),
                     'exit_tiers': json.dumps(tp_tiers) if tp_tiers else None,
                     'capital_recovered': 0,
-                    'status': 'OPEN',
-                    'opened_at': datetime.now().isoformat()
+                    'status': 'PENDING' if track_fills else 'OPEN',
+                    'opened_at': datetime.now().isoformat(),
+                    # Persisté pour reprendre le suivi de l'ordre après un redémarrage
+                    'order_id': trade_summary['order_id'] if track_fills else None,
+                    'order_size': (result.get('parent_size') or shares) if track_fills else None
                 })
+                if track_fills:
+                    fill_tracker.track(trade_summary['order_id'], position_id, asset_id, side, shares, price,
+                                       parent_size=result.get('parent_size'))
 
-                # ✨ WebSocket Emission
+                # ✅ Sauvegarder dans la DB
+                db_manager.save_polymarket_trade({
+                    'order_id': self._trade_key(result, position_id, trade_summary['order_id']),
+                    'timestamp': trade_summary['timestamp'],
+                    'market_slug': market_slug,
+                    'token_id': asset_id,
+                    'side': side,
+                    'price': price,
+                    'size': shares,
+                    'value_usd': position_size,
+                    'status': 'EXECUTED',
+                    'signal_type': signal_type,
+                    'tx_hash': result.get('result', {}).get('transactionHash', '')
+                })
+
+                # ✨ WebSocket Emission (delta poussé par le State Publisher)
+                mark_dirty('positions')
+                mark_dirty('pnl')
                 if self.socketio:
                     self.socketio.emit('position_update', {'type': 'NEW_POSITION', 'id': position_id})
                     logger.debug("📡 Update position émis via WebSocket")
@@ -292,9 +355,38 @@ class PolymarketExecutor:
             logger.error(f"❌ Erreur execute_copy_trade: {e}")
             return {'status': 'error', 'message': str(e)}
 
+    @staticmethod
+    def _trade_key(result: Dict, position_id, fallback: str) -> str:
+        """
+        Clé du trade en base. Les enfants d'un lot netté partagent l'orderID du
+        parent: chacun a sa propre ligne (orderID:position), sinon INSERT OR
+        REPLACE ne garderait que le dernier enfant (et son PnL).
+        """
+        order_id = result.get('orderID') or fallback
+        return f"{order_id}:{position_id}" if result.get('batch_size', 1) > 1 else order_id
+
+    def _place_netted(self, token_id: str, side: str, size: float, price: float, intents: list) -> Dict:
+        """Place l'ordre parent d'un lot de netting"""
+        if len(intents) == 1:
+            intent = intents[0]
+        elif all(intents):
+            # Même lot re-soumis = même ordre
+            intent = 'net:' + '|'.join(sorted(intents))
+        else:
+            intent = None
+        return polymarket_client.place_order(
+            token_id=token_id,
+            side=side,
+            price=price,
+            size=size,
+            order_type='LIMIT', # Standard
+            client_order_id=make_client_order_id(token_id, side, price, size, intent=intent)
+        )
+
     def on_signal_detected(self, signal: Dict):
         """
         Callback appelé quand un signal de trading est détecté.
+        Non bloquant: le signal est mis en file, exécuté par un worker.
         """
         logger.info(f"📡 Signal reçu: {signal.get('type')} de {signal.get('wallet', '')[:10]}...")
         
@@ -304,9 +396,26 @@ class PolymarketExecutor:
                  logger.info("ℹ️ Bot désactivé globalement, signal ignoré.")
                  return
                  
+        if self.execution_queue.submit(signal):
+            return {'status': 'queued'}
+        return {'status': 'rejected', 'message': "File d'exécution saturée"}
+
+    def _execute_queued(self, signal: Dict) -> Dict:
+        """Exécution d'un signal par un worker de la file"""
         result = self.execute_copy_trade(signal)
+        if result.get('status') == 'error':
+            logger.warning(f"⚠️ Signal {signal.get('type')} {signal.get('asset_id', '')[:12]}... non exécuté: {result.get('message')}")
         return result
 
+    def get_stats(self) -> Dict:
+        """Statistiques de l'exécuteur"""
+        return {
+            'execution_queue': self.execution_queue.get_stats(),
+            'netting': self.netter.get_stats(),
+            'fill_tracker': get_fill_tracker().get_stats(),
+            'position_store': get_position_store().get_stats()
+        }
+
     def sell_position(self, position_id, amount: float = None, market: str = None, side: str = None, slippage: float = 0) -> Dict:
         """
         Vend une position (totalement ou partiellement).
@@ -325,9 +434,8 @@ class PolymarketExecutor:
             # Résoudre l'ID de position pour le lock
             resolved_id = position_id if isinstance(position_id, int) else None
             if not resolved_id:
-                # Trouver l'ID depuis token_id
-                current_positions = db_manager.get_bot_positions(status=None)
-                position = next((p for p in current_positions if p.get('token_id') == position_id), None)
+                # Trouver l'ID depuis token_id (index du Position Store)
+                position = next(iter(get_position_store().get_positions_by_token(position_id)), None)
                 if position:
                     resolved_id = position.get('id') or position.get('position_id')
 
@@ -357,10 +465,12 @@ class PolymarketExecutor:
         try:
             import time
 
+            store = get_position_store()
+
             # Déterminer si c'est un ID numérique ou un token_id
             if isinstance(position_id, int):
                 # Nouveau format: ID de position unique
-                position = db_manager.get_position_by_id(position_id)
+                position = store.get_position_by_id(position_id)
                 if not position:
                     return {'success': False, 'error': f'Position #{position_id} introuvable'}
                 
@@ -373,8 +483,7 @@ class PolymarketExecutor:
             else:
                 # Ancien format: token_id (rétrocompatibilité)
                 token_id = position_id
-                current_positions = db_manager.get_bot_positions(status=None)
-                position = next((p for p in current_positions if p.get('token_id') == token_id), None)
+                position = next(iter(store.get_positions_by_token(token_id)), None)
                 
                 if not position:
                     return {'success': False, 'error': f'Position {token_id} introuvable'}
@@ -396,17 +505,21 @@ class PolymarketExecutor:
                 original_price = price
                 price = price * (1 - (slippage / 100))
                 logger.info(f"⚡ Slippage appliqué: ${original_price:.4f} -> ${price:.4f} (-{slippage}%)")
+
+                # Sortie plafonnée aux bids au-dessus de la limite: le reste
+                # repart au cycle suivant du RiskEngine sur un carnet rechargé
+                ladder = self.get_depth(token_id, 'SELL')
+                fillable = ladder.max_size_within(price) if ladder else 0.0
+                if 0 < fillable < shares_to_sell:
+                    logger.info(f"📚 Vente plafonnée à la profondeur: {shares_to_sell:.2f} -> {fillable:.2f} shares")
+                    shares_to_sell = fillable
             
-            # 3. Exécuter
-            result = polymarket_client.place_order(
-                token_id=token_id,
-                side='SELL',
-                price=price,
-                size=shares_to_sell,
-                order_type='LIMIT'
-            )
+            # 3. Exécuter (netté avec les autres sorties simultanées du token;
+            # les sorties forcées avec slippage forment leur propre lot)
+            result = self.netter.submit(token_id, 'SELL', round(shares_to_sell, 2), price, urgent=slippage > 0)
             
             if result.get('status') == 'success':
+                price = result.get('price', price)
                 logger.info(f"✅ Vente exécutée: {shares_to_sell:.2f} shares @ ${price:.4f}")
                 
                 # Calculer le PnL réalisé
@@ -419,16 +532,16 @@ class PolymarketExecutor:
                 
                 if remaining_shares < 0.0001:
                     # Fermeture complète
-                    db_manager.close_position(position_id, realized_pnl, status='CLOSED_MANUAL')
+                    store.close_position(position_id, realized_pnl, status='CLOSED_MANUAL')
                     logger.info(f"💾 Position #{position_id} fermée complètement (PnL: ${realized_pnl:.2f})")
                 else:
                     # Fermeture partielle
-                    db_manager.update_position_shares(position_id, remaining_shares)
+                    store.update_position_shares(position_id, remaining_shares)
                     logger.info(f"💾 Position #{position_id} réduite à {remaining_shares:.2f} shares")
                 
                 # Sauvegarder le trade de vente
                 db_manager.save_polymarket_trade({
-                    'order_id': result.get('orderID', f'sell_{int(time.time())}'),
+                    'order_id': self._trade_key(result, position_id, f'sell_{int(time.time())}'),
                     'timestamp': datetime.now().isoformat(),
                     'market_slug': market or 'unknown',
                     'token_id': token_id,
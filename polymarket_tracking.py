@@ -5,8 +5,14 @@ Surveille les positions et l'activité des portefeuilles cibles via:
 - Goldsky Subgraph (positions)
 - Polygonscan API (transactions historiques)
 - Gamma Markets API (prix marchés)
+
+Le polling est shardé: les wallets sont répartis par hash consistant entre
+plusieurs threads de polling (un lot de requêtes Goldsky batchées par shard),
+qui transmettent leurs signaux à un unique thread de dispatch vers l'exécuteur.
 """
 import os
+import math
+import queue
 import requests
 import time
 import threading
@@ -14,6 +20,10 @@ import logging
 from typing import List, Dict, Optional, Callable
 from datetime import datetime, timedelta
 
+from request_coalescer import coalesced_get_json
+from goldsky_client import get_goldsky_client
+from wallet_sharding import ConsistentHashRing
+
 # Configuration logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PolymarketTracker")
@@ -38,7 +48,7 @@ class PolymarketTracker:
         'USDC_POLYGON': '0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174',
     }
 
-    def __init__(self, socketio=None):
+    def __init__(self, socketio=None, wallets_per_shard: int = 50, max_shards: int = 8):
         self.tracked_wallets = {}  # {address: {name, capital, percent, ...}}
         self.last_positions = {}   # {wallet_address: {asset_id: balance}}
         self.last_transactions = {}  # {wallet_address: last_tx_hash}
@@ -58,6 +68,19 @@ class PolymarketTracker:
         self._markets_cache = {}
         self._markets_cache_time = None
 
+        # Sharding du polling (un thread par shard, un seul dispatch vers l'exécuteur)
+        self.wallets_per_shard = max(1, wallets_per_shard)
+        self.max_shards = max(1, max_shards)
+        self._ring = ConsistentHashRing(1)
+        self._lock = threading.RLock()
+        self._shard_threads: Dict[int, threading.Thread] = {}
+        self._shard_stats: Dict[int, Dict] = {}
+        self._signal_queue: "queue.Queue[Dict]" = queue.Queue()
+        self._dispatch_thread = None
+        self._interval = 30
+        self.rebalances = 0
+        self.wallets_moved = 0
+
         logger.info("🔭 PolymarketTracker initialisé")
         if self.polygonscan_api_key:
             logger.info("   ✅ Polygonscan API configurée")
@@ -72,22 +95,26 @@ class PolymarketTracker:
     def add_wallet(self, address: str, name: str = "Wallet", capital: float = 0, percent: float = 0):
         """Ajoute un wallet à la liste de surveillance avec sa config"""
         addr = address.lower()
-        self.tracked_wallets[addr] = {
-            'address': address,
-            'name': name,
-            'capital_allocated': capital,
-            'percent_per_trade': percent,
-            'added_at': datetime.now().isoformat()
-        }
+        with self._lock:
+            self.tracked_wallets[addr] = {
+                'address': address,
+                'name': name,
+                'capital_allocated': capital,
+                'percent_per_trade': percent,
+                'added_at': datetime.now().isoformat()
+            }
         logger.info(f"🔭 Wallet ajouté: {name} ({address[:10]}...) | Capital: ${capital} | %/trade: {percent}%")
+        self._rebalance()
 
     def remove_wallet(self, address: str):
         """Retire un wallet de la surveillance"""
         addr = address.lower()
-        if addr in self.tracked_wallets:
-            del self.tracked_wallets[addr]
-            if addr in self.last_positions:
-                del self.last_positions[addr]
+        with self._lock:
+            if addr in self.tracked_wallets:
+                del self.tracked_wallets[addr]
+                if addr in self.last_positions:
+                    del self.last_positions[addr]
+        self._rebalance()
 
     def add_callback(self, callback: Callable):
         """Ajoute un callback appelé lors de la détection d'un signal"""
@@ -107,37 +134,25 @@ class PolymarketTracker:
 
     def get_user_positions(self, address: str) -> List[Dict]:
         """Récupère les positions actuelles d'un utilisateur via Goldsky Subgraph."""
-        query = """
-        {
-          userBalances(first: 100, where: {user: "%s", balance_gt: "0"}) {
-            id
-            user
-            balance
-            asset {
-              id
-              condition {
-                id
-              }
-            }
-          }
-        }
-        """ % address.lower()
+        return self.get_all_user_positions([address]).get(address.lower()) or []
 
-        try:
-            resp = requests.post(self.GOLDSKY_POSITIONS, json={'query': query}, timeout=20)
+    def get_all_user_positions(self, addresses: List[str]) -> Dict[str, Optional[List[Dict]]]:
+        """
+        Récupère les positions de plusieurs wallets via des requêtes GraphQL batchées.
 
-            if resp.status_code == 200:
-                data = resp.json()
-                if 'data' in data and data['data'].get('userBalances'):
-                    return data['data']['userBalances']
-            return []
+        Returns:
+            {address_lower: [userBalance, ...]} - None pour un wallet en échec
+        """
+        try:
+            return get_goldsky_client().get_user_balances(addresses, timeout=20)
         except Exception as e:
-            logger.error(f"❌ Erreur get_user_positions: {e}")
-            return []
+            logger.error(f"❌ Erreur get_all_user_positions: {e}")
+            return {a.lower(): None for a in addresses}
 
-    def detect_position_changes(self, address: str) -> List[Dict]:
-        """Détecte les changements de position pour un wallet donné."""
-        current_positions = self.get_user_positions(address)
+    def detect_position_changes(self, address: str, current_positions: Optional[List[Dict]] = None) -> List[Dict]:
+        """Détecte les changements de position pour un wallet donné (positions pré-chargées ou non)."""
+        if current_positions is None:
+            current_positions = self.get_user_positions(address)
 
         # Convertir en dictionnaire {asset_id: balance}
         current_map = {}
@@ -146,17 +161,27 @@ class PolymarketTracker:
             if asset_id:
                 current_map[asset_id] = int(p.get('balance', 0))
 
-        wallet_info = self.tracked_wallets.get(address.lower(), {})
+        addr = address.lower()
 
-        # ✨ INITIAL SNAPSHOT: Si c'est la première fois qu'on scanne ce wallet,
-        # on enregistre l'état actuel sans déclencher d'alertes (pour éviter le spam au démarrage)
-        if address.lower() not in self.last_positions:
-            self.last_positions[address.lower()] = current_map
-            if current_map:
-                logger.info(f"📸 Snapshot initial pour {wallet_info.get('name', 'Wallet')} ({len(current_map)} positions)")
-            return []
+        # Comparaison + mise à jour atomiques de last_positions: pendant un rebalance,
+        # l'ancien et le nouveau shard peuvent scanner le même wallet; seul le premier
+        # à poser le nouvel état émet les signaux de cette transition.
+        with self._lock:
+            if addr not in self.tracked_wallets:
+                return []  # Retiré pendant le cycle
+            wallet_info = dict(self.tracked_wallets[addr])
+
+            # ✨ INITIAL SNAPSHOT: Si c'est la première fois qu'on scanne ce wallet,
+            # on enregistre l'état actuel sans déclencher d'alertes (pour éviter le spam au démarrage)
+            if addr not in self.last_positions:
+                self.last_positions[addr] = current_map
+                if current_map:
+                    logger.info(f"📸 Snapshot initial pour {wallet_info.get('name', 'Wallet')} ({len(current_map)} positions)")
+                return []
+
+            last_map = self.last_positions[addr]
+            self.last_positions[addr] = current_map
 
-        last_map = self.last_positions.get(address.lower(), {})
         changes = []
 
         # Détecter ACHATS (nouvelles positions ou augmentations)
@@ -165,7 +190,7 @@ class PolymarketTracker:
             if balance > old_balance:
                 diff = balance - old_balance
 
-                # Enrichir avec infos marché
+                # Enrichir avec infos marché (appel réseau hors verrou)
                 market_info = self.get_market_info(asset_id)
 
                 # Normalisation Amount (Assumption: 6 decimals for USDC markets)
@@ -213,8 +238,6 @@ class PolymarketTracker:
                     "source": "goldsky"
                 })
 
-        # Mettre à jour l'état
-        self.last_positions[address.lower()] = current_map
         return changes
 
     # =========================================================================
@@ -325,9 +348,9 @@ class PolymarketTracker:
 
         try:
             # Essayer l'API Gamma
-            resp = requests.get(f"{self.GAMMA_API}/markets/{token_id}", timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
+            # Coalescé: l'Insider Scanner et le client CLOB partagent la même requête
+            data = coalesced_get_json('gamma', f"{self.GAMMA_API}/markets/{token_id}", timeout=5)
+            if data:
                 market_info = {
                     'question': data.get('question', 'Unknown Market'),
                     'slug': data.get('slug', ''),
@@ -346,10 +369,9 @@ class PolymarketTracker:
     def get_active_markets(self, limit: int = 100) -> List[Dict]:
         """Récupère les marchés actifs de Polymarket."""
         try:
-            resp = requests.get(f"{self.GAMMA_API}/markets", params={'limit': limit, 'active': True}, timeout=10)
-            if resp.status_code == 200:
-                return resp.json()
-            return []
+            data = coalesced_get_json('gamma', f"{self.GAMMA_API}/markets",
+                                      params={'limit': limit, 'active': True}, timeout=10)
+            return data or []
         except Exception as e:
             logger.error(f"❌ Erreur récupération marchés: {e}")
             return []
@@ -360,11 +382,28 @@ class PolymarketTracker:
 
     def check_all_wallets(self) -> List[Dict]:
         """Vérifie tous les wallets suivis et retourne les signaux détectés."""
+        with self._lock:
+            wallets = list(self.tracked_wallets.keys())
+        return self.check_wallets(wallets)
+
+    def check_wallets(self, wallets: List[str]) -> List[Dict]:
+        """Vérifie une tranche de wallets (un shard) et retourne les signaux détectés."""
         all_signals = []
         self.last_check = datetime.now()
 
-        for wallet_address in list(self.tracked_wallets.keys()):
+        # Positions de tous les wallets actifs en une passe (documents GraphQL aliasés)
+        with self._lock:
+            active_wallets = [
+                addr for addr in wallets
+                if addr in self.tracked_wallets and self.tracked_wallets[addr].get('active', True)
+            ]
+        all_positions = self.get_all_user_positions(active_wallets) if active_wallets else {}
+
+        for wallet_address in wallets:
             try:
+                if wallet_address not in self.tracked_wallets:
+                    continue  # Retiré pendant le cycle
+
                 # ✨ Vérifier si le wallet est actif
                 wallet_info = self.tracked_wallets.get(wallet_address, {})
                 is_active = wallet_info.get('active', True)  # Par défaut actif
@@ -374,9 +413,16 @@ class PolymarketTracker:
                     continue
                 
                 # 1. Vérifier les changements de positions (Goldsky)
-                position_changes = self.detect_position_changes(wallet_address)
+                positions = all_positions.get(wallet_address.lower())
+                if positions is None:
+                    # Échec de lecture: ne pas interpréter comme une vente totale
+                    logger.debug(f"⚠️ Positions indisponibles pour {wallet_address[:10]}..., ignoré ce cycle")
+                    position_changes = []
+                else:
+                    position_changes = self.detect_position_changes(wallet_address, positions)
                 for change in position_changes:
-                    self.signals_detected += 1
+                    with self._lock:
+                        self.signals_detected += 1
                     logger.info(f"🔔 [{change['wallet_name']}] {change['type']} détecté - Asset: {change['asset_id'][:20]}...")
                     
                     # ✨ WebSocket Emission
@@ -385,7 +431,7 @@ class PolymarketTracker:
                         logger.debug("📡 Signal émis via WebSocket")
 
                     all_signals.append(change)
-                    self._notify_callbacks(change)
+                    self._dispatch_signal(change)
 
                 # 2. Vérifier les transactions Polymarket (Polygonscan)
                 if self.polygonscan_api_key:
@@ -398,28 +444,105 @@ class PolymarketTracker:
 
         return all_signals
 
+    # =========================================================================
+    # SHARDING
+    # =========================================================================
+
+    def _desired_shards(self) -> int:
+        return min(self.max_shards, max(1, math.ceil(len(self.tracked_wallets) / self.wallets_per_shard)))
+
+    def _rebalance(self):
+        """Ajuste le nombre de shards au nombre de wallets (seuls ~1/N wallets changent de shard)"""
+        with self._lock:
+            desired = self._desired_shards()
+            if desired != self._ring.size:
+                wallets = list(self.tracked_wallets)
+                before = {w: self._ring.shard_for(w) for w in wallets}
+                self._ring.resize(desired)
+                moved = sum(1 for w in wallets if self._ring.shard_for(w) != before[w])
+                self.rebalances += 1
+                self.wallets_moved += moved
+                logger.info(f"🔀 Rebalancing tracker: {desired} shard(s), {moved}/{len(wallets)} wallets déplacés")
+            if self.running:
+                self._ensure_shard_threads()
+
+    def wallets_for_shard(self, shard: int) -> List[str]:
+        """Tranche de wallets d'un shard"""
+        with self._lock:
+            return [w for w in self.tracked_wallets if self._ring.shard_for(w) == shard]
+
+    def _ensure_shard_threads(self):
+        """Un thread de polling par shard (les shards en trop s'arrêtent d'eux-mêmes)"""
+        with self._lock:
+            for shard in range(self._ring.size):
+                thread = self._shard_threads.get(shard)
+                if thread and thread.is_alive():
+                    continue
+                thread = threading.Thread(target=self._shard_loop, args=(shard,), daemon=True,
+                                          name=f"TrackerShard-{shard}")
+                self._shard_threads[shard] = thread
+                thread.start()
+
+    def _shard_loop(self, shard: int):
+        # Décalage initial: les shards ne frappent pas le rate limiter en même temps
+        time.sleep(self._interval * shard / max(1, self._ring.size))
+        stats = self._shard_stats.setdefault(shard, {'cycles': 0, 'overruns': 0, 'last_cycle_ms': 0.0, 'wallets': 0})
+        while self.running and shard < self._ring.size:
+            started = time.time()
+            wallets = self.wallets_for_shard(shard)
+            try:
+                signals = self.check_wallets(wallets)
+                if signals:
+                    logger.info(f"📊 Shard {shard}: {len(signals)} signal(s) détecté(s)")
+            except Exception as e:
+                logger.error(f"❌ Erreur monitoring shard {shard}: {e}")
+
+            elapsed = time.time() - started
+            stats['cycles'] += 1
+            stats['wallets'] = len(wallets)
+            stats['last_cycle_ms'] = round(elapsed * 1000, 1)
+            if elapsed > self._interval:
+                stats['overruns'] += 1
+            time.sleep(max(0.0, self._interval - elapsed))
+
+        with self._lock:
+            if self._shard_threads.get(shard) is threading.current_thread():
+                del self._shard_threads[shard]
+                self._shard_stats.pop(shard, None)
+
+    def _dispatch_signal(self, signal: Dict):
+        """Transmet un signal à l'exécuteur (via le thread de dispatch si le monitoring tourne)"""
+        if self.running and self._dispatch_thread:
+            self._signal_queue.put(signal)
+        else:
+            self._notify_callbacks(signal)
+
+    def _dispatch_loop(self):
+        """Thread unique vers l'exécuteur: les shards ne se bloquent pas sur l'exécution"""
+        while self.running or not self._signal_queue.empty():
+            try:
+                signal = self._signal_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._notify_callbacks(signal)
+
+    # =========================================================================
+    # MONITORING LOOP
+    # =========================================================================
+
     def start_monitoring(self, interval: int = 30):
-        """Démarre la boucle de monitoring en arrière-plan."""
+        """Démarre les threads de polling (un par shard) en arrière-plan."""
         if self.running:
             logger.warning("⚠️ Monitoring déjà en cours")
             return
 
         self.running = True
+        self._interval = interval
 
-        def monitor_loop():
-            logger.info(f"🚀 Monitoring Polymarket démarré (intervalle: {interval}s)")
-            while self.running:
-                try:
-                    signals = self.check_all_wallets()
-                    if signals:
-                        logger.info(f"📊 {len(signals)} signal(s) détecté(s)")
-                except Exception as e:
-                    logger.error(f"❌ Erreur monitoring loop: {e}")
-
-                time.sleep(interval)
-
-        self.monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        self._dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True, name="TrackerDispatch")
+        self._dispatch_thread.start()
+        self._rebalance()
+        logger.info(f"🚀 Monitoring Polymarket démarré (intervalle: {interval}s, {self._ring.size} shard(s))")
 
     def stop_monitoring(self):
         """Arrête la boucle de monitoring."""
@@ -438,6 +561,14 @@ class PolymarketTracker:
             'last_check': self.last_check.isoformat() if self.last_check else None,
             'running': self.running,
             'polygonscan_enabled': bool(self.polygonscan_api_key),
+            'sharding': {
+                'shards': self._ring.size,
+                'wallets_per_shard': self.wallets_per_shard,
+                'rebalances': self.rebalances,
+                'wallets_moved': self.wallets_moved,
+                'pending_signals': self._signal_queue.qsize(),
+                'per_shard': {str(k): dict(v) for k, v in self._shard_stats.items()}
+            },
             'wallets': [
                 {
                     'address': w['address'],
@@ -57,7 +57,8 @@ class PositionLockManager:
         """
         lock = self._get_lock(position_id)
 
-        acquired = lock.acquire(blocking=blocking, timeout=timeout)
+        # threading.Lock refuse un timeout en mode non bloquant
+        acquired = lock.acquire(blocking=blocking, timeout=timeout if blocking else -1)
 
         if acquired:
             with self._master_lock:
@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+"""
+Position Store - Positions en mémoire, persistance SQLite en write-through
+
+Chaque lecture de positions était un SELECT de toute la table suivi d'un
+re-mapping Python (sell_position par token_id deux fois, validation de chaque
+copie, Risk Engine à chaque seconde, routes Flask). Ici:
+
+    - chargement unique de bot_positions, index par id, token_id,
+      source_wallet et statut
+    - les mutations sont appliquées en mémoire immédiatement puis écrites
+      dans SQLite par un thread dédié (mêmes méthodes que db_manager)
+    - écritures coalescées par (opération, position): le prix d'une position
+      mis à jour chaque seconde ne produit qu'un UPDATE par passage du writer
+    - compteurs de modifications propres à bot_positions (triggers, voir
+      db_manager): si une autre connexion (autre processus en mode
+      multi-process) ou du SQL direct sur la même connexion a modifié la
+      table, elle est rechargée au prochain accès, après vidage des écritures
+      en attente; les écritures des autres tables ne rechargent rien
+
+Les vues renvoyées contiennent toutes les colonnes de la table plus les clés
+de compatibilité du frontend (id/position_id, asset_id, market, amount, pnl).
+"""
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger("PositionStore")
+
+
+def _view(row: Dict) -> Dict:
+    """Ligne bot_positions -> structure compatible frontend (bot.py)"""
+    return {
+        **row,
+        'position_id': row['id'],
+        'asset_id': row['token_id'],
+        'market': row.get('market_slug') or 'Unknown Market',
+        'amount': row.get('value_usd'),
+        'pnl': row.get('unrealized_pnl'),
+        'realized_pnl': row.get('realized_pnl') or 0,
+    }
+
+
+class PositionStore:
+    """
+    Dépôt de positions en mémoire. Thread-safe.
+
+    Args:
+        db: DatabaseManager (conn / lock / _execute et méthodes de position)
+    """
+
+    WRITE_INTERVAL_SEC = 0.05
+
+    def __init__(self, db: Any):
+        self.db = db
+        self._rows: Dict[int, Dict] = {}
+        self._views: Dict[int, Dict] = {}
+        self._by_token: Dict[str, Set[int]] = {}
+        self._by_wallet: Dict[str, Set[int]] = {}
+        self._by_status: Dict[str, Set[int]] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        # Compteurs vus au dernier chargement / à la dernière écriture du store:
+        # modifications des autres connexions, modifications de cette connexion
+        self._foreign_version: Optional[int] = None
+        self._local_version: Optional[int] = None
+        # Écritures différées mises en file (avec leur mutation mémoire, sous _lock):
+        # une écriture pendant un load() absente de l'instantané force un rechargement
+        self._generation = 0
+        self._reload_needed = False
+
+        self._pending: 'OrderedDict[Any, tuple]' = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._writer: Optional[threading.Thread] = None
+        self._seq = 0
+
+        # Stats
+        self.loads = 0
+        self.reads = 0
+        self.writes_queued = 0
+        self.writes_coalesced = 0
+        self.writes_applied = 0
+        self.write_errors = 0
+
+    # =========================================================================
+    # CHARGEMENT / SYNCHRONISATION
+    # =========================================================================
+
+    def _read_versions(self) -> Optional[tuple]:
+        """(modifications des autres connexions, modifications de cette connexion) ou None"""
+        try:
+            versions = self.db.get_position_versions()
+        except Exception:
+            return None
+        if versions is None:
+            return None
+        total, local = versions
+        return total - local, local
+
+    def _changed_externally(self, versions: Optional[tuple]) -> bool:
+        if versions is None:
+            return False
+        with self._lock:
+            return versions != (self._foreign_version, self._local_version)
+
+    def _own_write(self, fn: Callable, *args):
+        """
+        Écriture du store: l'avance du compteur local qu'elle provoque n'est pas
+        un changement externe. Sous le verrou de la base (aucune autre écriture
+        de la connexion ne s'intercale); un écart constaté avant l'écriture
+        (SQL direct) est conservé pour forcer le rechargement.
+        """
+        with self.db.lock:
+            before = self._read_versions()
+            result = fn(*args)
+            after = self._read_versions()
+            if before is not None and after is not None:
+                with self._lock:
+                    if before[1] == self._local_version:
+                        self._local_version = after[1]
+        return result
+
+    def load(self):
+        """(Re)charge toute la table bot_positions"""
+        with self._lock:
+            generation = self._generation
+        self.flush()
+        with self.db.lock:
+            # Compteurs lus avant la table: une écriture entre les deux provoque
+            # au pire un rechargement de trop, jamais une modification manquée
+            versions = self._read_versions()
+            cursor = self.db._execute('SELECT * FROM bot_positions', commit=False)
+            columns = [d[0] for d in cursor.description]
+            rows = [dict(zip(columns, values)) for values in cursor.fetchall()]
+        with self._lock:
+            # Mutation (+ écriture en file) après le vidage: appliquée aux anciennes
+            # lignes et peut-être absente de l'instantané -> rechargement au prochain accès
+            self._reload_needed = self._generation != generation
+            self._rows.clear()
+            self._views.clear()
+            self._by_token.clear()
+            self._by_wallet.clear()
+            self._by_status.clear()
+            for row in rows:
+                self._index(row)
+            self._loaded = True
+            self._foreign_version, self._local_version = versions or (None, None)
+            self.loads += 1
+        logger.info(f"📦 {len(rows)} position(s) chargées en mémoire")
+
+    def _sync(self):
+        """Charge au premier accès; recharge si bot_positions a été modifiée hors du store"""
+        self.reads += 1
+        if not self._loaded:
+            self.load()
+            return
+        if self._reload_needed:
+            logger.debug("🔄 Écriture pendant le dernier chargement, rechargement")
+            self.load()
+            return
+        if self._changed_externally(self._read_versions()):
+            logger.info("🔄 Positions modifiées hors du store, rechargement")
+            self.load()
+
+    # =========================================================================
+    # INDEX
+    # =========================================================================
+
+    def _index(self, row: Dict):
+        position_id = row['id']
+        self._rows[position_id] = row
+        self._views.pop(position_id, None)
+        self._by_token.setdefault(row.get('token_id'), set()).add(position_id)
+        self._by_wallet.setdefault(row.get('source_wallet'), set()).add(position_id)
+        self._by_status.setdefault(row.get('status'), set()).add(position_id)
+
+    def _unindex(self, position_id: int) -> Optional[Dict]:
+        row = self._rows.pop(position_id, None)
+        self._views.pop(position_id, None)
+        if row is None:
+            return None
+        for index, key in ((self._by_token, row.get('token_id')), (self._by_wallet, row.get('source_wallet')),
+                           (self._by_status, row.get('status'))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(position_id)
+                if not ids:
+                    del index[key]
+        return row
+
+    def _mutate(self, position_id: int, **fields) -> bool:
+        """Applique des champs à une position en mémoire (réindexe si statut/clé change)"""
+        with self._lock:
+            row = self._rows.get(position_id)
+            if row is None:
+                return False
+            fields.setdefault('last_updated', datetime.now().isoformat())
+            if {'status', 'token_id', 'source_wallet'} & fields.keys():
+                self._unindex(position_id)
+                row.update(fields)
+                self._index(row)
+            else:
+                row.update(fields)
+                self._views.pop(position_id, None)
+            return True
+
+    def _select(self, ids: Iterable[int]) -> List[Dict]:
+        """Vues (mises en cache jusqu'à la prochaine mutation), plus récentes d'abord"""
+        with self._lock:
+            views = []
+            for position_id in ids:
+                view = self._views.get(position_id)
+                if view is None:
+                    row = self._rows.get(position_id)
+                    if row is None:  # Retirée entre-temps
+                        continue
+                    view = self._views[position_id] = _view(row)
+                views.append(dict(view))
+        views.sort(key=lambda p: (p.get('opened_at_ms') or 0, p['id']), reverse=True)
+        return views
+
+    # =========================================================================
+    # LECTURES
+    # =========================================================================
+
+    def get_bot_positions(self, status: Optional[str] = 'OPEN') -> List[Dict]:
+        """Positions d'un statut (None: toutes), comme db_manager.get_bot_positions"""
+        self._sync()
+        with self._lock:
+            ids = list(self._rows) if status is None else list(self._by_status.get(status, ()))
+        return self._select(ids)
+
+    def get_open_positions(self) -> List[Dict]:
+        return self.get_bot_positions(status='OPEN')
+
+    def get_position_by_id(self, position_id: int) -> Optional[Dict]:
+        self._sync()
+        views = self._select([position_id])
+        return views[0] if views else None
+
+    def get_positions_by_token(self, token_id: str, status: Optional[str] = None) -> List[Dict]:
+        self._sync()
+        with self._lock:
+            ids = self._by_token.get(token_id, set())
+            if status is not None:
+                ids = ids & self._by_status.get(status, set())
+            ids = list(ids)
+        return self._select(ids)
+
+    def get_positions_by_wallet(self, source_wallet: str, status: Optional[str] = 'OPEN') -> List[Dict]:
+        self._sync()
+        with self._lock:
+            ids = self._by_wallet.get(source_wallet, set())
+            if status is not None:
+                ids = ids & self._by_status.get(status, set())
+            ids = list(ids)
+        return self._select(ids)
+
+    def get_realized_pnl_total(self) -> float:
+        """Somme du PnL réalisé (sans requête SQL)"""
+        self._sync()
+        with self._lock:
+            return float(sum(row.get('realized_pnl') or 0 for row in self._rows.values()))
+
+    # =========================================================================
+    # ÉCRITURES (mémoire immédiate, SQLite asynchrone)
+    # =========================================================================
+    # L'écriture SQLite part même si la position n'est pas en mémoire: la base
+    # reste la référence (un UPDATE sur un id inconnu est sans effet). Mutation
+    # mémoire et mise en file se font sous _lock: load() voit les deux ou aucune.
+
+    def add_position(self, position_data: Dict) -> int:
+        """Insertion synchrone (l'ID SQLite est nécessaire à l'appelant), puis indexation"""
+        self._sync()
+        self.flush()
+        position_id = self._own_write(self.db.add_position, position_data)
+        cursor = self.db._execute('SELECT * FROM bot_positions WHERE id = ?', (position_id,), commit=False)
+        columns = [d[0] for d in cursor.description]
+        values = cursor.fetchone()
+        if values:
+            with self._lock:
+                self._index(dict(zip(columns, values)))
+        return position_id
+
+    def update_position_price(self, position_id: int, current_price: float, unrealized_pnl: float):
+        with self._lock:
+            self._mutate(position_id, current_price=current_price, unrealized_pnl=unrealized_pnl)
+            self._enqueue(('price', position_id), self.db.update_position_price,
+                          position_id, current_price, unrealized_pnl)
+
+    def update_position_highest_price(self, position_id: int, highest_price: float):
+        with self._lock:
+            self._mutate(position_id, highest_price=highest_price)
+            self._enqueue(('highest', position_id), self.db.update_position_highest_price, position_id, highest_price)
+
+    def update_position_shares(self, position_id: int, new_shares: float):
+        with self._lock:
+            self._mutate(position_id, shares=new_shares, size=new_shares)
+            self._enqueue(('shares', position_id), self.db.update_position_shares, position_id, new_shares)
+
+    def apply_position_fill(self, position_id: int, filled_shares: float, avg_price: float):
+        with self._lock:
+            row = self._rows.get(position_id)
+            status = 'OPEN' if row and row.get('status') == 'PENDING' else (row or {}).get('status')
+            self._mutate(position_id, shares=filled_shares, size=filled_shares, avg_price=avg_price,
+                         entry_price=avg_price, value_usd=filled_shares * avg_price, status=status)
+            self._enqueue(('fill', position_id), self.db.apply_position_fill, position_id, filled_shares, avg_price)
+
+    def cancel_pending_position(self, position_id: int):
+        with self._lock:
+            row = self._rows.get(position_id)
+            if row is not None and row.get('status') == 'PENDING':
+                self._unindex(position_id)
+            self._enqueue(None, self.db.cancel_pending_position, position_id)
+
+    def close_position(self, position_id: int, realized_pnl: float, status: str = 'CLOSED_MANUAL'):
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._mutate(position_id, status=status, realized_pnl=realized_pnl, closed_at=now)
+            self._enqueue(None, self.db.close_position, position_id, realized_pnl, status)
+
+    def update_position_status(self, position_id: int, status: str):
+        with self._lock:
+            self._mutate(position_id, status=status)
+            self._enqueue(('status', position_id), self.db.update_position_status, position_id, status)
+
+    def apply_reconciliation(self, stale_ids: List[int], price_updates: List[tuple]):
+        """Réconciliation: SQLite en une transaction (synchrone), puis mémoire si elle a réussi"""
+        self.flush()
+        self._own_write(self.db.apply_position_reconciliation, stale_ids, price_updates)
+        for position_id in stale_ids:
+            self._mutate(position_id, status='STALE')
+        for position_id, current_price, unrealized_pnl in price_updates:
+            self._mutate(position_id, current_price=current_price, unrealized_pnl=unrealized_pnl)
+
+    def delete_stale_positions(self, opened_before: str) -> int:
+        """Suppression synchrone des positions STALE ouvertes avant `opened_before`"""
+        self.flush()
+        deleted = self._own_write(self.db.delete_stale_positions, opened_before)
+        with self._lock:
+            for position_id in list(self._by_status.get('STALE', ())):
+                if (self._rows[position_id].get('opened_at') or '') < opened_before:
+                    self._unindex(position_id)
+        return deleted
+
+    def delete_all_positions(self) -> int:
+        """Suppression synchrone de toutes les positions (reset des statistiques)"""
+        self.flush()
+        deleted = self._own_write(self.db.delete_all_positions)
+        with self._lock:
+            for position_id in list(self._rows):
+                self._unindex(position_id)
+        return deleted
+
+    def update_position_capital_recovered(self, position_id: int, status: int = 1):
+        with self._lock:
+            self._mutate(position_id, capital_recovered=status)
+            self._enqueue(('capital', position_id), self.db.update_position_capital_recovered, position_id, status)
+
+    def update_position_exit_tiers(self, position_id: int, tiers_json: str):
+        with self._lock:
+            self._mutate(position_id, exit_tiers=tiers_json)
+            self._enqueue(('tiers', position_id), self.db.update_position_exit_tiers, position_id, tiers_json)
+
+    # =========================================================================
+    # WRITER
+    # =========================================================================
+
+    def _enqueue(self, key: Any, fn: Callable, *args):
+        """Écriture différée; une clé déjà en attente est remplacée (dernière valeur). Appelé sous _lock"""
+        self._generation += 1
+        with self._pending_lock:
+            if key is None:
+                self._seq += 1
+                key = ('once', self._seq)
+            elif key in self._pending:
+                self.writes_coalesced += 1
+                del self._pending[key]
+            self._pending[key] = (fn, args)
+            self.writes_queued += 1
+            self._idle.clear()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="PositionWriter")
+                self._writer.start()
+        self._wake.set()
+
+    def _drain(self):
+        with self._write_lock:
+            while True:
+                with self._pending_lock:
+                    if not self._pending:
+                        self._idle.set()
+                        return
+                    _, (fn, args) = self._pending.popitem(last=False)
+                try:
+                    self._own_write(fn, *args)
+                    self.writes_applied += 1
+                except Exception as e:
+                    self.write_errors += 1
+                    logger.error(f"❌ Écriture position échouée ({getattr(fn, '__name__', fn)}): {e}")
+
+    def _writer_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            time.sleep(self.WRITE_INTERVAL_SEC)  # Laisse les mises à jour rapprochées se coalescer
+            self._drain()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Écrit tout ce qui est en attente (synchrone); False si délai dépassé"""
+        if self._idle.is_set():
+            return True
+        self._drain()
+        return self._idle.wait(timeout)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            by_status = {status: len(ids) for status, ids in self._by_status.items()}
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            'loaded': self._loaded,
+            'positions': by_status,
+            'loads': self.loads,
+            'reads': self.reads,
+            'writes_pending': pending,
+            'writes_queued': self.writes_queued,
+            'writes_coalesced': self.writes_coalesced,
+            'writes_applied': self.writes_applied,
+            'write_errors': self.write_errors
+        }
+
+
+_position_store: Optional[PositionStore] = None
+_position_store_lock = threading.Lock()
+
+
+def get_position_store() -> PositionStore:
+    """Instance globale (base du process courant), chargée au premier accès"""
+    global _position_store
+    if _position_store is None:
+        with _position_store_lock:
+            if _position_store is None:
+                from db_manager import db_manager
+                _position_store = PositionStore(db_manager)
+    return _position_store
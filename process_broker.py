@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+Process Broker - Bus local entre les processus du mode multi-process
+
+En mode multi-process (voir multiprocess_runner.py), le web, le module HFT,
+l'Insider Scanner et le copy-trading tournent chacun dans leur processus.
+Ils communiquent via ce broker, hébergé par le superviseur, sur un socket
+Unix (ou TCP localhost si indisponible) authentifié par clé:
+
+    - pub/sub     : événements Socket.IO des workers relayés par le web,
+                    canaux d'état modifiés, config sauvegardée
+    - état        : clé/valeur partagée (stats de chaque composant)
+    - commandes   : appels RPC vers le composant d'un autre processus
+                    (start/stop, set_config, ...), routés par rôle
+
+Côté web, RemoteComponent remplace l'objet local d'un composant: les méthodes
+de contrôle partent vers le worker, les stats sont lues dans l'état partagé.
+"""
+import os
+import time
+import socket
+import itertools
+import threading
+import logging
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Listener, Client
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("ProcessBroker")
+
+ENV_ADDRESS = 'BOT_BROKER_ADDRESS'
+ENV_AUTHKEY = 'BOT_BROKER_AUTHKEY'
+
+COMMAND_TIMEOUT = 10.0
+
+
+def default_address():
+    """Socket Unix dans le dossier temporaire, sinon TCP localhost (port libre)"""
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(tempfile.gettempdir(), f"bot-broker-{os.getpid()}.sock")
+    return ('127.0.0.1', 0)
+
+
+def encode_address(address) -> str:
+    if isinstance(address, tuple):
+        return f"{address[0]}:{address[1]}"
+    return address
+
+
+def decode_address(value: str):
+    if ':' in value and not value.startswith('/'):
+        host, port = value.rsplit(':', 1)
+        return (host, int(port))
+    return value
+
+
+# =========================================================================
+# BROKER (superviseur)
+# =========================================================================
+
+class _Peer:
+    """Connexion d'un worker au broker"""
+
+    def __init__(self, conn, peer_id: int):
+        self.conn = conn
+        self.id = peer_id
+        self.role: Optional[str] = None
+        self.topics = set()
+        self.send_lock = threading.Lock()
+
+    def send(self, message: Dict) -> bool:
+        try:
+            with self.send_lock:
+                self.conn.send(message)
+            return True
+        except (OSError, EOFError, ValueError):
+            return False
+
+
+class ProcessBroker:
+    """Broker pub/sub + état partagé + routage de commandes. Thread-safe."""
+
+    def __init__(self, address=None, authkey: Optional[bytes] = None):
+        self.authkey = authkey or os.urandom(16)
+        address = address or default_address()
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self._listener = Listener(address, authkey=self.authkey)
+        self.address = self._listener.address
+
+        self._peers: Dict[int, _Peer] = {}
+        self._state: Dict[str, Any] = {}
+        self._pending: Dict[int, _Peer] = {}  # req_id -> peer appelant
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._running = False
+
+        # Stats
+        self.messages_routed = 0
+        self.commands_routed = 0
+
+    def start(self):
+        """Démarre l'acceptation des connexions"""
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True, name="BrokerAccept").start()
+        logger.info(f"📮 Broker démarré sur {encode_address(self.address)}")
+
+    def stop(self):
+        self._running = False
+        try:
+            self._listener.close()
+        except OSError:
+            pass
+        with self._lock:
+            peers = list(self._peers.values())
+        for peer in peers:
+            try:
+                peer.conn.close()
+            except OSError:
+                pass
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def env(self) -> Dict[str, str]:
+        """Variables d'environnement permettant à un worker de se connecter"""
+        return {ENV_ADDRESS: encode_address(self.address), ENV_AUTHKEY: self.authkey.hex()}
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if self._running:
+                    logger.warning(f"⚠️ Connexion broker refusée: {e}")
+                continue
+            peer = _Peer(conn, next(self._ids))
+            with self._lock:
+                self._peers[peer.id] = peer
+            threading.Thread(target=self._peer_loop, args=(peer,), daemon=True,
+                             name=f"BrokerPeer-{peer.id}").start()
+
+    def _peer_loop(self, peer: _Peer):
+        try:
+            while self._running:
+                message = peer.conn.recv()
+                self._handle(peer, message)
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._peers.pop(peer.id, None)
+                orphaned = [req for req, caller in self._pending.items() if caller is peer]
+                for req in orphaned:
+                    del self._pending[req]
+            if peer.role:
+                logger.info(f"🔌 Worker '{peer.role}' déconnecté du broker")
+
+    def _handle(self, peer: _Peer, message: Dict):
+        op = message.get('op')
+
+        if op == 'hello':
+            peer.role = message.get('role')
+            logger.info(f"🔌 Worker '{peer.role}' connecté au broker")
+
+        elif op == 'sub':
+            peer.topics.add(message['topic'])
+
+        elif op == 'pub':
+            self.publish(message['topic'], message.get('data'), exclude=peer)
+
+        elif op == 'set':
+            with self._lock:
+                self._state[message['key']] = message.get('value')
+
+        elif op == 'get':
+            with self._lock:
+                value = self._state.get(message['key'])
+            peer.send({'op': 'reply', 'req': message['req'], 'value': value})
+
+        elif op == 'cmd':
+            target = self._peer_for_role(message['role'])
+            if target is None:
+                peer.send({'op': 'reply', 'req': message['req'],
+                           'error': f"Worker '{message['role']}' indisponible"})
+                return
+            with self._lock:
+                self._pending[message['req']] = peer
+                self.commands_routed += 1
+            if not target.send(message):
+                with self._lock:
+                    self._pending.pop(message['req'], None)
+                peer.send({'op': 'reply', 'req': message['req'],
+                           'error': f"Worker '{message['role']}' injoignable"})
+
+        elif op == 'cmd_result':
+            with self._lock:
+                caller = self._pending.pop(message['req'], None)
+            if caller:
+                caller.send({'op': 'reply', 'req': message['req'],
+                             'value': message.get('value'), 'error': message.get('error')})
+
+    def _peer_for_role(self, role: str) -> Optional[_Peer]:
+        with self._lock:
+            for peer in self._peers.values():
+                if peer.role == role:
+                    return peer
+        return None
+
+    def publish(self, topic: str, data: Any, exclude: Optional[_Peer] = None):
+        """Diffuse un message à tous les abonnés du topic"""
+        with self._lock:
+            targets = [p for p in self._peers.values() if topic in p.topics and p is not exclude]
+            self.messages_routed += 1
+        for peer in targets:
+            peer.send({'op': 'msg', 'topic': topic, 'data': data})
+
+    def get_state(self, key: str) -> Any:
+        with self._lock:
+            return self._state.get(key)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'address': encode_address(self.address),
+                'peers': sorted(p.role or '?' for p in self._peers.values()),
+                'state_keys': len(self._state),
+                'messages_routed': self.messages_routed,
+                'commands_routed': self.commands_routed,
+                'pending_commands': len(self._pending)
+            }
+
+
+# =========================================================================
+# CLIENT (workers)
+# =========================================================================
+
+class BrokerClient:
+    """Connexion d'un processus worker au broker"""
+
+    def __init__(self, address, authkey: bytes, role: str):
+        self.role = role
+        self._conn = Client(address, authkey=authkey)
+        self._send_lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable[[Any], None]]] = {}
+        self._replies: Dict[int, Future] = {}
+        self._reqs = itertools.count(1)
+        self._lock = threading.Lock()
+        self._services: Dict[str, Any] = {}
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"Broker-{role}")
+        self.connected = True
+
+        self._send({'op': 'hello', 'role': role})
+        threading.Thread(target=self._reader, daemon=True, name=f"BrokerReader-{role}").start()
+
+    def _send(self, message: Dict):
+        with self._send_lock:
+            self._conn.send(message)
+
+    def _next_req(self) -> int:
+        # Ids uniques entre processus: pid + compteur local
+        return os.getpid() * 1_000_000 + next(self._reqs)
+
+    def _reader(self):
+        try:
+            while True:
+                message = self._conn.recv()
+                op = message.get('op')
+                if op == 'msg':
+                    for callback in list(self._subscribers.get(message['topic'], ())):
+                        try:
+                            callback(message.get('data'))
+                        except Exception as e:
+                            logger.error(f"❌ Erreur abonné '{message['topic']}': {e}")
+                elif op == 'reply':
+                    with self._lock:
+                        future = self._replies.pop(message['req'], None)
+                    if future:
+                        if message.get('error'):
+                            future.set_exception(RuntimeError(message['error']))
+                        else:
+                            future.set_result(message.get('value'))
+                elif op == 'cmd':
+                    self._pool.submit(self._run_command, message)
+        except (EOFError, OSError):
+            logger.warning(f"⚠️ Broker déconnecté ({self.role})")
+        finally:
+            self.connected = False
+            with self._lock:
+                pending = list(self._replies.values())
+                self._replies.clear()
+            for future in pending:
+                if not future.done():
+                    future.set_exception(RuntimeError("Broker déconnecté"))
+
+    def _request(self, message: Dict, timeout: float) -> Any:
+        req = self._next_req()
+        future = Future()
+        with self._lock:
+            self._replies[req] = future
+        message['req'] = req
+        self._send(message)
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            with self._lock:
+                self._replies.pop(req, None)
+
+    # ---- pub/sub ----
+
+    def publish(self, topic: str, data: Any = None):
+        try:
+            self._send({'op': 'pub', 'topic': topic, 'data': data})
+        except (OSError, ValueError) as e:
+            logger.debug(f"Publication '{topic}' impossible: {e}")
+
+    def subscribe(self, topic: str, callback: Callable[[Any], None]):
+        first = topic not in self._subscribers
+        self._subscribers.setdefault(topic, []).append(callback)
+        if first:
+            self._send({'op': 'sub', 'topic': topic})
+
+    # ---- état partagé ----
+
+    def set_state(self, key: str, value: Any):
+        try:
+            self._send({'op': 'set', 'key': key, 'value': value})
+        except (OSError, ValueError) as e:
+            logger.debug(f"Écriture état '{key}' impossible: {e}")
+
+    def get_state(self, key: str, timeout: float = 2.0) -> Any:
+        return self._request({'op': 'get', 'key': key}, timeout)
+
+    # ---- commandes ----
+
+    def call(self, role: str, target: str, method: str, args: tuple = (), kwargs: Optional[Dict] = None,
+             timeout: float = COMMAND_TIMEOUT) -> Any:
+        """
+        Appelle `target.method(*args, **kwargs)` dans le worker `role`.
+
+        Raises:
+            RuntimeError: worker indisponible ou exception levée par la méthode
+            concurrent.futures.TimeoutError: pas de réponse dans `timeout`
+        """
+        return self._request({
+            'op': 'cmd', 'role': role, 'target': target, 'method': method,
+            'args': tuple(args), 'kwargs': kwargs or {}
+        }, timeout)
+
+    def serve(self, services: Dict[str, Any], stats_interval: float = 2.0):
+        """
+        Expose des composants locaux aux commandes distantes ({target: objet})
+        et publie leurs stats dans l'état partagé toutes les `stats_interval` s.
+        """
+        first = not self._services
+        self._services.update(services)
+        self.publish_stats()
+        if first:
+            def loop():
+                while self.connected:
+                    time.sleep(stats_interval)
+                    self.publish_stats()
+            threading.Thread(target=loop, daemon=True, name=f"BrokerStats-{self.role}").start()
+
+    def publish_stats(self):
+        """Publie get_stats() de chaque composant servi dans l'état partagé"""
+        for target, obj in self._services.items():
+            if hasattr(obj, 'get_stats'):
+                try:
+                    self.set_state(f"{self.role}:{target}:stats", obj.get_stats())
+                except Exception as e:
+                    logger.debug(f"Stats {target} indisponibles: {e}")
+
+    def _run_command(self, message: Dict):
+        result = {'op': 'cmd_result', 'req': message['req']}
+        try:
+            obj = self._services[message['target']]
+            if message['method'] == '__setattr__':
+                name, value = message['args']
+                setattr(obj, name, value)
+                result['value'] = None
+            else:
+                fn = obj
+                for part in message['method'].split('.'):
+                    fn = getattr(fn, part)
+                result['value'] = fn(*message['args'], **message['kwargs'])
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        # État à jour AVANT la réponse (même connexion = ordre garanti)
+        self.publish_stats()
+        try:
+            self._send(result)
+        except Exception as e:
+            # Résultat non sérialisable: renvoyer l'erreur plutôt que bloquer l'appelant
+            self._send({'op': 'cmd_result', 'req': message['req'], 'error': f"{type(e).__name__}: {e}"})
+
+    def close(self):
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+
+
+def connect_from_env(role: str) -> Optional[BrokerClient]:
+    """Connecte le processus courant au broker si lancé par le superviseur"""
+    address = os.getenv(ENV_ADDRESS)
+    authkey = os.getenv(ENV_AUTHKEY)
+    if not address or not authkey:
+        return None
+    return BrokerClient(decode_address(address), bytes.fromhex(authkey), role)
+
+
+# =========================================================================
+# ADAPTATEURS
+# =========================================================================
+
+class BrokerEmitter:
+    """
+    Remplace `socketio` dans un worker: les emit() sont relayés via le broker
+    au processus web, qui les diffuse aux navigateurs.
+    """
+
+    def __init__(self, client: BrokerClient):
+        self.client = client
+
+    def emit(self, event: str, data: Any = None, namespace: Optional[str] = None, to: Optional[str] = None, **kwargs):
+        self.client.publish('socketio', {'event': event, 'data': data, 'namespace': namespace or '/', 'to': to})
+
+
+class _RemoteMethod:
+    def __init__(self, component: 'RemoteComponent', path: str):
+        self._component = component
+        self._path = path
+
+    def __call__(self, *args, **kwargs):
+        c = self._component
+        timeout = c._timeouts.get(self._path, COMMAND_TIMEOUT)
+        return c._client.call(c._role, c._target, self._path, args, kwargs, timeout=timeout)
+
+    def __getattr__(self, name: str):
+        return _RemoteMethod(self._component, f"{self._path}.{name}")
+
+
+class RemoteComponent:
+    """
+    Proxy côté web d'un composant tournant dans un worker.
+
+    - méthodes listées dans `remote_methods` (chemins pointés autorisés via le
+      premier segment, ex: 'market_discovery') -> commande vers le worker
+    - get_stats() et attributs présents dans les stats -> état partagé
+    - le reste -> objet local (lectures DB sans état de boucle)
+    - affectation d'attribut -> locale ET distante
+    """
+
+    def __init__(self, client: BrokerClient, role: str, target: str, local: Any,
+                 remote_methods: Iterable[str] = (), timeouts: Optional[Dict[str, float]] = None):
+        object.__setattr__(self, '_client', client)
+        object.__setattr__(self, '_role', role)
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_local', local)
+        object.__setattr__(self, '_remote', set(remote_methods))
+        object.__setattr__(self, '_timeouts', timeouts or {})
+
+    def get_stats(self) -> Dict:
+        try:
+            stats = self._client.get_state(f"{self._role}:{self._target}:stats")
+        except Exception:
+            stats = None
+        if stats is None and hasattr(self._local, 'get_stats'):
+            stats = self._local.get_stats()
+        return stats or {}
+
+    def __getattr__(self, name: str):
+        if name in self._remote:
+            return _RemoteMethod(self, name)
+        stats = self.get_stats()
+        if isinstance(stats, dict) and name in stats:
+            return stats[name]
+        return getattr(self._local, name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._local, name, value)
+        self._client.call(self._role, self._target, '__setattr__', (name, value))
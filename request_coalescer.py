@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Request Coalescer - Fusion des requêtes concurrentes identiques (single-flight)
+
+Quand une whale trade, le Tracker, le HFT Monitor, l'Executor et le Risk Engine
+peuvent demander le même marché / carnet d'ordres à quelques millisecondes d'écart.
+Les caches ne sont remplis qu'au retour de la réponse HTTP: sans coalescing,
+chacun émet sa propre requête.
+
+Ce module garantit qu'une seule requête est en vol par clé: les appelants
+concurrents attendent le même Future et reçoivent le même résultat.
+"""
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("RequestCoalescer")
+
+
+class RequestCoalescer:
+    """
+    Coalesce les appels concurrents sur une même clé.
+    Thread-safe et partagé entre tous les composants.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        # Stats par namespace (préfixe de clé avant ':')
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        logger.info("RequestCoalescer initialisé")
+
+    @staticmethod
+    def _namespace(key: str) -> str:
+        idx = key.find(':')
+        return key[:idx] if idx > 0 else 'default'
+
+    def _ns_stats(self, key: str) -> Dict[str, int]:
+        ns = self._namespace(key)
+        stats = self._stats.get(ns)
+        if stats is None:
+            stats = {'requests': 0, 'executed': 0, 'saved': 0, 'errors': 0}
+            self._stats[ns] = stats
+        return stats
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Exécute `fn` une seule fois pour tous les appels concurrents de même clé.
+
+        Args:
+            key: Clé de la requête (ex: "gamma:markets/<id>", "clob:book:<token>")
+            fn: Fonction sans argument qui effectue la requête
+            timeout: Attente max (s) pour les appelants qui rejoignent une requête en vol
+
+        Returns:
+            Le résultat de `fn` (ou lève son exception)
+        """
+        with self._lock:
+            stats = self._ns_stats(key)
+            stats['requests'] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                stats['saved'] += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                stats['executed'] += 1
+                leader = True
+
+        if not leader:
+            return future.result(timeout=timeout)
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            with self._lock:
+                stats['errors'] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def in_flight(self) -> int:
+        """Nombre de requêtes actuellement en vol"""
+        with self._lock:
+            return len(self._inflight)
+
+    def get_stats(self) -> Dict:
+        """Retourne les statistiques (requêtes économisées par namespace)"""
+        with self._lock:
+            namespaces = {ns: dict(s) for ns, s in self._stats.items()}
+            in_flight = len(self._inflight)
+
+        total_requests = sum(s['requests'] for s in namespaces.values())
+        total_saved = sum(s['saved'] for s in namespaces.values())
+
+        return {
+            'total_requests': total_requests,
+            'requests_saved': total_saved,
+            'saved_rate': round(total_saved / total_requests * 100, 2) if total_requests else 0,
+            'in_flight': in_flight,
+            'namespaces': namespaces
+        }
+
+
+# Instance globale pour import facile
+_request_coalescer = None
+_init_lock = threading.Lock()
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """Retourne l'instance partagée du coalescer"""
+    global _request_coalescer
+    if _request_coalescer is None:
+        with _init_lock:
+            if _request_coalescer is None:
+                _request_coalescer = RequestCoalescer()
+    return _request_coalescer
+
+
+def coalesced_get_json(namespace: str, url: str, params: Optional[Dict] = None,
+                       timeout: float = 10, session=None) -> Optional[Any]:
+    """
+    GET HTTP coalescé: les appels concurrents sur la même URL partagent la réponse.
+
+    Args:
+        namespace: Namespace pour les stats ('gamma', 'clob', ...)
+        url: URL complète
+        params: Query params (inclus dans la clé)
+        timeout: Timeout HTTP en secondes
+        session: requests.Session optionnelle (sinon module requests)
+
+    Returns:
+        Le JSON décodé si statut 200, None sinon
+    """
+    if params:
+        query = '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
+        key = f"{namespace}:{url}?{query}"
+    else:
+        key = f"{namespace}:{url}"
+
+    def fetch():
+        http = session
+        if http is None:
+            import requests as http
+        resp = http.get(url, params=params, timeout=timeout)
+        if resp.status_code == 200:
+            return resp.json()
+        return None
+
+    return get_request_coalescer().do(key, fetch)
@@ -7,9 +7,12 @@ import time
 import threading
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
-from db_manager import db_manager
+from typing import Callable, List, Dict, Optional
+from position_store import get_position_store
+from timeseries_store import get_timeseries_store
+from state_publisher import mark_dirty
 
 logger = logging.getLogger("RiskEngine")
 
@@ -17,7 +20,7 @@ class RiskEngine:
     def __init__(self, executor, client, poll_interval: float = 1.0):
         self.executor = executor
         self.client = client
-        self.db = db_manager
+        self.db = get_position_store()  # Positions en mémoire, écritures SQLite asynchrones
         self.poll_interval = poll_interval
         self.running = False
         self.thread = None
@@ -25,6 +28,18 @@ class RiskEngine:
         # Cache de prix partagé pour éviter les appels API redondants par seconde
         self.price_cache = {} # {token_id: (price, timestamp)}
         self.cache_ttl = 0.8 # Cache très court pour la réactivité
+
+        # Historique des marks et de l'equity (rollups 1m/1h/1d)
+        self.timeseries = get_timeseries_store()
+        self._unrealized = {}  # {pos_id: unrealized_pnl} du cycle courant
+        self._realized_total = 0.0
+        self._realized_ts = 0.0
+        self.realized_ttl = 60  # Le PnL réalisé ne change qu'à la clôture
+
+        # Sorties décidées pendant le cycle, exécutées ensemble en fin de cycle:
+        # les sorties d'un même token tombent dans la même fenêtre de netting
+        self._exits: List[Dict] = []
+        self._exit_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="RiskExit")
         
         logger.info("🛡️ Risk Engine Unifié initialisé (Intervalle: {}s)".format(poll_interval))
 
@@ -61,15 +76,35 @@ class RiskEngine:
     def _process_cycle(self):
         """Un cycle complet de vérification de toutes les positions"""
         positions = self.db.get_bot_positions(status='OPEN')
-        if not positions:
-            return
 
+        self._unrealized = {}
+        self._exits = []
         for pos in positions:
             try:
                 self._check_position(pos)
             except Exception as e:
                 logger.error(f"❌ Erreur position #{pos.get('id')}: {e}")
 
+        self._flush_exits()
+        self._record_equity()
+        self.timeseries.maybe_flush()
+
+        # Prix / PnL mis à jour: le State Publisher enverra les deltas à la prochaine frame
+        if positions:
+            mark_dirty('positions')
+            mark_dirty('pnl')
+
+    def _record_equity(self):
+        """Enregistre l'equity du portefeuille (PnL réalisé + latent)"""
+        now = time.time()
+        if now - self._realized_ts >= self.realized_ttl:
+            try:
+                self._realized_total = self.db.get_realized_pnl_total()
+                self._realized_ts = now
+            except Exception as e:
+                logger.debug(f"Erreur PnL réalisé: {e}")
+        self.timeseries.record('equity', self._realized_total + sum(self._unrealized.values()), now)
+
     def _get_price(self, token_id: str) -> Optional[float]:
         """Récupère le prix avec un cache très court"""
         now = time.time()
@@ -108,6 +143,9 @@ class RiskEngine:
             
         unrealized_pnl = (current_price - entry_price) * pos.get('shares', 0)
         self.db.update_position_price(pos_id, current_price, unrealized_pnl)
+        self._unrealized[pos_id] = unrealized_pnl
+        self.timeseries.record(f"pos:{pos_id}:price", current_price)
+        self.timeseries.record(f"pos:{pos_id}:upnl", unrealized_pnl)
 
         # 3. Check STOP LOSS (Classique)
         sl_pct = pos.get('sl_percent')
@@ -147,8 +185,9 @@ class RiskEngine:
                     
                     if shares_to_sell < total_shares:
                         logger.info(f"   Vente de {shares_to_sell:.4f} shares pour récupérer ${initial_investment:.2f}")
-                        self._trigger_exit(pos, reason='CAPITAL_RECOVERY', amount_shares=shares_to_sell)
-                        self.db.update_position_capital_recovered(pos_id, 1)
+                        # Marqué seulement si la vente passe (sinon retentée au cycle suivant)
+                        self._trigger_exit(pos, reason='CAPITAL_RECOVERY', amount_shares=shares_to_sell,
+                                           on_success=lambda: self.db.update_position_capital_recovered(pos_id, 1))
                         return # On s'arrête là pour ce cycle
 
         # 7. Paliers de sortie (Partial TP)
@@ -164,19 +203,25 @@ class RiskEngine:
                         logger.info(f"🎯 PALIER TP {tier['profit']}% atteint pour #{pos_id}")
                         
                         shares_to_sell = pos['shares'] * (pct / 100.0)
-                        self._trigger_exit(pos, reason=f'PARTIAL_TP_{tier["profit"]}%', amount_shares=shares_to_sell)
-                        
-                        # Marquer le palier comme exécuté dans le JSON et update DB
+
+                        # Palier marqué exécuté dans le JSON une fois la vente réussie
                         tier['executed'] = True
-                        self.db.update_position_exit_tiers(pos_id, json.dumps(tiers))
+                        tiers_json = json.dumps(tiers)
+                        self._trigger_exit(pos, reason=f'PARTIAL_TP_{tier["profit"]}%', amount_shares=shares_to_sell,
+                                           on_success=lambda: self.db.update_position_exit_tiers(pos_id, tiers_json))
                         return
             except Exception as e:
                 logger.error(f"❌ Erreur processing tiers #{pos_id}: {e}")
 
-    def _trigger_exit(self, pos: Dict, reason: str, amount_usd: float = None, amount_shares: float = None):
-        """Exécute l'ordre de sortie"""
+    def _trigger_exit(self, pos: Dict, reason: str, amount_usd: float = None, amount_shares: float = None,
+                      on_success: Optional[Callable[[], None]] = None):
+        """Décide l'ordre de sortie (exécuté en fin de cycle par _flush_exits)
+
+        `on_success`: persistance liée à la sortie (palier, capital récupéré),
+        appelée seulement si la vente réussit.
+        """
         pos_id = pos['id']
-        logger.info(f"🔻 Exécution sortie position #{pos_id} | Raison: {reason}")
+        logger.info(f"🔻 Sortie position #{pos_id} programmée | Raison: {reason}")
         
         # Déterminer le slippage à appliquer selon la raison
         # Sorties d'urgence (SL, Trailing) = Slippage plus agressif (1%)
@@ -191,16 +236,44 @@ class RiskEngine:
             if current_price:
                 amount_usd = amount_shares * current_price
 
+        self._exits.append({'pos': pos, 'reason': reason, 'amount_usd': amount_usd, 'slippage': slippage,
+                            'on_success': on_success})
+
+    def _flush_exits(self):
+        """Exécute les sorties du cycle en parallèle (nettées par token dans l'exécuteur)"""
+        exits, self._exits = self._exits, []
+        if not exits:
+            return
+
+        tokens = {e['pos']['token_id'] for e in exits}
+        if len(tokens) < len(exits):
+            logger.info(f"🧮 {len(exits)} sorties sur {len(tokens)} token(s) ce cycle")
+        futures = [self._exit_pool.submit(self._execute_exit, e) for e in exits]
+        for exit_order, future in zip(exits, futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"❌ Erreur sortie #{exit_order['pos']['id']}: {e}")
+
+    def _execute_exit(self, exit_order: Dict):
+        """Exécute l'ordre de sortie"""
+        pos = exit_order['pos']
+        pos_id = pos['id']
+        reason = exit_order['reason']
+        logger.info(f"🔻 Exécution sortie position #{pos_id} | Raison: {reason}")
+
         # Appel à l'executor
         result = self.executor.sell_position(
             position_id=pos_id,
-            amount=amount_usd, # En USD
+            amount=exit_order['amount_usd'], # En USD
             market=pos.get('market_slug'),
-            slippage=slippage
+            slippage=exit_order['slippage']
         )
         
         if result.get('success'):
             logger.info(f"✅ Position #{pos_id} clôturée via {reason}")
+            if exit_order.get('on_success'):
+                exit_order['on_success']()
         else:
             logger.error(f"❌ Échec sortie #{pos_id}: {result.get('error')}")
 
@@ -1,21 +1,132 @@
 import os
+import json
 import base64
+import hmac
+import hashlib
+import tempfile
+import threading
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from pathlib import Path
 import subprocess
 
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+
+def _boot_id() -> str:
+    """Identifiant du boot courant ('' si indisponible: pas de cache trousseau)"""
+    try:
+        return Path('/proc/sys/kernel/random/boot_id').read_text().strip()
+    except OSError:
+        pass
+    try:
+        return subprocess.check_output(['sysctl', '-n', 'kern.boottime'], timeout=2).decode().strip()
+    except Exception:
+        return ''
+
+
+KEYRING_SERVICE = 'bot-du-millionaire'
+KEYRING_ENTRY = 'derived-key'
+
+# Clés dérivées du processus courant: {sha256(mot de passe): (hardware_uid, key)}
+_process_keys = {}
+_process_keys_lock = threading.Lock()
+
+
+def _purge_disk_cache():
+    """Anciennes versions: clé dérivée en clair sur disque (tmp partagé ou dossier de cache)"""
+    paths = list(Path(tempfile.gettempdir()).glob('bot-keycache-*.json'))
+    for base in (os.getenv('XDG_RUNTIME_DIR'), os.path.join(os.path.expanduser('~'), '.cache')):
+        if base:
+            paths.extend((Path(base) / 'bot-du-millionaire').glob('keycache-*.json'))
+    for path in paths:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
 class SecretManager:
     """Gère le chiffrement et déchiffrement des secrets (clés privées, etc.)"""
-    
+
     def __init__(self, master_password: str = None):
         # On utilise une phrase de passe maître + UUID matériel pour dériver la clé
         self.password = (master_password or os.getenv("MASTER_KEY", "MillionaireBotDefaultKey")).encode()
-        self.hardware_uid = self._get_hardware_uuid().encode()
-        self.salt = b'bot_du_millionnaire_' + self.hardware_uid # Sel lié à la machine
-        self.key = self._derive_key()
-        self.fernet = Fernet(self.key)
+        # Dérivation paresseuse (PBKDF2 200k + ioreg): au premier chiffrement/déchiffrement réel
+        self.hardware_uid = None
+        self.salt = None
+        self.key = None
+        self._fernet = None
+        self._lock = threading.Lock()
+
+    @property
+    def fernet(self) -> Fernet:
+        if self._fernet is None:
+            with self._lock:
+                if self._fernet is None:
+                    self._load_key()
+        return self._fernet
+
+    def _cache_check(self, key: bytes) -> str:
+        """Vérifie qu'une clé en cache correspond au mot de passe maître courant"""
+        return hmac.new(key, self.password, hashlib.sha256).hexdigest()
+
+    def _use_key(self, hardware_uid: bytes, key: bytes):
+        self.hardware_uid = hardware_uid
+        self.salt = b'bot_du_millionnaire_' + self.hardware_uid
+        self.key = key
+        self._fernet = Fernet(self.key)
+
+    def _read_keyring(self, boot: str) -> bool:
+        """Charge la clé du boot courant depuis le trousseau de l'OS (jamais sur disque en clair)"""
+        try:
+            cached = json.loads(keyring.get_password(KEYRING_SERVICE, KEYRING_ENTRY) or '{}')
+            if cached.get('boot_id') != boot:
+                return False
+            key = cached['key'].encode()
+            if not hmac.compare_digest(cached.get('check', ''), self._cache_check(key)):
+                return False
+            self._use_key(cached['hardware_uid'].encode(), key)
+            return True
+        except Exception:
+            return False  # Trousseau indisponible ou entrée illisible
+
+    def _write_keyring(self, boot: str):
+        try:
+            keyring.set_password(KEYRING_SERVICE, KEYRING_ENTRY, json.dumps({
+                'boot_id': boot,
+                'hardware_uid': self.hardware_uid.decode(),
+                'key': self.key.decode(),
+                'check': self._cache_check(self.key)
+            }))
+        except Exception:
+            pass
+
+    def _load_key(self):
+        _purge_disk_cache()
+        # Cache mémoire du processus, puis trousseau de l'OS (valable pour le boot courant)
+        slot = hashlib.sha256(self.password).hexdigest()
+        with _process_keys_lock:
+            cached = _process_keys.get(slot)
+        if cached:
+            self._use_key(*cached)
+            return
+
+        boot = _boot_id() if keyring else ''
+        if not (boot and self._read_keyring(boot)):
+            self.hardware_uid = self._get_hardware_uuid().encode()
+            self.salt = b'bot_du_millionnaire_' + self.hardware_uid # Sel lié à la machine
+            self.key = self._derive_key()
+            self._fernet = Fernet(self.key)
+            if boot:
+                self._write_keyring(boot)
+
+        with _process_keys_lock:
+            _process_keys[slot] = (self.hardware_uid, self.key)
 
     def _get_hardware_uuid(self) -> str:
         """Récupère l'UUID unique du Mac pour le machine binding"""
@@ -22,4 +22,9 @@ echo "🟢 Lancement du bot !"
 # 4. Ouvrir le navigateur automatiquement après 3 secondes (en background)
 (sleep 3 && open "http://localhost:5000") &
 
-./venv/bin/python bot.py
+# BOT_MULTIPROCESS=1 : web, HFT, Insider et copy-trading dans des processus séparés
+if [ "$BOT_MULTIPROCESS" = "1" ]; then
+    ./venv/bin/python multiprocess_runner.py
+else
+    ./venv/bin/python bot.py
+fi
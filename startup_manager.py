@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Startup Manager - Démarrage par phases et état de disponibilité
+
+bot.py démarrait tout de façon synchrone à l'import (tracker, risk engine,
+scanners, client CLOB) avant que Flask ne serve la première requête.
+Désormais:
+    - les phases synchrones (imports, init légère) sont chronométrées
+    - les sous-systèmes lourds démarrent en arrière-plan une fois le serveur
+      lancé, avec dépendances éventuelles entre eux
+    - l'état de chaque phase (pending/running/ready/failed/skipped) est
+      exposé sur /health et un rapport de timings est loggé à la fin
+"""
+import time
+import threading
+import logging
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger("StartupManager")
+
+PENDING = 'pending'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+_DONE = (READY, FAILED, SKIPPED)
+
+
+class _Phase:
+    def __init__(self, name: str, background: bool):
+        self.name = name
+        self.background = background
+        self.state = PENDING
+        self.started_at: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+
+class StartupManager:
+    """Suivi des phases de démarrage. Thread-safe."""
+
+    def __init__(self):
+        self.boot_time = time.time()
+        self._phases: Dict[str, _Phase] = {}
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def _get(self, name: str, background: bool = False) -> _Phase:
+        with self._lock:
+            phase = self._phases.get(name)
+            if phase is None:
+                phase = self._phases[name] = _Phase(name, background)
+            return phase
+
+    # =========================================================================
+    # PHASES
+    # =========================================================================
+
+    def record(self, name: str, started_at: float, error: Optional[Exception] = None):
+        """Enregistre une phase synchrone déjà exécutée (depuis `started_at`)"""
+        phase = self._get(name)
+        phase.started_at = started_at
+        self._finish(phase, FAILED if error else READY, error)
+
+    def skip(self, name: str, reason: str = ''):
+        """Phase désactivée (config, mode multi-process...)"""
+        phase = self._get(name)
+        phase.error = reason or None
+        self._finish(phase, SKIPPED)
+
+    def background(self, name: str, fn: Callable[[], None], after: Iterable[str] = ()):
+        """
+        Lance `fn` dans un thread dédié, après la fin des phases `after`.
+        Une phase dépendante d'une phase en échec échoue sans s'exécuter.
+        """
+        phase = self._get(name, background=True)
+        deps = [self._get(dep) for dep in after]
+
+        def run():
+            for dep in deps:
+                dep.done.wait()
+                if dep.state == FAILED:
+                    self._finish(phase, FAILED, RuntimeError(f"dépendance '{dep.name}' en échec"))
+                    return
+            phase.state = RUNNING
+            phase.started_at = time.time()
+            try:
+                fn()
+                self._finish(phase, READY)
+            except Exception as e:
+                logger.error(f"❌ Démarrage '{name}' échoué: {e}")
+                self._finish(phase, FAILED, e)
+
+        threading.Thread(target=run, daemon=True, name=f"Startup-{name}").start()
+
+    def _finish(self, phase: _Phase, state: str, error: Optional[Exception] = None):
+        if phase.started_at is not None:
+            phase.duration_ms = round((time.time() - phase.started_at) * 1000, 1)
+        if error is not None:
+            phase.error = str(error)
+        phase.state = state
+        phase.done.set()
+
+        with self._lock:
+            complete = all(p.state in _DONE for p in self._phases.values())
+            should_report = complete and not self._reported and any(p.background for p in self._phases.values())
+            if should_report:
+                self._reported = True
+        if should_report:
+            self.log_report()
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Attend la fin d'une phase; True si elle est prête"""
+        phase = self._get(name)
+        phase.done.wait(timeout)
+        return phase.state == READY
+
+    # =========================================================================
+    # ÉTAT
+    # =========================================================================
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(p.state in (READY, SKIPPED) for p in self._phases.values())
+
+    def get_status(self) -> Dict:
+        """État de disponibilité pour /health"""
+        with self._lock:
+            phases = {
+                p.name: {
+                    'state': p.state,
+                    'duration_ms': p.duration_ms,
+                    **({'error': p.error} if p.error else {})
+                }
+                for p in self._phases.values()
+            }
+        ready = all(p['state'] in (READY, SKIPPED) for p in phases.values())
+        failed = sorted(name for name, p in phases.items() if p['state'] == FAILED)
+        return {
+            # 'degraded': au moins une phase en échec (état terminal, ne redeviendra pas 'ok')
+            'status': 'degraded' if failed else ('ok' if ready else 'starting'),
+            'ready': ready,
+            'failed': failed,
+            'uptime_sec': round(time.time() - self.boot_time, 1),
+            'phases': phases
+        }
+
+    def log_report(self):
+        """Logge le rapport de timings par phase"""
+        with self._lock:
+            phases = sorted(self._phases.values(), key=lambda p: p.started_at or 0)
+        total = round((time.time() - self.boot_time) * 1000, 1)
+        logger.info(f"⏱️ Rapport de démarrage ({total} ms depuis le boot)")
+        for p in phases:
+            mode = 'bg  ' if p.background else 'sync'
+            duration = f"{p.duration_ms:>9.1f} ms" if p.duration_ms is not None else '        - ms'
+            suffix = f" ({p.error})" if p.error else ''
+            logger.info(f"   {mode} {p.name:<22} {duration}  {p.state}{suffix}")
+
+
+# Instance globale
+startup_manager = StartupManager()
@@ -3,11 +3,20 @@
 Startup Reconciler
 Réconcilie l'état des positions au démarrage du bot.
 Détecte les positions orphelines et les synchronise avec l'état réel.
+
+La réconciliation se fait en trois temps pour que la gestion du risque soit
+fiable au plus vite après un redémarrage:
+    1. prix de tous les tokens distincts récupérés en parallèle (un appel par token)
+    2. évaluation des positions en mémoire
+    3. marquages STALE et mises à jour de prix appliqués en une seule transaction
+La durée de chaque phase figure dans le rapport (`timings_ms`).
 """
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
-from db_manager import db_manager
+from typing import Dict, Iterable, List, Optional, Tuple
+from position_store import get_position_store
 
 logger = logging.getLogger("StartupReconciler")
 
@@ -17,28 +26,42 @@ class StartupReconciler:
     Réconcilie les positions au démarrage du bot.
 
     Responsabilités:
+    - Reprendre le suivi des ordres d'achat des positions PENDING
     - Détecter les positions OPEN qui auraient dû être fermées
     - Marquer les positions périmées comme STALE
     - Nettoyer les positions incohérentes
     - Générer un rapport de réconciliation
     """
 
-    def __init__(self, executor=None):
+    def __init__(self, executor=None, store=None, max_workers: int = 16, fill_tracker=None):
         """
         Args:
             executor: PolymarketExecutor pour récupérer les prix actuels
+            store: PositionStore (défaut: instance globale)
+            max_workers: Requêtes de prix simultanées
+            fill_tracker: FillTracker qui reprend les positions PENDING (None: pas de reprise)
         """
         self.executor = executor
+        self.store = store or get_position_store()
+        self.fill_tracker = fill_tracker
+        self.max_workers = max(1, int(max_workers))
         self.report = {
             'timestamp': None,
             'positions_checked': 0,
             'positions_updated': 0,
             'positions_closed': 0,
             'positions_stale': 0,
+            'pending_resumed': 0,
+            'pending_untracked': 0,
+            'tokens_priced': 0,
+            'timings_ms': {},
             'errors': [],
             'details': []
         }
 
+    def _timing(self, phase: str, started: float):
+        self.report['timings_ms'][phase] = round((time.perf_counter() - started) * 1000, 1)
+
     def reconcile(self) -> Dict:
         """
         Exécute la réconciliation complète au démarrage.
@@ -48,11 +71,17 @@ class StartupReconciler:
         """
         logger.info("🔄 Démarrage de la réconciliation des positions...")
         self.report['timestamp'] = datetime.now().isoformat()
+        started = time.perf_counter()
 
         try:
+            # 0. Ordres d'achat en vol au redémarrage: le suivi des fills reprend
+            self._resume_pending()
+
             # 1. Récupérer toutes les positions OPEN
-            open_positions = db_manager.get_bot_positions(status='OPEN')
+            phase = time.perf_counter()
+            open_positions = self.store.get_bot_positions(status='OPEN')
             self.report['positions_checked'] = len(open_positions)
+            self._timing('load', phase)
 
             if not open_positions:
                 logger.info("✅ Aucune position ouverte à réconcilier")
@@ -60,11 +89,30 @@ class StartupReconciler:
 
             logger.info(f"📊 {len(open_positions)} positions ouvertes à vérifier")
 
-            # 2. Vérifier chaque position
-            for position in open_positions:
-                self._check_position(position)
+            # 2. Prix de tous les tokens distincts, en parallèle
+            phase = time.perf_counter()
+            prices = self._fetch_prices(p.get('token_id') for p in open_positions)
+            self.report['tokens_priced'] = len(prices)
+            self._timing('pricing', phase)
 
-            # 3. Générer le résumé
+            # 3. Évaluer chaque position en mémoire
+            phase = time.perf_counter()
+            stale: List[int] = []
+            price_updates: List[Tuple[int, float, float]] = []
+            for position in open_positions:
+                self._check_position(position, prices, stale, price_updates)
+            self._timing('evaluate', phase)
+
+            # 4. Appliquer toutes les modifications en une transaction
+            phase = time.perf_counter()
+            if stale or price_updates:
+                self.store.apply_reconciliation(stale, price_updates)
+            self.report['positions_stale'] = len(stale)
+            self.report['positions_updated'] = len(price_updates)
+            self._timing('persist', phase)
+
+            # 5. Générer le résumé
+            self._timing('total', started)
             self._generate_summary()
 
             return self.report
@@ -73,34 +121,66 @@ class StartupReconciler:
             logger.error(f"❌ Erreur lors de la réconciliation: {e}")
             self.report['errors'].append(str(e))
             return self.report
+        finally:
+            self._timing('total', started)
 
-    def _check_position(self, position: Dict):
-        """Vérifie et réconcilie une position individuelle."""
+    def _resume_pending(self):
+        """Réenregistre les positions PENDING auprès du FillTracker"""
+        pending = self.store.get_bot_positions(status='PENDING')
+        if not pending:
+            return
+        untracked = [p for p in pending if not p.get('order_id')]
+        self.report['pending_untracked'] = len(untracked)
+        for position in untracked:
+            self._log_issue(position, "Position PENDING sans order ID: suivi des fills impossible")
+        if self.fill_tracker is not None and len(untracked) < len(pending):
+            self.report['pending_resumed'] = self.fill_tracker.resume_pending()
+
+    def _fetch_prices(self, token_ids: Iterable[Optional[str]]) -> Dict[str, object]:
+        """Prix de vente de chaque token distinct ({token_id: prix, None ou exception})"""
+        unique = list(dict.fromkeys(t for t in token_ids if t))
+        if not self.executor or not unique:
+            return {}
+
+        def fetch(token_id):
+            try:
+                return token_id, self.executor.get_market_price(token_id, 'SELL')
+            except Exception as e:
+                return token_id, e
+
+        workers = min(self.max_workers, len(unique))
+        if workers == 1:
+            return dict(fetch(t) for t in unique)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ReconcilePrice") as pool:
+            return dict(pool.map(fetch, unique))
+
+    def _check_position(self, position: Dict, prices: Dict[str, object], stale: List[int],
+                        price_updates: List[Tuple[int, float, float]]):
+        """Décide l'action pour une position (sans écriture: accumulée pour la transaction)"""
         pos_id = position.get('id')
-        token_id = position.get('token_id')
-        market = position.get('market_slug', 'unknown')
-        opened_at = position.get('opened_at')
 
         try:
             # 1. Vérifier l'âge de la position
             age_issue = self._check_position_age(position)
 
             # 2. Vérifier si le prix est disponible
-            price_issue = self._check_price_availability(position)
+            price_issue = self._check_price_availability(position, prices)
 
             # 3. Vérifier les données manquantes
             data_issue = self._check_data_integrity(position)
 
             # 4. Décider de l'action à prendre
             if age_issue == 'STALE':
-                self._mark_as_stale(position, "Position trop ancienne sans mise à jour")
+                self._mark_as_stale(position, "Position trop ancienne sans mise à jour", stale)
             elif price_issue:
-                self._mark_as_stale(position, f"Prix non disponible: {price_issue}")
+                self._mark_as_stale(position, f"Prix non disponible: {price_issue}", stale)
             elif data_issue:
                 self._log_issue(position, f"Données incomplètes: {data_issue}")
-            else:
-                # Position OK - mettre à jour le prix si possible
-                self._update_position_price(position)
+            elif self.executor:
+                # Position OK - mettre à jour le prix
+                current_price = prices[position['token_id']]
+                unrealized_pnl = (current_price - position.get('entry_price', 0)) * position.get('shares', 0)
+                price_updates.append((pos_id, current_price, unrealized_pnl))
 
         except Exception as e:
             self.report['errors'].append(f"Position #{pos_id}: {str(e)}")
@@ -131,8 +211,8 @@ class StartupReconciler:
         except:
             return 'STALE'
 
-    def _check_price_availability(self, position: Dict) -> str:
-        """Vérifie si le prix est disponible pour la position."""
+    def _check_price_availability(self, position: Dict, prices: Dict[str, object]) -> str:
+        """Vérifie si le prix (récupéré en lot) est disponible pour la position."""
         if not self.executor:
             return None  # Pas d'executor, on ne peut pas vérifier
 
@@ -140,13 +220,12 @@ class StartupReconciler:
         if not token_id:
             return "Token ID manquant"
 
-        try:
-            price = self.executor.get_market_price(token_id, 'SELL')
-            if not price or price <= 0:
-                return "Prix non disponible sur le marché"
-            return None
-        except Exception as e:
-            return str(e)
+        price = prices.get(token_id)
+        if isinstance(price, Exception):
+            return str(price)
+        if not price or price <= 0:
+            return "Prix non disponible sur le marché"
+        return None
 
     def _check_data_integrity(self, position: Dict) -> str:
         """Vérifie l'intégrité des données de la position."""
@@ -165,53 +244,18 @@ class StartupReconciler:
 
         return ", ".join(issues) if issues else None
 
-    def _mark_as_stale(self, position: Dict, reason: str):
-        """Marque une position comme STALE."""
+    def _mark_as_stale(self, position: Dict, reason: str, stale: List[int]):
+        """Marque une position comme STALE (appliqué avec la transaction finale)."""
         pos_id = position.get('id')
         logger.warning(f"⚠️ Position #{pos_id} marquée STALE: {reason}")
 
-        db_manager.execute_query('''
-            UPDATE bot_positions
-            SET status = 'STALE', last_updated = ?
-            WHERE id = ?
-        ''', (datetime.now().isoformat(), pos_id), commit=True)
-
-        self.report['positions_stale'] += 1
+        stale.append(pos_id)
         self.report['details'].append({
             'position_id': pos_id,
             'action': 'MARKED_STALE',
             'reason': reason
         })
 
-    def _update_position_price(self, position: Dict):
-        """Met à jour le prix actuel de la position."""
-        if not self.executor:
-            return
-
-        pos_id = position.get('id')
-        token_id = position.get('token_id')
-
-        try:
-            current_price = self.executor.get_market_price(token_id, 'SELL')
-            if current_price and current_price > 0:
-                entry_price = position.get('entry_price', 0)
-                shares = position.get('shares', 0)
-
-                # Calcul du PnL non réalisé
-                unrealized_pnl = (current_price - entry_price) * shares
-
-                db_manager.execute_query('''
-                    UPDATE bot_positions
-                    SET current_price = ?, unrealized_pnl = ?, last_updated = ?
-                    WHERE id = ?
-                ''', (current_price, unrealized_pnl, datetime.now().isoformat(), pos_id), commit=True)
-
-                self.report['positions_updated'] += 1
-                logger.debug(f"📊 Position #{pos_id} mise à jour: ${current_price:.4f}")
-
-        except Exception as e:
-            logger.error(f"❌ Erreur mise à jour prix #{pos_id}: {e}")
-
     def _log_issue(self, position: Dict, issue: str):
         """Log un problème sans action corrective."""
         pos_id = position.get('id')
@@ -230,12 +274,15 @@ class StartupReconciler:
         logger.info(f"   Positions vérifiées: {self.report['positions_checked']}")
         logger.info(f"   Positions mises à jour: {self.report['positions_updated']}")
         logger.info(f"   Positions STALE: {self.report['positions_stale']}")
+        logger.info(f"   Positions PENDING reprises: {self.report['pending_resumed']}")
         logger.info(f"   Erreurs: {len(self.report['errors'])}")
+        timings = self.report['timings_ms']
+        logger.info(f"   Durées (ms): " + ", ".join(f"{phase}={ms}" for phase, ms in timings.items()))
         logger.info("=" * 50)
 
     def get_stale_positions(self) -> List[Dict]:
         """Récupère les positions marquées comme STALE."""
-        return db_manager.get_bot_positions(status='STALE')
+        return self.store.get_bot_positions(status='STALE')
 
     def cleanup_stale_positions(self, max_age_days: int = 30) -> int:
         """
@@ -249,12 +296,7 @@ class StartupReconciler:
         """
         cutoff = datetime.now() - timedelta(days=max_age_days)
 
-        result = db_manager.execute_query('''
-            DELETE FROM bot_positions
-            WHERE status = 'STALE' AND opened_at < ?
-        ''', (cutoff.isoformat(),), commit=True)
-
-        deleted = result.rowcount if hasattr(result, 'rowcount') else 0
+        deleted = self.store.delete_stale_positions(cutoff.isoformat())
         logger.info(f"🗑️ {deleted} positions STALE supprimées (>{max_age_days} jours)")
         return deleted
 
@@ -269,7 +311,10 @@ def run_startup_reconciliation(executor=None) -> Dict:
     Returns:
         Rapport de réconciliation
     """
-    reconciler = StartupReconciler(executor)
+    from fill_tracker import get_fill_tracker
+
+    fill_tracker = get_fill_tracker()
+    reconciler = StartupReconciler(executor, fill_tracker=fill_tracker if fill_tracker.enabled else None)
     return reconciler.reconcile()
 
 
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+State Publisher - Push WebSocket delta-only de l'état du dashboard
+
+Au lieu d'émettre un simple id (`position_update`) puis de laisser chaque
+dashboard re-poller `/api/positions`, le serveur garde le dernier snapshot
+envoyé par canal (positions, pnl, hft_stats) et n'émet que des patchs
+JSON Merge Patch (RFC 7386), regroupés en frames toutes les 250 ms.
+
+Protocole Socket.IO:
+    client -> 'state_subscribe'  {channels: ['positions', 'pnl']}
+    serveur -> 'state_snapshot'  {channel, version, state}      (au client seul)
+    serveur -> 'state_frame'     {patches: [{channel, version, patch}, ...]}
+    client -> 'state_resync'     {channel}                       (si version manquante)
+
+Un patch met à null les clés supprimées. Les canaux ne sont recalculés que
+s'ils ont été marqués modifiés (mark_dirty) ou après `max_staleness` secondes:
+le coût serveur suit le rythme des changements, pas le nombre de dashboards.
+"""
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("StatePublisher")
+
+
+def compute_patch(old: Any, new: Any) -> Optional[Dict]:
+    """
+    Calcule un JSON Merge Patch de `old` vers `new` (dicts imbriqués).
+
+    Returns:
+        Le patch, ou None si aucun changement
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None if old == new else new
+
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            sub = compute_patch(old[key], value)
+            if sub is not None:
+                patch[key] = sub
+        elif old[key] != value:
+            patch[key] = value
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch or None
+
+
+class _Channel:
+    """Un canal d'état: provider + dernier snapshot envoyé"""
+
+    def __init__(self, name: str, provider: Callable[[], Dict], max_staleness: float):
+        self.name = name
+        self.provider = provider
+        self.max_staleness = max_staleness
+        self.snapshot: Optional[Dict] = None
+        self.version = 0
+        self.dirty = True
+        self.last_refresh = 0.0
+        self.subscribers = 0
+
+        # Stats
+        self.refreshes = 0
+        self.patches_sent = 0
+
+
+class StatePublisher:
+    """
+    Publie l'état du dashboard par canaux, en deltas, via Socket.IO.
+    Thread-safe: mark_dirty() peut être appelé depuis n'importe quel thread.
+    """
+
+    def __init__(self, socketio, frame_interval_ms: int = 250):
+        self.socketio = socketio
+        self.frame_interval = frame_interval_ms / 1000.0
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+        # Stats
+        self.frames_sent = 0
+        self.snapshots_sent = 0
+
+        logger.info(f"📡 StatePublisher initialisé (frames {frame_interval_ms}ms)")
+
+    # =========================================================================
+    # CANAUX
+    # =========================================================================
+
+    def register_channel(self, name: str, provider: Callable[[], Dict], max_staleness: float = 5.0):
+        """
+        Enregistre un canal d'état.
+
+        Args:
+            name: Nom du canal ('positions', 'pnl', 'hft_stats')
+            provider: Fonction retournant l'état courant (dict JSON-sérialisable)
+            max_staleness: Recalcul forcé au-delà de ce délai (s) même sans mark_dirty
+        """
+        with self._lock:
+            self._channels[name] = _Channel(name, provider, max_staleness)
+
+    def mark_dirty(self, name: str):
+        """Signale qu'un canal a changé (recalculé à la prochaine frame)"""
+        channel = self._channels.get(name)
+        if channel:
+            channel.dirty = True
+
+    @staticmethod
+    def room(name: str) -> str:
+        return f"state:{name}"
+
+    def _refresh(self, channel: _Channel) -> Optional[Dict]:
+        """Recalcule un canal et retourne le patch depuis le dernier snapshot"""
+        channel.dirty = False
+        channel.last_refresh = time.time()
+        channel.refreshes += 1
+        try:
+            state = channel.provider()
+        except Exception as e:
+            logger.error(f"❌ Erreur provider '{channel.name}': {e}")
+            return None
+
+        patch = compute_patch(channel.snapshot, state) if channel.snapshot is not None else state
+        channel.snapshot = state
+        if patch is None:
+            return None
+        channel.version += 1
+        return patch
+
+    # =========================================================================
+    # CLIENTS
+    # =========================================================================
+
+    def register_handlers(self):
+        """Enregistre les handlers Socket.IO d'abonnement"""
+        self.socketio.on_event('state_subscribe', self._on_subscribe)
+        self.socketio.on_event('state_resync', self._on_resync)
+        self.socketio.on_event('disconnect', self._on_disconnect)
+
+    def _on_subscribe(self, data):
+        from flask import request
+        from flask_socketio import join_room
+
+        names = (data or {}).get('channels', [])
+        subscribed = request.environ.setdefault('state_channels', set())
+        for name in names:
+            if name not in self._channels or name in subscribed:
+                continue
+            join_room(self.room(name))
+            subscribed.add(name)
+            with self._lock:
+                self._channels[name].subscribers += 1
+            self._send_snapshot(name, request.sid)
+
+    def _on_resync(self, data):
+        from flask import request
+
+        name = (data or {}).get('channel')
+        if name in self._channels:
+            self._send_snapshot(name, request.sid)
+
+    def _on_disconnect(self, *args):
+        from flask import request
+
+        with self._lock:
+            for name in request.environ.get('state_channels', ()):
+                channel = self._channels.get(name)
+                if channel:
+                    channel.subscribers = max(0, channel.subscribers - 1)
+
+    def _send_snapshot(self, name: str, sid: str):
+        """Envoie l'état complet d'un canal à un seul client"""
+        channel = self._channels[name]
+        with self._lock:
+            if channel.snapshot is None:
+                self._refresh(channel)
+            payload = {'channel': name, 'version': channel.version, 'state': channel.snapshot}
+        self.socketio.emit('state_snapshot', payload, to=sid, namespace='/')
+        self.snapshots_sent += 1
+
+    # =========================================================================
+    # FRAMES
+    # =========================================================================
+
+    def publish_frame(self) -> int:
+        """
+        Recalcule les canaux modifiés et émet une frame de patchs par canal.
+
+        Returns:
+            Nombre de patchs émis
+        """
+        now = time.time()
+        emitted = []
+        with self._lock:
+            for channel in self._channels.values():
+                if channel.subscribers <= 0:
+                    continue
+                if not channel.dirty and now - channel.last_refresh < channel.max_staleness:
+                    continue
+                patch = self._refresh(channel)
+                if patch is not None:
+                    channel.patches_sent += 1
+                    emitted.append((channel.name, {'channel': channel.name, 'version': channel.version, 'patch': patch}))
+
+        for name, payload in emitted:
+            self.socketio.emit('state_frame', {'patches': [payload]}, to=self.room(name), namespace='/')
+        if emitted:
+            self.frames_sent += 1
+        return len(emitted)
+
+    def _loop(self):
+        while self._running:
+            started = time.time()
+            try:
+                self.publish_frame()
+            except Exception as e:
+                logger.error(f"❌ Erreur frame état: {e}")
+            time.sleep(max(0.0, self.frame_interval - (time.time() - started)))
+
+    def start(self):
+        """Démarre la boucle de frames"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="StatePublisher")
+        self._thread.start()
+        logger.info("🚀 StatePublisher démarré")
+
+    def stop(self):
+        """Arrête la boucle de frames"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def get_stats(self) -> Dict:
+        """Statistiques par canal"""
+        with self._lock:
+            channels = {
+                name: {
+                    'version': c.version,
+                    'subscribers': c.subscribers,
+                    'refreshes': c.refreshes,
+                    'patches_sent': c.patches_sent
+                }
+                for name, c in self._channels.items()
+            }
+        return {
+            'running': self._running,
+            'frame_interval_ms': int(self.frame_interval * 1000),
+            'frames_sent': self.frames_sent,
+            'snapshots_sent': self.snapshots_sent,
+            'channels': channels
+        }
+
+
+# Instance globale (initialisée par bot.py avec le socketio)
+state_publisher: Optional[StatePublisher] = None
+
+# Mode multi-process: les workers n'ont pas de publisher, mark_dirty est relayé au web
+_dirty_forwarder: Optional[Callable[[str], None]] = None
+
+
+def init_state_publisher(socketio, frame_interval_ms: int = 250) -> StatePublisher:
+    global state_publisher
+    state_publisher = StatePublisher(socketio, frame_interval_ms)
+    return state_publisher
+
+
+def set_dirty_forwarder(forwarder: Optional[Callable[[str], None]]):
+    """Relaie les mark_dirty() d'un processus worker (voir multiprocess_runner.py)"""
+    global _dirty_forwarder
+    _dirty_forwarder = forwarder
+
+
+def mark_dirty(name: str):
+    """Raccourci sans dépendance: no-op si le publisher n'est pas initialisé"""
+    if state_publisher:
+        state_publisher.mark_dirty(name)
+    elif _dirty_forwarder:
+        _dirty_forwarder(name)
@@ -411,14 +411,17 @@ if (typeof socket !== 'undefined') {
             window.hftData.signals = window.hftData.signals.slice(0, 100);
         }
         renderHFTSignals(window.hftData.signals);
-
-        // Mettre a jour les stats
-        loadHFTStatus();
+        // Les stats arrivent via le canal d'état 'hft_stats'
     });
 
     socket.on('hft_trade_executed', function (data) {
         console.log('HFT Trade execute:', data);
-        loadHFTStatus();
+    });
+
+    // Deltas du canal 'hft_stats' (State Publisher)
+    document.addEventListener('state:hft_stats', function (e) {
+        window.hftData.stats = e.detail;
+        updateHFTStatusUI(e.detail);
     });
 
     socket.on('hft_status', function (data) {
@@ -261,7 +261,6 @@ function renderAlertFeed(alerts) {
         const typeLabel = (alert.alert_type || 'UNKNOWN').replace('_', ' ');
 
         const stats = alert.wallet_stats || {};
-        const pnlClass = (stats.pnl || 0) >= 0 ? 'positive' : 'negative';
 
         // ID unique pour suppression
         const alertId = getAlertId(alert);
@@ -276,7 +275,7 @@ function renderAlertFeed(alerts) {
                     <div>
                         <span class="alert-type-badge ${typeClass}">${typeLabel}</span>
                         <span class="alert-wallet-address">${truncateAddress(alert.wallet_address)}</span>
-                        ${alert.nickname ? `<span class="alert-nickname">(${escapeHtml(alert.nickname)})</span>` : ''}
+                        <span class="alert-nickname">${alert.nickname ? `(${escapeHtml(alert.nickname)})` : ''}</span>
                     </div>
                     <div class="alert-time">${formatTime(alert.timestamp)}</div>
                 </div>
@@ -294,9 +293,7 @@ function renderAlertFeed(alerts) {
                 </div>
 
                 <div class="alert-stats-row" style="display: flex; gap: 15px; font-size: 0.8em; color: #888; margin-bottom: 10px;">
-                    <span>PnL: <span class="${pnlClass}">$${(stats.pnl || 0).toFixed(0)}</span></span>
-                    <span>WinRate: ${(stats.win_rate || 0).toFixed(0)}%</span>
-                    <span>Trades: ${stats.total_trades || 0}</span>
+                    ${renderAlertStats(stats)}
                 </div>
 
                 <div class="alert-actions" style="display: flex; gap: 10px;">
@@ -315,6 +312,30 @@ function renderAlertFeed(alerts) {
     }).join('');
 }
 
+function renderAlertStats(stats) {
+    // Stats vides = enrichissement du wallet encore en cours côté serveur
+    if (!stats || Object.keys(stats).length === 0) {
+        return '<span style="font-style: italic;">⏳ Profil du wallet en cours de chargement...</span>';
+    }
+    const pnlClass = (stats.pnl || 0) >= 0 ? 'positive' : 'negative';
+    return `
+                    <span>PnL: <span class="${pnlClass}">$${(stats.pnl || 0).toFixed(0)}</span></span>
+                    <span>WinRate: ${(stats.win_rate || 0).toFixed(0)}%</span>
+                    <span>Trades: ${stats.total_trades || 0}</span>`;
+}
+
+function applyAlertEnrichment(data) {
+    // Mise à jour en place de la carte (pas de rechargement du feed)
+    const card = document.getElementById(`alert-${data.id}`);
+    if (!card) return;
+
+    const statsRow = card.querySelector('.alert-stats-row');
+    if (statsRow) statsRow.innerHTML = renderAlertStats(data.wallet_stats);
+
+    const nicknameEl = card.querySelector('.alert-nickname');
+    if (nicknameEl && data.nickname) nicknameEl.textContent = `(${data.nickname})`;
+}
+
 function dismissAlert(id) {
     if (!id) return;
     dismissedAlertIds.add(String(id));
@@ -717,6 +738,9 @@ function initInsiderWebSocket() {
                 });
             }
         });
+
+        // Deuxième étage: stats + pseudo du wallet chargés après l'émission de l'alerte
+        socket.on('insider_alert_enriched', applyAlertEnrichment);
     }
 }
 
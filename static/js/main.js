@@ -251,65 +251,69 @@ function loadPositions() {
     fetch('/api/positions')
         .then(r => r.json())
         .then(data => {
-            const container = document.getElementById('active-positions');
-            if (!data.success || !data.positions || data.positions.length === 0) {
-                container.innerHTML = '<p style="color: #888; text-align: center; padding: 20px;">Aucune position active</p>';
-                return;
-            }
-
-            container.innerHTML = data.positions.map(p => {
-                const pnl = p.pnl || p.unrealized_pnl || 0;
-                const pnlClass = pnl >= 0 ? 'positive' : 'negative';
-                const pnlSign = pnl >= 0 ? '+' : '';
-                const market = p.market || p.market_slug || 'Marché inconnu';
-                const amount = p.amount || p.value_usd || 0;
-
-                const statusBadges = [];
-                if (p.capital_recovered) {
-                    statusBadges.push('<span class="status-badge" style="background: #2196F3; color: white;">💰 CAPITAL RÉCUPÉRÉ</span>');
-                } else if (p.use_risk_free || p.exit_tiers) {
-                    statusBadges.push('<span class="status-badge" style="background: #9C27B0; color: white;">🛡️ RISK-FREE</span>');
-                }
-
-                return `
-            <div class="position-card">
-                <div class="position-header">
-                    <div style="display: flex; flex-direction: column; gap: 4px;">
-                        <strong>${market}</strong>
-                        <div style="display: flex; gap: 5px;">${statusBadges.join('')}</div>
-                    </div>
-                    <span class="side-badge ${(p.side || 'BUY').toLowerCase()}">${p.side || 'BUY'}</span>
-                </div>
-                <div class="position-details">
-                    <div>
-                        <span>Montant:</span>
-                        <span class="value">$${amount.toFixed(2)}</span>
-                    </div>
-                    <div>
-                        <span>Prix entrée:</span>
-                        <span>$${(p.entry_price || 0).toFixed(4)}</span>
-                    </div>
-                    <div>
-                        <span>Prix actuel:</span>
-                        <span>$${(p.current_price || 0).toFixed(4)}</span>
-                    </div>
-                    <div>
-                        <span>PnL:</span>
-                        <span class="${pnlClass}">${pnlSign}$${pnl.toFixed(2)}</span>
-                    </div>
-                </div>
-                <div class="position-actions">
-                    <button class="btn btn-danger btn-sm" onclick="openSellModal(${p.id || p.position_id})">Vendre</button>
-                </div>
-            </div>
-            `;
-            }).join('');
+            renderPositions(data.success ? data.positions : []);
         })
         .catch(e => {
             console.error('Erreur loadPositions:', e);
         });
 }
 
+function renderPositions(positions) {
+    const container = document.getElementById('active-positions');
+    if (!positions || positions.length === 0) {
+        container.innerHTML = '<p style="color: #888; text-align: center; padding: 20px;">Aucune position active</p>';
+        return;
+    }
+
+    container.innerHTML = positions.map(p => {
+        const pnl = p.pnl || p.unrealized_pnl || 0;
+        const pnlClass = pnl >= 0 ? 'positive' : 'negative';
+        const pnlSign = pnl >= 0 ? '+' : '';
+        const market = p.market || p.market_slug || 'Marché inconnu';
+        const amount = p.amount || p.value_usd || 0;
+
+        const statusBadges = [];
+        if (p.capital_recovered) {
+            statusBadges.push('<span class="status-badge" style="background: #2196F3; color: white;">💰 CAPITAL RÉCUPÉRÉ</span>');
+        } else if (p.use_risk_free || p.exit_tiers) {
+            statusBadges.push('<span class="status-badge" style="background: #9C27B0; color: white;">🛡️ RISK-FREE</span>');
+        }
+
+        return `
+    <div class="position-card">
+        <div class="position-header">
+            <div style="display: flex; flex-direction: column; gap: 4px;">
+                <strong>${market}</strong>
+                <div style="display: flex; gap: 5px;">${statusBadges.join('')}</div>
+            </div>
+            <span class="side-badge ${(p.side || 'BUY').toLowerCase()}">${p.side || 'BUY'}</span>
+        </div>
+        <div class="position-details">
+            <div>
+                <span>Montant:</span>
+                <span class="value">$${amount.toFixed(2)}</span>
+            </div>
+            <div>
+                <span>Prix entrée:</span>
+                <span>$${(p.entry_price || 0).toFixed(4)}</span>
+            </div>
+            <div>
+                <span>Prix actuel:</span>
+                <span>$${(p.current_price || 0).toFixed(4)}</span>
+            </div>
+            <div>
+                <span>PnL:</span>
+                <span class="${pnlClass}">${pnlSign}$${pnl.toFixed(2)}</span>
+            </div>
+        </div>
+        <div class="position-actions">
+            <button class="btn btn-danger btn-sm" onclick="openSellModal(${p.id || p.position_id})">Vendre</button>
+        </div>
+    </div>
+    `;
+    }).join('');
+}
+
 // ============ SELL MODAL ============
 function openSellModal(positionId) {
     // Store positionId
@@ -514,7 +518,7 @@ function filterHistory(filter) {
 }
 
 function exportData() {
-    window.open('/api/export', '_blank');
+    window.open('/api/export?format=ndjson', '_blank');
 }
 
 function resetStats() {
@@ -609,10 +613,13 @@ function updateUI() {
             const pm = data.polymarket || {};
             document.getElementById('signals-count').textContent = pm.signals_detected || 0;
             document.getElementById('trades-copied').textContent = pm.trades_copied || 0;
-            const profit = pm.total_profit || 0;
-            const profitEl = document.getElementById('total-profit');
-            profitEl.textContent = (profit >= 0 ? '+' : '') + '$' + profit.toFixed(2);
-            profitEl.className = 'value' + (profit < 0 ? ' negative' : '');
+            // Le profit total est piloté par le canal 'pnl' une fois abonné
+            if (!dashboardState.pnl) {
+                const profit = pm.total_profit || 0;
+                const profitEl = document.getElementById('total-profit');
+                profitEl.textContent = (profit >= 0 ? '+' : '') + '$' + profit.toFixed(2);
+                profitEl.className = 'value' + (profit < 0 ? ' negative' : '');
+            }
             document.getElementById('win-rate').textContent = (pm.win_rate || 0) + '%';
 
             // Toggles
@@ -689,7 +696,69 @@ const socket = io();
 
 socket.on('connect', () => {
     console.log('✅ Connecté au WebSocket!');
-    // On pourrait ajouter un indicateur visuel ici
+    // S'abonner aux deltas d'état (snapshot puis patchs toutes les 250ms)
+    socket.emit('state_subscribe', { channels: ['positions', 'pnl', 'hft_stats'] });
+});
+
+// ============ STATE DELTAS ============
+// État local par canal, maintenu par snapshot + JSON Merge Patch
+const dashboardState = {};
+const stateHandlers = {
+    positions: (state) => renderPositions(
+        Object.values(state).sort((a, b) => (b.opened_at || '').localeCompare(a.opened_at || ''))
+    ),
+    pnl: (state) => renderPnL(state)
+};
+
+function renderPnL(pnl) {
+    // Profit total = réalisé + latent, poussé par le canal 'pnl'
+    const profitEl = document.getElementById('total-profit');
+    if (!profitEl) return;
+    const equity = pnl.equity || 0;
+    profitEl.textContent = (equity >= 0 ? '+' : '') + '$' + equity.toFixed(2);
+    profitEl.className = 'value' + (equity < 0 ? ' negative' : '');
+    profitEl.title = `Réalisé: $${(pnl.realized_pnl || 0).toFixed(2)} | ` +
+        `Latent: $${(pnl.unrealized_pnl || 0).toFixed(2)} | ` +
+        `Positions ouvertes: ${pnl.open_positions || 0}`;
+}
+
+function applyMergePatch(target, patch) {
+    if (patch === null || typeof patch !== 'object' || Array.isArray(patch)) return patch;
+    const result = (target && typeof target === 'object' && !Array.isArray(target)) ? target : {};
+    Object.keys(patch).forEach(key => {
+        if (patch[key] === null) {
+            delete result[key];
+        } else {
+            result[key] = applyMergePatch(result[key], patch[key]);
+        }
+    });
+    return result;
+}
+
+function onStateChange(channel) {
+    const handler = stateHandlers[channel];
+    if (handler) handler(dashboardState[channel].state);
+    document.dispatchEvent(new CustomEvent('state:' + channel, { detail: dashboardState[channel].state }));
+}
+
+socket.on('state_snapshot', (data) => {
+    dashboardState[data.channel] = { version: data.version, state: data.state || {} };
+    onStateChange(data.channel);
+});
+
+socket.on('state_frame', (frame) => {
+    (frame.patches || []).forEach(({ channel, version, patch }) => {
+        const current = dashboardState[channel];
+        if (!current || version <= current.version) return;
+        if (version !== current.version + 1) {
+            // Patch manquant: redemander un snapshot complet
+            socket.emit('state_resync', { channel });
+            return;
+        }
+        current.state = applyMergePatch(current.state, patch);
+        current.version = version;
+        onStateChange(channel);
+    });
 });
 
 socket.on('disconnect', () => {
@@ -699,8 +768,8 @@ socket.on('disconnect', () => {
 // Écouter les mises à jour de position
 socket.on('position_update', (data) => {
     console.log('🔄 Mise à jour position reçue:', data);
-    // TODO: Mettre à jour l'UI spécifiquement
-    loadPositions(); // Pour l'instant on recharge tout
+    // Le rendu est piloté par les deltas du canal 'positions'
+    if (!dashboardState.positions) loadPositions();
 });
 
 // Écouter les nouveaux signaux (legacy)
@@ -720,8 +789,11 @@ socket.on('trade_signal', (data) => {
     addTradeToFlux(formattedData);
 });
 
-// Batch de trades (groupes)
-socket.on('trade_batch', (data) => {
+// Batch de trades (groupes) - 'trade_signal_batch' = une frame de l'aggregator
+socket.on('trade_batch', (data) => handleTradeBatch(data));
+socket.on('trade_signal_batch', (data) => handleTradeBatch(data));
+
+function handleTradeBatch(data) {
     console.log(`📬 Trade batch: ${data.count} trades`, data);
 
     if (data.count === 1) {
@@ -732,15 +804,17 @@ socket.on('trade_batch', (data) => {
     } else {
         // Plusieurs trades - affichage fluide sequentiel
         // showBatchToast(data.count); // Désactivé - notifications intrusives
+        // Étalement borné à la durée d'une frame pour ne pas accumuler de retard
+        const step = Math.min(200, 500 / data.count);
         data.trades.forEach((trade, index) => {
             setTimeout(() => {
                 const formattedData = formatTradeSignal(trade);
                 // showSignalBanner(formattedData); // Désactivé - notifications intrusives
                 addTradeToFlux(formattedData);
-            }, index * 200); // 200ms entre chaque pour effet fluide
+            }, index * step);
         });
     }
-});
+}
 
 // Formatter un trade depuis l'aggregator vers le format interne
 function formatTradeSignal(trade) {
@@ -969,11 +1043,14 @@ function loadPnLChart() {
     const ctx = document.getElementById('pnlChart');
     if (!ctx) return;
 
-    fetch('/api/stats/pnl_history?days=30')
+    // Courbe d'equity et drawdown lus depuis les rollups horaires
+    fetch('/api/stats/equity_history?days=30&resolution=1h')
         .then(r => r.json())
         .then(data => {
             if (!data.success) return;
 
+            updateDrawdown(data.drawdown || {});
+
             if (pnlChart) {
                 pnlChart.destroy();
             }
@@ -981,10 +1058,12 @@ function loadPnLChart() {
             pnlChart = new Chart(ctx, {
                 type: 'line',
                 data: {
-                    labels: data.dates,
+                    labels: data.timestamps.map(ts => new Date(ts * 1000).toLocaleString([], {
+                        day: '2-digit', month: '2-digit', hour: '2-digit', minute: '2-digit'
+                    })),
                     datasets: [{
-                        label: 'PnL Cumulé ($)',
-                        data: data.cumulative_values,
+                        label: 'Equity ($)',
+                        data: data.values,
                         borderColor: '#4ade80',
                         backgroundColor: 'rgba(74, 222, 128, 0.1)',
                         borderWidth: 2,
@@ -1031,6 +1110,15 @@ function loadPnLChart() {
         .catch(e => console.error('Erreur chargement chart:', e));
 }
 
+function updateDrawdown(drawdown) {
+    const el = document.getElementById('max-drawdown');
+    if (!el) return;
+    const maxDd = drawdown.max_drawdown || 0;
+    el.textContent = (maxDd > 0 ? '-' : '') + '$' + maxDd.toFixed(2) +
+        (drawdown.max_drawdown_pct ? ` (${drawdown.max_drawdown_pct.toFixed(1)}%)` : '');
+    el.className = 'value' + (maxDd > 0 ? ' negative' : '');
+}
+
 // ============ LOAD HISTORY ============
 function loadFluxHistory() {
     fetch('/api/history')
@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from book_depth import DepthLadder, ladder_for
+
+# Niveaux volontairement dans le désordre (l'API ne garantit pas le meilleur en tête)
+BOOK = {
+    'asks': [{'price': '0.55', 'size': '100'}, {'price': '0.50', 'size': '10'}, {'price': '0.52', 'size': '20'}],
+    'bids': [{'price': '0.45', 'size': '5'}, {'price': '0.48', 'size': '10'}],
+}
+
+
+class TestDepthLadder(unittest.TestCase):
+    def test_vwap_walks_levels_best_first(self):
+        asks = ladder_for(BOOK, 'BUY')
+        self.assertEqual(asks.best_price, 0.50)
+        self.assertAlmostEqual(asks.vwap(30), (10 * 0.50 + 20 * 0.52) / 30)
+        self.assertIsNone(asks.vwap(500))               # profondeur insuffisante
+        self.assertEqual(ladder_for(BOOK, 'SELL').best_price, 0.48)
+
+    def test_max_size_within_limit(self):
+        self.assertEqual(ladder_for(BOOK, 'BUY').max_size_within(0.52), 30)
+        self.assertEqual(ladder_for(BOOK, 'SELL').max_size_within(0.46), 10)
+        self.assertEqual(ladder_for(BOOK, 'SELL').max_size_within(0.49), 0)
+
+    def test_plan_caps_to_slippage(self):
+        plan = ladder_for(BOOK, 'BUY').plan(50, max_slippage_bps=500)    # limite 0.525
+        self.assertEqual((plan['shares'], plan['capped'], plan['limit_price']), (30, True, 0.52))
+
+        plan = ladder_for(BOOK, 'BUY').plan(8, max_slippage_bps=100)
+        self.assertEqual((plan['shares'], plan['capped'], plan['vwap']), (8, False, 0.50))
+
+        self.assertIsNone(DepthLadder([], 'BUY').plan(10, 100))
+
+    def test_ladder_reused_per_snapshot(self):
+        self.assertIs(ladder_for(BOOK, 'BUY'), ladder_for(BOOK, 'buy'))
+        self.assertIsNot(ladder_for(dict(BOOK), 'BUY'), ladder_for(BOOK, 'BUY'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_manager import ShardedCache
+
+
+class TestShardedCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ShardedCache(max_size=64, shards=4)
+
+    def test_set_get_and_ttl(self):
+        """Une entrée expirée n'est plus retournée"""
+        self.cache.set('orderbook:a', 1, ttl=60)
+        self.cache.set('orderbook:b', 2, ttl=0)
+        self.assertEqual(self.cache.get('orderbook:a'), 1)
+        self.assertIsNone(self.cache.get('orderbook:b'))
+
+    def test_lru_eviction(self):
+        """Le shard plein évince l'entrée la moins récemment utilisée"""
+        cache = ShardedCache(max_size=3, shards=1)
+        cache.set('market:1', 1)
+        cache.set('market:2', 2)
+        cache.set('market:3', 3)
+        cache.get('market:1')  # 1 devient le plus récent
+        cache.set('market:4', 4)
+        self.assertIsNone(cache.get('market:2'))
+        self.assertEqual(cache.get('market:1'), 1)
+        self.assertEqual(cache.get_stats()['namespaces']['market:']['evictions'], 1)
+
+    def test_single_flight(self):
+        """Des miss concurrents sur la même clé ne déclenchent qu'un seul chargement"""
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'book'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_load(('orderbook:', 'tok'), loader, 30)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['book'] * 8)
+        stats = self.cache.get_stats()['namespaces']['orderbook:']
+        self.assertEqual(stats['loads'], 1)
+        self.assertEqual(stats['coalesced'], 7)
+
+    def test_none_not_cached(self):
+        """Un résultat None n'est pas mis en cache"""
+        self.cache.get_or_load('trades:x', lambda: None, 30)
+        self.assertEqual(self.cache.get_or_load('trades:x', lambda: [1], 30), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import sqlite3
+import tempfile
+import time
+import sys
+import os
+from datetime import datetime
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from migrate_db import iso_to_epoch_ms
+
+
+class TestEpochMigration(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'test.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_legacy_rows_backfilled(self):
+        """Une base existante (ISO TEXT uniquement) est migrée vers epoch-ms"""
+        conn = sqlite3.connect(self.path)
+        conn.execute('''
+            CREATE TABLE insider_alerts (
+                id TEXT PRIMARY KEY, wallet_address TEXT NOT NULL, alert_type TEXT,
+                suspicion_score INTEGER NOT NULL, market_question TEXT, market_slug TEXT, market_url TEXT,
+                token_id TEXT, bet_amount REAL, bet_outcome TEXT, outcome_odds REAL, criteria_matched TEXT,
+                trigger_details TEXT, bet_details TEXT, wallet_stats TEXT, scoring_mode TEXT,
+                timestamp TEXT NOT NULL, dedup_key TEXT, nickname TEXT
+            )
+        ''')
+        insert = ("INSERT INTO insider_alerts (id, wallet_address, suspicion_score, wallet_stats, "
+                  "criteria_matched, timestamp) VALUES (?, '0xabc', ?, '{}', '[]', ?)")
+        conn.execute(insert, ('a', 80, '2025-01-01T10:00:00.500000'))
+        conn.execute(insert, ('b', 60, '2025-01-02T09:00:00'))
+        conn.commit()
+        conn.close()
+
+        db = DBManager(self.path)
+        try:
+            row = db.conn.execute("SELECT ts_ms FROM insider_alerts WHERE id = 'a'").fetchone()
+            self.assertEqual(row[0], iso_to_epoch_ms('2025-01-01T10:00:00.500000'))
+
+            alerts = db.get_insider_alerts(limit=10)
+            self.assertEqual([a['id'] for a in alerts], ['b', 'a'])
+            self.assertNotIn('criteria_matched', alerts[0])
+            self.assertEqual(alerts[0]['wallet_stats'], {})
+
+            plan = db.conn.execute(
+                'EXPLAIN QUERY PLAN SELECT id FROM insider_alerts WHERE suspicion_score >= 0 ORDER BY ts_ms DESC LIMIT 10'
+            ).fetchall()
+            self.assertIn('idx_insider_alerts_keyset', ' '.join(str(tuple(r)) for r in plan))
+        finally:
+            db.conn.close()
+
+    def test_new_rows_get_epoch(self):
+        """Les nouvelles écritures remplissent la colonne epoch-ms"""
+        db = DBManager(self.path)
+        try:
+            db.save_hft_trade({'signal_timestamp': '2025-03-01T00:00:00', 'source_wallet': '0x1',
+                               'token_id': 't', 'side': 'BUY'})
+            trades = db.get_hft_trades(10)
+            self.assertEqual(trades[0]['signal_ts_ms'], iso_to_epoch_ms('2025-03-01T00:00:00'))
+        finally:
+            db.conn.close()
+
+    @unittest.skipUnless(hasattr(time, 'tzset'), "tzset indisponible")
+    def test_naive_timestamps_are_local_time(self):
+        """ISO sans fuseau (datetime.now()) = heure locale, en Python comme dans le backfill SQL"""
+        previous = os.environ.get('TZ')
+        os.environ['TZ'] = 'Europe/Paris'
+        time.tzset()
+        try:
+            naive = '2025-01-01T10:00:00'
+            expected = int(datetime(2025, 1, 1, 10).timestamp() * 1000)   # 09:00 UTC
+            self.assertEqual(iso_to_epoch_ms(naive), expected)
+            self.assertEqual(iso_to_epoch_ms('2025-01-01T10:00:00Z'), expected + 3600 * 1000)
+
+            conn = sqlite3.connect(self.path)
+            conn.execute('CREATE TABLE polymarket_trades (order_id TEXT PRIMARY KEY, timestamp TEXT, status TEXT, pnl REAL)')
+            conn.execute("INSERT INTO polymarket_trades VALUES ('a', ?, 'EXECUTED', 0)", (naive,))
+            conn.commit()
+            conn.close()
+
+            db = DBManager(self.path)
+            try:
+                row = db.conn.execute("SELECT ts_ms FROM polymarket_trades WHERE order_id = 'a'").fetchone()
+                self.assertEqual(row[0], expected)
+            finally:
+                db.conn.close()
+        finally:
+            if previous is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = previous
+            time.tzset()
+
+
+if __name__ == '__main__':
+    unittest.main()
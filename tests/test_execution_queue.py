@@ -0,0 +1,166 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution_queue import ExecutionQueue
+
+
+def make_queue(handler, **kwargs):
+    return ExecutionQueue(
+        handler,
+        value_fn=lambda s: s['value'],
+        token_fn=lambda s: s['token'],
+        **kwargs
+    )
+
+
+class TestExecutionQueue(unittest.TestCase):
+    def test_submit_never_blocks_and_orders_by_value(self):
+        """La détection n'attend pas: les jobs en attente passent par valeur décroissante"""
+        gate = threading.Event()
+        done = []
+        all_done = threading.Event()
+
+        def handler(signal):
+            gate.wait(2)
+            done.append(signal['id'])
+            if len(done) == 4:
+                all_done.set()
+
+        queue = make_queue(handler, workers=1)
+        queue.submit({'id': 'first', 'value': 1, 'token': 'a'})
+        time.sleep(0.05)  # le worker est bloqué sur 'first'
+        started = time.time()
+        for sid, value in (('small', 10), ('big', 1000), ('mid', 100)):
+            queue.submit({'id': sid, 'value': value, 'token': sid})
+        self.assertLess(time.time() - started, 0.1)
+
+        gate.set()
+        self.assertTrue(all_done.wait(2))
+        self.assertEqual(done, ['first', 'big', 'mid', 'small'])
+        queue.stop()
+
+    def test_same_token_is_serialized(self):
+        """Jamais deux exécutions simultanées sur le même token"""
+        active = {}
+        overlaps = []
+        lock = threading.Lock()
+        finished = threading.Semaphore(0)
+
+        def handler(signal):
+            with lock:
+                active[signal['token']] = active.get(signal['token'], 0) + 1
+                if active[signal['token']] > 1:
+                    overlaps.append(signal['token'])
+            time.sleep(0.02)
+            with lock:
+                active[signal['token']] -= 1
+            finished.release()
+
+        queue = make_queue(handler, workers=4)
+        for i in range(8):
+            queue.submit({'id': i, 'value': i, 'token': 'same' if i % 2 else f't{i}'})
+        for _ in range(8):
+            self.assertTrue(finished.acquire(timeout=2))
+        self.assertEqual(overlaps, [])
+        queue.stop()
+
+    def test_same_token_keeps_submission_order(self):
+        """FIFO entre jobs d'un même token; la priorité ne départage que les tokens"""
+        gate = threading.Event()
+        done = []
+        all_done = threading.Event()
+
+        def handler(signal):
+            gate.wait(2)
+            done.append(signal['id'])
+            if len(done) == 5:
+                all_done.set()
+
+        queue = make_queue(handler, workers=1)
+        queue.submit({'id': 'blocker', 'value': 0, 'token': 'x'})
+        time.sleep(0.05)
+        queue.submit({'id': 'a-buy', 'value': 1, 'token': 'a'})
+        queue.submit({'id': 'a-sell', 'value': 100, 'token': 'a'})
+        queue.submit({'id': 'b', 'value': 50, 'token': 'b'})
+        queue.submit({'id': 'c', 'value': 5, 'token': 'c'})
+        self.assertEqual(queue.get_stats()['queued'], 4)
+
+        gate.set()
+        self.assertTrue(all_done.wait(2))
+        self.assertEqual(done, ['blocker', 'b', 'c', 'a-buy', 'a-sell'])
+        self.assertEqual(queue.get_stats()['queued'], 0)
+        queue.stop()
+
+    def test_stale_and_overflow_drops(self):
+        """Signaux périmés abandonnés (sauf non abandonnables), file pleine évince le moins prioritaire"""
+        gate = threading.Event()
+        executed = []
+        dropped = []
+
+        def handler(signal):
+            gate.wait(2)
+            executed.append(signal['id'])
+
+        queue = make_queue(handler, workers=1, max_size=2, max_age_sec=0.05,
+                           droppable_fn=lambda s: s['id'] != 'sell',
+                           on_drop=lambda s, reason: dropped.append((s['id'], reason)))
+        queue.submit({'id': 'blocker', 'value': 0, 'token': 'x'})
+        time.sleep(0.05)
+        queue.submit({'id': 'low', 'value': 1, 'token': 'a'})
+        queue.submit({'id': 'sell', 'value': 5, 'token': 'b'})
+        self.assertTrue(queue.submit({'id': 'high', 'value': 50, 'token': 'c'}))   # évince 'low'
+        self.assertFalse(queue.submit({'id': 'tiny', 'value': 0, 'token': 'd'}))   # refusé
+
+        time.sleep(0.1)  # 'high' devient périmé, 'sell' n'est pas abandonnable
+        gate.set()
+        deadline = time.time() + 2
+        while len(executed) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(executed, ['blocker', 'sell'])
+        self.assertIn(('low', 'queue_full'), dropped)
+        self.assertIn(('tiny', 'queue_full'), dropped)
+        self.assertIn(('high', 'stale'), dropped)
+        stats = queue.get_stats()
+        self.assertEqual(stats['dropped_full'], 2)
+        self.assertEqual(stats['dropped_stale'], 1)
+        queue.stop()
+
+    def test_full_queue_never_evicts_non_droppable(self):
+        """File pleine de sorties: le nouveau signal est refusé, aucune sortie évincée"""
+        gate = threading.Event()
+        executed = []
+        dropped = []
+
+        def handler(signal):
+            gate.wait(2)
+            executed.append(signal['id'])
+
+        queue = make_queue(handler, workers=1, max_size=2,
+                           droppable_fn=lambda s: not s['id'].startswith('sell'),
+                           on_drop=lambda s, reason: dropped.append((s['id'], reason)))
+        queue.submit({'id': 'blocker', 'value': 0, 'token': 'x'})
+        time.sleep(0.05)
+        queue.submit({'id': 'sell-1', 'value': 1, 'token': 'a'})
+        queue.submit({'id': 'sell-2', 'value': 2, 'token': 'b'})
+        self.assertFalse(queue.submit({'id': 'whale', 'value': 10000, 'token': 'c'}))
+        self.assertFalse(queue.submit({'id': 'sell-3', 'value': 3, 'token': 'd'}))
+
+        gate.set()
+        deadline = time.time() + 2
+        while len(executed) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(sorted(executed), ['blocker', 'sell-1', 'sell-2'])
+        self.assertEqual(dropped, [('whale', 'queue_full'), ('sell-3', 'queue_full')])
+        queue.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fill_tracker import FillTracker
+
+
+class FakeDB:
+    def __init__(self, pending=()):
+        self.fills = []
+        self.cancelled = []
+        self.pending = list(pending)
+
+    def get_bot_positions(self, status='OPEN'):
+        return self.pending if status == 'PENDING' else []
+
+    def apply_position_fill(self, position_id, shares, avg_price):
+        self.fills.append((position_id, shares, round(avg_price, 4)))
+
+    def cancel_pending_position(self, position_id):
+        self.cancelled.append(position_id)
+
+
+class FakeClient:
+    authenticated = False
+
+    def __init__(self):
+        self.open_orders = []
+        self.orders = {}
+        self.open_calls = 0
+
+    def get_open_orders(self):
+        self.open_calls += 1
+        return self.open_orders
+
+    def get_order(self, order_id):
+        return self.orders.get(order_id)
+
+
+def make_tracker():
+    client, db = FakeClient(), FakeDB()
+    tracker = FillTracker(client, db)
+    tracker._running = True  # pas de threads: on pilote les événements
+    return tracker, client, db
+
+
+class TestFillTracker(unittest.TestCase):
+    def test_websocket_partial_then_full_fill(self):
+        tracker, _, db = make_tracker()
+        tracker.track('o1', 7, 'tok', 'BUY', 10, 0.50)
+
+        trade = {'event_type': 'trade', 'id': 't1', 'taker_order_id': 'o1', 'size': '4', 'price': '0.48',
+                 'status': 'MATCHED'}
+        tracker._handle_event(trade)
+        tracker._handle_event(dict(trade, status='CONFIRMED'))   # même trade, pas de double comptage
+        tracker._handle_event({'event_type': 'trade', 'id': 't2', 'taker_order_id': 'x', 'status': 'MATCHED',
+                               'maker_orders': [{'order_id': 'o1', 'matched_amount': '6', 'price': '0.50'}]})
+
+        self.assertEqual(db.fills, [(7, 4.0, 0.48), (7, 10.0, 0.492)])
+        self.assertEqual(tracker.get_stats()['pending_orders'], 0)
+        self.assertEqual(tracker.partial_fills, 1)
+
+    def test_event_before_track_is_replayed(self):
+        tracker, _, db = make_tracker()
+        tracker._handle_event({'event_type': 'order', 'id': 'o2', 'type': 'UPDATE', 'size_matched': '5'})
+        tracker.track('o2', 8, 'tok', 'BUY', 5, 0.30)
+        self.assertEqual(db.fills, [(8, 5.0, 0.3)])
+
+    def test_batched_polling_applies_partial_and_cancel(self):
+        tracker, client, db = make_tracker()
+        tracker.track('a', 1, 'tok', 'BUY', 10, 0.5)
+        tracker.track('b', 2, 'tok', 'BUY', 10, 0.5)
+
+        client.open_orders = [{'id': 'a', 'size_matched': '3'}, {'id': 'b', 'size_matched': '0'}]
+        tracker.poll_once()
+        self.assertEqual(client.open_calls, 1)   # une requête pour tous les ordres
+        self.assertEqual(db.fills, [(1, 3.0, 0.5)])
+
+        client.open_orders = []
+        client.orders = {'a': {'status': 'CANCELED', 'size_matched': '3'},
+                         'b': {'status': 'CANCELED', 'size_matched': '0'}}
+        tracker.poll_once()
+        self.assertEqual(db.cancelled, [2])   # 'a' garde son fill partiel
+        self.assertEqual(tracker.get_stats()['pending_orders'], 0)
+
+    def test_resume_pending_after_restart(self):
+        """Positions PENDING persistées (dont deux d'un même parent) de nouveau suivies"""
+        client = FakeClient()
+        db = FakeDB(pending=[
+            {'id': 1, 'order_id': 'p', 'order_size': 15, 'token_id': 'tok', 'side': 'BUY', 'shares': 10,
+             'avg_price': 0.5},
+            {'id': 2, 'order_id': 'p', 'order_size': 15, 'token_id': 'tok', 'side': 'BUY', 'shares': 5,
+             'avg_price': 0.5},
+            {'id': 3, 'order_id': None, 'token_id': 'tok', 'side': 'BUY', 'shares': 5, 'avg_price': 0.5},
+        ])
+        tracker = FillTracker(client, db)
+        tracker._running = True
+
+        self.assertEqual(tracker.resume_pending(), 2)
+        self.assertEqual(tracker.get_stats()['pending_orders'], 1)
+
+        # Ordre rempli pendant l'arrêt: appliqué au premier poll, au pro rata
+        client.orders = {'p': {'status': 'MATCHED', 'size_matched': '15'}}
+        tracker.poll_once()
+        self.assertEqual(db.fills, [(1, 10.0, 0.5), (2, 5.0, 0.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
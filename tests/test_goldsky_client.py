@@ -0,0 +1,107 @@
+import unittest
+import re
+import threading
+import time
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from goldsky_client import GoldskyClient, GraphQLQuery, render_value
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeSubgraph:
+    """Sert des userBalances par wallet, avec pagination id_gt"""
+
+    ALIAS = re.compile(r'(q\d+): userBalances\(first: (\d+), (?:orderBy: id, orderDirection: asc, )?'
+                       r'where: \{user: "(0x\w+)", balance_gt: "0"(?:, id_gt: "(\w+)")?\}\)')
+
+    def __init__(self, balances, delay=0.0):
+        self.balances = balances
+        self.delay = delay
+        self.documents = []
+
+    def post(self, url, json=None, timeout=None, headers=None):
+        self.documents.append(json['query'])
+        time.sleep(self.delay)
+        data = {}
+        errors = []
+        for alias, first, user, id_gt in self.ALIAS.findall(json['query']):
+            if user == '0xbroken':
+                errors.append({'message': 'boom', 'path': [alias]})
+                continue
+            rows = [r for r in self.balances.get(user, []) if not id_gt or r['id'] > id_gt]
+            data[alias] = rows[:int(first)]
+        return FakeResponse({'data': data, 'errors': errors} if errors else {'data': data})
+
+
+class TestGoldskyClient(unittest.TestCase):
+    def test_render_value(self):
+        """Les valeurs Python sont sérialisées en littéraux GraphQL"""
+        self.assertEqual(
+            render_value({'asset_': {'condition': '0xc'}, 'balance_gt': "0", 'n_in': [1, 2], 'ok': True}),
+            '{asset_: {condition: "0xc"}, balance_gt: "0", n_in: [1, 2], ok: true}'
+        )
+
+    def test_batches_and_splits_results(self):
+        """Plusieurs wallets = un document aliasé, résultats redistribués par wallet"""
+        subgraph = FakeSubgraph({
+            '0xa': [{'id': 'a1'}],
+            '0xb': [{'id': 'b1'}, {'id': 'b2'}],
+        })
+        client = GoldskyClient(post=subgraph.post)
+        result = client.get_user_balances(['0xA', '0xb', '0xc', '0xbroken'])
+
+        self.assertEqual(len(subgraph.documents), 1)
+        self.assertEqual([r['id'] for r in result['0xa']], ['a1'])
+        self.assertEqual([r['id'] for r in result['0xb']], ['b1', 'b2'])
+        self.assertEqual(result['0xc'], [])
+        self.assertIsNone(result['0xbroken'])
+
+    def test_complexity_budget_splits_documents(self):
+        """Le budget de complexité (somme des first) découpe en plusieurs documents"""
+        subgraph = FakeSubgraph({})
+        client = GoldskyClient(max_complexity=250, post=subgraph.post)
+        client.get_user_balances([f'0x{i}' for i in range(5)])
+        self.assertEqual(len(subgraph.documents), 3)  # 2 + 2 + 1 requêtes de coût 100
+
+    def test_id_gt_pagination(self):
+        """Une page pleine déclenche la page suivante avec id_gt"""
+        subgraph = FakeSubgraph({'0xa': [{'id': f'a{i:03d}'} for i in range(250)], '0xb': [{'id': 'b1'}]})
+        client = GoldskyClient(post=subgraph.post)
+        result = client.get_user_balances(['0xa', '0xb'])
+        self.assertEqual(len(result['0xa']), 250)
+        self.assertEqual(len(result['0xb']), 1)
+        self.assertEqual(len(subgraph.documents), 3)
+        self.assertIn('id_gt: "a099"', subgraph.documents[1])
+        self.assertNotIn('"0xb"', subgraph.documents[1])
+
+    def test_identical_inflight_queries_deduped(self):
+        """Des requêtes identiques concurrentes partagent un seul envoi"""
+        subgraph = FakeSubgraph({'0xa': [{'id': 'a1'}]}, delay=0.1)
+        client = GoldskyClient(post=subgraph.post)
+        query = GraphQLQuery('userBalances', 'id', where={'user': '0xa', 'balance_gt': "0"})
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.query('url', query))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(subgraph.documents), 1)
+        self.assertEqual(results, [[{'id': 'a1'}]] * 5)
+        self.assertEqual(client.get_stats()['deduped'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
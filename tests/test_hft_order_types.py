@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hft_module.hft_executor import HFTExecutor
+
+
+class FakeClient:
+    """Client CLOB simulé: `fills` donne size_matched à chaque lecture d'état (None: illisible)"""
+
+    def __init__(self, fills, response=None):
+        self.fills = list(fills)
+        self.response = response or {}
+        self.placed = []
+        self.cancelled = []
+
+    def get_order_book(self, token_id):
+        return {'asks': [{'price': '0.50'}], 'bids': [{'price': '0.48'}]}
+
+    def place_order(self, **kwargs):
+        self.placed.append(kwargs)
+        return {'status': 'success', 'orderID': 'order-1', 'result': self.response}
+
+    def get_order(self, order_id):
+        matched = self.fills.pop(0) if len(self.fills) > 1 else self.fills[0]
+        return {'size_matched': matched, 'status': 'LIVE'} if matched is not None else None
+
+    def cancel_order(self, order_id):
+        self.cancelled.append(order_id)
+        return {'status': 'success'}
+
+
+SIGNAL = {'token_id': 'tok', 'side': 'BUY', 'price': 0.5}
+WALLET = {'capital_allocated': 100, 'percent_per_trade': 10}  # $10 -> 19.9 shares
+
+
+class TestHFTOrderTypes(unittest.TestCase):
+    def make_executor(self, client, **config):
+        executor = HFTExecutor(polymarket_client=client)
+        executor.FILL_POLL_SEC = 0.01
+        executor.set_config(config)
+        return executor
+
+    def test_fak_is_not_polled_nor_cancelled(self):
+        client = FakeClient([10.0])
+        executor = self.make_executor(client, order_type='FAK')
+        result = executor.execute_copy_trade(SIGNAL, WALLET)
+
+        self.assertEqual(client.placed[0]['time_in_force'], 'FAK')
+        self.assertEqual(result['status'], 'executed')
+        self.assertEqual(result['shares'], 10.0)
+        self.assertAlmostEqual(result['fill_ratio'], 10.0 / result['requested_shares'], places=3)
+        self.assertEqual(client.cancelled, [])
+
+    def test_gtc_remainder_cancelled_at_deadline(self):
+        client = FakeClient([0.0, 0.0, 5.0])
+        executor = self.make_executor(client, order_type='GTC', timeout_sec=0.1)
+        result = executor.execute_copy_trade(SIGNAL, WALLET)
+
+        self.assertEqual(client.cancelled, ['order-1'])
+        self.assertEqual(result['status'], 'executed')
+        self.assertEqual(result['shares'], 5.0)
+        self.assertTrue(result['remainder_cancelled'])
+        self.assertIsNotNone(result['fill_latency_ms'])
+        self.assertEqual(executor.get_stats()['remainders_cancelled'], 1)
+
+    def test_gtc_without_fill_is_unfilled(self):
+        client = FakeClient([0.0])
+        executor = self.make_executor(client, order_type='GTC', timeout_sec=0.05)
+        result = executor.execute_copy_trade(SIGNAL, WALLET)
+
+        self.assertEqual(result['status'], 'unfilled')
+        self.assertEqual(client.cancelled, ['order-1'])
+        self.assertEqual(executor.get_stats()['trades_unfilled'], 1)
+
+    def test_unreadable_fak_uses_post_response(self):
+        """État illisible: le fill immédiat de la réponse (takingAmount pour un BUY) fait foi"""
+        client = FakeClient([None], response={'status': 'matched', 'makingAmount': '3.5', 'takingAmount': '7'})
+        executor = self.make_executor(client, order_type='FAK')
+        result = executor.execute_copy_trade(SIGNAL, WALLET)
+
+        self.assertEqual(result['status'], 'executed')
+        self.assertEqual(result['shares'], 7.0)
+        self.assertIsNone(result['fill_latency_ms'])
+
+    def test_unreadable_killed_or_cancelled_order_is_not_assumed_filled(self):
+        """FOK tué ou GTC annulé sans état lisible ni montants: aucun fill supposé"""
+        for order_type in ('FOK', 'GTC'):
+            client = FakeClient([None])
+            executor = self.make_executor(client, order_type=order_type, timeout_sec=0.05)
+            result = executor.execute_copy_trade(SIGNAL, WALLET)
+
+            self.assertEqual(result['status'], 'unfilled', order_type)
+            self.assertEqual(result['final_status'], 'UNKNOWN')
+        self.assertEqual(client.cancelled, ['order-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
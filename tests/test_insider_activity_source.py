@@ -0,0 +1,151 @@
+import unittest
+import json
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import insider_activity_source
+from insider_activity_source import ActivitySubgraphSource, GOLDSKY_ORDERBOOK
+
+EXCHANGE = '0x4bfb41d5b3570defd03c39a9a4d8de6bd8b8982e'
+
+MARKET = {
+    'conditionId': '0xCOND',
+    'slug': 'test-market',
+    'clobTokenIds': json.dumps(['111', '222']),
+    'outcomes': json.dumps(['Yes', 'No']),
+}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self._data = data
+
+    def json(self):
+        return {'data': self._data}
+
+
+class FakeSubgraphs:
+    """Répond aux requêtes avec les événements postérieurs au timestamp demandé"""
+
+    def __init__(self):
+        self.fills = []
+        self.splits = []
+        self.queries = []
+
+    def post(self, url, json=None, timeout=None):
+        query = json['query']
+        self.queries.append(query)
+        ts = int(query.split('timestamp_gte: "')[1].split('"')[0])
+        if url == GOLDSKY_ORDERBOOK:
+            return FakeResponse({'orderFilledEvents': [e for e in self.fills if e['timestamp'] >= ts]})
+        return FakeResponse({'splits': [e for e in self.splits if e['timestamp'] >= ts]})
+
+
+class TestActivitySubgraphSource(unittest.TestCase):
+    def setUp(self):
+        self.subgraphs = FakeSubgraphs()
+        self.source = ActivitySubgraphSource(post=self.subgraphs.post, lookback_sec=0)
+        # Curseurs initialisés au début de l'historique de test
+        self.source.poll([MARKET])
+        for cursor in self.source._cursors.values():
+            cursor.ts = 100
+
+    def test_fill_converted_to_exact_buy(self):
+        """Le maker qui paie l'USDC est l'acheteur, au prix d'exécution"""
+        self.subgraphs.fills = [
+            {'id': 'f1', 'timestamp': 100, 'maker': '0xbuyer', 'taker': EXCHANGE,
+             'makerAssetId': '0', 'takerAssetId': '222',
+             'makerAmountFilled': '400000000', 'takerAmountFilled': '2000000000'},
+        ]
+        self.subgraphs.splits = [
+            {'id': 's1', 'timestamp': 101, 'stakeholder': '0xsplit', 'condition': '0xcond', 'amount': '5000000'},
+        ]
+        items = self.source.poll([MARKET])
+        self.assertEqual([a['type'] for a, _ in items], ['FILL', 'SPLIT'])
+        fill, market = items[0]
+        self.assertEqual(fill['user'], '0xbuyer')
+        self.assertEqual(fill['amount'], 400000000)
+        self.assertAlmostEqual(fill['odds'], 0.2)
+        self.assertEqual(fill['outcome'], 'NO')
+        self.assertIs(market, MARKET)
+
+    def test_exchange_never_reported_as_buyer(self):
+        """Événement côté ordre taker (vendeur maker, taker = contrat d'échange): pas d'achat"""
+        self.subgraphs.fills = [
+            {'id': 'f1', 'timestamp': 100, 'maker': '0xseller', 'taker': EXCHANGE,
+             'makerAssetId': '111', 'takerAssetId': '0',
+             'makerAmountFilled': '2000000000', 'takerAmountFilled': '400000000'},
+        ]
+        self.assertEqual(self.source.poll([MARKET]), [])
+
+    def test_adding_a_market_does_not_shift_cursors(self):
+        """Curseur par token: un nouveau marché ne rejoue ni ne saute les fills des autres"""
+        original = insider_activity_source.FILTER_CHUNK
+        insider_activity_source.FILTER_CHUNK = 1
+        try:
+            fill = {'id': 'f1', 'timestamp': 150, 'maker': '0xbuyer', 'taker': EXCHANGE,
+                    'makerAssetId': '0', 'takerAssetId': '222',
+                    'makerAmountFilled': '1000000', 'takerAmountFilled': '2000000'}
+            self.subgraphs.fills = [fill]
+            self.assertEqual([a['id'] for a, _ in self.source.poll([MARKET])], ['f1'])
+
+            # '000' se trie avant '111' et '222': les lots de tokens changent de composition
+            new_market = dict(MARKET, conditionId='0xNEW', clobTokenIds=json.dumps(['000']))
+            self.assertEqual(self.source.poll([new_market, MARKET]), [])
+
+            later = dict(fill, id='f2', timestamp=160, takerAssetId='111')
+            self.subgraphs.fills.append(later)
+            self.assertEqual([a['id'] for a, _ in self.source.poll([new_market, MARKET])], ['f2'])
+        finally:
+            insider_activity_source.FILTER_CHUNK = original
+
+    def test_cursor_skips_already_seen_events(self):
+        """Un événement n'est émis qu'une fois, y compris à timestamp égal"""
+        self.subgraphs.splits = [
+            {'id': 's1', 'timestamp': 150, 'stakeholder': '0xa', 'condition': '0xcond', 'amount': '1'},
+        ]
+        self.assertEqual(len(self.source.poll([MARKET])), 1)
+        self.subgraphs.splits.append(
+            {'id': 's2', 'timestamp': 150, 'stakeholder': '0xb', 'condition': '0xcond', 'amount': '1'}
+        )
+        items = self.source.poll([MARKET])
+        self.assertEqual([a['id'] for a, _ in items], ['s2'])
+        self.assertEqual(self.source.poll([MARKET]), [])
+
+    def test_queries_grow_with_pages_not_markets(self):
+        """Un seul appel par entité et par scan pour tous les marchés surveillés"""
+        markets = [dict(MARKET, conditionId=f'0x{i}', clobTokenIds=json.dumps([str(i)])) for i in range(100)]
+        self.subgraphs.queries.clear()
+        self.source.poll(markets)
+        self.assertEqual(len(self.subgraphs.queries), 2)
+
+    def test_full_page_is_paginated(self):
+        """Une page pleine déclenche la page suivante depuis le dernier timestamp"""
+        original = insider_activity_source.PAGE_SIZE
+        insider_activity_source.PAGE_SIZE = 2
+        try:
+            self.subgraphs.splits = [
+                {'id': f's{i}', 'timestamp': 200 + i, 'stakeholder': '0xa', 'condition': '0xcond', 'amount': '1'}
+                for i in range(5)
+            ]
+            fake_post = self.subgraphs.post
+
+            def paged_post(url, json=None, timeout=None):
+                resp = fake_post(url, json=json, timeout=timeout)
+                for key in resp._data:
+                    resp._data[key] = resp._data[key][:2]
+                return resp
+
+            self.source._post = paged_post
+            items = self.source.poll([MARKET])
+            self.assertEqual([a['id'] for a, _ in items], ['s0', 's1', 's2', 's3', 's4'])
+        finally:
+            insider_activity_source.PAGE_SIZE = original
+
+
+if __name__ == '__main__':
+    unittest.main()
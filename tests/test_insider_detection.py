@@ -0,0 +1,92 @@
+import unittest
+import threading
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insider_detection import InsiderDetectionEngine, build_rules
+
+CONFIG = {
+    'risky_bet': {'enabled': True, 'min_amount': 50, 'max_odds': 0.35, 'high_amount': 1000},
+    'whale_wakeup': {'enabled': True, 'min_amount': 100, 'dormant_days': 15},
+    'fresh_wallet': {'enabled': True, 'max_tx': 5, 'min_amount': 300},
+}
+
+
+class TestInsiderDetectionEngine(unittest.TestCase):
+    def setUp(self):
+        now = datetime.now()
+        self.profiles = {
+            '0xfresh': {'tx_count': 2, 'last_activity': now, 'first_seen': now - timedelta(days=1)},
+            '0xwhale': {'tx_count': 80, 'last_activity': now - timedelta(days=40), 'first_seen': now - timedelta(days=400)},
+        }
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def fetch(self, wallet):
+        with self.lock:
+            self.fetched.append(wallet)
+        return self.profiles.get(wallet, {})
+
+    def test_builtin_triggers_and_score(self):
+        """Les triggers historiques sont évalués en lot avec le même score"""
+        engine = InsiderDetectionEngine(build_rules(CONFIG), self.fetch)
+        rows = [
+            {'wallet': '0xsmall', 'amount': 20, 'odds': 0.1},    # Sous tous les seuils
+            {'wallet': '0xsniper', 'amount': 60, 'odds': 0.2},   # RISKY_BET (Low Odds)
+            {'wallet': '0xfresh', 'amount': 400, 'odds': 0.6},   # FRESH_WALLET
+            {'wallet': '0xwhale', 'amount': 1500, 'odds': 0.2},  # RISKY + WHALE + bonus
+        ]
+        results = {r['index']: r for r in engine.evaluate(rows)}
+
+        self.assertEqual(sorted(results), [1, 2, 3])
+        self.assertEqual([t['type'] for t in results[1]['triggers']], ['RISKY_BET'])
+        self.assertEqual(results[1]['triggers'][0]['details'], 'Low Odds (Odds: 0.20)')
+        self.assertEqual(results[1]['score'], 70)
+        self.assertEqual([t['type'] for t in results[2]['triggers']], ['FRESH_WALLET'])
+        self.assertEqual(results[2]['score'], 80)
+        self.assertEqual([t['type'] for t in results[3]['triggers']], ['RISKY_BET', 'WHALE_WAKEUP'])
+        self.assertEqual(results[3]['triggers'][1]['details'], 'Inactif 40j')
+        self.assertEqual(results[3]['score'], 100)
+
+    def test_prefetch_only_candidates_once(self):
+        """Les profils ne sont chargés qu'une fois, et seulement pour les montants éligibles"""
+        engine = InsiderDetectionEngine(build_rules(CONFIG), self.fetch, max_workers=4)
+        rows = [{'wallet': '0xfresh', 'amount': 400, 'odds': 0.6} for _ in range(50)]
+        rows.append({'wallet': '0xsmall', 'amount': 60, 'odds': 0.6})
+        engine.evaluate(rows)
+        self.assertEqual(self.fetched, ['0xfresh'])
+
+    def test_unknown_profile_never_triggers(self):
+        """Un profil indisponible (NaN) ne déclenche pas les triggers profil"""
+        engine = InsiderDetectionEngine(build_rules(CONFIG), lambda w: {})
+        self.assertEqual(engine.evaluate([{'wallet': '0xnone', 'amount': 800, 'odds': 0.6}]), [])
+
+    def test_custom_rule_from_config(self):
+        """Une règle personnalisée sur la liquidité s'ajoute depuis la config"""
+        config = dict(CONFIG, risky_bet={'enabled': False}, custom_rules=[
+            {'type': 'THIN_MARKET', 'label': 'Marché Illiquide', 'score': 15,
+             'all': [['amount', '>=', 200], ['liquidity', '<=', 5000]],
+             'details': 'Liquidité {liquidity:.0f}$'},
+            {'type': 'BROKEN', 'all': [['unknown', '>=', 1]]},
+        ])
+        rules = build_rules(config)
+        self.assertEqual([r.type for r in rules], ['WHALE_WAKEUP', 'FRESH_WALLET', 'THIN_MARKET'])
+
+        engine = InsiderDetectionEngine(rules, lambda w: {})
+        results = engine.evaluate([
+            {'wallet': '0xa', 'amount': 250, 'odds': 0.5, 'liquidity': 1200},
+            {'wallet': '0xb', 'amount': 250, 'odds': 0.5, 'liquidity': 90000},
+            {'wallet': '0xc', 'amount': 250, 'odds': 0.5},
+        ])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['index'], 0)
+        self.assertEqual(results[0]['triggers'][0]['details'], 'Liquidité 1200$')
+        self.assertEqual(results[0]['score'], 65)
+
+
+if __name__ == '__main__':
+    unittest.main()
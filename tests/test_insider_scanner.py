@@ -0,0 +1,129 @@
+import unittest
+import json
+import sys
+import os
+import time
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insider_scanner import InsiderScanner
+
+MARKET = {
+    'slug': 'test-market',
+    'question': 'Test market?',
+    'outcomePrices': json.dumps(['0.2', '0.8']),  # Format Gamma: chaîne JSON
+}
+
+RISKY_BET = {'enabled': True, 'min_amount': 50.0, 'max_odds': 0.35, 'high_amount': 1000.0}
+
+
+def usdc(amount):
+    return int(amount * 1e6)
+
+
+class FakeDB:
+    def __init__(self):
+        self.enrichments = []
+
+    def update_insider_alert_enrichment(self, alert_id, wallet_stats, nickname):
+        self.enrichments.append((alert_id, wallet_stats, nickname))
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data, namespace=None):
+        self.events.append((event, data))
+
+
+class TestInsiderScannerBatch(unittest.TestCase):
+    def setUp(self):
+        self.scanner = InsiderScanner()
+        # Seul RISKY_BET actif: pas d'appel Polygonscan pour les profils
+        self.scanner.config.update({
+            'risky_bet': dict(RISKY_BET),
+            'whale_wakeup': {'enabled': False},
+            'fresh_wallet': {'enabled': False},
+            'custom_rules': []
+        })
+
+    def test_split_and_json_outcome_prices(self):
+        """Un SPLIT et des outcomePrices en chaîne JSON dans le même lot"""
+        split = {'user': '0xaaa', 'amount': usdc(2000), 'type': 'SPLIT'}
+        # Prix d'activité incohérent (> 1): fallback sur les prix du marché
+        position = {'user': '0xbbb', 'amount': usdc(100), 'price': usdc(2)}
+
+        alerts = self.scanner.process_batch([(split, MARKET), (position, MARKET)])
+
+        by_wallet = {a.wallet_address: a for a in alerts}
+        self.assertEqual(set(by_wallet), {'0xaaa', '0xbbb'})
+        self.assertEqual(by_wallet['0xaaa'].bet_outcome, 'SPLIT')
+        self.assertIn('split', by_wallet['0xaaa'].bet_details)
+        self.assertEqual(by_wallet['0xbbb'].bet_outcome, 'YES')
+        self.assertAlmostEqual(by_wallet['0xbbb'].outcome_odds, 0.2)
+
+    def test_malformed_row_does_not_abort_batch(self):
+        bad = {'user': '0xbad', 'amount': usdc(2000), 'price': 'n/a'}
+        good = {'user': '0xgood', 'amount': usdc(2000), 'odds': 0.6, 'outcome': 'NO'}
+
+        alerts = self.scanner.process_batch([(bad, MARKET), (good, MARKET)])
+
+        self.assertEqual([a.wallet_address for a in alerts], ['0xgood'])
+
+    def test_dedup_same_wallet_and_market(self):
+        """Un petit pari non déclenché ne masque pas un gros pari du même wallet"""
+        small = {'user': '0xaaa', 'amount': usdc(20), 'odds': 0.6, 'outcome': 'YES'}
+        big = {'user': '0xaaa', 'amount': usdc(2000), 'odds': 0.6, 'outcome': 'YES'}
+        bigger = {'user': '0xaaa', 'amount': usdc(5000), 'odds': 0.6, 'outcome': 'YES'}
+
+        alerts = self.scanner.process_batch([(small, MARKET), (big, MARKET), (bigger, MARKET)])
+
+        # Une seule alerte par (wallet, marché): la mieux notée
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0].bet_amount, 5000)
+
+        # Fenêtre de dedup: le lot suivant ne réalerte pas
+        self.assertEqual(self.scanner.process_batch([(big, MARKET)]), [])
+
+        # Autre marché: nouvelle alerte
+        other = dict(MARKET, slug='other-market')
+        self.assertEqual(len(self.scanner.process_batch([(big, other)])), 1)
+
+
+class TestInsiderScannerEnrichment(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB()
+        self.socketio = FakeSocketIO()
+        self.scanner = InsiderScanner(socketio=self.socketio, db_manager=self.db)
+        self.scanner.config.update({
+            'risky_bet': dict(RISKY_BET),
+            'whale_wakeup': {'enabled': False},
+            'fresh_wallet': {'enabled': False},
+            'custom_rules': []
+        })
+        self.scanner.enrich_wallet = lambda address: ({'pnl': 42.0, 'win_rate': 60.0}, 'whale')
+
+    def _wait_enrichment(self):
+        deadline = time.time() + 5
+        while self.scanner.enrichment_pending and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_enrichment_updates_alert_after_publish(self):
+        activity = {'user': '0xaaa', 'amount': usdc(2000), 'type': 'SPLIT'}
+        alert = self.scanner.process_batch([(activity, MARKET)])[0]
+
+        self.scanner._schedule_enrichment(alert)
+        self._wait_enrichment()
+
+        self.assertEqual(self.db.enrichments, [(alert.id, {'pnl': 42.0, 'win_rate': 60.0}, 'whale')])
+        event, data = self.socketio.events[-1]
+        self.assertEqual(event, 'insider_alert_enriched')
+        self.assertEqual(data['nickname'], 'whale')
+        self.assertTrue(alert.enriched)
+        self.assertEqual(self.scanner.enrichment_done, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
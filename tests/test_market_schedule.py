@@ -0,0 +1,112 @@
+import unittest
+import json
+import time
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hft_module.market_discovery import CryptoMarket, HFTMarketDiscovery
+
+
+def gamma_market(slug, condition_id='0xabc'):
+    """Marché tel que renvoyé par Gamma (token IDs et prix en chaînes JSON)"""
+    return {
+        'question': 'Bitcoin Up or Down - 15 min',
+        'slug': slug,
+        'conditionId': condition_id,
+        'startDate': '2020-01-01T00:00:00Z',   # date de création, pas d'ouverture
+        'clobTokenIds': json.dumps(['111', '222']),
+        'outcomePrices': json.dumps(['0.52', '0.48']),
+    }
+
+
+class TestMarketClassifier(unittest.TestCase):
+    def test_whole_words_only(self):
+        """'eth' ne matche plus "whether", 'up' ne matche plus "update" """
+        self.assertEqual(HFTMarketDiscovery.classify("Will ETH go up?"), ('ETH', 'UP'))
+        self.assertEqual(HFTMarketDiscovery.classify("Bitcoin above $100k or below?"), ('BTC', 'UP'))
+        self.assertEqual(HFTMarketDiscovery.classify("Whether the update passes"), (None, None))
+
+
+class TestMarketSchedule(unittest.TestCase):
+    def test_predicts_aligned_slugs(self):
+        now = 1_700_000_100  # 100 s après le début d'une fenêtre
+        base = 1_700_000_100 // 900 * 900
+        windows = HFTMarketDiscovery.predict_windows(now)
+        self.assertEqual(windows[0], (f"btc-updown-15m-{base}", base))
+        self.assertIn((f"eth-updown-15m-{base + 900}", base + 900), windows)
+
+    def test_resolves_before_open_and_prewarms(self):
+        """Le marché est résolu et connu par token avant son ouverture"""
+        discovery = HFTMarketDiscovery()
+        prewarmed = []
+        discovery.add_prewarm_callback(prewarmed.append)
+
+        next_open = (int(time.time()) // 900 + 1) * 900
+        slug = f"btc-updown-15m-{next_open}"
+
+        def fake_gamma(api, url, params=None, timeout=None):
+            return [gamma_market(slug)] if params['slug'] == slug else []
+
+        with patch('hft_module.market_discovery.coalesced_get_json', side_effect=fake_gamma):
+            self.assertEqual(discovery.schedule_tick(now=next_open - 60), 0)   # trop tôt
+            self.assertEqual(discovery.schedule_tick(now=next_open - 10), 1)
+            self.assertEqual(discovery.schedule_tick(now=next_open - 8), 0)    # déjà résolu
+
+        market = discovery.get_market_by_token('222')
+        self.assertIsNotNone(market)
+        self.assertEqual(market.crypto_asset, 'BTC')
+        self.assertEqual(market.yes_price, 0.52)
+        self.assertEqual(market.start_date.timestamp(), next_open)
+        self.assertEqual([m.slug for m in prewarmed], [slug])
+
+    def test_unresolved_slug_backs_off(self):
+        """Un slug prédit pas encore publié n'est pas re-demandé à chaque tick (2 s)"""
+        discovery = HFTMarketDiscovery()
+        next_open = (int(time.time()) // 900 + 1) * 900
+        slug = f"btc-updown-15m-{next_open}"
+        published = []
+        queried = []
+
+        def fake_gamma(api, url, params=None, timeout=None):
+            if params['slug'] == slug:
+                queried.append(slug)
+            return [gamma_market(slug)] if params['slug'] in published else []
+
+        with patch('hft_module.market_discovery.coalesced_get_json', side_effect=fake_gamma):
+            t = next_open - 20
+            discovery.schedule_tick(now=t)        # échec 1: prochain essai à +2 s
+            discovery.schedule_tick(now=t + 1)
+            discovery.schedule_tick(now=t + 2)    # échec 2: prochain essai à +4 s
+            discovery.schedule_tick(now=t + 4)
+            self.assertEqual(len(queried), 2)
+            self.assertEqual(discovery.get_stats()['schedule']['backoff'], 4)
+
+            published.append(slug)
+            self.assertEqual(discovery.schedule_tick(now=t + 6), 1)
+            self.assertEqual(len(queried), 3)
+            self.assertIsNotNone(discovery.get_market_by_token('222'))
+
+    def test_market_and_tokens_expire_at_end_date(self):
+        discovery = HFTMarketDiscovery()
+        market = CryptoMarket(
+            condition_id='0xdef', question='ETH Up or Down', slug='eth-updown-15m-0',
+            end_date=datetime.now() + timedelta(seconds=5), duration_minutes=15,
+            yes_token_id='333', no_token_id='444', yes_price=0.5, no_price=0.5,
+            volume=0, liquidity=0, crypto_asset='ETH', direction='UP'
+        )
+        discovery.register_market(market)
+        self.assertIs(discovery.get_market_by_token('333'), market)
+
+        discovery._expiry.advance(time.time() + 6)
+        self.assertIsNone(discovery.get_market_by_token('333'))
+        self.assertEqual(discovery.get_all_token_ids(), [])
+        self.assertEqual(discovery.markets_expired, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notification_aggregator import NotificationAggregator, TradeNotification
+
+
+def make_trade(tx, wallet='0xa', market='BTC Up?', amount=10.0, outcome='YES'):
+    return TradeNotification(tx_hash=tx, wallet_address=wallet, trader_name='t', action='BUY',
+                             market_question=market, amount=amount, outcome=outcome,
+                             timestamp=datetime.now(), source='polling')
+
+
+class TestNotificationAggregator(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+        self.agg = NotificationAggregator(lambda e, d: self.emitted.append((e, d)),
+                                          emit_interval_ms=10, max_queue_size=3, max_batch_size=10)
+        self.agg.stop()  # Worker arrêté: on contrôle l'émission via flush()
+
+    def test_duplicates_filtered(self):
+        self.assertTrue(self.agg.add_trade(make_trade('0x1')))
+        self.assertFalse(self.agg.add_trade(make_trade('0x1')))
+
+    def test_coalesce_when_full(self):
+        """Queue pleine: un trade du même trader/marché est fusionné"""
+        self.agg.add_trade(make_trade('1', wallet='0xa'))
+        self.agg.add_trade(make_trade('2', wallet='0xb'))
+        self.agg.add_trade(make_trade('3', wallet='0xc'))
+        self.assertTrue(self.agg.add_trade(make_trade('4', wallet='0xb', amount=5)))
+        self.assertTrue(self.agg.add_trade(make_trade('5', wallet='0xd')))  # Pas de clé: drop oldest
+
+        stats = self.agg.get_stats()
+        self.assertEqual(stats['queue_size'], 3)
+        self.assertEqual(stats['coalesced'], 1)
+        self.assertEqual(stats['dropped'], 1)
+
+        self.agg.flush()
+        event, data = self.emitted[-1]
+        self.assertEqual(event, 'trade_signal_batch')
+        self.assertEqual([t['wallet'] for t in data['trades']], ['0xb', '0xc', '0xd'])
+        self.assertEqual(data['trades'][0]['count'], 2)
+        self.assertEqual(data['trades'][0]['amount'], 15)
+
+    def test_no_coalesce_across_outcomes(self):
+        """YES et NO du même trader sur le même marché restent séparés"""
+        self.agg.add_trade(make_trade('1', wallet='0xa', outcome='YES'))
+        self.agg.add_trade(make_trade('2', wallet='0xb'))
+        self.agg.add_trade(make_trade('3', wallet='0xc'))
+        self.agg.add_trade(make_trade('4', wallet='0xa', outcome='NO'))
+
+        stats = self.agg.get_stats()
+        self.assertEqual(stats['coalesced'], 0)
+        self.assertEqual(stats['dropped'], 1)
+
+        self.agg.flush()
+        _, data = self.emitted[-1]
+        self.assertEqual([(t['wallet'], t['outcome']) for t in data['trades']],
+                         [('0xb', 'YES'), ('0xc', 'YES'), ('0xa', 'NO')])
+
+    def test_dedup_expiry(self):
+        """Les hashes expirés sont purgés sans scan complet"""
+        self.agg._dedup_ttl = 0
+        self.agg.add_trade(make_trade('x'))
+        self.assertTrue(self.agg.add_trade(make_trade('x')))
+        self.assertEqual(len(self.agg._seen_expiry), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_gateway import OrderGateway, OrderRejected, make_client_order_id
+
+
+class FakeExchange:
+    """CLOB simulé: un ordre signé n'est accepté qu'une fois (hash identique)"""
+
+    def __init__(self, script=()):
+        self.script = list(script)   # comportements successifs des POST
+        self.accepted = []
+        self.posts = 0
+        self.signatures = 0
+        self.lock = threading.Lock()
+
+    def sign(self, token_id, side, price, size):
+        self.signatures += 1
+        return {'hash': f"0x{self.signatures}", 'token_id': token_id, 'side': side, 'price': price, 'size': size}
+
+    def post(self, signed, time_in_force):
+        with self.lock:
+            self.posts += 1
+            action = self.script.pop(0) if self.script else 'ok'
+        if isinstance(action, (int, float)):
+            time.sleep(action)
+            action = 'ok'
+        with self.lock:
+            if signed['hash'] in self.accepted:
+                raise OrderRejected('duplicated order', 400)
+            if action in ('ok', 'lost'):
+                self.accepted.append(signed['hash'])
+        if action == 'lost':
+            raise TimeoutError('read timeout')   # accepté, réponse perdue
+        if action == 'timeout':
+            raise TimeoutError('connect timeout')
+        if action == 'reject':
+            raise OrderRejected('not enough balance', 400)
+        if action == 'duplicate':
+            raise OrderRejected('duplicated order', 400)   # ordre introuvable par lookup
+        return {'orderID': signed['hash'], 'success': True}
+
+    def lookup(self, signed, since):
+        return {'id': signed['hash']} if signed['hash'] in self.accepted else None
+
+
+def make_gateway(exchange, **kwargs):
+    return OrderGateway(exchange.sign, exchange.post, exchange.lookup,
+                        base_backoff_sec=0.001, max_backoff_sec=0.01, **kwargs)
+
+
+class TestOrderGateway(unittest.TestCase):
+    def test_lost_response_is_recovered_not_resubmitted(self):
+        """Timeout alors que l'ordre est passé: vérification, pas de second ordre"""
+        exchange = FakeExchange(['lost'])
+        result = make_gateway(exchange).submit('tok', 'BUY', 0.5, 10)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertTrue(result['recovered'])
+        self.assertEqual(exchange.accepted, ['0x1'])
+        self.assertEqual(exchange.posts, 1)
+
+    def test_identical_foreign_order_is_not_recovered(self):
+        """Un autre ordre de mêmes token/sens/prix/taille n'est pas pris pour le nôtre"""
+        exchange = FakeExchange(['timeout'])
+        exchange.accepted.append('0xforeign')
+        result = make_gateway(exchange).submit('tok', 'BUY', 0.5, 10)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertFalse(result.get('recovered'))
+        self.assertEqual(result['orderID'], '0x1')
+        self.assertEqual(exchange.accepted, ['0xforeign', '0x1'])
+
+    def test_fast_retry_on_transient_timeout(self):
+        exchange = FakeExchange(['timeout', 'timeout'])
+        started = time.time()
+        result = make_gateway(exchange).submit('tok', 'BUY', 0.5, 10)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['attempts'], 3)
+        self.assertEqual(exchange.signatures, 1)   # signé une seule fois
+        self.assertLess(time.time() - started, 1.0)
+
+    def test_definitive_rejection_is_not_retried(self):
+        exchange = FakeExchange(['reject'])
+        result = make_gateway(exchange).submit('tok', 'BUY', 0.5, 10)
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(exchange.posts, 1)
+
+    def test_same_client_order_id_is_submitted_once(self):
+        exchange = FakeExchange()
+        gateway = make_gateway(exchange)
+        cid = make_client_order_id('tok', 'BUY', 0.5, 10, intent='signal-1')
+        self.assertEqual(cid, make_client_order_id('tok', 'BUY', 0.51, 9, intent='signal-1'))
+
+        first = gateway.submit('tok', 'BUY', 0.5, 10, client_order_id=cid)
+        second = gateway.submit('tok', 'BUY', 0.51, 9, client_order_id=cid)
+        self.assertEqual(first['orderID'], second['orderID'])
+        self.assertTrue(second['deduplicated'])
+        self.assertEqual(exchange.posts, 1)
+
+    def test_hedge_reposts_same_signed_order(self):
+        """Premier POST lent: hedge du même ordre signé, un seul ordre accepté"""
+        exchange = FakeExchange([0.3, 'ok'])
+        gateway = make_gateway(exchange, default_hedge_ms=50)
+        result = gateway.submit('tok', 'BUY', 0.5, 10, hedge=True)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertTrue(result['hedged'])
+        self.assertEqual(gateway.get_stats()['hedges_sent'], 1)
+        time.sleep(0.35)  # le premier POST se termine (rejeté comme doublon)
+        self.assertEqual(exchange.accepted, ['0x1'])
+
+    def test_unfound_duplicate_is_ambiguous_not_success(self):
+        """Doublon rejeté sans ordre retrouvé: pas de succès sans orderID, pas de re-POST"""
+        exchange = FakeExchange(['duplicate'])
+        gateway = make_gateway(exchange)
+        cid = make_client_order_id('tok', 'BUY', 0.5, 10, intent='signal-2')
+        result = gateway.submit('tok', 'BUY', 0.5, 10, client_order_id=cid)
+
+        self.assertEqual(result['status'], 'error')
+        self.assertTrue(result['ambiguous'])
+        again = gateway.submit('tok', 'BUY', 0.5, 10, client_order_id=cid)
+        self.assertTrue(again['ambiguous'])
+        self.assertEqual(exchange.posts, 1)
+        self.assertEqual(gateway.get_stats()['ambiguous'], 1)
+
+    def test_order_without_hash_is_never_reposted(self):
+        """Fallback REST sans hash: timeout ambigu remonté, ni retry ni hedge"""
+        exchange = FakeExchange(['lost'])
+        gateway = OrderGateway(exchange.sign, exchange.post, lambda signed, since: None,
+                               resubmittable=lambda signed: False, default_hedge_ms=1)
+        result = gateway.submit('tok', 'BUY', 0.5, 10, hedge=True)
+
+        self.assertEqual(result['status'], 'error')
+        self.assertTrue(result['ambiguous'])
+        self.assertEqual(exchange.posts, 1)
+        self.assertEqual(gateway.get_stats()['hedges_sent'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_netting import OrderNetter
+from fill_tracker import FillTracker
+
+
+class FakeDB:
+    def __init__(self):
+        self.fills = []
+
+    def apply_position_fill(self, position_id, shares, avg_price):
+        self.fills.append((position_id, shares, avg_price))
+
+
+class TestOrderNetter(unittest.TestCase):
+    def setUp(self):
+        self.placed = []
+
+        def place(token_id, side, size, price, intents):
+            self.placed.append((token_id, side, size, price, sorted(i or '' for i in intents)))
+            return {'status': 'success', 'orderID': f"parent-{len(self.placed)}"}
+
+        self.netter = OrderNetter(place, window_ms=80)
+
+    def _submit_all(self, orders):
+        results = [None] * len(orders)
+
+        def run(i, args):
+            results[i] = self.netter.submit(*args)
+
+        threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(orders)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        return results
+
+    def test_simultaneous_buys_share_one_parent(self):
+        results = self._submit_all([('tok', 'BUY', 10, 0.52, 'a'), ('tok', 'BUY', 5, 0.50, 'b'),
+                                    ('tok', 'BUY', 2.5, 0.51, 'c')])
+
+        self.assertEqual(self.placed, [('tok', 'BUY', 17.5, 0.50, ['a', 'b', 'c'])])
+        self.assertEqual(sorted(r['allocated_shares'] for r in results), [2.5, 5.0, 10.0])
+        self.assertTrue(all(r['orderID'] == 'parent-1' and r['price'] == 0.50 and r['batch_size'] == 3
+                            for r in results))
+        self.assertEqual(self.netter.get_stats()['orders_saved'], 2)
+
+    def test_sides_and_tokens_are_not_mixed(self):
+        self._submit_all([('tok', 'SELL', 4, 0.40, None), ('tok', 'SELL', 6, 0.41, None),
+                          ('tok', 'BUY', 3, 0.45, None), ('other', 'SELL', 1, 0.30, None)])
+
+        by_key = {(p[0], p[1]): (p[2], p[3]) for p in self.placed}
+        self.assertEqual(len(self.placed), 3)
+        self.assertEqual(by_key[('tok', 'SELL')], (10.0, 0.41))   # aucun vendeur sous sa limite
+        self.assertEqual(by_key[('tok', 'BUY')], (3.0, 0.45))
+
+    def test_urgent_exits_batched_apart_at_aggressive_price(self):
+        self._submit_all([('tok', 'SELL', 4, 0.45, 'tp', False), ('tok', 'SELL', 6, 0.40, 'sl', True),
+                          ('tok', 'SELL', 2, 0.42, 'trail', True)])
+
+        by_intents = {tuple(p[4]): (p[2], p[3]) for p in self.placed}
+        self.assertEqual(by_intents[('tp',)], (4.0, 0.45))
+        self.assertEqual(by_intents[('sl', 'trail')], (8.0, 0.40))   # pas la limite de la sortie ordinaire
+
+    def test_child_timing_out_before_close_is_not_in_parent(self):
+        self.netter.window_ms = 300
+        leader = {}
+        thread = threading.Thread(target=lambda: leader.update(self.netter.submit('tok', 'BUY', 10, 0.5, 'leader')))
+        thread.start()
+        time.sleep(0.02)
+        late = self.netter.submit('tok', 'BUY', 5, 0.5, 'late', timeout=0.05)
+        thread.join(5)
+
+        self.assertEqual(late['status'], 'error')
+        self.assertEqual(self.placed, [('tok', 'BUY', 10.0, 0.5, ['leader'])])
+        self.assertEqual((leader['status'], leader['batch_size']), ('success', 1))
+
+    def test_one_parent_in_flight_per_token_across_sides(self):
+        """Sérialisation après netting: un BUY et un SELL du même token ne sont jamais en vol ensemble"""
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def place(token_id, side, size, price, intents):
+            with lock:
+                if token_id in active:
+                    overlaps.append(token_id)
+                active.append(token_id)
+            time.sleep(0.05)
+            with lock:
+                active.remove(token_id)
+            return {'status': 'success', 'orderID': f"{token_id}-{side}"}
+
+        self.netter = OrderNetter(place, window_ms=10)
+        results = self._submit_all([('tok', 'BUY', 3, 0.45, 'w1'), ('tok', 'SELL', 4, 0.40, 'w2'),
+                                    ('other', 'BUY', 1, 0.30, 'w3')])
+
+        self.assertEqual(overlaps, [])
+        self.assertEqual(sorted(r['orderID'] for r in results), ['other-BUY', 'tok-BUY', 'tok-SELL'])
+
+
+class TestParentFillAllocation(unittest.TestCase):
+    def test_fills_split_pro_rata(self):
+        db = FakeDB()
+        tracker = FillTracker(client=None, db=db)
+        tracker._running = True
+        tracker.track('p', 1, 'tok', 'BUY', 10, 0.5, parent_size=15)
+        tracker._handle_event({'event_type': 'order', 'id': 'p', 'type': 'UPDATE', 'size_matched': '6'})
+        tracker.track('p', 2, 'tok', 'BUY', 5, 0.5, parent_size=15)   # enregistrée après un fill
+        tracker._handle_event({'event_type': 'order', 'id': 'p', 'type': 'UPDATE', 'size_matched': '15'})
+
+        self.assertEqual(db.fills, [(1, 4.0, 0.5), (2, 2.0, 0.5), (1, 10.0, 0.5), (2, 5.0, 0.5)])
+        self.assertEqual(tracker.get_stats()['pending_orders'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
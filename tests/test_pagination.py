@@ -0,0 +1,62 @@
+import unittest
+import tempfile
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager, next_cursor, decode_cursor
+
+
+class TestKeysetPagination(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = DBManager(os.path.join(self.tmpdir.name, 'test.db'))
+        # 5 trades dont 2 au même timestamp (départage par order_id)
+        for i, ts in enumerate(['01', '02', '02', '03', '04']):
+            self.db.save_polymarket_trade({'order_id': f'o{i}', 'timestamp': f'2025-01-{ts}T00:00:00'})
+
+    def tearDown(self):
+        self.db.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_pages_cover_all_rows_once(self):
+        """Les pages successives couvrent toutes les lignes sans doublon"""
+        seen, cursor = [], None
+        while True:
+            page = self.db.get_polymarket_trades(limit=2, before=cursor)
+            seen += [t['order_id'] for t in page]
+            cursor = next_cursor(page, 2, id_key='order_id')
+            if not cursor:
+                break
+        self.assertEqual(seen, ['o4', 'o3', 'o2', 'o1', 'o0'])
+
+    def test_rows_without_epoch_are_paginated(self):
+        """Lignes à ts_ms NULL (ancienne version) ou sans timestamp: backfill au démarrage, jamais perdues"""
+        self.db.save_polymarket_trade({'order_id': 'bad', 'timestamp': 'n/a'})
+        self.db._execute("UPDATE polymarket_trades SET ts_ms = NULL WHERE order_id IN ('o1', 'bad')")
+        self.db.conn.close()
+        self.db = DBManager(self.db.db_path)
+
+        seen, cursor = [], None
+        while True:
+            page = self.db.get_polymarket_trades(limit=2, before=cursor)
+            seen += [t['order_id'] for t in page]
+            cursor = next_cursor(page, 2, id_key='order_id')
+            if not cursor:
+                break
+        self.assertEqual(seen, ['o4', 'o3', 'o2', 'o1', 'o0', 'bad'])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor('???')
+
+    def test_stream_rows(self):
+        """L'export streaming lit toutes les lignes via une connexion dédiée"""
+        rows = list(self.db.stream_rows('SELECT order_id FROM polymarket_trades', batch_size=2))
+        self.assertEqual(len(rows), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
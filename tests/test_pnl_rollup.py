@@ -0,0 +1,57 @@
+import unittest
+import tempfile
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+
+class TestDailyPnlRollup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = DBManager(os.path.join(self.tmpdir.name, 'test.db'))
+
+    def tearDown(self):
+        self.db.conn.close()
+        self.tmpdir.cleanup()
+
+    def _trade(self, order_id, day, pnl, status='EXECUTED'):
+        self.db.save_polymarket_trade({
+            'order_id': order_id, 'timestamp': f'{day}T12:00:00',
+            'side': 'SELL', 'pnl': pnl, 'status': status
+        })
+
+    def test_rollup_matches_trades(self):
+        """Le rollup est maintenu à l'insertion, y compris en cas de REPLACE"""
+        self._trade('a', '2025-01-01', 10)
+        self._trade('b', '2025-01-01', -4)
+        self._trade('c', '2025-01-02', 5)
+        self._trade('d', '2025-01-02', 99, status='FAILED')
+        self._trade('c', '2025-01-02', 7)  # Remplacement du trade c
+
+        history = self.db.get_daily_pnl(30)
+        self.assertEqual([r['day'] for r in history], ['2025-01-02', '2025-01-01'])
+        self.assertEqual(history[0]['daily_pnl'], 7)
+        self.assertEqual(history[0]['trades_count'], 1)
+        self.assertEqual(history[1]['winning_trades'], 1)
+        self.assertEqual(history[0]['cumulative_pnl'], 13)
+
+    def test_rebuild_is_consistent(self):
+        """Le backfill reproduit le rollup incrémental"""
+        self._trade('a', '2025-01-01', 10)
+        self._trade('b', '2025-01-03', 3)
+        before = self.db.get_daily_pnl(30)
+        self.db.rebuild_daily_pnl_rollup()
+        self.assertEqual(self.db.get_daily_pnl(30), before)
+
+    def test_delete_trade_history_clears_rollup(self):
+        self._trade('a', '2025-01-01', 10)
+        self.assertEqual(self.db.delete_trade_history(), 1)
+        self.assertEqual(self.db.get_daily_pnl(30), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
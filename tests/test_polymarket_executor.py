@@ -0,0 +1,79 @@
+import unittest
+import tempfile
+import threading
+import sys
+import os
+from datetime import date
+from unittest.mock import patch
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import polymarket_executor
+from db_manager import DBManager
+from position_store import PositionStore
+
+
+def position(token_id, wallet, shares=10.0, price=0.5):
+    return {'token_id': token_id, 'source_wallet': wallet, 'market_slug': 'mkt', 'side': 'BUY',
+            'shares': shares, 'size': shares, 'avg_price': price, 'entry_price': price,
+            'current_price': price, 'value_usd': shares * price, 'status': 'OPEN'}
+
+
+class TestNettedExits(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = DBManager(os.path.join(self.tmpdir.name, 'test.db'))
+        self.a = self.db.add_position(position('tok1', 'w1'))
+        self.b = self.db.add_position(position('tok1', 'w2'))
+        self.store = PositionStore(self.db)
+
+        self.placed = []
+
+        def place_order(**order):
+            self.placed.append(order)
+            return {'status': 'success', 'orderID': 'parent-1', 'result': {}}
+
+        patches = [
+            patch.object(polymarket_executor, 'db_manager', self.db),
+            patch.object(polymarket_executor, 'get_position_store', lambda: self.store),
+            patch.object(polymarket_executor.polymarket_client, 'place_order', place_order),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+        self.executor = polymarket_executor.PolymarketExecutor()
+        self.executor.get_market_price = lambda token_id, side: 0.6
+
+    def tearDown(self):
+        self.store.flush()
+        self.db.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_netted_exits_keep_one_trade_each(self):
+        """Deux sorties nettées dans un parent: deux lignes de trade, PnL des deux au rollup"""
+        results = {}
+        threads = [threading.Thread(target=lambda pid=pid: results.update({pid: self.executor.sell_position(pid)}))
+                   for pid in (self.a, self.b)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(self.placed), 1)
+        self.assertEqual(self.placed[0]['size'], 20.0)
+        self.assertTrue(all(r['success'] for r in results.values()), results)
+
+        trades = {t['order_id']: t for t in self.db.get_polymarket_trades(limit=10)}
+        self.assertEqual(set(trades), {f"parent-1:{self.a}", f"parent-1:{self.b}"})
+        self.assertAlmostEqual(sum(t['pnl'] for t in trades.values()), 2.0)
+
+        today = self.db.get_daily_pnl(1)[0]
+        self.assertEqual(today['day'], date.today().isoformat())
+        self.assertEqual(today['trades_count'], 2)
+        self.assertAlmostEqual(today['daily_pnl'], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
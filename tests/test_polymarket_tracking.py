@@ -0,0 +1,113 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from collections import Counter
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from polymarket_tracking import PolymarketTracker
+
+
+def wallet(i):
+    return f"0x{i:040x}"
+
+
+class TestTrackerSharding(unittest.TestCase):
+    def setUp(self):
+        self.tracker = PolymarketTracker(wallets_per_shard=10, max_shards=8)
+        self.polled = Counter()
+
+        def fake_positions(addresses):
+            self.polled.update(a.lower() for a in addresses)
+            return {a.lower(): [] for a in addresses}
+
+        self.tracker.get_all_user_positions = fake_positions
+
+    def run_cycle(self):
+        """Un cycle complet: chaque shard poll sa tranche, comme _shard_loop"""
+        self.polled.clear()
+        for shard in range(self.tracker._ring.size):
+            self.tracker.check_wallets(self.tracker.wallets_for_shard(shard))
+        return self.polled
+
+    def assert_each_polled_once(self):
+        polled = self.run_cycle()
+        self.assertEqual(set(polled), set(self.tracker.tracked_wallets))
+        self.assertTrue(all(count == 1 for count in polled.values()), polled.most_common(3))
+
+    def test_added_and_removed_wallets_polled_exactly_once(self):
+        for i in range(25):
+            self.tracker.add_wallet(wallet(i))
+        self.assertEqual(self.tracker._ring.size, 3)
+        self.assert_each_polled_once()
+
+        # Ajouts (adresses en casse mixte): passage à 5 shards, une partie des wallets change de shard
+        for i in range(25, 45):
+            self.tracker.add_wallet('0x' + wallet(i)[2:].upper())
+        self.assertEqual(self.tracker._ring.size, 5)
+        self.assert_each_polled_once()
+
+        # Retraits: retour à 3 shards, les wallets retirés ne sont plus pollés
+        removed = [wallet(i) for i in range(0, 45, 2)]
+        for address in removed:
+            self.tracker.remove_wallet(address)
+        self.assertEqual(self.tracker._ring.size, 3)
+        self.assert_each_polled_once()
+        self.assertFalse(set(removed) & set(self.polled))
+
+    def test_wallet_removed_during_cycle_is_not_polled(self):
+        for i in range(15):
+            self.tracker.add_wallet(wallet(i))
+        shard = self.tracker._ring.shard_for(wallet(3))
+        slice_ = self.tracker.wallets_for_shard(shard)
+
+        self.tracker.remove_wallet(wallet(3))
+        self.polled.clear()
+        self.tracker.check_wallets(slice_)
+
+        self.assertNotIn(wallet(3), self.polled)
+        self.assertEqual(set(self.polled), set(slice_) - {wallet(3)})
+
+    def test_wallet_moving_shard_mid_cycle_signals_once(self):
+        for i in range(10):
+            self.tracker.add_wallet(wallet(i))
+        old_slices = {s: self.tracker.wallets_for_shard(s) for s in range(self.tracker._ring.size)}
+        self.run_cycle()  # Snapshots initiaux
+
+        # Resize: un wallet passe sur un nouveau shard pendant que l'ancien scanne encore
+        for i in range(10, 25):
+            self.tracker.add_wallet(wallet(i))
+        moved = next(w for s, ws in old_slices.items() for w in ws
+                     if self.tracker._ring.shard_for(w) != s)
+        old_slice = next(ws for ws in old_slices.values() if moved in ws)
+        new_slice = self.tracker.wallets_for_shard(self.tracker._ring.shard_for(moved))
+
+        balance = {'asset': {'id': 'tok-1'}, 'balance': 5_000_000}
+        self.tracker.get_all_user_positions = lambda addrs: {
+            a.lower(): ([balance] if a.lower() == moved else []) for a in addrs
+        }
+
+        def slow_market_info(token_id):
+            time.sleep(0.05)  # Appel réseau: fenêtre où l'autre shard lit last_positions
+            return {'yes_price': 0.5}
+
+        self.tracker.get_market_info = slow_market_info
+        dispatched = []
+        self.tracker._dispatch_signal = dispatched.append
+
+        threads = [threading.Thread(target=self.tracker.check_wallets, args=(slice_,))
+                   for slice_ in (old_slice, new_slice)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([(s['wallet'], s['type'], s['asset_id']) for s in dispatched],
+                         [(moved, 'BUY', 'tok-1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
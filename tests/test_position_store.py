@@ -0,0 +1,131 @@
+import unittest
+import tempfile
+import threading
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from position_store import PositionStore
+
+
+def position(token_id, wallet, status='OPEN', shares=10.0, price=0.5):
+    return {'token_id': token_id, 'source_wallet': wallet, 'market_slug': 'mkt', 'side': 'BUY',
+            'shares': shares, 'size': shares, 'avg_price': price, 'entry_price': price,
+            'current_price': price, 'value_usd': shares * price, 'status': status}
+
+
+class TestPositionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'test.db')
+        self.db = DBManager(self.path)
+        self.a = self.db.add_position(position('tok1', 'w1'))
+        self.b = self.db.add_position(position('tok1', 'w2'))
+        self.c = self.db.add_position(position('tok2', 'w1', status='PENDING'))
+        self.store = PositionStore(self.db)
+
+    def tearDown(self):
+        self.store.flush()
+        self.db.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_indexes_and_compatible_views(self):
+        self.assertEqual({p['id'] for p in self.store.get_bot_positions()}, {self.a, self.b})
+        self.assertEqual({p['id'] for p in self.store.get_positions_by_token('tok1')}, {self.a, self.b})
+        self.assertEqual([p['id'] for p in self.store.get_positions_by_wallet('w1', status=None)],
+                         [self.c, self.a])   # plus récente d'abord
+
+        view = self.store.get_position_by_id(self.a)
+        self.assertEqual((view['position_id'], view['asset_id'], view['amount']), (self.a, 'tok1', 5.0))
+        self.assertEqual(view['highest_price'], 0.5)   # colonnes complètes (trailing)
+        self.assertEqual(self.store.loads, 1)
+
+    def test_mutations_are_immediate_then_written_through(self):
+        self.store.get_bot_positions()
+        self.store.apply_position_fill(self.c, 4.0, 0.48)
+        self.store.update_position_price(self.a, 0.6, 1.0)
+        self.store.update_position_price(self.a, 0.7, 2.0)   # coalescé avec le précédent
+        self.store.close_position(self.b, 1.5, status='CLOSED_TP')
+
+        self.assertEqual({p['id'] for p in self.store.get_bot_positions()}, {self.a, self.c})
+        self.assertEqual(self.store.get_realized_pnl_total(), 1.5)
+
+        self.assertTrue(self.store.flush())
+        self.assertEqual(self.db.get_position_by_id(self.a)['current_price'], 0.7)
+        self.assertEqual(self.db.get_position_by_id(self.b)['status'], 'CLOSED_TP')
+        self.assertEqual(self.db.get_position_by_id(self.c)['status'], 'OPEN')
+        self.assertEqual(self.store.loads, 1)   # nos propres écritures ne rechargent pas
+
+    def test_reloads_after_write_from_other_connection(self):
+        self.store.get_bot_positions()
+        other = DBManager(self.path)   # autre processus
+        other.close_position(self.a, 0.0, status='CLOSED_MANUAL')
+        other.conn.close()
+
+        self.assertEqual({p['id'] for p in self.store.get_bot_positions()}, {self.b})
+        self.assertEqual(self.store.loads, 2)
+
+    def test_unrelated_writes_do_not_reload(self):
+        self.store.get_bot_positions()
+        other = DBManager(self.path)
+        other.save_polymarket_trade({'order_id': 'x', 'token_id': 'tok1', 'side': 'BUY', 'price': 0.5, 'size': 1})
+        other.conn.close()
+
+        self.store.get_bot_positions()
+        self.assertEqual(self.store.loads, 1)
+
+    def test_reloads_after_raw_sql_on_same_connection(self):
+        self.store.get_bot_positions()
+        self.db._execute("DELETE FROM bot_positions WHERE id = ?", (self.a,))
+        self.store.update_position_price(self.b, 0.6, 1.0)   # écriture du store après le SQL direct
+        self.assertTrue(self.store.flush())
+
+        self.assertEqual({p['id'] for p in self.store.get_bot_positions()}, {self.b})
+        self.assertEqual(self.store.loads, 2)
+
+    def test_delete_all_positions(self):
+        self.store.get_bot_positions()
+        self.assertEqual(self.store.delete_all_positions(), 3)
+        self.assertEqual(self.store.get_bot_positions(status=None), [])
+        self.assertEqual(self.db.get_bot_positions(status=None), [])
+        self.assertEqual(self.store.loads, 1)
+
+    def test_write_during_load_is_not_lost(self):
+        """Mutation + écriture en file entre le vidage et l'instantané de load(): rechargée ensuite"""
+        self.store.get_bot_positions()
+        real_flush = self.store.flush
+
+        def flush_then_concurrent_write(*args):
+            done = real_flush(*args)
+            writer = threading.Thread(target=self.store.update_position_price, args=(self.a, 0.9, 4.0))
+            writer.start()
+            writer.join()
+            return done
+
+        self.store.flush = flush_then_concurrent_write
+        self.store.load()
+        self.store.flush = real_flush
+
+        self.assertEqual(self.store.get_position_by_id(self.a)['current_price'], 0.9)
+        self.assertTrue(self.store.flush())
+        self.assertEqual(self.db.get_position_by_id(self.a)['current_price'], 0.9)
+
+    def test_failed_reconciliation_leaves_memory_untouched(self):
+        self.store.get_bot_positions()
+
+        def fail(stale_ids, price_updates):
+            raise RuntimeError("disk full")
+
+        self.db.apply_position_reconciliation = fail
+        with self.assertRaises(RuntimeError):
+            self.store.apply_reconciliation([self.a], [(self.b, 0.9, 4.0)])
+
+        self.assertEqual(self.store.get_position_by_id(self.a)['status'], 'OPEN')
+        self.assertEqual(self.store.get_position_by_id(self.b)['current_price'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
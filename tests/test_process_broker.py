@@ -0,0 +1,79 @@
+import unittest
+import threading
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from process_broker import ProcessBroker, BrokerClient, BrokerEmitter, RemoteComponent
+
+
+class FakeScanner:
+    def __init__(self):
+        self.running = False
+        self.scan_interval = 30
+
+    def start(self):
+        self.running = True
+        return True
+
+    def fail(self):
+        raise ValueError("boom")
+
+    def get_stats(self):
+        return {'running': self.running, 'scan_interval': self.scan_interval}
+
+
+class TestProcessBroker(unittest.TestCase):
+    def setUp(self):
+        self.broker = ProcessBroker()
+        self.broker.start()
+        self.web = BrokerClient(self.broker.address, self.broker.authkey, 'web')
+        self.worker = BrokerClient(self.broker.address, self.broker.authkey, 'hft')
+
+    def tearDown(self):
+        self.web.close()
+        self.worker.close()
+        self.broker.stop()
+
+    def test_emitter_relays_socketio_events(self):
+        """Un emit() du worker arrive chez les abonnés du topic socketio"""
+        received = []
+        done = threading.Event()
+        self.web.subscribe('socketio', lambda m: (received.append(m), done.set()))
+        self.web.get_state('sync')  # abonnement traité par le broker
+
+        BrokerEmitter(self.worker).emit('hft_signal', {'id': 1})
+        self.assertTrue(done.wait(2))
+        self.assertEqual(received[0]['event'], 'hft_signal')
+        self.assertEqual(received[0]['data'], {'id': 1})
+
+    def test_remote_component_commands_and_stats(self):
+        """Méthodes distantes exécutées dans le worker, stats lues dans l'état partagé"""
+        scanner = FakeScanner()
+        self.worker.serve({'hft': scanner}, stats_interval=60)
+        local = FakeScanner()
+        proxy = RemoteComponent(self.web, 'hft', 'hft', local, remote_methods=['start', 'fail'])
+
+        self.assertFalse(proxy.running)
+        self.assertTrue(proxy.start())
+        self.assertTrue(scanner.running)
+        self.assertTrue(proxy.running)     # stats republiées avant la réponse
+        self.assertFalse(local.running)
+
+        proxy.scan_interval = 60
+        self.assertEqual(scanner.scan_interval, 60)
+        self.assertEqual(local.scan_interval, 60)
+
+        with self.assertRaises(RuntimeError):
+            proxy.fail()
+
+    def test_command_to_missing_worker_fails_fast(self):
+        """Une commande vers un rôle non connecté échoue immédiatement"""
+        with self.assertRaises(RuntimeError):
+            self.web.call('insider', 'insider', 'start_scanning', timeout=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
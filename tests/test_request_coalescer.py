@@ -0,0 +1,55 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from request_coalescer import RequestCoalescer
+
+
+class TestRequestCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.coalescer = RequestCoalescer()
+
+    def test_concurrent_calls_share_one_request(self):
+        """Les appels concurrents sur la même clé n'exécutent la requête qu'une fois"""
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'question': 'BTC Up?'}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.coalescer.do('gamma:markets/1', fetch)))
+            for _ in range(6)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 6)
+        stats = self.coalescer.get_stats()
+        self.assertEqual(stats['requests_saved'], 5)
+        self.assertEqual(stats['namespaces']['gamma']['executed'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_error_propagates_and_is_not_retained(self):
+        """Une erreur est propagée puis la clé est libérée"""
+        def fail():
+            raise ValueError("timeout")
+
+        with self.assertRaises(ValueError):
+            self.coalescer.do('clob:book:x', fail)
+        self.assertEqual(self.coalescer.do('clob:book:x', lambda: 42), 42)
+        self.assertEqual(self.coalescer.get_stats()['namespaces']['clob']['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from startup_manager import StartupManager
+
+
+class TestStartupManager(unittest.TestCase):
+    def test_background_phase_respects_dependencies(self):
+        """Une phase ne démarre qu'après ses dépendances"""
+        manager = StartupManager()
+        order = []
+        release = threading.Event()
+
+        manager.background('clob', lambda: (release.wait(2), order.append('clob')))
+        manager.background('hft', lambda: order.append('hft'), after=['clob'])
+        time.sleep(0.05)
+        self.assertEqual(order, [])
+        self.assertFalse(manager.get_status()['ready'])
+        self.assertEqual(manager.get_status()['status'], 'starting')
+
+        release.set()
+        self.assertTrue(manager.wait('hft', timeout=2))
+        self.assertEqual(order, ['clob', 'hft'])
+        self.assertTrue(manager.get_status()['ready'])
+        self.assertEqual(manager.get_status()['status'], 'ok')
+
+    def test_failure_propagates_and_is_reported(self):
+        """Une phase en échec est visible et fait échouer ses dépendantes"""
+        manager = StartupManager()
+
+        def boom():
+            raise RuntimeError("clé invalide")
+
+        manager.record('imports', time.time())
+        manager.skip('insider', 'auto_start désactivé')
+        manager.background('clob', boom)
+        manager.background('risk', lambda: None, after=['clob'])
+
+        self.assertFalse(manager.wait('risk', timeout=2))
+        status = manager.get_status()
+        self.assertFalse(status['ready'])
+        self.assertEqual(status['status'], 'degraded')
+        self.assertEqual(status['failed'], ['clob', 'risk'])
+        self.assertEqual(status['phases']['clob']['state'], 'failed')
+        self.assertIn('clé invalide', status['phases']['clob']['error'])
+        self.assertEqual(status['phases']['risk']['state'], 'failed')
+        self.assertEqual(status['phases']['insider']['state'], 'skipped')
+        self.assertEqual(status['phases']['imports']['state'], 'ready')
+
+
+if __name__ == '__main__':
+    unittest.main()
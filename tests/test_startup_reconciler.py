@@ -0,0 +1,106 @@
+import unittest
+import tempfile
+import threading
+import time
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from position_store import PositionStore
+from startup_reconciler import StartupReconciler
+
+
+class FakeExecutor:
+    """Prix par token, avec latence réseau simulée"""
+
+    def __init__(self, prices, latency=0.05):
+        self.prices = prices
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_market_price(self, token_id, side):
+        with self._lock:
+            self.calls.append(token_id)
+        time.sleep(self.latency)
+        return self.prices.get(token_id)
+
+
+class FakeFillTracker:
+    def __init__(self, store):
+        self.store = store
+        self.tracked = []
+
+    def resume_pending(self):
+        pending = [p for p in self.store.get_bot_positions(status='PENDING') if p.get('order_id')]
+        self.tracked.extend((p['order_id'], p['id']) for p in pending)
+        return len(pending)
+
+
+class TestStartupReconciler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = DBManager(os.path.join(self.tmpdir.name, 'test.db'))
+        self.ids = {}
+        for name, token in (('a', 'tok1'), ('b', 'tok1'), ('c', 'tok2'), ('d', 'tok3'), ('old', 'tok1')):
+            self.ids[name] = self.db.add_position({
+                'token_id': token, 'source_wallet': name, 'market_slug': 'mkt', 'shares': 10, 'size': 10,
+                'entry_price': 0.5, 'avg_price': 0.5, 'status': 'OPEN'
+            })
+        old = (datetime.now() - timedelta(days=10)).isoformat()
+        self.db._execute('UPDATE bot_positions SET last_updated = ? WHERE id = ?', (old, self.ids['old']))
+        self.store = PositionStore(self.db)
+
+    def tearDown(self):
+        self.db.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_batched_pricing_and_single_transaction(self):
+        executor = FakeExecutor({'tok1': 0.6, 'tok3': 0.4})   # tok2 sans prix
+        report = StartupReconciler(executor, store=self.store).reconcile()
+
+        self.assertEqual(sorted(executor.calls), ['tok1', 'tok2', 'tok3'])   # un appel par token
+        self.assertLess(report['timings_ms']['pricing'], 3 * 50)             # en parallèle
+        self.assertEqual(set(report['timings_ms']), {'load', 'pricing', 'evaluate', 'persist', 'total'})
+        self.assertEqual((report['positions_checked'], report['positions_updated'], report['positions_stale']),
+                         (5, 3, 2))
+
+        by_id = {p['id']: p for p in self.db.get_bot_positions(status=None)}
+        self.assertEqual(by_id[self.ids['c']]['status'], 'STALE')
+        self.assertEqual(by_id[self.ids['old']]['status'], 'STALE')
+        self.assertEqual(by_id[self.ids['a']]['current_price'], 0.6)
+        self.assertAlmostEqual(by_id[self.ids['d']]['unrealized_pnl'], -1.0)
+        self.assertEqual(len(self.store.get_bot_positions(status='STALE')), 2)
+
+    def test_cleanup_stale_positions(self):
+        StartupReconciler(FakeExecutor({}, latency=0), store=self.store).reconcile()
+        reconciler = StartupReconciler(store=self.store)
+        self.assertEqual(reconciler.cleanup_stale_positions(max_age_days=-1), 5)
+        self.assertEqual(reconciler.get_stale_positions(), [])
+
+    def test_pending_positions_resumed_without_open_positions(self):
+        self.db._execute("DELETE FROM bot_positions", commit=True)
+        pending = self.db.add_position({
+            'token_id': 'tok1', 'source_wallet': 'a', 'market_slug': 'mkt', 'shares': 10, 'size': 10,
+            'entry_price': 0.5, 'avg_price': 0.5, 'status': 'PENDING', 'order_id': 'ord-1', 'order_size': 10
+        })
+        self.db.add_position({
+            'token_id': 'tok1', 'source_wallet': 'b', 'market_slug': 'mkt', 'shares': 10, 'size': 10,
+            'entry_price': 0.5, 'avg_price': 0.5, 'status': 'PENDING'
+        })
+        store = PositionStore(self.db)
+        tracker = FakeFillTracker(store)
+
+        report = StartupReconciler(store=store, fill_tracker=tracker).reconcile()
+
+        self.assertEqual(tracker.tracked, [('ord-1', pending)])
+        self.assertEqual((report['pending_resumed'], report['pending_untracked']), (1, 1))
+        self.assertEqual(store.get_position_by_id(pending)['order_size'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
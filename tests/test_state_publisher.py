@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_publisher import StatePublisher, compute_patch
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, to=None, namespace=None):
+        self.emitted.append((event, data, to))
+
+
+class TestStatePublisher(unittest.TestCase):
+    def test_compute_patch(self):
+        """Le patch ne contient que les champs modifiés, null pour les suppressions"""
+        old = {'1': {'price': 0.5, 'pnl': 1}, '2': {'price': 0.3}}
+        new = {'1': {'price': 0.6, 'pnl': 1}, '3': {'price': 0.1}}
+        self.assertEqual(compute_patch(old, new), {'1': {'price': 0.6}, '2': None, '3': {'price': 0.1}})
+        self.assertIsNone(compute_patch(new, dict(new)))
+
+    def test_frames_only_for_dirty_channels(self):
+        """Seuls les canaux modifiés et suivis émettent un patch"""
+        sio = FakeSocketIO()
+        state = {'1': {'price': 0.5}}
+        publisher = StatePublisher(sio)
+        publisher.register_channel('positions', lambda: {k: dict(v) for k, v in state.items()}, max_staleness=60)
+        publisher._channels['positions'].subscribers = 1
+
+        publisher.publish_frame()  # Premier snapshot
+        sio.emitted.clear()
+
+        self.assertEqual(publisher.publish_frame(), 0)  # Rien de modifié
+
+        state['1']['price'] = 0.55
+        publisher.mark_dirty('positions')
+        self.assertEqual(publisher.publish_frame(), 1)
+        event, data, room = sio.emitted[-1]
+        self.assertEqual(event, 'state_frame')
+        self.assertEqual(room, 'state:positions')
+        self.assertEqual(data['patches'][0]['patch'], {'1': {'price': 0.55}})
+        self.assertEqual(data['patches'][0]['version'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import tempfile
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from timeseries_store import TimeSeriesStore
+
+
+class TestTimeSeriesStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = DBManager(os.path.join(self.tmpdir.name, 'test.db'))
+        self.store = TimeSeriesStore(self.db)
+
+    def tearDown(self):
+        self.db.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_incremental_rollups(self):
+        """Les rollups 1m sont mis à jour incrémentalement entre deux flush"""
+        base = 1_700_000_040  # Début d'une minute
+        self.store.record('equity', 10, base)
+        self.store.record('equity', 15, base + 10)
+        self.store.flush()
+        self.store.record('equity', 8, base + 20)
+        self.store.record('equity', 12, base + 30)
+        self.store.flush()
+
+        buckets = self.store.get_series('equity', '1m')
+        self.assertEqual(len(buckets), 1)
+        b = buckets[0]
+        self.assertEqual((b['open'], b['high'], b['low'], b['close'], b['count']), (10, 15, 8, 12, 4))
+        self.assertAlmostEqual(b['avg'], 11.25)
+
+    def test_drawdown(self):
+        """Le drawdown max est calculé sur les rollups"""
+        base = 1_700_000_040
+        for i, value in enumerate([100, 120, 90, 110]):
+            self.store.record('equity', value, base + i * 60)
+        self.store.flush()
+
+        dd = self.store.get_drawdown('equity', '1m')
+        self.assertEqual(dd['max_drawdown'], 30)
+        self.assertEqual(dd['max_drawdown_pct'], 25.0)
+        self.assertEqual(dd['current_drawdown'], 10)
+
+    def test_clear_drops_buffer_and_history(self):
+        base = 1_700_000_040
+        self.store.record('equity', 100, base)
+        self.store.flush()
+        self.store.record('equity', 120, base + 60)   # encore dans le buffer
+
+        self.store.clear()
+        self.store.flush()
+
+        self.assertEqual(self.store.get_series('equity', '1m'), [])
+        self.assertEqual(self.db.conn.execute('SELECT COUNT(*) FROM ts_points').fetchone()[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
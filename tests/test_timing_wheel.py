@@ -0,0 +1,53 @@
+import unittest
+import random
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timing_wheel import TimingWheel
+
+
+class TestTimingWheel(unittest.TestCase):
+    def test_fires_exactly_at_deadline_across_levels(self):
+        """Chaque timer expire au tick de son échéance, jamais avant, même après cascades"""
+        wheel = TimingWheel(tick_sec=1.0, slots=8, levels=3, now=1000)
+        fired = {}
+        rng = random.Random(42)
+        deadlines = {f"k{i}": 1000 + rng.randint(1, 700) for i in range(300)}  # au-delà de 8^3
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline, lambda k, fired=fired: fired.__setitem__(k, now))
+
+        for now in range(1001, 1801):
+            wheel.advance(now)
+
+        self.assertEqual(fired, deadlines)
+        self.assertEqual(len(wheel), 0)
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimingWheel(tick_sec=1.0, slots=8, levels=2, now=0)
+        fired = []
+        wheel.schedule('a', 5, fired.append)
+        wheel.schedule('b', 5, fired.append)
+        wheel.schedule('b', 20, fired.append)   # reprogrammé
+        self.assertTrue(wheel.cancel('a'))
+        self.assertFalse(wheel.cancel('a'))
+
+        wheel.advance(10)
+        self.assertEqual(fired, [])
+        self.assertIn('b', wheel)
+        wheel.advance(20)
+        self.assertEqual(fired, ['b'])
+
+    def test_past_deadline_fires_on_next_tick(self):
+        wheel = TimingWheel(tick_sec=1.0, now=100)
+        fired = []
+        wheel.schedule('late', 50, fired.append)
+        self.assertEqual(wheel.advance(100.5), 0)
+        self.assertEqual(wheel.advance(101), 1)
+        self.assertEqual(fired, ['late'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import sys
+import os
+
+# Ajouter le dossier parent au path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wallet_sharding import ConsistentHashRing
+
+WALLETS = [f"0x{i:040x}" for i in range(1000)]
+
+
+class TestConsistentHashRing(unittest.TestCase):
+    def test_assignment_is_stable_and_case_insensitive(self):
+        """Un wallet a toujours le même shard, quelle que soit la casse"""
+        ring = ConsistentHashRing(4)
+        self.assertEqual(ring.shard_for('0xABCDEF'), ring.shard_for('0xabcdef'))
+        self.assertEqual(ConsistentHashRing(4).assign(WALLETS), ring.assign(WALLETS))
+
+    def test_wallets_spread_across_shards(self):
+        """Répartition raisonnablement équilibrée grâce aux nœuds virtuels"""
+        slices = ConsistentHashRing(4).assign(WALLETS)
+        self.assertEqual(sorted(slices), [0, 1, 2, 3])
+        for wallets in slices.values():
+            self.assertGreater(len(wallets), 150)
+
+    def test_resize_moves_only_a_fraction(self):
+        """Passer de 4 à 5 shards ne déplace que les wallets du nouveau shard"""
+        ring = ConsistentHashRing(4)
+        before = {w: ring.shard_for(w) for w in WALLETS}
+        ring.resize(5)
+        moved = [w for w in WALLETS if ring.shard_for(w) != before[w]]
+        self.assertTrue(all(ring.shard_for(w) == 4 for w in moved))
+        self.assertLess(len(moved), 350)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Time-Series Store - Historique compact des prix de positions et de l'equity
+
+Le Risk Engine met à jour `current_price` chaque seconde sans garder d'historique,
+et les graphiques PnL faisaient un GROUP BY sur toute la table des trades.
+
+Ce module stocke des séries append-only dans SQLite (clés epoch entières, tables
+WITHOUT ROWID) et maintient incrémentalement des rollups 1m / 1h / 1d
+(open/high/low/close/sum/count). Les lectures du dashboard et du drawdown
+n'utilisent que les rollups pré-agrégés.
+
+Séries:
+    - equity              : PnL total du portefeuille (réalisé + latent)
+    - pos:<id>:price      : prix marqué d'une position
+    - pos:<id>:upnl       : PnL latent d'une position
+"""
+import time
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("TimeSeriesStore")
+
+# Résolutions des rollups (secondes) et rétention associée
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+RETENTION = {
+    0: 2 * 86400,          # Points bruts: 48h
+    60: 30 * 86400,        # 1m: 30 jours
+    3600: 365 * 86400,     # 1h: 1 an
+    86400: None,           # 1d: illimité
+}
+
+
+class TimeSeriesStore:
+    """
+    Store de séries temporelles adossé à la connexion SQLite du DBManager.
+    Les écritures sont bufferisées en mémoire et flushées par lot dans une transaction.
+    """
+
+    def __init__(self, db, flush_interval: float = 5.0, prune_interval: float = 3600.0):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+
+        self._buffer: List[Tuple[str, int, float]] = []
+        self._buffer_lock = threading.Lock()
+        self._last_flush = time.time()
+        self._last_prune = time.time()
+
+        # Stats
+        self.points_written = 0
+        self.rollups_written = 0
+        self.flush_count = 0
+
+        self._init_tables()
+        logger.info("📈 TimeSeriesStore initialisé")
+
+    def _init_tables(self):
+        """Crée les tables de séries (points bruts + rollups)"""
+        with self.db.lock:
+            c = self.db.conn.cursor()
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS ts_points (
+                    series TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (series, ts)
+                ) WITHOUT ROWID
+            ''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS ts_rollups (
+                    series TEXT NOT NULL,
+                    resolution INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    sum REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (series, resolution, bucket)
+                ) WITHOUT ROWID
+            ''')
+            self.db.conn.commit()
+
+    # =========================================================================
+    # ÉCRITURE
+    # =========================================================================
+
+    def record(self, series: str, value: float, ts: Optional[float] = None):
+        """Ajoute un point au buffer (non bloquant, pas d'I/O)"""
+        if value is None:
+            return
+        with self._buffer_lock:
+            self._buffer.append((series, int(ts if ts is not None else time.time()), float(value)))
+
+    def maybe_flush(self):
+        """Flush si l'intervalle est écoulé (appelé depuis la boucle du Risk Engine)"""
+        now = time.time()
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+        if now - self._last_prune >= self.prune_interval:
+            self.prune()
+
+    def flush(self) -> int:
+        """
+        Écrit les points bufferisés et met à jour les rollups dans une seule transaction.
+
+        Returns:
+            Nombre de points écrits
+        """
+        with self._buffer_lock:
+            points = self._buffer
+            self._buffer = []
+        self._last_flush = time.time()
+
+        if not points:
+            return 0
+
+        # Ordre chronologique pour que open/close soient corrects
+        points.sort(key=lambda p: p[1])
+
+        # Pré-agrégation en mémoire: une seule UPSERT par (série, résolution, bucket)
+        buckets: Dict[Tuple[str, int, int], List[float]] = {}
+        for series, ts, value in points:
+            for res in RESOLUTIONS.values():
+                key = (series, res, ts - ts % res)
+                agg = buckets.get(key)
+                if agg is None:
+                    # [open, high, low, close, sum, count]
+                    buckets[key] = [value, value, value, value, value, 1]
+                else:
+                    if value > agg[1]:
+                        agg[1] = value
+                    if value < agg[2]:
+                        agg[2] = value
+                    agg[3] = value
+                    agg[4] += value
+                    agg[5] += 1
+
+        with self.db.lock:
+            conn = self.db.conn
+            try:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO ts_points (series, ts, value) VALUES (?, ?, ?)',
+                    points
+                )
+                conn.executemany('''
+                    INSERT INTO ts_rollups (series, resolution, bucket, open, high, low, close, sum, count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(series, resolution, bucket) DO UPDATE SET
+                        high = max(high, excluded.high),
+                        low = min(low, excluded.low),
+                        close = excluded.close,
+                        sum = sum + excluded.sum,
+                        count = count + excluded.count
+                ''', [(s, r, b, *agg) for (s, r, b), agg in buckets.items()])
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"❌ Erreur flush séries: {e}")
+                return 0
+
+        self.points_written += len(points)
+        self.rollups_written += len(buckets)
+        self.flush_count += 1
+        return len(points)
+
+    def prune(self):
+        """Supprime les points bruts et rollups au-delà de leur rétention"""
+        self._last_prune = time.time()
+        now = int(time.time())
+        with self.db.lock:
+            conn = self.db.conn
+            try:
+                for res, retention in RETENTION.items():
+                    if retention is None:
+                        continue
+                    if res == 0:
+                        conn.execute('DELETE FROM ts_points WHERE ts < ?', (now - retention,))
+                    else:
+                        conn.execute(
+                            'DELETE FROM ts_rollups WHERE resolution = ? AND bucket < ?',
+                            (res, now - retention)
+                        )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"❌ Erreur prune séries: {e}")
+
+    def clear(self):
+        """Oublie tout l'historique: buffer en mémoire et tables (reset des statistiques)"""
+        with self._buffer_lock:
+            self._buffer = []
+        self.db.clear_timeseries()
+
+    # =========================================================================
+    # LECTURE (rollups uniquement)
+    # =========================================================================
+
+    def get_series(self, series: str, resolution: str = '1h', since: Optional[int] = None,
+                   until: Optional[int] = None) -> List[Dict]:
+        """
+        Retourne les buckets pré-agrégés d'une série, en ordre chronologique.
+
+        Args:
+            series: Nom de la série ('equity', 'pos:12:price', ...)
+            resolution: '1m', '1h' ou '1d'
+            since / until: Bornes epoch (secondes) optionnelles
+        """
+        res = RESOLUTIONS.get(resolution)
+        if res is None:
+            raise ValueError(f"Résolution inconnue: {resolution}")
+
+        query = '''
+            SELECT bucket, open, high, low, close, sum, count
+            FROM ts_rollups
+            WHERE series = ? AND resolution = ? AND bucket >= ?
+        '''
+        params = [series, res, since or 0]
+        if until is not None:
+            query += ' AND bucket <= ?'
+            params.append(until)
+        query += ' ORDER BY bucket'
+
+        with self.db.lock:
+            rows = self.db.conn.execute(query, params).fetchall()
+
+        return [
+            {
+                'ts': r[0], 'open': r[1], 'high': r[2], 'low': r[3], 'close': r[4],
+                'avg': r[5] / r[6] if r[6] else r[4], 'count': r[6]
+            }
+            for r in rows
+        ]
+
+    def get_drawdown(self, series: str = 'equity', resolution: str = '1h',
+                     since: Optional[int] = None) -> Dict:
+        """
+        Calcule le drawdown max et courant à partir des rollups (peak sur high, creux sur low).
+        """
+        buckets = self.get_series(series, resolution, since)
+        if not buckets:
+            return {'max_drawdown': 0, 'max_drawdown_pct': 0, 'current_drawdown': 0,
+                    'peak': 0, 'peak_ts': None, 'trough_ts': None}
+
+        peak = buckets[0]['high']
+        peak_ts = buckets[0]['ts']
+        max_dd = 0.0
+        max_dd_pct = 0.0
+        dd_peak_ts = None
+        trough_ts = None
+
+        for b in buckets:
+            if b['high'] > peak:
+                peak = b['high']
+                peak_ts = b['ts']
+            dd = peak - b['low']
+            if dd > max_dd:
+                max_dd = dd
+                max_dd_pct = (dd / peak * 100) if peak > 0 else 0
+                dd_peak_ts = peak_ts
+                trough_ts = b['ts']
+
+        return {
+            'max_drawdown': round(max_dd, 4),
+            'max_drawdown_pct': round(max_dd_pct, 2),
+            'current_drawdown': round(peak - buckets[-1]['close'], 4),
+            'peak': peak,
+            'peak_ts': dd_peak_ts,
+            'trough_ts': trough_ts
+        }
+
+    def get_stats(self) -> Dict:
+        """Statistiques du store"""
+        with self._buffer_lock:
+            buffered = len(self._buffer)
+        return {
+            'buffered_points': buffered,
+            'points_written': self.points_written,
+            'rollups_written': self.rollups_written,
+            'flush_count': self.flush_count
+        }
+
+
+# Instance globale (partage la connexion du DBManager)
+_timeseries_store = None
+_init_lock = threading.Lock()
+
+
+def get_timeseries_store() -> TimeSeriesStore:
+    """Retourne l'instance partagée du store"""
+    global _timeseries_store
+    if _timeseries_store is None:
+        with _init_lock:
+            if _timeseries_store is None:
+                from db_manager import db_manager
+                _timeseries_store = TimeSeriesStore(db_manager)
+    return _timeseries_store
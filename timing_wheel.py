@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Timing Wheel - Expiration à échéance exacte, en O(1)
+
+Roue temporelle hiérarchique (type noyau Linux / Kafka): chaque niveau a
+`slots` cases, une case du niveau L couvre slots^L ticks. Un timer est rangé
+au plus petit niveau qui contient son échéance; quand la roue inférieure fait
+un tour, la case correspondante du niveau supérieur est redescendue (cascade).
+
+    - schedule / cancel: O(1) (dict par case + index par clé)
+    - advance: O(ticks écoulés + timers expirés), jamais de scan complet
+    - un timer n'expire jamais avant son échéance (arrondi au tick supérieur)
+
+La roue n'a pas de thread: le propriétaire appelle `advance()` (boucle
+existante ou avant une lecture). Les callbacks sont appelés hors du verrou.
+"""
+import math
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger("TimingWheel")
+
+
+class _Timer:
+    __slots__ = ('key', 'expires_tick', 'callback', 'level', 'slot')
+
+    def __init__(self, key: Hashable, expires_tick: int, callback: Optional[Callable[[Hashable], Any]]):
+        self.key = key
+        self.expires_tick = expires_tick
+        self.callback = callback
+        self.level = 0
+        self.slot = 0
+
+
+class TimingWheel:
+    """
+    Roue temporelle hiérarchique. Thread-safe.
+
+    Args:
+        tick_sec: Résolution (durée d'un tick)
+        slots: Cases par niveau
+        levels: Nombre de niveaux (portée: tick_sec * slots^levels, au-delà
+                les timers restent au dernier niveau et y cascadent)
+    """
+
+    def __init__(self, tick_sec: float = 1.0, slots: int = 64, levels: int = 4,
+                 now: Optional[float] = None, name: str = "TimingWheel"):
+        self.tick_sec = tick_sec
+        self.slots = slots
+        self.levels = levels
+        self.name = name
+
+        self._wheels: List[List[Dict[Hashable, _Timer]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._spans = [slots ** level for level in range(levels + 1)]
+        self._timers: Dict[Hashable, _Timer] = {}
+        self._current_tick = int((now if now is not None else time.time()) // tick_sec)
+        self._lock = threading.Lock()
+
+        # Stats
+        self.scheduled = 0
+        self.fired = 0
+        self.cancelled = 0
+        self.cascaded = 0
+
+    # =========================================================================
+    # TIMERS
+    # =========================================================================
+
+    def _place(self, timer: _Timer):
+        """Range un timer dans la bonne case (appelé sous le verrou)"""
+        delta = timer.expires_tick - self._current_tick
+        level = 0
+        while level < self.levels - 1 and delta >= self._spans[level + 1]:
+            level += 1
+        timer.level = level
+        timer.slot = (timer.expires_tick // self._spans[level]) % self.slots
+        self._wheels[level][timer.slot][timer.key] = timer
+
+    def _unlink(self, timer: _Timer):
+        self._wheels[timer.level][timer.slot].pop(timer.key, None)
+
+    def schedule(self, key: Hashable, deadline: float,
+                 callback: Optional[Callable[[Hashable], Any]] = None):
+        """
+        Programme (ou reprogramme) l'expiration de `key` à `deadline` (epoch).
+        Une échéance passée expire au prochain tick.
+        """
+        expires_tick = max(math.ceil(deadline / self.tick_sec), 0)
+        with self._lock:
+            old = self._timers.get(key)
+            if old is not None:
+                self._unlink(old)
+            timer = _Timer(key, max(expires_tick, self._current_tick + 1), callback)
+            self._timers[key] = timer
+            self._place(timer)
+            self.scheduled += 1
+
+    def cancel(self, key: Hashable) -> bool:
+        """Annule le timer de `key`; False s'il n'existait pas"""
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer is None:
+                return False
+            self._unlink(timer)
+            self.cancelled += 1
+            return True
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """
+        Avance la roue jusqu'à `now` et exécute les callbacks des timers expirés.
+
+        Returns:
+            Nombre de timers expirés
+        """
+        target = int((now if now is not None else time.time()) // self.tick_sec)
+        expired: List[_Timer] = []
+        with self._lock:
+            if target <= self._current_tick:
+                return 0
+            if not self._timers:
+                self._current_tick = target
+                return 0
+            while self._current_tick < target:
+                self._current_tick += 1
+                tick = self._current_tick
+                # Cascade: du plus haut niveau dont la période se termine vers le bas
+                for level in range(self.levels - 1, 0, -1):
+                    if tick % self._spans[level] == 0:
+                        slot = self._wheels[level][(tick // self._spans[level]) % self.slots]
+                        if slot:
+                            timers = list(slot.values())
+                            slot.clear()
+                            for timer in timers:
+                                self._place(timer)
+                            self.cascaded += len(timers)
+                bucket = self._wheels[0][tick % self.slots]
+                if bucket:
+                    for timer in bucket.values():
+                        del self._timers[timer.key]
+                        expired.append(timer)
+                    bucket.clear()
+                if not self._timers:
+                    self._current_tick = target
+            self.fired += len(expired)
+
+        for timer in expired:
+            if timer.callback:
+                try:
+                    timer.callback(timer.key)
+                except Exception as e:
+                    logger.error(f"❌ {self.name}: erreur callback {timer.key}: {e}")
+        return len(expired)
+
+    # =========================================================================
+    # ÉTAT
+    # =========================================================================
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        """Échéance (arrondie au tick) de `key`, None si non programmé"""
+        timer = self._timers.get(key)
+        return timer.expires_tick * self.tick_sec if timer else None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'pending': len(self._timers),
+                'tick_sec': self.tick_sec,
+                'scheduled': self.scheduled,
+                'fired': self.fired,
+                'cancelled': self.cancelled,
+                'cascaded': self.cascaded
+            }
@@ -8,6 +8,9 @@ from typing import Dict, List, Tuple
 
 logger = logging.getLogger("TradeValidator")
 
+# Statuts comptés dans les limites: PENDING = ordre d'achat en vol, pas encore rempli
+ACTIVE_STATUSES = ('OPEN', 'PENDING')
+
 
 class TradeValidator:
     """Valide les trades selon plusieurs critères de risque"""
@@ -58,8 +61,8 @@ class TradeValidator:
         if liquidity < self.min_market_liquidity:
             return False, f"Liquidité insuffisante: ${liquidity:.0f} < ${self.min_market_liquidity}"
         
-        # 3. Vérifier le nombre de positions ouvertes
-        open_positions = [p for p in current_positions if p.get('status') == 'OPEN']
+        # 3. Vérifier le nombre de positions ouvertes (ou en attente de remplissage)
+        open_positions = [p for p in current_positions if p.get('status') in ACTIVE_STATUSES]
         if len(open_positions) >= self.max_open_positions:
             return False, f"Nombre max de positions atteint: {len(open_positions)}/{self.max_open_positions}"
         
@@ -122,7 +125,7 @@ class TradeValidator:
         }
         
         # Check 3: Nombre de positions
-        open_positions = [p for p in current_positions if p.get('status') == 'OPEN']
+        open_positions = [p for p in current_positions if p.get('status') in ACTIVE_STATUSES]
         checks['open_positions'] = {
             'passed': len(open_positions) < self.max_open_positions,
             'message': f"{len(open_positions)}/{self.max_open_positions} positions"
@@ -212,6 +215,14 @@ if __name__ == '__main__':
     assert "max de positions" in reason, f"Test 4 failed: {reason}"
     print("✅ Test 4: Trop de positions rejetée OK")
     
+    # Test 4b: Les positions PENDING (ordre en vol) comptent aussi
+    positions = [{'status': 'OPEN', 'value_usd': 10} for _ in range(5)]
+    positions += [{'status': 'PENDING', 'value_usd': 10} for _ in range(5)]
+    is_valid, reason = validator.validate(signal1, positions)
+    assert not is_valid, "Test 4b failed"
+    assert "max de positions" in reason, f"Test 4b failed: {reason}"
+    print("✅ Test 4b: Positions PENDING comptées OK")
+    
     # Test 5: Validation avec détails
     result = validator.validate_with_details(signal1, [])
     assert result['valid'], f"Test 5 failed: {result}"
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Wallet Sharding - Répartition des wallets suivis entre shards de polling
+
+Hash consistant (anneau avec nœuds virtuels): chaque wallet appartient à un
+shard déterminé par son adresse. Quand le nombre de shards change (wallets
+ajoutés/retirés), seuls ~1/N wallets changent de shard; les autres gardent
+leur shard et leur rythme de polling.
+"""
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterable, List
+
+DEFAULT_VNODES = 64
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class ConsistentHashRing:
+    """Anneau de hash consistant sur des shards numérotés 0..size-1. Thread-safe."""
+
+    def __init__(self, size: int = 1, vnodes: int = DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[int] = []
+        self._lock = threading.Lock()
+        self.size = 0
+        self.resize(size)
+
+    def resize(self, size: int):
+        """Ajuste le nombre de shards (les shards existants gardent leurs points)"""
+        size = max(1, int(size))
+        ring = {}
+        for shard in range(size):
+            for v in range(self.vnodes):
+                ring[_hash(f"shard-{shard}-{v}")] = shard
+        points = sorted(ring)
+        with self._lock:
+            self._points = points
+            self._owners = [ring[p] for p in points]
+            self.size = size
+
+    def shard_for(self, key: str) -> int:
+        """Shard propriétaire d'une clé (adresse de wallet, insensible à la casse)"""
+        h = _hash(key.lower())
+        with self._lock:
+            idx = bisect.bisect(self._points, h) % len(self._points)
+            return self._owners[idx]
+
+    def assign(self, keys: Iterable[str]) -> Dict[int, List[str]]:
+        """Répartition {shard: [clés]} (tous les shards présents, même vides)"""
+        slices = {shard: [] for shard in range(self.size)}
+        for key in keys:
+            slices.setdefault(self.shard_for(key), []).append(key)
+        return slices